@@ -14,6 +14,7 @@ setup(name = 'Finmag',
         packages = [
             'finmag',
             'finmag.scheduler',
+            'finmag.benchmarks',
             'finmag.example.normal_modes',
             'finmag.example',
             'finmag.drivers',
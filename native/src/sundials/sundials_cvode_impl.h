@@ -346,6 +346,13 @@ namespace finmag { namespace sundials {
             return retval;
         }
 
+        // Dense output: the k-th derivative of the interpolating polynomial
+        // at time t, which must lie within the last internal step.
+        void get_dky(double t, int k, np_array<double> &dky) {
+            array_nvector nv(dky);
+            CHECK_SUNDIALS_RET(CVodeGetDky, (cvode_mem, t, k, nv.ptr()));
+        }
+
         void get_err_weights(np_array<double> &eweight) {
             array_nvector nv(eweight);
             CHECK_SUNDIALS_RET(CVodeGetErrWeights, (cvode_mem, nv.ptr()));
@@ -716,7 +723,7 @@ namespace finmag { namespace sundials {
         double tret = 0;
         // Release GIL while we are performing time integration
         finmag::util::scoped_gil_release gil_release;
-        CHECK_SUNDIALS_RET(CVode, (cvode_mem, tout, yout_nvec.ptr(), &tout, itask));
+        CHECK_SUNDIALS_RET(CVode, (cvode_mem, tout, yout_nvec.ptr(), &tret, itask));
         return tret;
     }
 
@@ -824,6 +831,7 @@ namespace finmag { namespace sundials {
         cv.def("get_current_time", &cvode::get_current_time);
         cv.def("get_num_stab_lim_order_reds", &cvode::get_num_stab_lim_order_reds);
         cv.def("get_tol_scale_factor", &cvode::get_tol_scale_factor);
+        cv.def("get_dky", &cvode::get_dky, (arg("t"), arg("k"), arg("dky")));
         cv.def("get_err_weights", &cvode::get_err_weights, (arg("eweights")));
         cv.def("get_est_local_errors", &cvode::get_est_local_errors, (arg("ele")));
         cv.def("get_integrator_stats", &cvode::get_integrator_stats);
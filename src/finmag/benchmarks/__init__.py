@@ -0,0 +1,22 @@
+"""
+Reproducible performance benchmarks of finmag.
+
+Run the suite with
+
+    python -m finmag.benchmarks --output results.json
+
+and compare a later run against these results with
+
+    python -m finmag.benchmarks --baseline results.json
+
+which flags the cases that became slower by more than the given
+tolerance (and exits with a non-zero status if there are any). See
+`python -m finmag.benchmarks --help` for all options.
+
+The cases are defined in finmag.benchmarks.cases. The infrastructure in
+finmag.benchmarks.suite does not require dolfin.
+
+"""
+from suite import Benchmark, BENCHMARKS, benchmark, run_benchmarks, \
+    save_results, load_results, compare_to_baseline, format_comparison, \
+    format_results, machine_metadata
@@ -0,0 +1,75 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from finmag.benchmarks import suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m finmag.benchmarks',
+        description='Run the finmag benchmark suite.')
+    parser.add_argument('--sizes', default='small,medium',
+                        help='comma separated problem sizes out of small, '
+                        'medium and large (default: %(default)s)')
+    parser.add_argument('--cases', default=None,
+                        help='comma separated parts of the names of the '
+                        'cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed repetitions per case')
+    parser.add_argument('--output', default=None,
+                        help='save the results to this JSON file')
+    parser.add_argument('--baseline', default=None,
+                        help='compare the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown which is flagged when '
+                        'comparing to the baseline (default: %(default)s)')
+    parser.add_argument('--list', action='store_true',
+                        help='list the cases and exit')
+    args = parser.parse_args(argv)
+
+    from finmag.benchmarks import cases
+
+    if args.list:
+        for name, case in suite.BENCHMARKS.iteritems():
+            print "{:<32} {}".format(name, case.description)
+        return 0
+
+    sizes = args.sizes.split(',')
+    for size in sizes:
+        if size not in cases.SIZES:
+            parser.error("Unknown size '{}'. Known sizes: {}".format(
+                size, ', '.join(cases.SIZES)))
+    names = args.cases.split(',') if args.cases else None
+
+    # The output cases write files, so run everything in a scratch directory.
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp(prefix='finmag_benchmarks_')
+    os.chdir(tmpdir)
+    try:
+        results = suite.run_benchmarks(sizes, names=names, repeat=args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+    print suite.format_results(results)
+    if output:
+        suite.save_results(results, output)
+
+    if args.baseline:
+        rows = suite.compare_to_baseline(
+            results, suite.load_results(args.baseline), args.tolerance)
+        print
+        print suite.format_comparison(rows)
+        slower = [row[0] for row in rows if row[4] in ('slower', 'failed')]
+        if slower:
+            print
+            print "Slower or failed: {}".format(', '.join(slower))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
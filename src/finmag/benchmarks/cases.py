@@ -0,0 +1,164 @@
+"""
+The benchmark cases of the suite.
+
+All cases use permalloy boxes of 40 nm x 40 nm x 5 nm generated with
+`finmag.util.meshes.box`. The problem sizes differ only in the maximum
+edge length of the mesh (see `SIZES`). The meshes are saved to
+`MESH_DIRECTORY` so that the same meshes are used in all runs.
+
+"""
+import os
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import dolfin as df
+from finmag import Simulation, sim_with, normal_mode_simulation
+from finmag.energies import Exchange, UniaxialAnisotropy, DMI, Zeeman, Demag
+from finmag.energies.demag.treecode_bem import TreecodeBEM
+from finmag.native.llg import compute_bem_fk
+from finmag.util.meshes import box
+from suite import benchmark
+
+# Maximum edge length (in nm) of the meshes for each problem size.
+SIZES = OrderedDict([('small', 4.0), ('medium', 2.5), ('large', 1.6)])
+
+MESH_DIRECTORY = os.path.join(tempfile.gettempdir(), 'finmag_benchmark_meshes')
+
+Ms = 8.6e5
+A = 13e-12
+m_init = (1, 0, 1)
+
+_meshes = {}
+
+
+def mesh_for(size):
+    if size not in _meshes:
+        maxh = SIZES[size]
+        _meshes[size] = box(0, 0, 0, 40, 40, 5, maxh, directory=MESH_DIRECTORY,
+                            filename="benchmark_box_{}".format(size))
+    return _meshes[size]
+
+
+def _standard_sim(size, name, demag=True):
+    """
+    Exchange and demag (if `demag` is True) with uniform initial
+    magnetisation.
+    """
+    return sim_with(mesh_for(size), Ms, m_init, A=A, unit_length=1e-9,
+                    demag_solver='FK' if demag else None,
+                    name='benchmark_{}_{}'.format(name, size))
+
+
+def _nodes(sim):
+    return sim.mesh.num_vertices()
+
+
+@benchmark('llg_rhs')
+def llg_rhs(size):
+    """Right-hand side of the LLG equation (exchange, anisotropy, demag)."""
+    sim = _standard_sim(size, 'rhs')
+    sim.add(UniaxialAnisotropy(1e4, (0, 0, 1)))
+    y = sim.llg._m_field.get_ordered_numpy_array_xxx()
+    ydot = np.empty_like(y)
+    return (lambda: sim.llg.sundials_rhs(0.0, y, ydot)), _nodes(sim)
+
+
+def _field_benchmark(name, interaction_factory):
+    def setup(size):
+        sim = Simulation(mesh_for(size), Ms, unit_length=1e-9,
+                         name='benchmark_{}_{}'.format(name, size))
+        sim.set_m(m_init)
+        interaction = interaction_factory()
+        sim.add(interaction)
+        return interaction.compute_field, _nodes(sim)
+    return setup
+
+
+for _name, _factory in [
+        ('Exchange', lambda: Exchange(A)),
+        ('UniaxialAnisotropy', lambda: UniaxialAnisotropy(5e4, (0, 0, 1))),
+        ('DMI', lambda: DMI(3e-3)),
+        ('Zeeman', lambda: Zeeman((0, 0, 1e5))),
+        ('Demag_FK', lambda: Demag('FK')),
+        ('Demag_Treecode', lambda: Demag('Treecode'))]:
+    _setup = _field_benchmark(_name, _factory)
+    _setup.__doc__ = "Field of the {} interaction.".format(_name)
+    benchmark('compute_field/' + _name)(_setup)
+
+
+@benchmark('bem_build')
+def bem_build(size):
+    """Assembly of the dense boundary element matrix of the FK method."""
+    mesh = mesh_for(size)
+    boundary_mesh = df.BoundaryMesh(mesh, 'exterior', False)
+    return (lambda: compute_bem_fk(boundary_mesh)), mesh.num_vertices()
+
+
+@benchmark('treecode_setup')
+def treecode_setup(size):
+    """Setup of the treecode demag solver (solid angles, normals, tree)."""
+    sim = Simulation(mesh_for(size), Ms, unit_length=1e-9,
+                     name='benchmark_treecode_{}'.format(size))
+    sim.set_m(m_init)
+
+    def setup():
+        TreecodeBEM().setup(sim.llg.effective_field.m_field,
+                            sim.llg.effective_field.Ms, unit_length=1e-9)
+    return setup, _nodes(sim)
+
+
+@benchmark('cvode_run_until')
+def cvode_run_until(size):
+    """Time integration of the standard problem for 10 ps with CVODE."""
+    sim = _standard_sim(size, 'run_until')
+
+    def run():
+        sim.set_m(m_init)
+        sim.reset_time(0.0)
+        sim.run_until(1e-11)
+    return run, _nodes(sim)
+
+
+@benchmark('neb_step', sizes=('small', 'medium'))
+def neb_step(size):
+    """Effective field and tangents of a band of 6 images."""
+    from finmag.physics.neb import NEB_Sundials
+    sim = _standard_sim(size, 'neb', demag=False)
+    sim.add(UniaxialAnisotropy(5e4, (0, 0, 1)))
+    neb = NEB_Sundials(sim, [(0, 0, 1), (0, 0, -1)], interpolations=[4],
+                       name='benchmark_neb_{}'.format(size))
+    return (lambda: neb.compute_effective_field(neb.coords)), _nodes(sim)
+
+
+@benchmark('eigenmode_assembly', sizes=('small',))
+def eigenmode_assembly(size):
+    """Assembly of the matrices of the generalised eigenproblem."""
+    sim = normal_mode_simulation(mesh_for(size), Ms, m_init, A=A,
+                                 unit_length=1e-9, demag_solver=None,
+                                 name='benchmark_eigen_{}'.format(size))
+
+    def assemble():
+        sim.assemble_eigenproblem_matrices(use_generalized=True,
+                                           force_recompute_matrices=True)
+    return assemble, _nodes(sim)
+
+
+@benchmark('save_ndt')
+def save_ndt(size):
+    """Saving a line of averages to the .ndt file."""
+    sim = _standard_sim(size, 'ndt')
+    return sim.save_ndt, _nodes(sim)
+
+
+@benchmark('save_npy')
+def save_npy(size):
+    """Saving the magnetisation to numbered .npy files."""
+    sim = _standard_sim(size, 'npy')
+    return (lambda: sim.save_field('m', incremental=True)), _nodes(sim)
+
+
+@benchmark('save_vtk')
+def save_vtk(size):
+    """Saving the magnetisation to a .pvd/.vtu series."""
+    sim = _standard_sim(size, 'vtk')
+    return sim.save_vtk, _nodes(sim)
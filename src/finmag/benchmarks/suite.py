@@ -0,0 +1,242 @@
+"""
+Infrastructure of the benchmark suite: a registry of benchmark cases,
+timing, machine metadata, JSON storage and comparison with a baseline.
+
+This module does not depend on dolfin, so results can be compared on
+machines without a finmag installation.
+
+"""
+import json
+import time
+import socket
+import logging
+import platform
+import traceback
+import multiprocessing
+from collections import OrderedDict
+import numpy as np
+
+log = logging.getLogger(name="finmag")
+
+# Format version of the results files.
+RESULTS_VERSION = 1
+
+
+class Benchmark(object):
+
+    """
+    A benchmark case. The function `setup(size)` prepares everything that
+    should not be timed and returns a function without arguments whose
+    execution time is measured, or a pair (function, number of mesh
+    nodes).
+
+    If `sizes` is given, the case is only run for these problem sizes
+    (e.g. because it needs dense matrices).
+
+    """
+
+    def __init__(self, name, setup, sizes=None, description=""):
+        self.name = name
+        self.setup = setup
+        self.sizes = sizes
+        self.description = description
+
+    def runs_for(self, size):
+        return self.sizes is None or size in self.sizes
+
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, sizes=None):
+    """
+    Decorator which registers the setup function of a benchmark case
+    under `name` (see `Benchmark`). The docstring of the function is
+    used as the description of the case.
+    """
+    def register(setup):
+        if name in BENCHMARKS:
+            raise ValueError("A benchmark named '{}' exists already.".format(name))
+        BENCHMARKS[name] = Benchmark(name, setup, sizes,
+                                     (setup.__doc__ or "").strip())
+        return setup
+    return register
+
+
+def result_key(name, size):
+    return "{}[{}]".format(name, size)
+
+
+def time_function(f, repeat=5, warmup=1):
+    """
+    Call `f` `warmup` times without timing it and then `repeat` times,
+    and return a dictionary with the minimum, median and mean time of a
+    call (in seconds) and the number of timed calls.
+
+    The minimum is the least noisy of these and is used for comparisons.
+    """
+    for i in xrange(warmup):
+        f()
+    times = []
+    for i in xrange(repeat):
+        start = time.time()
+        f()
+        times.append(time.time() - start)
+    return {'min': min(times),
+            'median': float(np.median(times)),
+            'mean': float(np.mean(times)),
+            'repeat': repeat}
+
+
+def machine_metadata():
+    """
+    Return a dictionary describing the machine and the versions of the
+    most relevant software, to be stored with the results.
+    """
+    metadata = {'hostname': socket.gethostname(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'processor': platform.processor(),
+                'cpu_count': multiprocessing.cpu_count(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    metadata['processor'] = line.split(':', 1)[1].strip()
+                    break
+    except IOError:
+        pass
+    for module in ['scipy', 'dolfin']:
+        try:
+            metadata[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            metadata[module] = None
+    return metadata
+
+
+def run_benchmarks(sizes, names=None, repeat=5, benchmarks=None):
+    """
+    Run the benchmark cases for all problem `sizes` and return the
+    results as a dictionary with the keys 'version', 'metadata' and
+    'results'. The latter maps 'NAME[SIZE]' to the timings (see
+    `time_function`) and the number of mesh nodes, or to {'error': ...}
+    if the case failed.
+
+    If `names` is given, only the cases whose names contain one of the
+    strings in `names` are run.
+
+    """
+    if benchmarks is None:
+        benchmarks = BENCHMARKS
+    results = OrderedDict()
+    for size in sizes:
+        for name, case in benchmarks.iteritems():
+            if names and not any(n in name for n in names):
+                continue
+            if not case.runs_for(size):
+                continue
+            key = result_key(name, size)
+            log.info("Running benchmark {}.".format(key))
+            try:
+                f = case.setup(size)
+                nodes = None
+                if isinstance(f, tuple):
+                    f, nodes = f
+                result = time_function(f, repeat=repeat)
+                result['nodes'] = nodes
+            except Exception as e:
+                log.error("Benchmark {} failed: {}".format(key, e))
+                log.debug(traceback.format_exc())
+                result = {'error': "{}: {}".format(type(e).__name__, e)}
+            results[key] = result
+    return {'version': RESULTS_VERSION,
+            'metadata': machine_metadata(),
+            'results': results}
+
+
+def save_results(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    log.info("Saved benchmark results to '{}'.".format(filename))
+
+
+def load_results(filename):
+    with open(filename) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Compare the minimum times in `results` with those in `baseline`
+    (both as returned by `run_benchmarks`).
+
+    Returns a list of tuples (key, baseline time, new time, ratio,
+    status), where status is one of
+
+        'slower'    new time > (1 + tolerance) * baseline time
+        'faster'    new time < baseline time / (1 + tolerance)
+        'ok'        otherwise
+        'new'       the case is not in the baseline
+        'failed'    the case failed in `results`
+
+    Cases in the baseline which were not run are ignored.
+
+    """
+    rows = []
+    old = baseline['results']
+    for key, result in results['results'].iteritems():
+        if 'error' in result:
+            rows.append((key, None, None, None, 'failed'))
+            continue
+        new_time = result['min']
+        if key not in old or 'error' in old[key]:
+            rows.append((key, None, new_time, None, 'new'))
+            continue
+        old_time = old[key]['min']
+        ratio = new_time / old_time if old_time > 0 else float('inf')
+        if ratio > 1 + tolerance:
+            status = 'slower'
+        elif ratio < 1.0 / (1 + tolerance):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, old_time, new_time, ratio, status))
+    return rows
+
+
+def format_comparison(rows):
+    """
+    Return the comparison returned by `compare_to_baseline` as a table.
+    """
+    def fmt(x, spec):
+        return "-" if x is None else format(x, spec)
+
+    width = max([len(row[0]) for row in rows] + [9])
+    lines = ["{:<{w}} {:>12} {:>12} {:>8}  {}".format(
+        "benchmark", "baseline [s]", "new [s]", "ratio", "status", w=width)]
+    for key, old_time, new_time, ratio, status in rows:
+        lines.append("{:<{w}} {:>12} {:>12} {:>8}  {}".format(
+            key, fmt(old_time, '.4g'), fmt(new_time, '.4g'),
+            fmt(ratio, '.2f'), status, w=width))
+    return "\n".join(lines)
+
+
+def format_results(results):
+    """
+    Return the timings in `results` as a table.
+    """
+    rows = results['results']
+    width = max([len(key) for key in rows] + [9])
+    lines = ["{:<{w}} {:>8} {:>12} {:>12}".format(
+        "benchmark", "nodes", "min [s]", "median [s]", w=width)]
+    for key, result in rows.iteritems():
+        if 'error' in result:
+            lines.append("{:<{w}} failed: {}".format(key, result['error'], w=width))
+        else:
+            lines.append("{:<{w}} {:>8} {:>12.4g} {:>12.4g}".format(
+                key, result['nodes'] or '-', result['min'], result['median'],
+                w=width))
+    return "\n".join(lines)
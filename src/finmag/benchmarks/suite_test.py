@@ -0,0 +1,64 @@
+import time
+import pytest
+from collections import OrderedDict
+from suite import Benchmark, run_benchmarks, compare_to_baseline, \
+    format_comparison, format_results, save_results, load_results
+
+
+def sleeper(seconds):
+    def setup(size):
+        return (lambda: time.sleep(seconds)), 42
+    return setup
+
+
+def failing_setup(size):
+    raise RuntimeError("no mesh generator")
+
+
+def make_benchmarks():
+    return OrderedDict([
+        ('sleep', Benchmark('sleep', sleeper(0.01))),
+        ('sleep_small', Benchmark('sleep_small', sleeper(0.001),
+                                  sizes=('small',))),
+        ('broken', Benchmark('broken', failing_setup))])
+
+
+def test_run_benchmarks(tmpdir):
+    results = run_benchmarks(['small', 'large'], repeat=2,
+                             benchmarks=make_benchmarks())
+    r = results['results']
+    assert r.keys() == ['sleep[small]', 'sleep_small[small]', 'broken[small]',
+                        'sleep[large]', 'broken[large]']
+    assert r['sleep[small]']['min'] >= 0.01
+    assert r['sleep[small]']['nodes'] == 42
+    assert r['sleep[small]']['repeat'] == 2
+    assert 'RuntimeError' in r['broken[large]']['error']
+    assert 'hostname' in results['metadata']
+    assert 'sleep[large]' in format_results(results)
+
+    # Results survive a round trip through JSON.
+    filename = str(tmpdir.join('results.json'))
+    save_results(results, filename)
+    assert load_results(filename)['results'].keys() == r.keys()
+
+    results = run_benchmarks(['small'], names=['small'], repeat=1,
+                             benchmarks=make_benchmarks())
+    assert results['results'].keys() == ['sleep_small[small]']
+
+
+def test_compare_to_baseline():
+    baseline = {'results': {'a[small]': {'min': 1.0},
+                            'b[small]': {'min': 1.0},
+                            'c[small]': {'min': 1.0},
+                            'gone[small]': {'min': 1.0}}}
+    results = {'results': OrderedDict([
+        ('a[small]', {'min': 1.1}),
+        ('b[small]', {'min': 1.5}),
+        ('c[small]', {'min': 0.5}),
+        ('d[small]', {'min': 1.0}),
+        ('e[small]', {'error': 'oops'})])}
+    rows = compare_to_baseline(results, baseline, tolerance=0.2)
+    assert [row[4] for row in rows] == ['ok', 'slower', 'faster', 'new', 'failed']
+    assert rows[1][3] == pytest.approx(1.5)
+    table = format_comparison(rows)
+    assert 'slower' in table and 'gone' not in table
@@ -0,0 +1,53 @@
+"""
+Benchmark of the cost of scheduled output during a ringdown.
+
+Runs a 1 ns ringdown of a small permalloy bar three times:
+
+- without saving anything,
+- saving the averages every 5 ps (served by interpolating CVODE's
+  solution, which is the default),
+- saving the averages every 5 ps but forcing CVODE to stop at each save
+  time (using `hard_stop=True`, which is what every event would cost if
+  output was not interpolated).
+
+and reports the number of RHS evaluations and the wall time of each run.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+import finmag
+
+t_end = 1e-9
+t_save = 5e-12
+
+
+def ringdown(save=False, hard_stop=False):
+    sim = finmag.example.barmini(name='ringdown')
+    sim.alpha = 0.01
+    if save:
+        sim.schedule('save_ndt', every=t_save, hard_stop=hard_stop)
+    start = time.time()
+    sim.run_until(t_end)
+    runtime = time.time() - start
+    return sim.integrator.stats()['nfevals'], runtime
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp()
+    os.chdir(tmpdir)
+    try:
+        results = [("no output", ringdown()),
+                   ("interpolated output", ringdown(save=True)),
+                   ("hard stops", ringdown(save=True, hard_stop=True))]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+    for label, (nfevals, runtime) in results:
+        print "{:>20}: {:6d} RHS evaluations, {:.2f} s".format(
+            label, nfevals, runtime)
+    print "RHS evaluations saved by interpolating: {:.1f}x".format(
+        results[2][1][0] / float(results[1][1][0]))
@@ -0,0 +1,58 @@
+"""
+Benchmark of the preconditioners for the GMRES solver used by CVODE.
+
+Relaxes the magnetisation of a 50 nm x 50 nm x 5 nm permalloy film
+(exchange and anisotropy only, so that exchange dominates the stiffness)
+for 0.1 ns on meshes of increasing resolution, once with the identity
+as preconditioner (method "bdf_gmres_prec_id", the default) and once with
+the incomplete LU preconditioner (method "bdf_gmres_prec_ilu"), and
+reports the number of time steps, linear iterations and the wall time.
+
+"""
+import time
+import dolfin as df
+from finmag.physics.llg import LLG
+from finmag.drivers.llg_integrator import llg_integrator
+from finmag.energies import Exchange, UniaxialAnisotropy
+
+t_end = 1e-10
+resolutions = [5.0, 2.5, 1.25]  # cell size in nm
+methods = ["bdf_gmres_prec_id", "bdf_gmres_prec_ilu"]
+
+
+def setup_llg(h):
+    nx = int(round(50 / h))
+    nz = max(1, int(round(5 / h)))
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(50, 50, 5), nx, nx, nz)
+    S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+    llg = LLG(S1, S3, unit_length=1e-9)
+    llg.Ms = 8.6e5
+    llg.set_alpha(0.5)
+    llg.set_m(df.Expression(("cos(x[0] / 10)", "sin(x[0] / 10)", "0.1"),
+                            degree=1))
+    llg.effective_field.add(Exchange(13e-12))
+    llg.effective_field.add(UniaxialAnisotropy(1e4, (1, 0, 0)))
+    return llg
+
+
+def run(h, method):
+    llg = setup_llg(h)
+    integrator = llg_integrator(llg, llg.m_field, method=method)
+    start = time.time()
+    integrator.advance_time(t_end)
+    runtime = time.time() - start
+    stats = integrator.stats()
+    linear_stats = integrator.linear_solver_stats()
+    return (llg.S1.dim(), stats['nsteps'], linear_stats['nliters'],
+            linear_stats['nlcfails'], runtime)
+
+
+if __name__ == "__main__":
+    print "{:>8} {:>20} {:>8} {:>8} {:>8} {:>8}".format(
+        "nodes", "method", "steps", "liniters", "linfails", "time [s]")
+    for h in resolutions:
+        for method in methods:
+            nodes, nsteps, nliters, nlcfails, runtime = run(h, method)
+            print "{:8d} {:>20} {:8d} {:8d} {:8d} {:8.2f}".format(
+                nodes, method, nsteps, nliters, nlcfails, runtime)
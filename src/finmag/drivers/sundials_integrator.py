@@ -1,5 +1,6 @@
 import logging
 from finmag.native import sundials
+from finmag.physics.llg_preconditioner import LLGPreconditioner
 
 EPSILON = 1e-15
 
@@ -11,6 +12,25 @@ class SundialsIntegrator(object):
     """
     Sundials time integrator. We always start integration from t = 0.
 
+    CVODE is run in its normal mode, i.e. it chooses its internal steps
+    freely and the solution at a requested output time is obtained by
+    interpolation (dense output). Requests for output times which lie
+    within the last internal step are answered directly from the
+    interpolating polynomial without calling CVODE. Use `set_stop_time`
+    before `advance_time` if the integrator must not step past the
+    target time (e.g. because the system is changed there).
+
+    The available methods are
+
+        adams               Adams-Moulton with functional iteration
+        bdf_diag            BDF with a diagonal approximation of the Jacobian
+        bdf_gmres_no_prec   BDF with GMRES, without preconditioner
+        bdf_gmres_prec_id   BDF with GMRES and the identity as preconditioner
+        bdf_gmres_prec_ilu  BDF with GMRES, preconditioned with an incomplete
+                            LU factorisation of the local part of the LLG
+                            Jacobian and the linear interactions (see
+                            finmag.physics.llg_preconditioner)
+
     Attributes:
         cur_t       The time up to which integration has been carried out.
     """
@@ -18,11 +38,14 @@ class SundialsIntegrator(object):
     def __init__(self, llg, m0, t0=0.0, reltol=1e-6, abstol=1e-6,
                  nsteps=10000, method="bdf_gmres_prec_id", tablewriter=None):
         assert method in ("adams", "bdf_diag",
-                          "bdf_gmres_no_prec", "bdf_gmres_prec_id")
+                          "bdf_gmres_no_prec", "bdf_gmres_prec_id",
+                          "bdf_gmres_prec_ilu")
         self.llg = llg
         self.cur_t = t0
         self.m = m0.copy()
         self.tablewriter = tablewriter
+        self.n_dense_outputs = 0
+        self.preconditioner = None
 
         if method == "adams":
             integrator = sundials.cvode(
@@ -43,6 +66,12 @@ class SundialsIntegrator(object):
             integrator.set_spils_jac_times_vec_fn(self.llg.sundials_jtimes)
             integrator.set_spils_preconditioner(
                 llg.sundials_psetup, llg.sundials_psolve)
+        elif method == "bdf_gmres_prec_ilu":
+            integrator.set_linear_solver_sp_gmr(sundials.PREC_LEFT)
+            integrator.set_spils_jac_times_vec_fn(self.llg.sundials_jtimes)
+            self.preconditioner = LLGPreconditioner(llg)
+            integrator.set_spils_preconditioner(
+                self.preconditioner.psetup, self.preconditioner.psolve)
 
         integrator.set_scalar_tolerances(reltol, abstol)
         self.max_steps = nsteps
@@ -86,6 +115,14 @@ class SundialsIntegrator(object):
                 "t={:.3g}, self.cur_t={:.3g} -- why are we integrating "
                 "into the past?".format(t, self.cur_t))
 
+        if self._within_last_step(t):
+            # CVODE has already stepped past t, so we can interpolate.
+            self.integrator.get_dky(t, 0, self.m)
+            self.n_dense_outputs += 1
+            self.cur_t = t
+            self.llg.sundials_m = self.m
+            return True
+
         try:
             self.integrator.advance_time(t, self.m)
         except RuntimeError, msg:
@@ -118,6 +155,26 @@ class SundialsIntegrator(object):
         self.llg.sundials_m = self.m  # actually writes to the field class (c.f. llg.py)
         return reached_tout
 
+    def _within_last_step(self, t):
+        if self.integrator.get_num_steps() == 0:
+            return False
+        t_internal = self.integrator.get_current_time()
+        return t_internal - self.integrator.get_last_step() <= t <= t_internal
+
+    def set_stop_time(self, t):
+        """
+        Make sure that the next call of `advance_time(t)` does not let
+        CVODE take internal steps beyond `t`.
+
+        This is only useful if the system changes at time `t` (for example
+        if the applied field is changed and the integrator reinitialised),
+        since any steps past `t` would be wasted. For output alone the
+        interpolated solution is just as accurate and cheaper.
+
+        """
+        if t > self.integrator.get_current_time():
+            self.integrator.set_stop_time(t)
+
     def advance_steps(self, steps):
         """
         Run the integrator for `steps` internal steps.
@@ -190,3 +247,22 @@ class SundialsIntegrator(object):
              'tcur': tcur
              }
         return d
+
+    def linear_solver_stats(self):
+        """
+        Return statistics of the iterative linear solver as a dictionary
+        with the keys nliters (number of linear iterations), nlcfails
+        (number of linear convergence failures), npevals (number of
+        preconditioner evaluations), npsolves (number of calls to the
+        preconditioner solve function) and njvevals (number of
+        Jacobian-vector products).
+
+        Only available for the methods using GMRES.
+
+        """
+        cv = self.integrator
+        return {'nliters': cv.get_spils_num_lin_iters(),
+                'nlcfails': cv.get_spils_num_conv_fails(),
+                'npevals': cv.get_spils_num_prec_evals(),
+                'npsolves': cv.get_spils_num_prec_solves(),
+                'njvevals': cv.get_spils_num_jtimes_evals()}
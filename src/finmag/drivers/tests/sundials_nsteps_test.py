@@ -57,3 +57,47 @@ def test_integrator_n_steps_only(tmpdir):
     assert sim.integrator.stats()['nsteps'] == 4
     # check also value of cur_t is up-to-date
     assert sim.integrator.cur_t == sim.integrator.stats()['tcur']
+
+
+def test_saving_averages_does_not_stop_the_integrator(tmpdir):
+    """
+    Scheduled output is served by interpolation, so saving the averages
+    frequently should hardly change the number of RHS evaluations. (It
+    may change slightly because CVODE's initial step size depends on the
+    first requested output time.)
+
+    """
+    os.chdir(str(tmpdir))
+    sim = finmag.example.barmini(name='no_saving')
+    sim.run_until(1e-10)
+    nfevals = sim.integrator.stats()['nfevals']
+
+    sim = finmag.example.barmini(name='saving')
+    sim.schedule('save_ndt', every=5e-12)
+    sim.run_until(1e-10)
+    assert sim.integrator.stats()['nfevals'] <= 1.1 * nfevals
+    assert sim.integrator.n_dense_outputs > 0
+
+
+def test_hard_stop_at_scheduled_time(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = finmag.example.barmini()
+    internal_times = []
+    sim.schedule(lambda sim: internal_times.append(sim.integrator.stats()['tcur']),
+                 at=3e-11, hard_stop=True)
+    sim.run_until(1e-10)
+    assert abs(internal_times[0] - 3e-11) < 1e-22
+
+
+def test_built_in_state_changing_events_stop_exactly(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = finmag.example.barmini()
+    sim.schedule('save_ndt', every=1e-11)
+    sim.run_until(1.05e-11)
+    # the integrator stops at the end of run_until instead of stepping past
+    assert abs(sim.integrator.stats()['tcur'] - 1.05e-11) < 1e-22
+
+    assert sim.schedule('switch_off_H_ext', at=2e-11).hard_stop
+    assert not sim.schedule('save_ndt', every=1e-11).hard_stop
+    assert not sim.schedule('switch_off_H_ext', at=3e-11,
+                            hard_stop=False).hard_stop
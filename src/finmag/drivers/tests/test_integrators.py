@@ -48,3 +48,6 @@ class IntegratorTests(unittest.TestCase):
 
     def test_sundials_bdf_gmres_prec_id(self):
         self.run_test("sundials", "bdf_gmres_prec_id")
+
+    def test_sundials_bdf_gmres_prec_ilu(self):
+        self.run_test("sundials", "bdf_gmres_prec_ilu")
@@ -33,6 +33,28 @@ def test_easy_relaxation(do_plot=False):
     assert sim.t < 3e-10
 
 
+def test_relaxation_does_not_compute_energy_at_every_check(tmpdir):
+    os.chdir(str(tmpdir))
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(50, 10, 10), 10, 2, 2)
+    sim = Simulation(mesh, 0.86e6, name="test_relaxation_energies")
+    sim.set_m((1, 0, 0))
+    sim.add(Zeeman((0, 0.86e6, 0)))
+    sim.add(Exchange(13.0e-12))
+    sim.add(Demag())
+    sim.relax()
+
+    dmdts = np.array([dmdt for t, dmdt in sim.relaxation['dmdts']])
+    energies = np.array(sim.relaxation['energies'])
+    assert len(energies) == len(dmdts)
+    assert dmdts[-1] <= sim.relaxation['stopping_dmdt']
+    n_computed = np.sum(~np.isnan(energies))
+    assert n_computed == sim.relaxation['n_energy_evals']
+    assert n_computed < len(dmdts)
+
+    # The criterion is taken from the last right-hand side evaluation.
+    assert sim.llg.last_max_dmdt_norm() is not None
+
+
 def plot_averages(sim):
     fig = plt.figure()
     ax1 = fig.add_subplot(111)
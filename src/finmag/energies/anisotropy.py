@@ -82,6 +82,9 @@ class UniaxialAnisotropy(EnergyBase):
         if K2 != 0:
             self.assemble = False
 
+        # With K2 = 0 the field -2 K1 (a . m) a is linear in m.
+        self.field_is_linear = self.assemble
+
     @timer.method
     def setup(self, m, Ms, unit_length=1):
         """
@@ -135,6 +138,9 @@ class UniaxialAnisotropy(EnergyBase):
             self.volumes = df.assemble(df.TestFunction(cg_scalar_functionspace) * df.dx)
             self.compute_field = self.__compute_field_directly
 
+    def _matrix_parameters(self):
+        return [self.K1, self.K2, self.axis, self.Ms]
+
     def __compute_field_directly(self):
 
         m = self.m.get_numpy_array_debug()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the time update of time-dependent external fields.
+
+Applies a sinc pulse with a spatially varying amplitude to a box mesh
+and reports the time per call of `update` for
+
+- TimeZeeman (interpolation of a dolfin Expression at every update),
+- TimeZeemanPython (one precomputed profile times the sinc function),
+- TabulatedTimeZeeman (field tabulated on a time grid, with linear
+  interpolation in between).
+
+"""
+import time
+import numpy as np
+import dolfin as df
+from finmag.field import Field
+from finmag.energies import TimeZeeman, TimeZeemanPython, TabulatedTimeZeeman
+
+H0 = 1e5          # amplitude of the pulse (A/m)
+f_c = 50e9        # cut-off frequency of the sinc pulse (Hz)
+t0 = 0.1e-9       # time of the maximum of the pulse
+t_end = 0.2e-9
+n_updates = 200
+
+
+def sinc(t):
+    return np.sinc(2 * f_c * (t - t0))
+
+sinc_expr = ("0", "0",
+             "H0 * (1 - x[0] / 100) * (t == t0 ? 1 : "
+             "sin(2*pi*f_c*(t - t0)) / (2*pi*f_c*(t - t0)))")
+
+
+def time_updates(H_ext, m, Ms):
+    H_ext.setup(m, Ms, unit_length=1e-9)
+    ts = np.linspace(0, t_end, n_updates)
+    start = time.time()
+    for t in ts:
+        H_ext.update(t)
+    return (time.time() - start) / n_updates
+
+
+if __name__ == "__main__":
+    for n in [10, 20, 40]:
+        mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(100, 100, 10), n, n, 2)
+        S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+        S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+        m = Field(S3, (1, 0, 0))
+        Ms = Field(df.FunctionSpace(mesh, "DG", 0), 8.6e5)
+
+        expr = df.Expression(sinc_expr, H0=H0, f_c=f_c, t0=t0, t=0, degree=1)
+        profile = df.Expression(("0", "0", "H0 * (1 - x[0] / 100)"),
+                                H0=H0, degree=1)
+        fields = [
+            ("TimeZeeman", TimeZeeman(expr)),
+            ("TimeZeemanPython", TimeZeemanPython(profile, sinc)),
+            ("TabulatedTimeZeeman", TabulatedTimeZeeman(
+                expr, np.linspace(0, t_end, 401))),
+        ]
+        print "{} nodes:".format(S1.dim())
+        for name, H_ext in fields:
+            print "    {:>20}: {:.3g} ms per update".format(
+                name, 1e3 * time_updates(H_ext, m, Ms))
@@ -0,0 +1,119 @@
+"""
+Persistent on-disk cache for boundary element matrices.
+
+Computing the boundary element matrix (BEM) dominates the setup time of
+FKDemag for large meshes. Since the BEM only depends on the geometry of the
+boundary (and the macro geometry, if any), it can be reused by all
+simulations on the same mesh. Entries are stored as .npy files in a
+directory named after a hash of the geometry, so they can be loaded as
+memory-mapped arrays.
+
+The cache directory and its maximum size can be set in the [demag] section
+of the .finmagrc file (see `finmag.util.configuration`). When the size limit
+is exceeded, the least recently used entries are removed.
+
+Several processes may use the same cache directory (see
+`finmag.util.disk_cache`).
+
+"""
+import os
+import hashlib
+import logging
+import numpy as np
+import dolfin as df
+from finmag.util import configuration
+from finmag.util.disk_cache import DiskCache
+
+logger = logging.getLogger('finmag')
+
+DEFAULT_CACHE_DIR = "~/.finmag/bem_cache"
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # bytes
+
+
+def bem_cache_enabled():
+    """
+    Return False if the BEM cache was switched off in the .finmagrc file
+    (option 'bem_cache' in section [demag]), otherwise True.
+
+    """
+    value = configuration.get_config_option('demag', 'bem_cache', 'True')
+    return value.strip().lower() not in ['false', 'no', 'off', '0']
+
+
+class BEMCache(DiskCache):
+
+    """
+    Content-addressed cache of boundary element matrices.
+
+    *Arguments*
+
+    directory: string
+
+        The cache directory. Defaults to the option 'bem_cache_dir' in the
+        [demag] section of the .finmagrc file, or '~/.finmag/bem_cache'.
+
+    max_size: int
+
+        Maximum total size of the cache in bytes. Defaults to the option
+        'bem_cache_max_size' in the [demag] section of the .finmagrc file,
+        or 2 GB.
+
+    """
+    description = 'boundary element matrix'
+
+    def __init__(self, directory=None, max_size=None):
+        if directory is None:
+            directory = configuration.get_config_option(
+                'demag', 'bem_cache_dir', DEFAULT_CACHE_DIR)
+        if max_size is None:
+            max_size = configuration.get_config_option(
+                'demag', 'bem_cache_max_size', DEFAULT_MAX_SIZE)
+        super(BEMCache, self).__init__(directory, max_size)
+
+    @staticmethod
+    def key(mesh, unit_length=1, Ts=None, far_cutoff=None):
+        """
+        Return the cache key for the BEM of `mesh`, which is a hash of the
+        coordinates and connectivity of its boundary, the numbering of the
+        boundary vertices in the mesh, the unit length and the translation
+        vectors `Ts` and far image cut-off of the macro geometry (if any).
+
+        """
+        bmesh = df.BoundaryMesh(mesh, 'exterior', False)
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(bmesh.coordinates(), dtype=np.float64).tostring())
+        h.update(np.ascontiguousarray(bmesh.cells(), dtype=np.int64).tostring())
+        h.update(np.ascontiguousarray(bmesh.entity_map(0).array(), dtype=np.int64).tostring())
+        h.update(repr(float(unit_length)))
+        if Ts is not None:
+            h.update(np.ascontiguousarray(Ts, dtype=np.float64).tostring())
+        if far_cutoff is not None:
+            h.update('far_cutoff' + repr(float(far_cutoff)))
+        return h.hexdigest()
+
+    def load(self, key):
+        """
+        Return the tuple (bem, b2g_map) stored under `key` as read-only
+        memory-mapped arrays, or None if there is no such entry.
+
+        """
+        entry = self._entry(key)
+        try:
+            bem = np.load(os.path.join(entry, 'bem.npy'), mmap_mode='r')
+            b2g_map = np.load(os.path.join(entry, 'b2g_map.npy'))
+        except (IOError, OSError, ValueError):
+            return None
+        self._touch(key)
+        logger.debug("Loaded boundary element matrix from cache '{}'.".format(entry))
+        return bem, b2g_map
+
+    def store(self, key, bem, b2g_map):
+        """
+        Store `bem` and `b2g_map` under `key`. If another process stores
+        the same entry at the same time, the first one to finish wins.
+
+        """
+        def write(path):
+            np.save(os.path.join(path, 'bem.npy'), bem)
+            np.save(os.path.join(path, 'b2g_map.npy'), b2g_map)
+        self._store(key, write)
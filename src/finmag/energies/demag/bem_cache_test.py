@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import dolfin as df
+from finmag.energies.demag.bem_cache import BEMCache
+from finmag.energies.demag.fk_demag import FKDemag
+from finmag.energies.demag.fk_demag_pbc import MacroGeometry
+from finmag.field import Field
+
+
+def test_store_and_load(tmpdir):
+    cache = BEMCache(directory=str(tmpdir))
+    bem = np.random.random_sample((10, 10))
+    b2g_map = np.arange(10)
+    assert cache.load('abc') is None
+
+    cache.store('abc', bem, b2g_map)
+    bem_loaded, b2g_map_loaded = cache.load('abc')
+    assert isinstance(bem_loaded, np.memmap)
+    assert np.array_equal(bem_loaded, bem)
+    assert np.array_equal(b2g_map_loaded, b2g_map)
+
+    # storing the same entry again (e.g. from another process) is harmless
+    cache.store('abc', bem, b2g_map)
+    assert len(cache.entries()) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmpdir):
+    bem = np.zeros((20, 20))
+    b2g_map = np.arange(20)
+    cache = BEMCache(directory=str(tmpdir), max_size=1e9)
+    cache.store('a', bem, b2g_map)
+    cache.store('b', bem, b2g_map)
+    entry_size = cache.size() / 2
+
+    # make 'a' the most recently used entry
+    os.utime(os.path.join(str(tmpdir), 'b'), (0, 0))
+    cache.load('a')
+
+    cache.max_size = 2.5 * entry_size
+    cache.store('c', bem, b2g_map)
+    assert cache.load('a') is not None
+    assert cache.load('b') is None
+    assert cache.load('c') is not None
+
+
+def test_key_depends_on_geometry():
+    mesh1 = df.BoxMesh(df.Point(0, 0, 0), df.Point(1, 1, 1), 2, 2, 2)
+    mesh2 = df.BoxMesh(df.Point(0, 0, 0), df.Point(1, 1, 2), 2, 2, 2)
+    key = BEMCache.key(mesh1)
+    assert key == BEMCache.key(mesh1)
+    assert key != BEMCache.key(mesh2)
+    assert key != BEMCache.key(mesh1, unit_length=1e-9)
+    Ts = MacroGeometry(nx=3, ny=1).compute_Ts(mesh1)
+    assert key != BEMCache.key(mesh1, Ts=Ts)
+    assert BEMCache.key(mesh1, Ts=Ts) != BEMCache.key(mesh1, Ts=Ts, far_cutoff=5)
+
+
+def test_fk_demag_reuses_cached_bem(tmpdir):
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 3), 5, 5, 2)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1)
+    m = Field(S3, (1, 0, 0))
+    Ms = Field(df.FunctionSpace(mesh, 'DG', 0), 8e5)
+    cache = BEMCache(directory=str(tmpdir))
+
+    demag1 = FKDemag(bem_cache=cache)
+    demag1.setup(m, Ms, 1e-9)
+    assert len(cache.entries()) == 1
+    assert not isinstance(demag1._bem, np.memmap)
+
+    demag2 = FKDemag(bem_cache=cache)
+    demag2.setup(m, Ms, 1e-9)
+    assert isinstance(demag2._bem, np.memmap)
+    assert np.allclose(demag2.compute_field(), demag1.compute_field(),
+                       atol=0, rtol=1e-12)
@@ -0,0 +1,76 @@
+"""
+Benchmark of the geometric setup of the treecode and periodic BEM demag
+solvers: the solid angles at the boundary vertices and the outward
+normals of the boundary facets.
+
+Compares the vectorised functions in finmag.energies.demag.boundary_geometry
+with the loops over the cells and faces of the mesh they replace (which
+are only run for the smaller meshes) and checks that the results agree.
+
+"""
+import time
+import numpy as np
+import dolfin as df
+from finmag.native.treecode_bem import compute_solid_angle_single
+from finmag.energies.demag.boundary_geometry import boundary_solid_angles, \
+    boundary_facet_normals
+
+max_loop_cells = 200000
+
+
+def solid_angles_loop(mesh, b2g_map):
+    vert_bsa = np.zeros(mesh.num_vertices())
+    mc = mesh.cells()
+    xyz = mesh.coordinates()
+    for i in range(mesh.num_cells()):
+        for j in range(4):
+            vert_bsa[mc[i][j]] += compute_solid_angle_single(
+                xyz[mc[i][j]],
+                xyz[mc[i][(j + 1) % 4]],
+                xyz[mc[i][(j + 2) % 4]],
+                xyz[mc[i][(j + 3) % 4]])
+    return vert_bsa[b2g_map] / (4 * np.pi) - 1
+
+
+def normals_loop(mesh):
+    t_normals = []
+    for face in df.faces(mesh):
+        t = face.normal()  # one must call normal() before entities(3),...
+        if len(face.entities(3)) == 1:
+            t_normals.append([t.x(), t.y(), t.z()])
+    return np.array(t_normals)
+
+
+def timed(f, *args):
+    start = time.time()
+    result = f(*args)
+    return result, time.time() - start
+
+
+if __name__ == "__main__":
+    print "{:>9} {:>9} | {:>10} {:>10} | {:>10} {:>10} | {:>9}".format(
+        "cells", "b. nodes", "bsa loop", "bsa numpy",
+        "nrm loop", "nrm numpy", "max diff")
+    for n in [5, 10, 20, 40, 60]:
+        mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 10), n, n, n)
+        bmesh = df.BoundaryMesh(mesh, 'exterior', False)
+        b2g_map = bmesh.entity_map(0).array()
+        xyz, cells = mesh.coordinates(), mesh.cells()
+
+        bsa, t_bsa = timed(boundary_solid_angles, xyz, cells, b2g_map)
+        normals, t_normals = timed(boundary_facet_normals, xyz, cells,
+                                   b2g_map[bmesh.cells()])
+        if mesh.num_cells() <= max_loop_cells:
+            bsa_loop, t_bsa_loop = timed(solid_angles_loop, mesh, b2g_map)
+            normals_ref, t_normals_loop = timed(normals_loop, mesh)
+            diff = max(np.max(np.abs(bsa - bsa_loop)),
+                       np.max(np.abs(normals - normals_ref)))
+            loop_times = ["{:10.3f}".format(t) for t in
+                          [t_bsa_loop, t_normals_loop]]
+            diff = "{:9.2g}".format(diff)
+        else:
+            loop_times = ["{:>10}".format("-")] * 2
+            diff = "{:>9}".format("-")
+        print "{:9d} {:9d} | {} {:10.3f} | {} {:10.3f} | {}".format(
+            mesh.num_cells(), len(b2g_map), loop_times[0], t_bsa,
+            loop_times[1], t_normals, diff)
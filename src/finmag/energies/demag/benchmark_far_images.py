@@ -0,0 +1,45 @@
+"""
+Benchmark of the far-image approximation for the boundary element matrix
+of a periodic macro geometry.
+
+For a film-like macro geometry, the boundary element matrix is computed
+once with all images treated exactly and then for several cut-off radii,
+beyond which the images are represented by their lattice sums (see
+`finmag.energies.demag.fk_demag_pbc.image_lattice_sums`). Prints the
+setup times and the relative deviation from the full sum.
+
+"""
+import time
+import numpy as np
+import dolfin as df
+from finmag.energies.demag.fk_demag_pbc import MacroGeometry, BMatrixPBC
+
+mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(20, 20, 3), 8, 8, 2)
+n_images = 31
+cutoffs = [25, 45, 65, 105, 205]
+
+
+def timed(f, *args):
+    start = time.time()
+    result = f(*args)
+    return result, time.time() - start
+
+
+if __name__ == "__main__":
+    Ts = MacroGeometry(nx=n_images, ny=n_images).compute_Ts(mesh)
+    full, t_full = timed(BMatrixPBC, mesh, Ts)
+    print "{} x {} images, full sum: {:.2f} s".format(
+        n_images, n_images, t_full)
+
+    print "{:>8} {:>8} {:>10} {:>10}".format(
+        "cutoff", "exact", "time [s]", "rel. diff")
+    for far_cutoff in cutoffs:
+        mg = MacroGeometry(nx=n_images, ny=n_images, far_cutoff=far_cutoff)
+
+        def setup():
+            near_Ts, far_sums = mg.compute_image_sums(mesh)
+            return near_Ts, BMatrixPBC(mesh, near_Ts, far_sums)
+        (near_Ts, bm), t = timed(setup)
+        diff = np.max(np.abs(bm.bm - full.bm)) / np.max(np.abs(full.bm))
+        print "{:8g} {:8d} {:10.2f} {:10.2g}".format(
+            far_cutoff, len(near_Ts), t, diff)
@@ -0,0 +1,52 @@
+"""
+Compare the dense boundary element matrix of FKDemag with its H-matrix
+approximation (bem_format='hmatrix') in terms of accuracy, memory and
+time on a sphere and a thin film.
+
+"""
+import time
+import numpy as np
+import dolfin as df
+from finmag.energies.demag.fk_demag import FKDemag
+from finmag.field import Field
+from finmag.util.meshes import sphere, box
+
+now = time.time
+unit_length = 1e-9
+repetitions = 10
+meshes = [("sphere", lambda: sphere(r=10.0, maxh=1.0, directory="meshes")),
+          ("film", lambda: box(0, 0, 0, 200, 200, 2, maxh=2.0, directory="meshes"))]
+
+
+def run_demag(mesh, **kwargs):
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1)
+    m = Field(S3, df.Expression(('x[1]', '1', 'x[0]'), degree=1),
+              normalised=True)
+    Ms = Field(df.FunctionSpace(mesh, 'DG', 0), 8e5)
+    demag = FKDemag(**kwargs)
+    start = now()
+    demag.setup(m, Ms, unit_length)
+    setup_time = now() - start
+    start = now()
+    for j in xrange(repetitions):
+        H = demag.compute_field()
+    runtime = (now() - start) / repetitions
+    return H, setup_time, runtime, demag._bem.nbytes
+
+
+if __name__ == "__main__":
+    for name, create_mesh in meshes:
+        mesh = create_mesh()
+        bmesh = df.BoundaryMesh(mesh, 'exterior', False)
+        print "{}: {} vertices, {} boundary vertices".format(
+            name, mesh.num_vertices(), bmesh.num_vertices())
+        H_ref, setup_time, runtime, nbytes = run_demag(mesh)
+        print "    dense:   setup {:.2f} s, field {:.4f} s, BEM {:.1f} MB".format(
+            setup_time, runtime, nbytes / 1024. ** 2)
+        for eps in [1e-4, 1e-6]:
+            H, setup_time, runtime, nbytes = run_demag(
+                mesh, bem_format='hmatrix', eps=eps)
+            error = np.max(np.abs(H - H_ref)) / np.max(np.abs(H_ref))
+            print "    hmatrix (eps={:g}): setup {:.2f} s, field {:.4f} s, " \
+                "BEM {:.1f} MB, rel. error {:.2g}".format(
+                    eps, setup_time, runtime, nbytes / 1024. ** 2, error)
@@ -0,0 +1,166 @@
+"""
+Geometric preprocessing for the boundary element methods.
+
+The treecode and periodic BEM solvers need, for every boundary vertex,
+the solid angle subtended by the mesh at this vertex and, for every
+boundary facet, its outward unit normal. Computing these with Python
+loops over the cells of the mesh (or over `df.faces(mesh)`) takes minutes
+for meshes with millions of cells, so the functions in this module work
+on the whole arrays of coordinates and cells at once.
+
+Only numpy arrays are used here: `coordinates` is an (n, 3) array of
+vertex coordinates and `cells` an (N, 4) array of vertex indices of the
+tetrahedra, as returned by `mesh.coordinates()` and `mesh.cells()`.
+
+"""
+import numpy as np
+
+# Local vertex indices of the facet opposite to each vertex of a
+# tetrahedron, in the cyclic order used for the solid angles.
+_CYCLIC = [[(j + k) % 4 for k in xrange(1, 4)] for j in xrange(4)]
+
+
+def solid_angles(p, x1, x2, x3):
+    """
+    Return the solid angles subtended by the triangles (x1, x2, x3) at the
+    points p, where all arguments are arrays of shape (..., 3).
+
+    This uses the formula of Van Oosterom and Strackee (IEEE Trans. Biomed.
+    Eng. 30, 125 (1983)) and agrees with `solid_angle_single` from
+    finmag.native.treecode_bem.
+
+    """
+    x = x1 - p
+    y = x2 - p
+    z = x3 - p
+    d = np.einsum('...i,...i', x, np.cross(y, z))
+    a = np.sqrt(np.einsum('...i,...i', x, x))
+    b = np.sqrt(np.einsum('...i,...i', y, y))
+    c = np.sqrt(np.einsum('...i,...i', z, z))
+    div = (a * b * c + np.einsum('...i,...i', x, y) * c
+           + np.einsum('...i,...i', x, z) * b
+           + np.einsum('...i,...i', y, z) * a)
+    return 2 * np.arctan2(np.abs(d), div)
+
+
+def vertex_solid_angles(coordinates, cells, vertices=None):
+    """
+    Return the solid angle subtended by the mesh at each of its vertices,
+    i.e. the sum of the solid angles of the cells the vertex belongs to.
+
+    If `vertices` (an array of vertex indices) is given, only the cells
+    containing one of these vertices are taken into account and only the
+    solid angles at these vertices are returned. Interior vertices always
+    have a solid angle of 4 pi, so this saves most of the work for the
+    boundary vertices.
+
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    cells = np.asarray(cells)
+    n = len(coordinates)
+    if vertices is None:
+        selected = np.ones(n, dtype=bool)
+    else:
+        selected = np.zeros(n, dtype=bool)
+        selected[vertices] = True
+
+    omega = np.zeros(n)
+    for j, (k1, k2, k3) in enumerate(_CYCLIC):
+        c = cells[selected[cells[:, j]]]
+        omega += np.bincount(
+            c[:, j], minlength=n,
+            weights=solid_angles(coordinates[c[:, j]], coordinates[c[:, k1]],
+                                 coordinates[c[:, k2]], coordinates[c[:, k3]]))
+    return omega if vertices is None else omega[vertices]
+
+
+def boundary_solid_angles(coordinates, cells, b2g_map):
+    """
+    Return the solid angle term of the boundary element matrix for the
+    boundary vertices given by `b2g_map`, i.e. Omega / (4 pi) - 1 where
+    Omega is the solid angle subtended by the mesh at the vertex.
+
+    """
+    omega = vertex_solid_angles(coordinates, cells, b2g_map)
+    return omega / (4 * np.pi) - 1.0
+
+
+def _lexsort_rows(rows):
+    return np.lexsort(rows.T[::-1])
+
+
+def boundary_facets(cells):
+    """
+    Return the facets which belong to only one cell, as a pair of arrays
+    (facets, opposite). The rows of the (m, 3) array `facets` are the
+    vertex indices of the facets in ascending order, sorted
+    lexicographically, and `opposite` contains the remaining vertex of
+    the cell each facet belongs to.
+
+    """
+    cells = np.asarray(cells)
+    facets = np.vstack([cells[:, k] for k in _CYCLIC])
+    opposite = np.concatenate([cells[:, j] for j in xrange(4)])
+    facets.sort(axis=1)
+
+    order = _lexsort_rows(facets)
+    facets = facets[order]
+    opposite = opposite[order]
+
+    # Each interior facet appears twice in a row, each boundary facet once.
+    same_as_next = np.all(facets[1:] == facets[:-1], axis=1)
+    unique = np.ones(len(facets), dtype=bool)
+    unique[1:] &= ~same_as_next
+    unique[:-1] &= ~same_as_next
+    return facets[unique], opposite[unique]
+
+
+def facet_normals(coordinates, facets, opposite):
+    """
+    Return the unit normals of the triangles `facets` (an (m, 3) array of
+    vertex indices) pointing away from the vertices `opposite` of the
+    cells they belong to. For boundary facets these are the outward
+    normals.
+
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    x1 = coordinates[facets[:, 0]]
+    normals = np.cross(coordinates[facets[:, 1]] - x1,
+                       coordinates[facets[:, 2]] - x1)
+    inward = np.einsum('ij,ij->i', normals, coordinates[opposite] - x1) > 0
+    normals[inward] *= -1
+    normals /= np.sqrt(np.einsum('ij,ij->i', normals, normals))[:, np.newaxis]
+    return normals
+
+
+def boundary_facet_normals(coordinates, cells, facets):
+    """
+    Return the outward unit normals of the boundary facets `facets` (an
+    (m, 3) array of vertex indices of the mesh, in any order) of the mesh
+    given by `coordinates` and `cells`.
+
+    For a dolfin BoundaryMesh `bmesh` of `mesh`, the facets are
+
+        bmesh.entity_map(0).array()[bmesh.cells()]
+
+    and the result agrees with the normals computed by Face.normal().
+
+    """
+    facets = np.asarray(facets)
+    b_facets, b_opposite = boundary_facets(cells)
+
+    # Find the facets among the boundary facets by sorting both together;
+    # since the sort is stable, each of the given facets ends up right
+    # after the boundary facet it is equal to.
+    query = np.sort(facets, axis=1)
+    rows = np.vstack([b_facets, query])
+    order = _lexsort_rows(rows)
+    positions = np.empty(len(rows), dtype=int)
+    positions[order] = np.arange(len(rows))
+    match = order[positions[len(b_facets):] - 1]
+    if (np.any(match >= len(b_facets)) or
+            np.any(rows[match] != query)):
+        raise ValueError("Not all of the given facets are boundary facets "
+                         "of the mesh.")
+
+    return facet_normals(coordinates, facets, b_opposite[match])
@@ -0,0 +1,129 @@
+import itertools
+import numpy as np
+import dolfin as df
+import pytest
+from finmag.native.treecode_bem import compute_solid_angle_single
+from finmag.energies.demag.boundary_geometry import solid_angles, \
+    vertex_solid_angles, boundary_solid_angles, boundary_facets, \
+    facet_normals, boundary_facet_normals
+
+
+def cube_mesh(n):
+    """
+    Return the coordinates and cells of the unit cube divided into n^3
+    small cubes, each of which is split into 6 tetrahedra.
+    """
+    grid = np.arange(n + 1) / float(n)
+    coordinates = np.array(list(itertools.product(grid, grid, grid)))
+
+    def index(i, j, k):
+        return (i * (n + 1) + j) * (n + 1) + k
+
+    cells = []
+    for corner in itertools.product(range(n), range(n), range(n)):
+        for path in itertools.permutations(range(3)):
+            vertex = list(corner)
+            cell = [index(*vertex)]
+            for axis in path:
+                vertex[axis] += 1
+                cell.append(index(*vertex))
+            cells.append(cell)
+    return coordinates, np.array(cells)
+
+
+def reference_solid_angle(p, x1, x2, x3):
+    # same formula as solid_angle_single in native/src/treecode_bem/common.c
+    x, y, z = x1 - p, x2 - p, x3 - p
+    d = np.linalg.det(np.array([x, y, z]))
+    a, b, c = np.linalg.norm(x), np.linalg.norm(y), np.linalg.norm(z)
+    div = a * b * c + np.dot(x, y) * c + np.dot(x, z) * b + np.dot(y, z) * a
+    return 2 * np.arctan2(abs(d), div)
+
+
+def test_solid_angles_agree_with_single_triangle_formula():
+    points = np.random.random_sample((4, 20, 3))
+    omega = solid_angles(*points)
+    assert omega.shape == (20,)
+    for i in xrange(20):
+        assert abs(omega[i] - reference_solid_angle(*points[:, i])) < 1e-14
+
+    # an octant of the unit sphere
+    assert abs(solid_angles(np.zeros(3), np.array([1., 0, 0]),
+                            np.array([0, 1., 0]), np.array([0, 0, 1.]))
+               - np.pi / 2) < 1e-14
+
+
+def test_solid_angles_at_cube_vertices():
+    n = 3
+    coordinates, cells = cube_mesh(n)
+    omega = vertex_solid_angles(coordinates, cells)
+    on_boundary = np.sum((coordinates == 0) | (coordinates == 1), axis=1)
+
+    # 4 pi inside, 2 pi on faces, pi on edges and pi/2 at corners
+    expected = 4 * np.pi / 2 ** on_boundary
+    assert np.max(np.abs(omega - expected)) < 1e-12
+
+    b2g_map = np.nonzero(on_boundary)[0][::-1]
+    bsa = boundary_solid_angles(coordinates, cells, b2g_map)
+    assert np.max(np.abs(bsa - (expected[b2g_map] / (4 * np.pi) - 1))) < 1e-14
+    assert np.allclose(vertex_solid_angles(coordinates, cells, b2g_map),
+                       omega[b2g_map], rtol=0, atol=1e-14)
+
+
+def test_boundary_facets_and_normals_of_cube():
+    n = 3
+    coordinates, cells = cube_mesh(n)
+    facets, opposite = boundary_facets(cells)
+    assert facets.shape == (6 * 2 * n ** 2, 3)
+    assert np.all(np.diff(facets, axis=1) > 0)
+    for facet, vertex in zip(facets, opposite):
+        assert any(set(cell) == set(facet) | set([vertex]) for cell in cells)
+
+    normals = facet_normals(coordinates, facets, opposite)
+    centres = coordinates[facets].mean(axis=1)
+    # the normals are the outward unit vectors along the coordinate axes
+    assert np.allclose(np.sum(normals ** 2, axis=1), 1)
+    assert np.allclose(np.abs(normals).max(axis=1), 1)
+    assert np.all(np.sum(normals * (centres - 0.5), axis=1) > 0)
+
+
+def test_boundary_facet_normals_for_given_facets():
+    coordinates, cells = cube_mesh(2)
+    facets, opposite = boundary_facets(cells)
+    expected = facet_normals(coordinates, facets, opposite)
+
+    # shuffle the facets and the order of their vertices
+    order = np.random.permutation(len(facets))
+    shuffled = np.array([np.random.permutation(f) for f in facets[order]])
+    normals = boundary_facet_normals(coordinates, cells, shuffled)
+    assert np.allclose(normals, expected[order], rtol=0, atol=1e-14)
+
+    # an interior facet
+    with pytest.raises(ValueError):
+        boundary_facet_normals(coordinates, cells, np.array([cells[0, 1:]]))
+
+
+def test_agreement_with_dolfin_and_native_code():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(3, 2, 1), 5, 4, 3)
+    xyz = mesh.coordinates()
+    mc = mesh.cells()
+    bmesh = df.BoundaryMesh(mesh, 'exterior', False)
+    b2g_map = bmesh.entity_map(0).array()
+
+    vert_bsa = np.zeros(mesh.num_vertices())
+    for i in range(mesh.num_cells()):
+        for j in range(4):
+            vert_bsa[mc[i][j]] += compute_solid_angle_single(
+                xyz[mc[i][j]], xyz[mc[i][(j + 1) % 4]],
+                xyz[mc[i][(j + 2) % 4]], xyz[mc[i][(j + 3) % 4]])
+    expected = vert_bsa[b2g_map] / (4 * np.pi) - 1
+    bsa = boundary_solid_angles(xyz, mc, b2g_map)
+    assert np.max(np.abs(bsa - expected)) < 1e-13
+
+    t_normals = []
+    for face in df.faces(mesh):
+        t = face.normal()  # one must call normal() before entities(3),...
+        if len(face.entities(3)) == 1:
+            t_normals.append([t.x(), t.y(), t.z()])
+    normals = boundary_facet_normals(xyz, mc, b2g_map[bmesh.cells()])
+    assert np.max(np.abs(normals - np.array(t_normals))) < 1e-13
@@ -4,6 +4,8 @@ import dolfin as df
 from finmag import Simulation
 from finmag.energies import Exchange, DMI, Demag
 from finmag import MacroGeometry
+from finmag.energies.demag.fk_demag_pbc import BMatrixPBC, split_images, \
+    image_lattice_sums
 
 mesh_1 = df.BoxMesh(df.Point(-10, -10, -10), df.Point(10, 10, 10), 10, 10, 10)
 mesh_3 = df.BoxMesh(df.Point(-30, -10, -10), df.Point(30, 10, 10), 30, 10, 10)
@@ -69,6 +71,37 @@ def test_field_2d():
     print f1, f2, error
     assert max(error) < 0.004
 
+def test_image_lattice_sums():
+    Ts = MacroGeometry(nx=5, ny=3, dx=2.0, dy=3.0).compute_Ts(mesh_1)
+    near, far = split_images(Ts, 4.0)
+    assert len(near) == 11 and len(far) == 4
+    assert np.all(np.sqrt(np.sum(near ** 2, axis=1)) <= 4.0)
+
+    G, M = image_lattice_sums(far)
+    # the images come in pairs T, -T and lie in the xy-plane
+    assert np.allclose(G, 0, atol=1e-15)
+    assert np.allclose(M, M.T) and abs(np.trace(M)) < 1e-14
+    assert np.allclose(M[2, 2], np.sum(np.sum(far ** 2, axis=1) ** -1.5))
+
+    with pytest.raises(ValueError):
+        image_lattice_sums(near)
+
+
+def test_far_images_converge_to_full_sum():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 2), 3, 3, 1)
+    Ts = MacroGeometry(nx=15, ny=15).compute_Ts(mesh)
+    full = BMatrixPBC(mesh, Ts).bm
+
+    errors = []
+    for far_cutoff in [15, 25, 50]:
+        near, far = split_images(Ts, far_cutoff)
+        bm = BMatrixPBC(mesh, near, image_lattice_sums(far)).bm
+        errors.append(np.max(np.abs(bm - full)) / np.max(np.abs(full)))
+    print errors
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[0] < 0.02 and errors[2] < 1e-3
+
+
 if __name__ == '__main__':
     test_field_1d()
     test_field_2d()
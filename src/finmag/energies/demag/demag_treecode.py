@@ -3,6 +3,7 @@ import dolfin as df
 import numpy as np
 
 from finmag.native.fast_sum_lib import FastSum
+from finmag.energies.demag.boundary_geometry import boundary_facets, facet_normals
 
 
 _nodes = (
@@ -94,12 +95,18 @@ tet_w = (
 )
 
 
+# length, length2, compute_area, compute_det and compute_correction_simplified
+# accept single points as well as (n, 3) arrays of points.
+
 def length(p1, p2):
-    return np.sqrt((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2 + (p1[2] - p2[2]) ** 2)
+    return np.sqrt(length2(p1, p2))
 
 
 def length2(p1, p2):
-    return (p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2 + (p1[2] - p2[2]) ** 2
+    d = np.asarray(p1, dtype=float) - p2
+    if d.ndim == 1:
+        return np.dot(d, d)
+    return np.einsum('...i,...i', d, d)
 
 
 def G(r1, r2):
@@ -166,9 +173,9 @@ def compute_det(x1, y1, z1, x2, y2, z2, x3, y3, z3):
 
 def compute_correction_simplified(sa, sb, sc, p1, p2, p3):
 
-    x1, y1, z1 = p1
-    x2, y2, z2 = p2
-    x3, y3, z3 = p3
+    x1, y1, z1 = np.asarray(p1).T
+    x2, y2, z2 = np.asarray(p2).T
+    x3, y3, z3 = np.asarray(p3).T
 
     J1, J2, J3 = compute_det(x1, y1, z1, x2, y2, z2, x3, y3, z3)
 
@@ -211,9 +218,9 @@ class FastDemag():
         # self.compute_gauss_coeff_tetrahedron()
         # self.compute_affine_transformation_surface()
         # self.compute_affine_transformation_volume()
-        # self.nodes=np.array(self.s_nodes+self.v_nodes)
-        # self.weights=np.array(self.s_weight+self.v_weight)
-        # self.charges=np.array(self.s_charge+self.v_charge)
+        # self.nodes=np.concatenate([self.s_nodes, self.v_nodes])
+        # self.weights=np.concatenate([self.s_weight, self.v_weight])
+        # self.charges=np.concatenate([self.s_charge, self.v_charge])
 
         self.compute_triangle_normal()
         fast_sum = FastSum(
@@ -244,20 +251,9 @@ class FastDemag():
 
     def compute_triangle_normal(self):
 
-        self.face_nodes = []
-        self.face_norms = []
-        self.t_normals = []
-
-        for face in df.faces(self.mesh):
-            t = face.normal()  # one must call normal() before entities(3),...
-            cells = face.entities(3)
-            if len(cells) == 1:
-                face_nodes = face.entities(0)
-                self.face_nodes.append(face_nodes)
-                self.face_norms.append(t)
-                self.t_normals.append([t.x(), t.y(), t.z()])
-
-        self.t_normals = np.array(self.t_normals)
+        self.face_nodes, opposite = boundary_facets(self.mesh.cells())
+        self.t_normals = facet_normals(
+            self.mesh.coordinates(), self.face_nodes, opposite)
         self.face_nodes_array = np.array(self.face_nodes, dtype=np.int32)
 
     def compute_affine_transformation_surface(self):
@@ -268,25 +264,7 @@ class FastDemag():
 
         cs = self.mesh.coordinates()
 
-        self.face_nodes = []
-        self.face_norms = []
-        self.t_normals = []
-
-        for face in df.faces(self.mesh):
-            t = face.normal()  # one must call normal() before entities(3),...
-            cells = face.entities(3)
-            if len(cells) == 1:
-                face_nodes = face.entities(0)
-                self.face_nodes.append(face_nodes)
-                self.face_norms.append(t)
-                self.t_normals.append([t.x(), t.y(), t.z()])
-
-        self.t_normals = np.array(self.t_normals)
-        self.face_nodes_array = np.array(self.face_nodes, dtype=np.int32)
-
-        self.s_nodes = []
-        self.s_weight = []
-        self.s_charge = []
+        self.compute_triangle_normal()
 
         def compute_det_xy(x1, y1, z1, x2, y2, z2, x3, y3, z3):
 
@@ -300,101 +278,73 @@ class FastDemag():
 
             return det
 
-        for i in range(len(self.face_nodes)):
-            f_c = self.face_nodes[i]
-
-            x1, y1, z1 = cs[f_c[0]]
-            x2, y2, z2 = cs[f_c[1]]
-            x3, y3, z3 = cs[f_c[2]]
-
-            c11 = x2 - x1
-            c12 = x3 - x1
-            c21 = y2 - y1
-            c22 = y3 - y1
-            c31 = z2 - z1
-            c32 = z3 - z1
-
-            t = self.face_norms[i]
-
-            if abs(t.z()) > abs(t.x()) and abs(t.z()) > abs(t.y()):
-                det = compute_det_xy(x1, y1, z1, x2, y2, z2, x3, y3, z3)
-            elif abs(t.y()) > abs(t.x()):
-                det = compute_det_xy(z1, x1, y1, z2, x2, y2, z3, x3, y3)
-            else:
-                det = compute_det_xy(y1, z1, x1, y2, z2, x2, y3, z3, x3)
-
-            sa = (m[f_c[0]][0] * t.x() + m[f_c[0]][1]
-                  * t.y() + m[f_c[0]][2] * t.z())
-            sb = (m[f_c[1]][0] * t.x() + m[f_c[1]][1]
-                  * t.y() + m[f_c[1]][2] * t.z())
-            sc = (m[f_c[2]][0] * t.x() + m[f_c[2]][1]
-                  * t.y() + m[f_c[2]][2] * t.z())
-
-            for j in range(len(self.s_x)):
-                x = c11 * self.s_x[j] + c12 * self.s_y[j] + x1
-                y = c21 * self.s_x[j] + c22 * self.s_y[j] + y1
-                z = c31 * self.s_x[j] + c32 * self.s_y[j] + z1
-
-                self.s_nodes.append([x, y, z])
-                self.s_weight.append(det * self.s_w[j])
-                self.s_charge.append(
-                    sa + (sb - sa) * self.s_x[j] + (sc - sa) * self.s_y[j])
+        # all arrays below run over the boundary facets
+        f_c = self.face_nodes
+        p1, p2, p3 = cs[f_c[:, 0]], cs[f_c[:, 1]], cs[f_c[:, 2]]
+        tx, ty, tz = np.abs(self.t_normals).T
+
+        # project each facet onto the coordinate plane most nearly
+        # parallel to it to compute its Jacobian
+        xy = (tz > tx) & (tz > ty)
+        zx = ~xy & (ty > tx)
+        yz = ~xy & ~zx
+        det = np.empty(len(f_c))
+        for plane, axes in [(xy, [0, 1, 2]), (zx, [2, 0, 1]), (yz, [1, 2, 0])]:
+            det[plane] = compute_det_xy(*[p[plane, k] for p in [p1, p2, p3]
+                                          for k in axes])
+
+        sa = np.sum(m[f_c[:, 0]] * self.t_normals, axis=1)
+        sb = np.sum(m[f_c[:, 1]] * self.t_normals, axis=1)
+        sc = np.sum(m[f_c[:, 2]] * self.t_normals, axis=1)
+
+        s_x = np.array(self.s_x)[np.newaxis, :]
+        s_y = np.array(self.s_y)[np.newaxis, :]
+        nodes = (p1[:, np.newaxis, :]
+                 + (p2 - p1)[:, np.newaxis, :] * s_x[..., np.newaxis]
+                 + (p3 - p1)[:, np.newaxis, :] * s_y[..., np.newaxis])
+
+        self.s_nodes = nodes.reshape(-1, 3)
+        self.s_weight = (det[:, np.newaxis] * self.s_w).ravel()
+        self.s_charge = (sa[:, np.newaxis] + (sb - sa)[:, np.newaxis] * s_x
+                         + (sc - sa)[:, np.newaxis] * s_y).ravel()
 
     def compute_affine_transformation_volume(self):
-        v = TestFunction(self.V)
-        K = df.assemble(df.div(self.m) * v * df.dx)
-        L = df.assemble(v * df.dx)
-        rho = K.array() / L.array()
-
         cs = self.mesh.coordinates()
         m = self.m.vector().array()
-        n = len(m) / 3
-
-        def compute_divergence(cell):
-            i = cell.entities(0)
-            x1, y1, z1 = cs[i[1]] - cs[i[0]]
-            x2, y2, z2 = cs[i[2]] - cs[i[0]]
-            x3, y3, z3 = cs[i[3]] - cs[i[0]]
-            m0 = np.array([m[i[0]], m[i[0] + n], m[i[0] + 2 * n]])
-            m1 = np.array([m[i[1]], m[i[1] + n], m[i[1] + 2 * n]]) - m0
-            m2 = np.array([m[i[2]], m[i[2] + n], m[i[2] + 2 * n]]) - m0
-            m3 = np.array([m[i[3]], m[i[3] + n], m[i[3] + 2 * n]]) - m0
-            a1 = [y3 * z2 - y2 * z3, -x3 * z2 + x2 * z3, x3 * y2 - x2 * y3]
-            a2 = [-y3 * z1 + y1 * z3, x3 * z1 - x1 * z3, -x3 * y1 + x1 * y3]
-            a3 = [y2 * z1 - y1 * z2, -x2 * z1 + x1 * z2, x2 * y1 - x1 * y2]
-            v = x3 * y2 * z1 - x2 * y3 * z1 - x3 * y1 * z2 + \
-                x1 * y3 * z2 + x2 * y1 * z3 - x1 * y2 * z3
-
-            tmp = 0
-            for j in range(3):
-                tmp += a1[j] * m1[j] + a2[j] * m2[j] + a3[j] * m3[j]
-
-            tmp = -1.0 * tmp / v
-            return tmp, abs(v)
-
-        self.v_nodes = []
-        self.v_weight = []
-        self.v_charge = []
-        for cell in df.cells(self.mesh):
-            i = cell.entities(0)
-            rho, det = compute_divergence(cell)
-
-            x0, y0, z0 = cs[i[0]]
-            c11, c12, c13 = cs[i[1]] - cs[i[0]]
-            c21, c22, c23 = cs[i[2]] - cs[i[0]]
-            c31, c32, c33 = cs[i[3]] - cs[i[0]]
-
-            for j in range(len(self.v_w)):
-                x = c11 * self.v_x[j] + c21 * \
-                    self.v_y[j] + c31 * self.v_z[j] + x0
-                y = c12 * self.v_x[j] + c22 * \
-                    self.v_y[j] + c32 * self.v_z[j] + y0
-                z = c13 * self.v_x[j] + c23 * \
-                    self.v_y[j] + c33 * self.v_z[j] + z0
-
-                self.v_charge.append(rho)
-                self.v_nodes.append([x, y, z])
-                self.v_weight.append(det * self.v_w[j])
+        m = m.reshape((-1, 3), order='F')
+
+        # all arrays below run over the cells
+        i = self.mesh.cells()
+        p0 = cs[i[:, 0]]
+        x1, y1, z1 = (cs[i[:, 1]] - p0).T
+        x2, y2, z2 = (cs[i[:, 2]] - p0).T
+        x3, y3, z3 = (cs[i[:, 3]] - p0).T
+        m0 = m[i[:, 0]]
+        m1 = m[i[:, 1]] - m0
+        m2 = m[i[:, 2]] - m0
+        m3 = m[i[:, 3]] - m0
+        a1 = np.array([y3 * z2 - y2 * z3, -x3 * z2 + x2 * z3, x3 * y2 - x2 * y3]).T
+        a2 = np.array([-y3 * z1 + y1 * z3, x3 * z1 - x1 * z3, -x3 * y1 + x1 * y3]).T
+        a3 = np.array([y2 * z1 - y1 * z2, -x2 * z1 + x1 * z2, x2 * y1 - x1 * y2]).T
+        v = x3 * y2 * z1 - x2 * y3 * z1 - x3 * y1 * z2 + \
+            x1 * y3 * z2 + x2 * y1 * z3 - x1 * y2 * z3
+
+        # the divergence of m, which is constant on each cell
+        rho = -np.sum(a1 * m1 + a2 * m2 + a3 * m3, axis=1) / v
+        det = abs(v)
+
+        v_x = np.array(self.v_x)[np.newaxis, :, np.newaxis]
+        v_y = np.array(self.v_y)[np.newaxis, :, np.newaxis]
+        v_z = np.array(self.v_z)[np.newaxis, :, np.newaxis]
+        nodes = (p0[:, np.newaxis, :]
+                 + (cs[i[:, 1]] - p0)[:, np.newaxis, :] * v_x
+                 + (cs[i[:, 2]] - p0)[:, np.newaxis, :] * v_y
+                 + (cs[i[:, 3]] - p0)[:, np.newaxis, :] * v_z)
+
+        n_w = len(self.v_w)
+        self.v_nodes = nodes.reshape(-1, 3)
+        self.v_weight = (det[:, np.newaxis] * self.v_w).ravel()
+        self.v_charge = np.repeat(rho, n_w)
 
     def sum_directly(self):
         cs = self.mesh.coordinates()
@@ -483,20 +433,9 @@ class Demag():
 
     def compute_triangle_normal(self):
 
-        self.face_nodes = []
-        self.face_norms = []
-        self.t_normals = []
-
-        for face in df.faces(self.mesh):
-            t = face.normal()  # one must call normal() before entities(3),...
-            cells = face.entities(3)
-            if len(cells) == 1:
-                face_nodes = face.entities(0)
-                self.face_nodes.append(face_nodes)
-                self.face_norms.append(t)
-                self.t_normals.append([t.x(), t.y(), t.z()])
-
-        self.t_normals = np.array(self.t_normals)
+        self.face_nodes, opposite = boundary_facets(self.mesh.cells())
+        self.t_normals = facet_normals(
+            self.mesh.coordinates(), self.face_nodes, opposite)
         self.face_nodes_array = np.array(self.face_nodes, dtype=np.int32)
 
     def find_max_d(self):
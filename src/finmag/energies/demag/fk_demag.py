@@ -17,7 +17,10 @@ from finmag.native.llg import compute_bem_fk
 from finmag.util.meshes import nodal_volume
 from finmag.util import helpers, configuration
 from finmag.field import Field
+from finmag.util.profiling import profiler
 from fk_demag_pbc import BMatrixPBC
+from hmatrix import HMatrix, BEMEntries
+from bem_cache import BEMCache, bem_cache_enabled
 
 
 logger = logging.getLogger('finmag')
@@ -40,7 +43,8 @@ class FKDemag(object):
     """
 
     def __init__(self, name='Demag', thin_film=False, macrogeometry=None,
-                 solver_type=None, parameters=None):
+                 solver_type=None, parameters=None, bem_format='dense',
+                 eps=1e-6, bem_cache=None, jacobian_approximation=None):
         """
         Create a new FKDemag instance.
 
@@ -68,9 +72,35 @@ class FKDemag(object):
         latter uses the value set in the .finmagrc file, defaulting to 'Krylov'
         as no value is provided there).
 
+        Allowed values for `bem_format` are 'dense' (the default) and
+        'hmatrix'. The latter stores the boundary element matrix as a
+        hierarchical matrix with low-rank blocks of relative accuracy `eps`,
+        which needs O(Nb log Nb) instead of O(Nb^2) memory for Nb boundary
+        vertices (see `finmag.energies.demag.hmatrix`).
+
+        Dense boundary element matrices are stored in a persistent on-disk
+        cache and reused by later simulations on the same geometry (see
+        `finmag.energies.demag.bem_cache`). Set `bem_cache` to False to
+        disable this, or pass a `BEMCache` instance to use a cache directory
+        other than the one from the .finmagrc file.
+
+        By default, the demag field is left out of the Jacobian used by
+        implicit time integrators. Since the field is linear in m, its
+        directional derivative is the field of the direction m'. Setting
+        `jacobian_approximation` to 'exact' includes this field (at the
+        cost of a full demag solve per Jacobian-times-vector product),
+        and 'neumann' includes the cheaper approximation given by the
+        solution phi_1 of the Neumann problem alone, which skips the
+        boundary element matrix and the second linear solve.
+
         """
+        if jacobian_approximation not in [None, 'exact', 'neumann']:
+            raise ValueError("Argument 'jacobian_approximation' must be None, "
+                             "'exact' or 'neumann'. Got: '{}'".format(
+                                 jacobian_approximation))
         self.name = name
-        self.in_jacobian = False
+        self.jacobian_approximation = jacobian_approximation
+        self.in_jacobian = jacobian_approximation is not None
         default_parameters = {
             'absolute_tolerance': 1e-6,
             'relative_tolerance': 1e-6,
@@ -107,6 +137,13 @@ class FKDemag(object):
 
         self.macrogeometry = macrogeometry
 
+        if bem_format not in ['dense', 'hmatrix']:
+            raise ValueError("Argument 'bem_format' must be either 'dense' or "
+                             "'hmatrix'. Got: '{}'".format(bem_format))
+        self.bem_format = bem_format
+        self.eps = eps
+        self.bem_cache = bem_cache
+
     @timer.method
     def setup(self, m, Ms, unit_length=1):
         """
@@ -192,14 +229,20 @@ class FKDemag(object):
 
         with fk_timer('compute BEM'):
             if not hasattr(self, "_bem"):
-                if self.macrogeometry is not None:
-                    Ts = self.macrogeometry.compute_Ts(self.m.mesh())
-                    pbc = BMatrixPBC(self.m.mesh(), Ts)
-                    self._b2g_map = np.array(pbc.b2g_map, dtype=np.int)
-                    self._bem = pbc.bm
+                if self.bem_format == 'hmatrix':
+                    Ts = None
+                    if self.macrogeometry is not None:
+                        Ts = self.macrogeometry.compute_Ts(self.m.mesh())
+                    entries = BEMEntries(self.m.mesh(), Ts)
+                    self._b2g_map = np.array(entries.b2g_map, dtype=np.int)
+                    self._bem = HMatrix(entries, entries.coords, eps=self.eps)
                 else:
-                    self._bem, self._b2g_map = compute_bem_fk(
-                        df.BoundaryMesh(self.m.mesh(), 'exterior', False))
+                    self._compute_dense_bem()
+            elif self.bem_format == 'hmatrix' and isinstance(self._bem, np.ndarray):
+                # compress a BEM which was passed in via precomputed_bem()
+                coords = df.BoundaryMesh(
+                    self.m.mesh(), 'exterior', False).coordinates()
+                self._bem = HMatrix.from_dense(self._bem, coords, eps=self.eps)
         logger.debug("Boundary element matrix uses {:.2f} MB of memory.".format(
             self._bem.nbytes / 1024. ** 2))
         # solution of inhomogeneous Neumann problem
@@ -222,6 +265,47 @@ class FKDemag(object):
 
         self._setup_gradient_computation()
 
+    def _get_bem_cache(self):
+        if self.bem_cache is None:
+            return BEMCache() if bem_cache_enabled() else None
+        if self.bem_cache is True:
+            return BEMCache()
+        return self.bem_cache or None
+
+    def _compute_dense_bem(self):
+        """
+        Compute the dense boundary element matrix, or load it from the
+        persistent cache if it has been computed for the same geometry
+        before.
+
+        """
+        mesh = self.m.mesh()
+        Ts = None
+        far_cutoff = None
+        if self.macrogeometry is not None:
+            Ts = self.macrogeometry.compute_Ts(mesh)
+            far_cutoff = self.macrogeometry.far_cutoff
+
+        cache = self._get_bem_cache()
+        if cache is not None:
+            key = cache.key(mesh, self.unit_length, Ts, far_cutoff)
+            cached = cache.load(key)
+            if cached is not None:
+                self._bem, self._b2g_map = cached
+                return
+
+        if Ts is not None:
+            near_Ts, far_sums = self.macrogeometry.compute_image_sums(mesh)
+            pbc = BMatrixPBC(mesh, near_Ts, far_sums)
+            self._b2g_map = np.array(pbc.b2g_map, dtype=np.int)
+            self._bem = pbc.bm
+        else:
+            self._bem, self._b2g_map = compute_bem_fk(
+                df.BoundaryMesh(mesh, 'exterior', False))
+
+        if cache is not None:
+            cache.store(key, self._bem, self._b2g_map)
+
     @timer.method
     def precomputed_bem(self, bem, b2g_map):
         """
@@ -258,6 +342,93 @@ class FKDemag(object):
         self._compute_magnetic_potential()
         return self._compute_gradient()
 
+    @timer.method
+    def compute_jacobian_field(self, mp):
+        """
+        Compute the (approximate) directional derivative of the
+        demagnetising field in the direction `mp`, as selected by the
+        argument `jacobian_approximation` of the constructor.
+
+        *Arguments*
+            mp: numpy.ndarray
+
+                Direction (in the same order as m.f.vector()).
+
+        *Returns*
+            numpy.ndarray
+                The derivative of the demagnetising field.
+
+        """
+        if not hasattr(self, "_mp_vector"):
+            self._mp_vector = self.m.f.vector().copy()
+        self._mp_vector.set_local(mp)
+        self._mp_vector.apply("insert")
+        self._compute_magnetic_potential(
+            self._mp_vector,
+            laplace=(self.jacobian_approximation != 'neumann'))
+        return self._compute_gradient()
+
+    @timer.method
+    def compute_field_batch(self, M):
+        """
+        Compute the demagnetising fields for several magnetisation vectors
+        at once.
+
+        *Arguments*
+            M: numpy.ndarray
+
+                Array of shape (k, 3n) whose rows are magnetisation vectors
+                (in the same order as m.f.vector()).
+
+        *Returns*
+            numpy.ndarray
+                Array of shape (k, 3n) whose rows are the demagnetising fields.
+
+        The divergence, the boundary element matrix and the gradient are
+        applied to all k vectors with one matrix-matrix product each. The
+        two linear solves are still done per vector, but with solvers that
+        are set up only once.
+
+        """
+        M = np.atleast_2d(M)
+        if not hasattr(self, "_batch_divergence"):
+            self._batch_divergence = helpers.petsc_matrix_to_csr(
+                self._Ms_times_divergence)
+            self._batch_gradient = helpers.petsc_matrix_to_csr(
+                self._gradient, row_scale=1.0 / self._nodal_volumes_S3_no_units)
+        k = M.shape[0]
+
+        # compute phi_1 on the whole domain for all vectors
+        G_1 = self._batch_divergence.dot(M.T)
+        Phi_1 = np.empty(G_1.shape)
+        g_1 = self._laplace_zeros.copy()
+        with profiler("demag/first linear solve"):
+            for j in xrange(k):
+                g_1.set_local(G_1[:, j])
+                g_1.apply("insert")
+                self._poisson_solver.solve(self._phi_1.vector(), g_1)
+                Phi_1[:, j] = self._phi_1.vector().array()
+
+        # boundary values of phi_2 for all vectors at once
+        with profiler("demag/BEM matvec"):
+            Phi_2_boundary = self._bem.dot(Phi_1[self._b2g_map])
+
+        # compute phi_2 on the whole domain. The boundary conditions were
+        # already applied to the matrix in setup(), so only the right hand
+        # side changes.
+        Phi = Phi_1
+        b = self._laplace_zeros
+        self._laplace_solver.set_operator(self._poisson_matrix)
+        with profiler("demag/second linear solve"):
+            for j in xrange(k):
+                self._phi_2.vector()[self._b2g_map[:]] = Phi_2_boundary[:, j]
+                self.boundary_condition.set_value(self._phi_2)
+                self.boundary_condition.apply(b)
+                self._laplace_solver.solve(self._phi_2.vector(), b)
+                Phi[:, j] += self._phi_2.vector().array()
+
+        return self._batch_gradient.dot(Phi).T
+
     def average_field(self):
         """
         Compute the average demag field.
@@ -320,30 +491,40 @@ class FKDemag(object):
         A = df.dot(df.grad(self._trial1), df.grad(self._test1)) * df.dx
         return df.assemble(A)  # stiffness matrix for Poisson equation
 
-    def _compute_magnetic_potential(self):
+    def _compute_magnetic_potential(self, m_vector=None, laplace=True):
+        # Computes the potential of the magnetisation m_vector (by default
+        # the one of self.m). If laplace is False, only _phi_1 is used.
+        if m_vector is None:
+            m_vector = self.m.f.vector()
+
         # compute _phi_1 on the whole domain
-        g_1 = self._Ms_times_divergence * self.m.f.vector()
-        with fk_timer("first linear solve"):
-            self._poisson_solver.solve(self._phi_1.vector(), g_1)
+        g_1 = self._Ms_times_divergence * m_vector
+        with profiler("demag/first linear solve"):
+            iterations = self._poisson_solver.solve(self._phi_1.vector(), g_1)
+        profiler.count("demag/first linear solve iterations", iterations)
+
+        if not laplace:
+            self._phi.vector()[:] = self._phi_1.vector()
+            return
 
         # compute _phi_2 on the boundary using the Dirichlet boundary
         # conditions we get from BEM * _phi_1 on the boundary.
-        with fk_timer("using boundary conditions"):
-            phi_1 = self._phi_1.vector()[self._b2g_map]
-            self._phi_2.vector()[self._b2g_map[:]] = np.dot(
-                self._bem, phi_1)
-            #boundary_condition = df.DirichletBC(self.S1, self._phi_2, df.DomainBoundary())
-            #A = self._poisson_matrix.copy()
-            #b = self._laplace_zeros
-            #boundary_condition.apply(A, b)
-            A = self._poisson_matrix
-            b = self._laplace_zeros
-            self.boundary_condition.set_value(self._phi_2)
-            self.boundary_condition.apply(A, b)
+        phi_1 = self._phi_1.vector()[self._b2g_map]
+        with profiler("demag/BEM matvec"):
+            self._phi_2.vector()[self._b2g_map[:]] = self._bem.dot(phi_1)
+        #boundary_condition = df.DirichletBC(self.S1, self._phi_2, df.DomainBoundary())
+        #A = self._poisson_matrix.copy()
+        #b = self._laplace_zeros
+        #boundary_condition.apply(A, b)
+        A = self._poisson_matrix
+        b = self._laplace_zeros
+        self.boundary_condition.set_value(self._phi_2)
+        self.boundary_condition.apply(A, b)
 
         # compute _phi_2 on the whole domain
-        with fk_timer("second linear solve"):
-            self._laplace_solver.solve(A, self._phi_2.vector(), b)
+        with profiler("demag/second linear solve"):
+            iterations = self._laplace_solver.solve(A, self._phi_2.vector(), b)
+        profiler.count("demag/second linear solve iterations", iterations)
 
         # add _phi_1 and _phi_2 to obtain magnetic potential
         self._phi.vector()[:] = self._phi_1.vector() + self._phi_2.vector()
@@ -372,7 +553,6 @@ class FKDemag(object):
         b = df.dot(self._test3, df.Constant((1, 1, 1))) * df.dx
         self._nodal_volumes_S3_no_units = df.assemble(b).array()
 
-    @fk_timer.method
     def _compute_gradient(self):
         """
         Get the demagnetising field from the magnetic scalar potential.
@@ -390,5 +570,6 @@ class FKDemag(object):
         but the method used here is computationally less expensive.
 
         """
-        H = self._gradient * self._phi.vector()
-        return H.array() / self._nodal_volumes_S3_no_units
+        with profiler("demag/gradient"):
+            H = self._gradient * self._phi.vector()
+            return H.array() / self._nodal_volumes_S3_no_units
@@ -11,18 +11,25 @@ a template for other techniques like the GCR.
 import logging
 import numpy as np
 import dolfin as df
-from finmag.native.treecode_bem import compute_solid_angle_single
 from finmag.native.treecode_bem import compute_boundary_element
 from finmag.native.treecode_bem import build_boundary_matrix
+from boundary_geometry import boundary_solid_angles
 
 logger = logging.getLogger('finmag')
 
 
 class MacroGeometry(object):
 
-    def __init__(self, nx=None, ny=None, dx=None, dy=None, Ts=None):
+    def __init__(self, nx=None, ny=None, dx=None, dy=None, Ts=None,
+                 far_cutoff=None):
         """
         If Ts is not None the other parameters will be ignored.
+
+        If `far_cutoff` is given, only the images whose translation vector
+        has at most this length (in mesh units) enter the dense boundary
+        element matrix exactly. The other images are represented by their
+        lattice sums (see `image_lattice_sums`), which makes the setup cost
+        independent of their number.
         """
 
         self.nx = nx or 1
@@ -30,6 +37,8 @@ class MacroGeometry(object):
         self.dx = dx
         self.dy = dy
         self.Ts = Ts
+        self.far_cutoff = far_cutoff
+        self._image_sums = None
 
         if Ts != None and (nx != None or ny != None or dx != None and dy != None):
             logger.warning(
@@ -61,6 +70,23 @@ class MacroGeometry(object):
 
         return self.Ts
 
+    def compute_image_sums(self, mesh):
+        """
+        Return the tuple (near_Ts, far_sums) for the translation vectors
+        of this macro geometry and `far_cutoff`, where far_sums are the
+        lattice sums of the far images, or None if there are none. The
+        result is computed once and cached.
+
+        """
+        if self._image_sums is None:
+            near_Ts, far_Ts = split_images(self.compute_Ts(mesh),
+                                           self.far_cutoff)
+            far_sums = image_lattice_sums(far_Ts) if len(far_Ts) else None
+            logger.debug("Macro-geometry: {} images treated exactly, {} by "
+                         "their lattice sums.".format(len(near_Ts), len(far_Ts)))
+            self._image_sums = (near_Ts, far_sums)
+        return self._image_sums
+
     def find_mesh_info(self, mesh):
 
         xt = mesh.coordinates()
@@ -72,9 +98,110 @@ class MacroGeometry(object):
         return sizes[0], sizes[1]
 
 
+def compute_boundary_solid_angles(mesh, b2g_map):
+    """
+    Return the solid angle term of the boundary element matrix for the
+    boundary vertices given by `b2g_map`, i.e. Omega / (4 pi) - 1 where
+    Omega is the solid angle subtended by the mesh at the vertex.
+
+    """
+    return boundary_solid_angles(mesh.coordinates(), mesh.cells(), b2g_map)
+
+
+def split_images(Ts, far_cutoff=None):
+    """
+    Split the translation vectors `Ts` into those of length at most
+    `far_cutoff` (the near images, which always include the zero
+    translation if it is in `Ts`) and the others (the far images). All
+    images are near if `far_cutoff` is None.
+
+    """
+    Ts = np.array(Ts, dtype=np.float).reshape(-1, 3)
+    if far_cutoff is None:
+        return Ts, Ts[:0]
+    near = np.sqrt(np.sum(Ts ** 2, axis=1)) <= far_cutoff
+    return Ts[near], Ts[~near]
+
+
+def image_lattice_sums(Ts):
+    """
+    Return the lattice sums (G, M) of the images with the (non-zero)
+    translation vectors `Ts`:
+
+        G = sum_T T / |T|^3
+        M = sum_T (I / |T|^3 - 3 T T^t / |T|^5)
+
+    The double layer potential at a point x of a boundary triangle of the
+    image T is proportional to S . (T + d) / |T + d|^3, with S the area
+    vector of the triangle and d = y - x for y on the triangle. Summed over
+    the far images and expanded to first order in d (which is small
+    compared to |T|) this is S . (G + M d).
+
+    For a point symmetric set of images, like the far images of a
+    `MacroGeometry`, G and the second-order term vanish, so that the error
+    is of third order in |d| / |T|.
+
+    """
+    Ts = np.array(Ts, dtype=np.float).reshape(-1, 3)
+    r = np.sqrt(np.sum(Ts ** 2, axis=1))
+    if np.any(r == 0):
+        raise ValueError("The zero translation cannot be a far image.")
+    G = np.sum(Ts / r[:, np.newaxis] ** 3, axis=0)
+    M = np.eye(3) * np.sum(r ** -3) - 3 * np.einsum('ti,tj,t->ij', Ts, Ts, r ** -5)
+    return G, M
+
+
+def far_image_bmatrix(coordinates, faces, G, M):
+    """
+    Return the contribution of the far images with lattice sums (G, M) to
+    the boundary element matrix of the boundary mesh with the given vertex
+    `coordinates` and triangles `faces`.
+
+    With the linear basis function phi_j of vertex j, the contribution to
+    the entry (p, j) is
+
+        -1/(4 pi) sum_t n_t . (G int_t phi_j(y) dy
+                               + M int_t phi_j(y) (y - x_p) dy)
+
+    where the sum runs over the triangles t around j, n_t = S_t / A_t is
+    the unit normal of t (S_t its area vector and A_t its area), and
+    int_t phi_j(y) dy = A_t / 3, int_t phi_j(y) y dy = A_t (y_j + 3 c_t) / 12
+    with c_t the centroid of t. Hence each triangle contributes
+    S_t . G / 3 + (M S_t) . ((y_j + 3 c_t) / 12 - x_p / 3). This is of the
+    form u_j . x_p - w_j, so the matrix is computed in O(n^2) operations
+    for any number of far images.
+
+    """
+    x1, x2, x3 = [coordinates[faces[:, k]] for k in xrange(3)]
+    # oriented like the normal in boundary_element in the native code
+    S = 0.5 * np.cross(x2 - x1, x3 - x2)
+    centroids = (x1 + x2 + x3) / 3.0
+    SM = S.dot(M)
+
+    n = len(coordinates)
+    w = np.zeros(n)
+    u = np.zeros((n, 3))
+    for k in xrange(3):
+        y = coordinates[faces[:, k]]
+        w += np.bincount(faces[:, k], minlength=n, weights=S.dot(G) / 3.0
+                         + np.sum(SM * (y + 3 * centroids), axis=1) / 12.0)
+        for i in xrange(3):
+            u[:, i] += np.bincount(faces[:, k], minlength=n,
+                                   weights=SM[:, i] / 3.0)
+    return (coordinates.dot(u.T) - w[np.newaxis, :]) / (4 * np.pi)
+
+
 class BMatrixPBC(object):
 
-    def __init__(self, mesh, Ts=[(0., 0, 0)]):
+    """
+    The boundary element matrix for the periodic copies of `mesh` with the
+    translation vectors `Ts`. The optional `far_sums` are the lattice sums
+    (G, M) of further images, see `image_lattice_sums` and
+    `far_image_bmatrix`.
+
+    """
+
+    def __init__(self, mesh, Ts=[(0., 0, 0)], far_sums=None):
         self.mesh = mesh
         self.bmesh = df.BoundaryMesh(self.mesh, 'exterior', False)
         self.b2g_map = self.bmesh.entity_map(0).array()
@@ -83,30 +210,14 @@ class BMatrixPBC(object):
         #self.g2b_map[val] = i
         self.__compute_bsa()
         self.Ts = np.array(Ts, dtype=np.float)
+        self.far_sums = far_sums
 
         n = self.bmesh.num_vertices()
         self.bm = np.zeros((n, n))
         self.compute_bmatrix()
 
     def __compute_bsa(self):
-
-        vert_bsa = np.zeros(self.mesh.num_vertices())
-
-        mc = self.mesh.cells()
-        xyz = self.mesh.coordinates()
-        for i in range(self.mesh.num_cells()):
-            for j in range(4):
-                tmp_omega = compute_solid_angle_single(
-                    xyz[mc[i][j]],
-                    xyz[mc[i][(j + 1) % 4]],
-                    xyz[mc[i][(j + 2) % 4]],
-                    xyz[mc[i][(j + 3) % 4]])
-
-                vert_bsa[mc[i][j]] += tmp_omega
-
-        vert_bsa = vert_bsa / (4 * np.pi) - 1.0
-
-        self.vert_bsa = vert_bsa[self.b2g_map]
+        self.vert_bsa = compute_boundary_solid_angles(self.mesh, self.b2g_map)
 
     def __compute_bmatrix_T(self, T):
         cds = self.bmesh.coordinates()
@@ -137,8 +248,10 @@ class BMatrixPBC(object):
             build_boundary_matrix(
                 cds, face_nodes, self.bm, T, len(cds), len(face_nodes))
 
-        for p in range(self.bmesh.num_vertices()):
-            self.bm[p][p] += self.vert_bsa[p]
+        if self.far_sums is not None:
+            self.bm += far_image_bmatrix(cds, face_nodes, *self.far_sums)
+
+        self.bm[np.diag_indices_from(self.bm)] += self.vert_bsa
 
 
 if __name__ == '__main__':
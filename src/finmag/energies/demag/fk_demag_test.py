@@ -146,3 +146,32 @@ def test_regression_Ms_numpy_type():
     demag = FKDemag()
     Ms_field = Field(df.FunctionSpace(mesh, 'DG', 0), Ms)
     demag.setup(m, Ms_field, unit_length)  # this used to fail
+
+
+def test_jacobian_field_of_demag():
+    mesh = sphere(r=radius, maxh=maxh)
+    Ms_field = Field(df.FunctionSpace(mesh, 'DG', 0), 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1)
+    m = Field(S3, (1, 0, 0))
+    mp = np.random.RandomState(0).uniform(-1, 1, S3.dim())
+
+    demag = FKDemag(jacobian_approximation='exact')
+    assert demag.in_jacobian
+    demag.setup(m, Ms_field, unit_length)
+    m0 = m.f.vector().array()
+    Hp_exact = demag.compute_jacobian_field(mp)
+    assert np.all(m.f.vector().array() == m0)
+
+    # The demag field is linear, so the exact derivative in the direction
+    # mp is the field of mp.
+    m.f.vector().set_local(mp)
+    assert np.allclose(Hp_exact, demag.compute_field(), rtol=1e-6, atol=1e-8)
+
+    demag.jacobian_approximation = 'neumann'
+    Hp_neumann = demag.compute_jacobian_field(mp)
+    assert not np.allclose(Hp_neumann, Hp_exact)
+    # ... but it is an approximation of the exact derivative.
+    assert np.dot(Hp_neumann, Hp_exact) > 0
+
+    with pytest.raises(ValueError):
+        FKDemag(jacobian_approximation='thin_film')
@@ -0,0 +1,409 @@
+"""
+Hierarchical matrix (H-matrix) representation of the boundary element matrix.
+
+The dense FK boundary element matrix needs O(Nb^2) memory and time for each
+matrix-vector product, where Nb is the number of boundary vertices. Since the
+underlying kernel is smooth for well separated groups of vertices, the
+corresponding blocks of the matrix have low numerical rank. Here we build a
+cluster tree over the boundary vertices, approximate blocks that belong to
+well separated ("admissible") cluster pairs by low-rank factors obtained with
+adaptive cross approximation (ACA) and keep the remaining near-field blocks
+dense. This gives O(Nb log Nb) storage and matrix-vector products.
+
+The entries of the matrix are requested through a function `get_block(rows,
+cols)` which returns the dense sub-matrix for the given row and column
+indices, so that the full matrix never needs to be assembled. The class
+`BEMEntries` provides such a function for the FK boundary element matrix.
+
+"""
+import logging
+import numpy as np
+import dolfin as df
+from scipy.sparse import csr_matrix, coo_matrix
+from fk_demag_pbc import compute_boundary_solid_angles
+
+logger = logging.getLogger('finmag')
+
+
+class ClusterTree(object):
+
+    """
+    Binary tree of clusters of points, obtained by recursively splitting the
+    bounding box of the points along its longest edge.
+
+    The points are reordered such that every cluster is a contiguous range
+    [start, stop) of `self.permutation`.
+
+    """
+
+    def __init__(self, coords, leaf_size=32):
+        self.coords = np.asarray(coords, dtype=float)
+        self.leaf_size = leaf_size
+        self.permutation = np.arange(len(self.coords))
+        self.root = self._build(0, len(self.coords))
+
+    def _build(self, start, stop):
+        idx = self.permutation[start:stop]
+        pts = self.coords[idx]
+        node = {'start': start, 'stop': stop,
+                'bbox': (pts.min(axis=0), pts.max(axis=0)), 'children': ()}
+        if stop - start > self.leaf_size:
+            axis = np.argmax(node['bbox'][1] - node['bbox'][0])
+            order = np.argsort(pts[:, axis], kind='mergesort')
+            self.permutation[start:stop] = idx[order]
+            mid = (start + stop) // 2
+            node['children'] = (self._build(start, mid), self._build(mid, stop))
+        return node
+
+    def indices(self, node):
+        return self.permutation[node['start']:node['stop']]
+
+
+def diameter(node):
+    lo, hi = node['bbox']
+    return np.sqrt(np.sum((hi - lo) ** 2))
+
+
+def distance(node1, node2):
+    lo1, hi1 = node1['bbox']
+    lo2, hi2 = node2['bbox']
+    gap = np.maximum(0, np.maximum(lo1 - hi2, lo2 - hi1))
+    return np.sqrt(np.sum(gap ** 2))
+
+
+def aca(get_block, rows, cols, eps, max_rank=None):
+    """
+    Adaptive cross approximation with partial pivoting of the block
+    A = get_block(rows, cols) of size m x n.
+
+    Returns factors U (m x k) and V (k x n) such that U * V approximates A to
+    the relative accuracy `eps` in the Frobenius norm, or None if no
+    approximation with rank k < min(m, n) / 2 was found (in which case the
+    block is better stored densely).
+
+    """
+    m, n = len(rows), len(cols)
+    if max_rank is None:
+        max_rank = min(m, n) // 2
+    us, vs = [], []
+    norm2 = 0.0
+    used_rows = np.zeros(m, dtype=bool)
+    i = 0
+    for k in xrange(max_rank):
+        row = get_block(rows[i:i + 1], cols)[0]
+        for u, v in zip(us, vs):
+            row -= u[i] * v
+        used_rows[i] = True
+        j = np.argmax(np.abs(row))
+        if row[j] == 0:
+            if used_rows.all():
+                break
+            i = np.argmin(used_rows)
+            continue
+        v = row / row[j]
+        u = get_block(rows, cols[j:j + 1])[:, 0]
+        for u_l, v_l in zip(us, vs):
+            u -= v_l[j] * u_l
+        norm_uv2 = np.dot(u, u) * np.dot(v, v)
+        for u_l, v_l in zip(us, vs):
+            norm2 += 2 * np.dot(u_l, u) * np.dot(v_l, v)
+        norm2 += norm_uv2
+        us.append(u)
+        vs.append(v)
+        if norm_uv2 <= eps ** 2 * norm2:
+            return np.array(us).T, np.array(vs)
+        candidates = np.abs(u)
+        candidates[used_rows] = -1
+        i = np.argmax(candidates)
+        if candidates[i] < 0:
+            break
+    return None
+
+
+class HMatrix(object):
+
+    """
+    Hierarchical matrix built from a function `get_block(rows, cols)` which
+    returns dense sub-blocks of the matrix to be approximated.
+
+    *Arguments*
+
+    get_block: callable
+
+        Maps two integer index arrays to the corresponding dense sub-matrix.
+
+    coords: numpy.ndarray
+
+        N x 3 array of the positions associated with the rows/columns.
+
+    eps: float
+
+        Relative accuracy of the low-rank approximations.
+
+    eta: float
+
+        Admissibility parameter. A pair of clusters (s, t) is approximated
+        by low-rank factors if min(diam(s), diam(t)) <= eta * dist(s, t).
+
+    leaf_size: int
+
+        Maximum number of points in a leaf cluster.
+
+    """
+
+    def __init__(self, get_block, coords, eps=1e-6, eta=1.0, leaf_size=32):
+        self.shape = (len(coords), len(coords))
+        self.eps = eps
+        self.eta = eta
+        self.tree = ClusterTree(coords, leaf_size)
+        self.dense_blocks = []
+        self.lowrank_blocks = []
+        self._build(get_block, self.tree.root, self.tree.root)
+        logger.debug("Created H-matrix of size {} with {} dense and {} "
+                     "low-rank blocks.".format(self.shape,
+                                               len(self.dense_blocks),
+                                               len(self.lowrank_blocks)))
+        self._assemble()
+        logger.debug("H-matrix uses {:.2f} MB (dense: {:.2f} MB).".format(
+            self.nbytes / 1024. ** 2, self.shape[0] * self.shape[1] * 8 / 1024. ** 2))
+
+    @classmethod
+    def from_dense(cls, A, coords, **kwargs):
+        """
+        Compress the dense matrix `A` (for example a precomputed boundary
+        element matrix) into an H-matrix.
+
+        """
+        return cls(lambda rows, cols: A[np.ix_(rows, cols)], coords, **kwargs)
+
+    def _build(self, get_block, s, t):
+        rows, cols = self.tree.indices(s), self.tree.indices(t)
+        admissible = min(diameter(s), diameter(t)) <= self.eta * distance(s, t)
+        if admissible:
+            factors = aca(get_block, rows, cols, self.eps)
+            if factors is not None:
+                self.lowrank_blocks.append((rows, cols) + factors)
+                return
+        if s['children'] and t['children']:
+            for s_child in s['children']:
+                for t_child in t['children']:
+                    self._build(get_block, s_child, t_child)
+        else:
+            self.dense_blocks.append((rows, cols, get_block(rows, cols)))
+
+    def _assemble(self):
+        """
+        Collect the dense blocks into one sparse matrix and the low-rank
+        factors into two sparse matrices, so that a matrix-vector product
+        needs three sparse matrix-vector products instead of a Python loop
+        over all blocks.
+
+        """
+        n_rows, n_cols = self.shape
+        near = [[], [], []]
+        for rows, cols, B in self.dense_blocks:
+            r, c = np.meshgrid(rows, cols, indexing='ij')
+            near[0].append(r.ravel())
+            near[1].append(c.ravel())
+            near[2].append(B.ravel())
+
+        U, V = [[], [], []], [[], [], []]
+        rank = 0
+        for rows, cols, U_block, V_block in self.lowrank_blocks:
+            k = U_block.shape[1]
+            r, c = np.meshgrid(rows, np.arange(rank, rank + k), indexing='ij')
+            U[0].append(r.ravel())
+            U[1].append(c.ravel())
+            U[2].append(U_block.ravel())
+            r, c = np.meshgrid(np.arange(rank, rank + k), cols, indexing='ij')
+            V[0].append(r.ravel())
+            V[1].append(c.ravel())
+            V[2].append(V_block.ravel())
+            rank += k
+
+        def to_csr(ijv, shape):
+            if not ijv[0]:
+                return csr_matrix(shape)
+            i, j, v = [np.concatenate(a) for a in ijv]
+            return coo_matrix((v, (i, j)), shape=shape).tocsr()
+
+        self._near = to_csr(near, self.shape)
+        self._U = to_csr(U, (n_rows, rank))
+        self._V = to_csr(V, (rank, n_cols))
+        del self.dense_blocks, self.lowrank_blocks
+
+    @property
+    def nbytes(self):
+        return sum(A.data.nbytes + A.indices.nbytes + A.indptr.nbytes
+                   for A in (self._near, self._U, self._V))
+
+    def dot(self, x):
+        """
+        Return the matrix-vector product of the H-matrix with `x`.
+
+        """
+        return self._near.dot(x) + self._U.dot(self._V.dot(x))
+
+    def todense(self):
+        """
+        Return the dense matrix represented by the H-matrix (for testing).
+
+        """
+        return self._near.toarray() + self._U.dot(self._V).toarray()
+
+
+class BEMEntries(object):
+
+    """
+    Evaluate blocks of the FK boundary element matrix of `mesh` on demand,
+    without assembling the full matrix. The row/column indices refer to the
+    vertices of the boundary mesh, as for the matrix computed by
+    `compute_bem_fk` or `BMatrixPBC`.
+
+    The optional argument `Ts` is the list of translation vectors of a
+    macro geometry (see `MacroGeometry.compute_Ts`).
+
+    """
+
+    def __init__(self, mesh, Ts=None):
+        bmesh = df.BoundaryMesh(mesh, 'exterior', False)
+        self.coords = bmesh.coordinates()
+        self.faces = np.array(bmesh.cells(), dtype=np.int32)
+        self.b2g_map = bmesh.entity_map(0).array()
+        self.vert_bsa = compute_boundary_solid_angles(mesh, self.b2g_map)
+        if Ts is None:
+            Ts = [(0., 0., 0.)]
+        self.Ts = np.array(Ts, dtype=np.float)
+
+        self._triangles = _TriangleGeometry(self.coords[self.faces[:, 0]],
+                                            self.coords[self.faces[:, 1]],
+                                            self.coords[self.faces[:, 2]])
+
+    def __call__(self, rows, cols):
+        rows = np.asarray(rows, dtype=int)
+        cols = np.asarray(cols, dtype=int)
+        col_pos = -np.ones(len(self.coords), dtype=int)
+        col_pos[cols] = np.arange(len(cols))
+
+        # Only the faces touching one of the columns contribute. Their
+        # element values for all rows are computed at once and then summed
+        # into the columns of the face vertices.
+        faces = np.nonzero(np.any(col_pos[self.faces] >= 0, axis=1))[0]
+        face_cols = col_pos[self.faces[faces]].ravel()
+        hit = np.nonzero(face_cols >= 0)[0]
+
+        xp = self.coords[rows][:, np.newaxis, :]
+        be = np.zeros((len(rows), len(faces), 3))
+        for T in self.Ts:
+            be += self._triangles.boundary_elements(xp, faces, T)
+        be = be.reshape(len(rows), -1)[:, hit]
+        index = np.arange(len(rows))[:, np.newaxis] * len(cols) + face_cols[hit]
+        B = np.bincount(index.ravel(), weights=be.ravel(),
+                        minlength=len(rows) * len(cols))
+        B = B.astype(np.float).reshape(len(rows), len(cols))
+
+        diag = np.nonzero(col_pos[rows] >= 0)[0]
+        B[diag, col_pos[rows[diag]]] += self.vert_bsa[rows[diag]]
+        return B
+
+
+def _dot(x, y):
+    return x[..., 0] * y[..., 0] + x[..., 1] * y[..., 1] + x[..., 2] * y[..., 2]
+
+
+def _norm(x):
+    return np.sqrt(_dot(x, x))
+
+
+def _solid_angles(p, x1, x2, x3):
+    """
+    Vectorised version of `solid_angle_single` in the native treecode_bem
+    module: the (unsigned) solid angles of the triangles with vertices
+    `x1`, `x2`, `x3` seen from the points `p`. The arguments are arrays of
+    shape (..., 3) which are broadcast against each other.
+
+    """
+    x = x1 - p
+    y = x2 - p
+    z = x3 - p
+    d = _dot(x, np.cross(y, z))
+    a = _norm(x)
+    b = _norm(y)
+    c = _norm(z)
+    div = a * b * c + _dot(x, y) * c + _dot(x, z) * b + _dot(y, z) * a
+    return 2 * np.arctan2(np.abs(d), div)
+
+
+class _TriangleGeometry(object):
+
+    """
+    Vectorised version of `compute_boundary_element` (Lindholm's formula,
+    see `boundary_element` in `native/src/treecode_bem/common.c`) for a set
+    of triangles with vertices `x1`, `x2`, `x3` (arrays of shape (n, 3)).
+    The quantities which only depend on the triangles are computed once.
+
+    """
+
+    def __init__(self, x1, x2, x3):
+        self.x = [x1, x2, x3]
+        sv = [x2 - x1, x3 - x2, x1 - x3]
+        self.s = [_norm(v) for v in sv]
+        xi = [v / s[:, np.newaxis] for v, s in zip(sv, self.s)]
+        zetav = np.cross(sv[0], sv[1])
+        self.zetav = zetav / _norm(zetav)[:, np.newaxis]
+        self.etav = [np.cross(self.zetav, v) for v in xi]
+        # gamma[l][i] = xi[(l + 1) % 3] . xi[i]
+        self.gamma = [[_dot(xi[(l + 1) % 3], xi[i]) for i in xrange(3)]
+                      for l in xrange(3)]
+        s = self.s
+        sp = (s[0] + s[1] + s[2]) / 2.0
+        area = np.sqrt(sp * (sp - s[0]) * (sp - s[1]) * (sp - s[2]))
+        self.factor = [s[(l + 1) % 3] / (8.0 * np.pi * area)
+                       for l in xrange(3)]
+
+    def boundary_elements(self, xp, faces, T):
+        """
+        Return the contributions of the triangles with indices `faces`,
+        translated by `T`, to the rows of the boundary element matrix
+        belonging to the points `xp` (broadcast against `faces`). The last
+        axis of the result holds the values for the three vertices.
+
+        """
+        x = [v[faces] + T for v in self.x]
+        xp, x[0], x[1], x[2] = np.broadcast_arrays(xp, x[0], x[1], x[2])
+        omega = _solid_angles(xp, x[0], x[1], x[2])
+
+        s = [v[faces] for v in self.s]
+        rhov = [v - xp for v in x]
+        rho = [_norm(v) for v in rhov]
+        zeta = _dot(self.zetav[faces], rhov[0])
+        eta = [_dot(self.etav[i][faces], rhov[i]) for i in xrange(3)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = [np.log((rho[i] + rho[(i + 1) % 3] + s[i]) /
+                        (rho[i] + rho[(i + 1) % 3] - s[i] + 1e-300))
+                 for i in xrange(3)]
+
+        omega_signed = np.where(zeta < 0, -omega, omega)
+        res = np.empty(omega.shape + (3,))
+        for l in xrange(3):
+            # The value of vertex l belongs to the opposite edge (l + 1) % 3.
+            e = (l + 1) % 3
+            tmp = sum(self.gamma[l][i][faces] * p[i] for i in xrange(3))
+            res[..., l] = (eta[e] * omega_signed - zeta * tmp) \
+                * self.factor[l][faces]
+
+        # Points in the plane of a triangle get no contribution from it,
+        # except from an image of a macro geometry which touches the point
+        # with one of its vertices.
+        zero = omega == 0
+        res[zero] = 0
+        if np.any(np.asarray(T) != 0):
+            for l in xrange(3):
+                touch = zero & np.all(x[l] == xp, axis=-1)
+                if np.any(touch):
+                    v = [y[touch] for y in x]
+                    v[l] = xp[touch] + T
+                    res[touch, l] = _solid_angles(
+                        xp[touch], v[0], v[1], v[2]) / (4 * np.pi)
+                    zero &= ~touch
+        return res
@@ -0,0 +1,69 @@
+import numpy as np
+import dolfin as df
+from finmag.energies.demag.fk_demag import FKDemag
+from finmag.energies.demag.fk_demag_pbc import BMatrixPBC, MacroGeometry
+from finmag.energies.demag.hmatrix import HMatrix, BEMEntries
+from finmag.native.llg import compute_bem_fk
+from finmag.field import Field
+from finmag.util.meshes import sphere
+
+
+def points_on_sphere(n):
+    rng = np.random.RandomState(0)
+    x = rng.normal(size=(n, 3))
+    return x / np.sqrt(np.sum(x ** 2, axis=1))[:, np.newaxis]
+
+
+def test_hmatrix_approximates_smooth_kernel():
+    x = points_on_sphere(1500)
+    d = np.sqrt(np.sum((x[:, np.newaxis, :] - x[np.newaxis, :, :]) ** 2, axis=-1))
+    A = 1.0 / (d + 0.05)
+
+    H = HMatrix.from_dense(A, x, eps=1e-6)
+    v = np.random.random_sample(len(x))
+    rel_err = np.linalg.norm(H.dot(v) - A.dot(v)) / np.linalg.norm(A.dot(v))
+    print "Relative error of H-matrix product: {:.2g}".format(rel_err)
+    assert rel_err < 1e-5
+    assert np.allclose(H.todense(), A, atol=1e-5 * np.abs(A).max(), rtol=0)
+
+
+def test_bem_entries_match_dense_bem():
+    mesh = sphere(r=1.0, maxh=0.4)
+    bem, b2g_map = compute_bem_fk(df.BoundaryMesh(mesh, 'exterior', False))
+    entries = BEMEntries(mesh)
+    rows = np.arange(0, len(bem), 7)
+    cols = np.arange(3, len(bem), 5)
+    assert np.allclose(entries(rows, cols), bem[np.ix_(rows, cols)],
+                       atol=1e-12, rtol=1e-10)
+
+
+def test_bem_entries_match_dense_bem_with_macro_geometry():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(3, 3, 1), 6, 6, 2)
+    Ts = MacroGeometry(nx=3, ny=3).compute_Ts(mesh)
+    bem = BMatrixPBC(mesh, Ts).bm
+    entries = BEMEntries(mesh, Ts)
+    rows = np.arange(len(bem))
+    cols = np.arange(0, len(bem), 4)
+    assert np.allclose(entries(rows, cols), bem[:, cols],
+                       atol=1e-12, rtol=1e-10)
+    assert np.allclose(entries(rows[5:6], cols), bem[5:6, cols],
+                       atol=1e-12, rtol=1e-10)
+
+
+def test_hmatrix_demag_field_agrees_with_dense_bem():
+    mesh = sphere(r=1.0, maxh=0.3)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1)
+    m = Field(S3, df.Expression(('x[1]', '1', 'x[0]'), degree=1),
+              normalised=True)
+    Ms = Field(df.FunctionSpace(mesh, 'DG', 0), 8e5)
+
+    dense = FKDemag()
+    dense.setup(m, Ms, 1e-9)
+    hmatrix = FKDemag(bem_format='hmatrix', eps=1e-6)
+    hmatrix.setup(m, Ms, 1e-9)
+
+    H_dense = dense.compute_field()
+    H_hmatrix = hmatrix.compute_field()
+    rel_err = np.max(np.abs(H_hmatrix - H_dense)) / np.max(np.abs(H_dense))
+    print "Maximum relative difference of demag fields: {:.2g}".format(rel_err)
+    assert rel_err < 1e-4
@@ -6,10 +6,11 @@ from finmag.field import Field
 from finmag.util.consts import mu0
 from finmag.util.meshes import nodal_volume
 from finmag.native.treecode_bem import FastSum
-from finmag.native.treecode_bem import compute_solid_angle_single
 from finmag.util import helpers
+from finmag.energies.energy_base import compute_field_batch_by_loop
 
 from fk_demag import FKDemag
+from boundary_geometry import boundary_solid_angles, boundary_facet_normals
 
 logger = logging.getLogger(name='finmag')
 
@@ -109,37 +110,25 @@ class TreecodeBEM(FKDemag):
         self.phi2_b = np.zeros(self.bmesh.num_vertices())
 
     def __compute_bsa(self):
-
-        vert_bsa = np.zeros(self.mesh.num_vertices())
-
-        mc = self.mesh.cells()
-        xyz = self.mesh.coordinates()
-        for i in range(self.mesh.num_cells()):
-            for j in range(4):
-
-                tmp_omega = compute_solid_angle_single(
-                    xyz[mc[i][j]],
-                    xyz[mc[i][(j + 1) % 4]],
-                    xyz[mc[i][(j + 2) % 4]],
-                    xyz[mc[i][(j + 3) % 4]])
-
-                vert_bsa[mc[i][j]] += tmp_omega
-
-        vert_bsa = vert_bsa / (4 * np.pi) - 1
-
-        self.vert_bsa = vert_bsa[self._b2g_map]
+        self.vert_bsa = boundary_solid_angles(
+            self.mesh.coordinates(), self.mesh.cells(), self._b2g_map)
 
     def compute_triangle_normal(self):
-
-        self.t_normals = []
-
-        for face in df.faces(self.mesh):
-            t = face.normal()  # one must call normal() before entities(3),...
-            cells = face.entities(3)
-            if len(cells) == 1:
-                self.t_normals.append([t.x(), t.y(), t.z()])
-
-        self.t_normals = np.array(self.t_normals)
+        # The outward normals of the boundary facets, in the order of the
+        # cells of the boundary mesh.
+        facets = self._b2g_map[self.bmesh.cells()]
+        self.t_normals = boundary_facet_normals(
+            self.mesh.coordinates(), self.mesh.cells(), facets)
+
+    def compute_field_batch(self, M):
+        """
+        Compute the demagnetising fields for the rows of `M` (see
+        `FKDemag.compute_field_batch`). The treecode has no dense boundary
+        element matrix to apply to all of them at once, so they are
+        computed one by one.
+
+        """
+        return compute_field_batch_by_loop(self, self.m, M)
 
     def _compute_magnetic_potential(self):
         # compute _phi_1 on the whole domain
@@ -66,6 +66,7 @@ class DMI(EnergyBase):
             dmi_np.setup(m, Ms)
             H_dmi_np = dmi_np.compute_field()
     """
+    field_is_linear = True
 
     def __init__(self, D, method='box-matrix-petsc', name='DMI',
                  dmi_type='auto'):
@@ -105,7 +106,11 @@ class DMI(EnergyBase):
         super(DMI, self).setup(E_integrand, m, Ms, unit_length)
         
         if self.method == 'direct':
-            self.__setup_field_direct()
+            self._assemble_field_matrix = self.__setup_field_direct
+            self._update_field_matrix()
+
+    def _matrix_parameters(self):
+        return [self.D, self.Ms]
 
     def __setup_field_direct(self):
         dofmap = self.m.mesh_dofmap()
@@ -2,6 +2,7 @@ import logging
 import dolfin as df
 import numpy as np
 from aeon import timer
+from scipy.sparse import csr_matrix
 from finmag.util.meshes import nodal_volume
 from finmag.util import helpers
 from finmag.util.consts import mu0
@@ -10,6 +11,28 @@ from finmag.field import Field
 logger = logging.getLogger('finmag')
 
 
+def compute_field_batch_by_loop(interaction, m, M):
+    """
+    Compute the field of `interaction` for each row of the (k, 3n) array
+    `M` by setting the magnetisation Field `m` to it in turn. The original
+    magnetisation is restored afterwards.
+
+    This is the fallback for interactions which have no more efficient
+    way of computing a batch of fields.
+
+    """
+    M = np.atleast_2d(M)
+    m_orig = m.f.vector().array()
+    H = np.empty(M.shape)
+    try:
+        for i, m_i in enumerate(M):
+            m.f.vector().set_local(m_i)
+            H[i] = interaction.compute_field()
+    finally:
+        m.f.vector().set_local(m_orig)
+    return H
+
+
 class EnergyBase(object):
 
     """
@@ -52,6 +75,10 @@ class EnergyBase(object):
     _supported_methods = ['box-assemble', 'box-matrix-numpy',
                           'box-matrix-petsc', 'project', 'direct']
 
+    # Derived classes whose field is linear in m (H = g * m) set this to
+    # True, which allows EffectiveField to fuse them into one operator.
+    field_is_linear = False
+
     def __init__(self, method="box-matrix-petsc", in_jacobian=False):
         if method not in self._supported_methods:
             logger.error("Can't create '{}' object with method '{}'. "
@@ -102,6 +129,11 @@ class EnergyBase(object):
         self.m = m
         self.Ms = Ms
         self.unit_length = unit_length
+        self._field_matrix = None  # used by compute_field_batch
+        # Function which (re)assembles the matrix g of the box-matrix
+        # methods, and the parameter version it was last assembled for.
+        self._assemble_field_matrix = None
+        self._field_matrix_version = None
 
         self.E = E_integrand * df.dx
         self.nodal_E = df.dot(E_integrand, df.TestFunction(self.S1)) * df.dx
@@ -118,10 +150,12 @@ class EnergyBase(object):
         if self.method == 'box-assemble':
             self.__compute_field = self.__compute_field_assemble
         elif self.method == 'box-matrix-numpy':
-            self.__setup_field_numpy()
+            self._assemble_field_matrix = self.__setup_field_numpy
+            self._update_field_matrix()
             self.__compute_field = self.__compute_field_numpy
         elif self.method == 'box-matrix-petsc':
-            self.__setup_field_petsc()
+            self._assemble_field_matrix = self.__setup_field_petsc
+            self._update_field_matrix()
             self.__compute_field = self.__compute_field_petsc
         elif self.method == 'project':
             self.__setup_field_project()
@@ -202,12 +236,91 @@ class EnergyBase(object):
 
         return H
 
+    @timer.method
+    def compute_field_batch(self, M):
+        """
+        Compute the fields for several magnetisation vectors at once.
+
+        *Arguments*
+            M
+                numpy.ndarray of shape (k, 3n) whose rows are magnetisation
+                vectors (in the same order as m.f.vector()).
+
+        *Returns*
+            numpy.ndarray
+                Array of shape (k, 3n) whose rows are the fields.
+
+        If the field is linear in m, all fields are computed with a single
+        sparse matrix-matrix product. Otherwise, they are computed one by
+        one.
+
+        """
+        M = np.atleast_2d(M)
+        self._update_field_matrix()
+        if getattr(self, '_field_matrix', None) is None:
+            self._field_matrix = self.linear_field_matrix()
+        if self._field_matrix is None:
+            return compute_field_batch_by_loop(self, self.m, M)
+        return self._field_matrix.dot(M.T).T
+
     def average_field(self):
         """
         Compute the average field.
         """
         return helpers.average_field(self.compute_field())
 
+    def linear_field_matrix(self):
+        """
+        If the field is linear in m and represented by a precomputed
+        matrix g, return the sparse matrix A = g / nodal_volume_S3, so
+        that the field is given by A * m (in dof order). Otherwise,
+        return None.
+
+        *Returns*
+            scipy.sparse.csr_matrix or None
+
+        """
+        if not self.field_is_linear:
+            return None
+        self._update_field_matrix()
+        if hasattr(self, "g_petsc"):
+            return helpers.petsc_matrix_to_csr(
+                self.g_petsc, row_scale=1.0 / self.nodal_volume_S3)
+        if hasattr(self, "g"):
+            return csr_matrix(self.g / self.nodal_volume_S3[:, np.newaxis])
+        return None
+
+    def _matrix_parameters(self):
+        """
+        Return the Fields holding the material parameters of this
+        interaction, on which the matrix g of the box-matrix methods
+        depends. Derived classes add their own parameters.
+
+        """
+        return [self.Ms]
+
+    def parameter_version(self):
+        """
+        Return a stamp which changes whenever one of the parameters is
+        set, so that quantities derived from them can be recomputed.
+
+        """
+        return tuple(p.version for p in self._matrix_parameters())
+
+    def _update_field_matrix(self):
+        """
+        Reassemble the matrix g if a parameter has been set since it was
+        last assembled.
+
+        """
+        if self._assemble_field_matrix is None:
+            return
+        version = self.parameter_version()
+        if version != self._field_matrix_version:
+            self._assemble_field_matrix()
+            self._field_matrix_version = version
+            self._field_matrix = None
+
     def __compute_field_assemble(self):
         return df.assemble(self.dE_dm).array() / self.nodal_volume_S3
 
@@ -224,6 +337,7 @@ class EnergyBase(object):
     def __compute_field_petsc(self):
         if not hasattr(self, "g_petsc"):
             self.__setup_field_petsc()
+        self._update_field_matrix()
         self.g_petsc.mult(self.m.f.vector(), self.H_petsc)
         return self.H_petsc.array() / self.nodal_volume_S3
 
@@ -243,6 +357,7 @@ class EnergyBase(object):
         self.g = df.assemble(g_form).array()
 
     def __compute_field_numpy(self):
+        self._update_field_matrix()
         Mvec = self.m.f.vector().array()
         H_ex = np.dot(self.g, Mvec)
         return H_ex / self.nodal_volume_S3
@@ -62,6 +62,7 @@ class Exchange(EnergyBase):
             H_exch_np = exchange_np.compute_field()
 
     """
+    field_is_linear = True
 
     def __init__(self, A, method='box-matrix-petsc', name='Exchange'):
         self.A_value = A  # Value of A, later converted to a Field object.
@@ -102,3 +103,6 @@ class Exchange(EnergyBase):
             df.inner(df.grad(m.f), df.grad(m.f))
 
         super(Exchange, self).setup(E_integrand, m, Ms, unit_length)
+
+    def _matrix_parameters(self):
+        return [self.A, self.Ms]
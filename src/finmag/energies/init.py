@@ -4,7 +4,7 @@ from energy_base import EnergyBase
 from exchange import Exchange
 from anisotropy import UniaxialAnisotropy
 from cubic_anisotropy import CubicAnisotropy
-from zeeman import Zeeman, TimeZeeman, DiscreteTimeZeeman, OscillatingZeeman, TimeZeemanPython
+from zeeman import Zeeman, TimeZeeman, DiscreteTimeZeeman, OscillatingZeeman, TimeZeemanPython, SeparableTimeZeeman, TabulatedTimeZeeman
 from dmi import DMI, DMI_interfacial
 from thin_film_demag import ThinFilmDemag
 from dw_fixed_energy import FixedEnergyDW
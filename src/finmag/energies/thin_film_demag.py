@@ -1,6 +1,7 @@
 import logging
 import numpy as np
 import dolfin as df
+from scipy.sparse import diags
 
 logger = logging.getLogger('finmag')
 
@@ -43,5 +44,16 @@ class ThinFilmDemag(object):
         self.H[self.direction][:] = - self.strength * m[self.direction]
         return self.H.ravel()
 
+    def linear_field_matrix(self):
+        """
+        Return the diagonal sparse matrix A such that the field returned
+        by `compute_field` is A * m.
+
+        """
+        n = self.H.shape[1]
+        diagonal = np.zeros((3, n))
+        diagonal[self.direction][:] = - self.strength
+        return diags(diagonal.ravel(), 0, format='csr')
+
     def compute_energy(self):
         return 0
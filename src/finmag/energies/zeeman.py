@@ -77,6 +77,16 @@ class Zeeman(object):
     def compute_field(self):
         return self.H.get_numpy_array_debug()
 
+    def compute_field_batch(self, M):
+        """
+        Return the field for each row of the (k, 3n) array `M` of
+        magnetisation vectors. Since the field does not depend on the
+        magnetisation, this is just k copies of it.
+
+        """
+        M = np.atleast_2d(M)
+        return np.tile(self.compute_field(), (M.shape[0], 1))
+
     def compute_energy(self, dx=df.dx):
         dim = self.m.mesh_dim()
         E = df.assemble(self.E * dx) * self.unit_length ** dim
@@ -181,6 +191,11 @@ class TimeZeeman(Zeeman):
         #       time t_off? (See comment in update() below.)
         self.t_off = t_off
         self.switched_off = False
+        self._t_last_update = None
+
+    def set_value(self, value, **kwargs):
+        super(TimeZeeman, self).set_value(value, **kwargs)
+        self._t_last_update = None
 
     def update(self, t):
         if not self.switched_off:
@@ -193,9 +208,15 @@ class TimeZeeman(Zeeman):
                 #       (This should probably happen in __init__)
                 self.switch_off()
                 return
+            if t == self._t_last_update:
+                # The field at this time is set already (e.g. the time
+                # integrator evaluates the right-hand side several times
+                # at the same time).
+                return
             self.value.t = t
             self.H.set(self.value)
             self.H.name = 'H_ext'
+            self._t_last_update = t
 
     def switch_off(self):
         # It might be nice to provide the option to remove the Zeeman
@@ -243,14 +264,124 @@ class DiscreteTimeZeeman(TimeZeeman):
                 dt_since_last_update = t - self.t_last_update
                 if dt_since_last_update >= self.dt_update:
                     self.value.t = t
-                    dofmap = self.m.functionspace.dofmap()
-                    dg_vector_functionspace = df.VectorFunctionSpace(self.m.mesh(), 'CG', 1, 3, constrained_domain=dofmap.constrained_domain)
-                    self.H = Field(dg_vector_functionspace, self.value, name='H_ext')
+                    self.H.set(self.value)
+                    self.t_last_update = t
                     log.debug("At t={}, after dt={}, update external field again.".format(
                         t, dt_since_last_update))
 
 
-class TimeZeemanPython(TimeZeeman):
+class SeparableTimeZeeman(TimeZeeman):
+
+    def __init__(self, profiles, coefficients, t_off=None, name='SeparableTimeZeeman'):
+        """
+        Time dependent external field (in A/m) which is a linear
+        combination of a few fixed spatial profiles with time dependent
+        coefficients:
+
+           H(t, x) = sum_k c_k(t) * H_k(x)
+
+        The profiles are interpolated only once (in `setup`), so that each
+        time update costs a single matrix-vector product of the
+        (K, 3n) array of profiles with the K coefficients, without any
+        dolfin Expression evaluation.
+
+        *Arguments*
+
+        profiles :  list
+
+            The spatial profiles H_k. Each of them can have any of the
+            forms accepted by 'finmag.util.helpers.vector_valued_function'
+            but must not depend on time.
+
+        coefficients :  callable
+
+            Function which takes the time t and returns the sequence
+            (c_1(t), ..., c_K(t)) of coefficients of the profiles.
+
+        t_off :  float
+
+            Time at which the field is switched off.
+
+        Example: a field rotating in the xy-plane with angular frequency
+        w and a spatially constant amplitude H0:
+
+            SeparableTimeZeeman([(H0, 0, 0), (0, H0, 0)],
+                                lambda t: (cos(w * t), sin(w * t)))
+
+        """
+        self.profiles = profiles
+        self.coefficients = coefficients
+        self.t_off = t_off
+        self.switched_off = False
+        self.name = name
+        self.in_jacobian = False
+
+    def _compute_profiles(self):
+        """
+        Return the array of shape (K, 3n) whose rows are the spatial
+        profiles in dolfin's dof order.
+        """
+        return np.array([helpers.vector_valued_function(
+            profile, self.m.functionspace).vector().array()
+            for profile in self.profiles])
+
+    def setup(self, m, Ms, unit_length=1):
+        self.m = m
+        self.Ms = Ms
+        self.unit_length = unit_length
+
+        self.H_profiles = self._compute_profiles()
+        self.H = np.zeros(self.H_profiles.shape[1])
+        self.H_field = Field(m.functionspace, name='H_ext')
+        self.E = - mu0 * self.Ms.f * df.dot(self.m.f, self.H_field.f)
+        self._t_last_update = None
+        self.update(0.0)
+
+    def update(self, t):
+        if not self.switched_off:
+            if self.t_off and t >= self.t_off:
+                self.switch_off()
+                return
+            if t != self._t_last_update:
+                c = np.asarray(self.coefficients(t), dtype=float).ravel()
+                np.dot(c, self.H_profiles, out=self.H)
+                self._t_last_update = t
+        return self  # for use in list comprehensions
+
+    def switch_off(self):
+        # It might be nice to provide the option to remove the Zeeman
+        # interaction from the simulation altogether (or at least
+        # provide an option to do so) in order to avoid computing the
+        # Zeeman energy at all once the field is switched off.
+        log.debug("Switching external field off.")
+        self.H[:] = 0
+        self.value = None
+        self.switched_off = True
+
+    def average_field(self):
+        """
+        Compute the average applied field.
+        """
+        return helpers.average_field(self.compute_field())
+
+    def compute_field(self):
+        return self.H
+
+    def compute_energy(self, dx=df.dx):
+        self.H_field.set_with_numpy_array_debug(self.H)
+        dim = self.m.mesh_dim()
+        E = df.assemble(self.E * dx) * self.unit_length ** dim
+        return E
+
+    def energy_density(self):
+        """
+        Return energy density (as a finmag.Field object).
+        """
+        self.H_field.set_with_numpy_array_debug(self.H)
+        return self.m.dot(self.H_field) * self.Ms * -mu0
+
+
+class TimeZeemanPython(SeparableTimeZeeman):
 
     def __init__(self, df_expression, time_fun, t_off=None, name='TimeZeemanPython'):
         """
@@ -291,76 +422,110 @@ class TimeZeemanPython(TimeZeeman):
         assert isinstance(df_expression, (df.Expression, df.Constant))
         self.df_expression = df_expression
         self.time_fun = time_fun
-        self.t_off = t_off
-        self.switched_off = False
-        self.name = name
-        self.in_jacobian = False
 
         self.scalar_df_expression = False
         if df_expression.value_size() == 1:
             self.scalar_df_expression = True
 
-    def setup(self, m, Ms, unit_length=1):
-        self.m = m
-        self.Ms = Ms
-        self.unit_length = unit_length
-        if self.scalar_df_expression:
-            dofmap = m.functionspace.dofmap()
-            self.S1 = df.FunctionSpace(
-                m.mesh(), "Lagrange", 1, constrained_domain=dofmap.constrained_domain)
-            self.h0 = helpers.scalar_valued_function(
-                self.df_expression, self.S1).vector().array()
-            self.H0 = df.Function(m.functionspace)
-        else:
-            self.H0 = helpers.vector_valued_function(
-                self.df_expression, self.m.functionspace)
+        super(TimeZeemanPython, self).__init__(
+            [df_expression], time_fun, t_off=t_off, name=name)
 
-        self.E = - mu0 * self.Ms.f * df.dot(self.m.f, self.H0)
+    def _compute_profiles(self):
+        if not self.scalar_df_expression:
+            return super(TimeZeemanPython, self)._compute_profiles()
 
-        self.H_init = self.H0.vector().array()
-        self.H = self.H_init.copy()
+        # One profile per component, each of which is h0 in that
+        # component and zero in the others.
+        dofmap = self.m.functionspace.dofmap()
+        self.S1 = df.FunctionSpace(
+            self.m.mesh(), "Lagrange", 1, constrained_domain=dofmap.constrained_domain)
+        h0 = Field(self.S1, self.df_expression).get_ordered_numpy_array()
+        profile = Field(self.m.functionspace)
+        profiles = []
+        for i in xrange(3):
+            h_xxx = np.zeros((3, len(h0)))
+            h_xxx[i] = h0
+            profile.set_with_ordered_numpy_array_xxx(h_xxx.ravel())
+            profiles.append(profile.get_numpy_array_debug().copy())
+        return np.array(profiles)
 
-    def update(self, t):
-        if not self.switched_off:
-            if self.t_off and t >= self.t_off:
-                self.switch_off()
-                return
 
-            if self.scalar_df_expression:
-                tx, ty, tz = self.time_fun(t)
+class TabulatedTimeZeeman(SeparableTimeZeeman):
 
-                self.H.shape = (3, -1)
-                self.H[0, :] = self.h0 * tx
-                self.H[1, :] = self.h0 * ty
-                self.H[2, :] = self.h0 * tz
-                self.H.shape = (-1,)
-            else:
-                self.H[:] = self.H_init[:] * self.time_fun(t)
-        return self  # for use in list comprehensions
+    def __init__(self, field_expression, ts, t_off=None, name='TabulatedTimeZeeman'):
+        """
+        Time dependent external field (in A/m) which is tabulated on the
+        time grid `ts` in `setup` and linearly interpolated in between.
 
-    def switch_off(self):
-        # It might be nice to provide the option to remove the Zeeman
-        # interaction from the simulation altogether (or at least
-        # provide an option to do so) in order to avoid computing the
-        # Zeeman energy at all once the field is switched off.
-        log.debug("Switching external field off.")
-        self.H = np.zeros_like(self.H)
-        self.value = None
-        self.switched_off = True
+        This is useful for fields which do not separate into a few
+        spatial profiles (e.g. a pulse travelling through the sample).
+        Each time update then costs a few vector operations instead of
+        the interpolation of a dolfin Expression, at the expense of
+        storing len(ts) copies of the field.
+
+        *Arguments*
+
+        field_expression :  dolfin.Expression or callable
+
+            Either a dolfin Expression with the time variable `t` or a
+            function which takes the time and returns the field in any
+            of the forms accepted by
+            'finmag.util.helpers.vector_valued_function'.
+
+        ts :  array_like
+
+            The increasing times at which the field is tabulated. Before
+            the first and after the last of these times, the field is
+            constant.
+
+        t_off :  float
+
+            Time at which the field is switched off.
 
-    def average_field(self):
         """
-        Compute the average applied field.
+        ts = np.asarray(ts, dtype=float)
+        if ts.ndim != 1 or len(ts) < 2 or np.any(np.diff(ts) <= 0):
+            raise ValueError("The argument 'ts' must be an increasing "
+                             "sequence of at least two times.")
+        self.field_expression = field_expression
+        self.ts = ts
+        super(TabulatedTimeZeeman, self).__init__(
+            None, None, t_off=t_off, name=name)
+
+    def _compute_profiles(self):
         """
-        return helpers.average_field(self.compute_field())
-
-    def compute_field(self):
-        return self.H
+        Return the array of shape (len(ts), 3n) of the field values at
+        the times `ts`.
+        """
+        table = []
+        for t in self.ts:
+            if isinstance(self.field_expression, df.Expression):
+                self.field_expression.t = t
+                value = self.field_expression
+            else:
+                value = self.field_expression(t)
+            table.append(helpers.vector_valued_function(
+                value, self.m.functionspace).vector().array())
+        return np.array(table)
 
-    def compute_energy(self, dx=df.dx):
-        self.H0.vector().set_local(self.H)
-        E = df.assemble(self.E * dx) * self.unit_length ** 3
-        return E
+    def update(self, t):
+        if not self.switched_off:
+            if self.t_off and t >= self.t_off:
+                self.switch_off()
+                return
+            if t != self._t_last_update:
+                ts = self.ts
+                i = np.searchsorted(ts, t, side='right') - 1
+                if i < 0:
+                    self.H[:] = self.H_profiles[0]
+                elif i >= len(ts) - 1:
+                    self.H[:] = self.H_profiles[-1]
+                else:
+                    w = (t - ts[i]) / (ts[i + 1] - ts[i])
+                    np.multiply(self.H_profiles[i], 1 - w, out=self.H)
+                    self.H += w * self.H_profiles[i + 1]
+                self._t_last_update = t
+        return self  # for use in list comprehensions
 
 
 class OscillatingZeeman(TimeZeemanPython):
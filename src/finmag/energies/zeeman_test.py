@@ -8,6 +8,7 @@ import logging
 from finmag.field import Field
 from finmag import sim_with
 from finmag.energies import Zeeman, TimeZeeman, DiscreteTimeZeeman, OscillatingZeeman
+from finmag.energies import TimeZeemanPython, SeparableTimeZeeman, TabulatedTimeZeeman
 from finmag.util.consts import mu0
 from finmag.util.meshes import pair_of_disks
 from finmag.example import sphere_inside_airbox
@@ -381,6 +382,61 @@ def test_oscillating_zeeman():
         check_field_at_time(t, H * cos(2 * pi * freq * t + phase))
 
 
+def test_separable_time_zeeman_rotating_field():
+    w = 2 * pi * 1e9
+    H0 = 1e5
+    H_rot = SeparableTimeZeeman([(H0, 0, 0), (0, H0, 0)],
+                                lambda t: (cos(w * t), sin(w * t)), t_off=1e-9)
+    H_rot.setup(m, Ms)
+    for t in np.linspace(0, 0.9e-9, 10):
+        H_rot.update(t)
+        expected = H0 * np.array([cos(w * t), sin(w * t), 0])
+        assert diff(H_rot, expected) < 1e-9 * H0
+
+    # The energy uses the current field
+    H_rot.update(0.1e-9)
+    E = H_rot.compute_energy()
+    assert abs(E + mu0 * H0 * cos(w * 0.1e-9)) < 1e-9 * mu0 * H0
+
+    H_rot.update(1e-9)
+    assert H_rot.switched_off
+    assert diff(H_rot, np.array([0, 0, 0])) < TOL
+
+
+def test_time_zeeman_python_with_scalar_expression():
+    h0 = df.Expression("1 + x[0]", degree=1)
+    H_ext = TimeZeemanPython(h0, lambda t: (0, cos(t), sin(t)))
+    H_ext.setup(m, Ms)
+    H_ext.update(0.3)
+
+    H = Field(S3)
+    H.set_with_numpy_array_debug(H_ext.compute_field())
+    expected = Field(S3, df.Expression(("0", "(1 + x[0]) * c", "(1 + x[0]) * s"),
+                                       c=cos(0.3), s=sin(0.3), degree=1))
+    assert H.allclose(expected)
+
+
+def test_tabulated_time_zeeman_agrees_with_time_zeeman():
+    field_expr = df.Expression(("0", "sin(t)", "t * x[0]"), t=0, degree=1)
+    H_tab = TabulatedTimeZeeman(field_expr, np.linspace(0, 2, 201))
+    H_tab.setup(m, Ms)
+    H_ext = TimeZeeman(field_expr)
+    H_ext.setup(m, Ms)
+    for t in [0, 0.05, 0.333, 1.0, 1.999]:
+        H_tab.update(t)
+        H_ext.update(t)
+        assert np.allclose(H_tab.compute_field(), H_ext.compute_field(),
+                           atol=1e-4)
+
+    # Outside of the tabulated times, the field is constant.
+    H_tab.update(3.0)
+    H_ext.update(2.0)
+    assert np.allclose(H_tab.compute_field(), H_ext.compute_field())
+
+    with pytest.raises(ValueError):
+        TabulatedTimeZeeman(field_expr, [0, 1, 1])
+
+
 def test_dipolar_field_class(tmpdir):
     os.chdir(str(tmpdir))
     H_dipole = DipolarField(pos=[0, 0, 0], m=[1, 0, 0], magnitude=3e9)
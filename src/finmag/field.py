@@ -34,6 +34,44 @@ def associated_scalar_space(functionspace):
     return df.FunctionSpace(functionspace.mesh(), fs_family, fs_degree)
 
 
+def _mpi_sum(local_values):
+    """
+    Sum the array `local_values` over all processes.
+    """
+    comm = df.mpi_comm_world()
+    if df.MPI.size(comm) == 1:
+        return local_values
+    return np.array([df.MPI.sum(comm, float(x)) for x in local_values])
+
+
+def average_many(fields, dx=df.dx):
+    """
+    Return the spatial averages of all Fields in the list `fields` (in
+    the same format as `Field.average`).
+
+    Fields on the same function space share their integration weights
+    (those of the first such field) and are averaged with a single
+    matrix product.
+
+    """
+    averages = [None] * len(fields)
+    groups = {}
+    for i, field in enumerate(fields):
+        groups.setdefault(id(field.functionspace), []).append(i)
+
+    for indices in groups.itervalues():
+        first = fields[indices[0]]
+        W, volume = first._integration_weights(dx)
+        F = np.array([fields[i].f.vector().array() for i in indices])
+        A = _mpi_sum(W.dot(F.T).ravel()).reshape((W.shape[0], -1)) / volume
+        for j, i in enumerate(indices):
+            if first.is_scalar_field():
+                averages[i] = float(A[0, j])
+            else:
+                averages[i] = A[:, j].copy()
+    return averages
+
+
 class Field(object):
     """
     Representation of scalar and vector fields using a dolfin function.
@@ -54,6 +92,10 @@ class Field(object):
         self.functionspace = functionspace
         self.f = df.Function(self.functionspace)
         self.name = name
+        self._average_weights = {}
+        # Increased by `set`, so that objects which cache quantities
+        # derived from the field values can tell when they are outdated.
+        self.version = 0
 
         if value is not None:
             self.value = value
@@ -198,6 +240,7 @@ class Field(object):
 
         if normalised:
             self.normalise()
+        self.version += 1
 
     def set_with_numpy_array_debug(self, value, normalised=False):
         """ONLY for debugging"""
@@ -370,30 +413,60 @@ class Field(object):
         else:
             raise NotImplementedError()
 
+    def _integration_weights(self, dx):
+        """
+        Return the pair (W, volume), where W is an array of shape
+        (value_dim, number of dofs) such that the integral of the field
+        over `dx` is W.dot(self.f.vector().array()), and volume is the
+        volume of the integration domain.
+
+        The weights are computed once per measure and cached (the cache
+        belongs to this field, whose function space and mesh never change).
+        Call `invalidate_average_weights` if the mesh is moved or the cell
+        markers used by `dx` are changed.
+
+        """
+        key = repr(dx)
+        if key not in self._average_weights:
+            # Compute the mesh "volume". For 1D mesh "volume" is the
+            # length and for 2D mesh is the area of the mesh.
+            volume = df.assemble(df.Constant(1) * dx(self.mesh()))
+            v = df.TestFunction(self.functionspace)
+            if self.is_scalar_field():
+                forms = [v * dx]
+            else:
+                forms = [v[i] * dx for i in xrange(self.value_dim())]
+            W = np.array([df.assemble(form).array() for form in forms])
+            self._average_weights[key] = (W, volume)
+        return self._average_weights[key]
+
+    def invalidate_average_weights(self):
+        """
+        Discard the cached integration weights used by `average`.
+        """
+        self._average_weights = {}
+
     def average(self, dx=df.dx):
         """
         Return the spatial field average.
 
+        The average is computed as a weighted sum of the field values
+        with weights which are assembled once per measure `dx` (see
+        `invalidate_average_weights`).
+
         Returns:
           f_average (float for scalar and np.ndarray for vector field)
 
         """
-        # Compute the mesh "volume". For 1D mesh "volume" is the length and
-        # for 2D mesh is the area of the mesh.
-        volume = df.assemble(df.Constant(1) * dx(self.mesh()))
+        W, volume = self._integration_weights(dx)
+        f_average = _mpi_sum(W.dot(self.f.vector().array())) / volume
 
         # Scalar field.
         if self.is_scalar_field():
-            return df.assemble(self.f * dx) / volume
+            return float(f_average[0])
 
         # Vector field.
-        else:
-            f_average = []
-            # Compute the average for every vector component independently.
-            for i in xrange(self.value_dim()):
-                f_average.append(df.assemble(self.f[i] * dx))
-
-            return np.array(f_average) / volume
+        return f_average
 
     def coords_and_values(self, t=None):
         """
@@ -929,6 +929,64 @@ class TestField(object):
                 assert isinstance(f_av, np.ndarray)
                 assert f_av.shape == (field.value_dim(),)
 
+    def test_average_reuses_weights_and_agrees_with_assembly(self):
+        """Test that cached weights give the same average as assemble."""
+        for functionspace in self.vector3d_fspaces:
+            field = Field(functionspace, ('x[0]', 'x[1]*x[1]', '1'))
+            f_av = field.average()
+            assert len(field._average_weights) == 1
+
+            volume = df.assemble(df.Constant(1) * df.dx(field.mesh()))
+            expected = [df.assemble(field.f[i] * df.dx) / volume
+                        for i in xrange(3)]
+            assert np.allclose(f_av, expected, atol=self.tol1)
+
+            # Changing the values does not require new weights.
+            field.set(('2*x[0]', '0', '-1'))
+            f_av = field.average()
+            assert len(field._average_weights) == 1
+            assert abs(f_av[0] - 2 * expected[0]) < self.tol1
+            assert abs(f_av[2] + 1) < self.tol1
+
+            field.invalidate_average_weights()
+            assert field._average_weights == {}
+            assert np.allclose(field.average(), f_av)
+
+    def test_average_on_region(self):
+        """Test computing the average over a marked part of the mesh."""
+        mesh = df.UnitCubeMesh(5, 5, 5)
+        markers = df.CellFunction('size_t', mesh, 0)
+        df.CompiledSubDomain('x[0] <= 0.5').mark(markers, 1)
+        dx = df.Measure('dx', domain=mesh, subdomain_data=markers)
+
+        functionspace = df.VectorFunctionSpace(mesh, 'CG', 1, 3)
+        field = Field(functionspace, ('x[0]', '1', '0'))
+        assert np.allclose(field.average(dx=dx(1)), (0.25, 1, 0))
+        assert np.allclose(field.average(dx=dx(0)), (0.75, 1, 0))
+        assert np.allclose(field.average(), (0.5, 1, 0))
+        assert len(field._average_weights) == 3
+
+    def test_average_many(self):
+        """Test computing the averages of several fields at once."""
+        from field import average_many
+        fields = []
+        expected = []
+        for fspaces in [self.scalar_fspaces, self.vector3d_fspaces]:
+            for functionspace in fspaces:
+                for value in [1, 2]:
+                    if functionspace.num_sub_spaces() == 0:
+                        field = Field(functionspace, 'x[0]*{}'.format(value))
+                    else:
+                        field = Field(functionspace, ('0', str(value), 'x[0]'))
+                    fields.append(field)
+                    expected.append(field.average())
+
+        averages = average_many(fields)
+        assert len(averages) == len(fields)
+        for av, av_expected in zip(averages, expected):
+            assert type(av) == type(av_expected)
+            assert np.allclose(av, av_expected)
+
     def test_coords_and_values_scalar_field(self):
         """Test coordinates and values for scalar field."""
         # Test for scalar fields on 1D, 2D, and 3D meshes,
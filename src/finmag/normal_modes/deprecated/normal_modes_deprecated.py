@@ -3,13 +3,17 @@ import dolfin as df
 import numpy as np
 import logging
 import os
+import multiprocessing
+import scipy.sparse
 import scipy.sparse.linalg
 from time import time
 from finmag.util import helpers
 from finmag.util.meshes import embed3d
-from itertools import izip
+from itertools import izip, imap
 from math import pi
 from finmag.field import Field
+from finmag.energies import Zeeman
+from finmag.energies.energy_base import compute_field_batch_by_loop
 logger = logging.getLogger('finmag')
 
 
@@ -128,127 +132,480 @@ def differentiate_fd4(f, x, dx):
     return res
 
 
-def compute_eigenproblem_matrix(sim, frequency_unit=1e9, filename=None, differentiate_H_numerically=True, dtype=complex):
+class LinearisedEffectiveField(object):
+
     """
-    Compute and return the square matrix `D` defining the eigenproblem which
-    has the normal mode frequencies and oscillation patterns as its solution.
+    Matrix-free representation of the linear operator
 
-    Note that `sim` needs to be in a relaxed state, otherwise the results will
-    be wrong.
+        v  ->  H'(m0) v - h0 v
 
-    """
-    # Create the helper simulation which we use to compute
-    # the effective field for various values of m.
-    #Ms = sim.Ms
-    #A = sim.get_interaction('Exchange').A
-    #unit_length = sim.unit_length
-    # try:
-    #    sim.get_interaction('Demag')
-    #    demag_solver = 'FK'
-    # except ValueError:
-    #    demag_solver = None
-    #sim_aux = sim_with(sim.mesh, Ms=Ms, m_init=[1, 0, 0], A=A, unit_length=unit_length, demag_solver=demag_solver)
-    # In order to compute the derivative of the effective field, the magnetisation needs to be set
-    # to many different values. Thus we store a backup so that we can restore
-    # it later.
-    m_orig = sim.m
+    where m0 is the current magnetisation of the simulation `sim`, H'(m0)
+    is the derivative of the effective field at m0 and h0 = H(m0) . m0
+    (nodewise dot product). Vectors have the same layout as `sim.m`.
 
-    def effective_field_for_m(m, normalise=True):
-        if np.iscomplexobj(m):
-            raise NotImplementedError(
-                "XXX TODO: Implement the version for complex arrays!")
-        sim.set_m(m, normalise=normalise, debug=False)
-        return sim.effective_field()
-
-    # N is the number of degrees of freedom of the magnetisation vector.
-    # It may be smaller than the number of mesh nodes if we are using
-    # periodic boundary conditions.
-    N = sim.llg.S3.dim()
-    n = N // 3
-    assert (N == 3 * n)
-
-    m0_array = sim.m.copy()
-    # this corresponds to the vector 'm0_flat' in Simlib
-    m0_3xn = m0_array.reshape(3, n)
-    m0_column_vector = m0_array.reshape(3, 1, n)
-    H0_array = effective_field_for_m(m0_array)
-    H0_3xn = H0_array.reshape(3, n)
-    h0 = H0_3xn[0] * m0_3xn[0] + H0_3xn[1] * m0_3xn[1] + H0_3xn[2] * m0_3xn[2]
+    If `use_linear_fields` is True (the default), the interactions whose
+    field is linear in m (exchange, DMI, assembled anisotropy, ...) are
+    applied through their sparse matrix (which is their exact Jacobian),
+    interactions whose field does not depend on m (Zeeman) are skipped
+    and only the remaining ones (e.g. demag) are differentiated. If it is
+    False, the total effective field is differentiated, as in the original
+    dense assembly.
 
-    logger.debug(
-        "Computing basis of the tangent space and transition matrices.")
-    Q, R, S, Mcross = compute_tangential_space_basis(m0_column_vector)
-    Qt = mf_transpose(Q).copy()
+    If `nonlinear_only` is True, only the derivative of the interactions
+    which are not linear in m is applied (without the h0 term); the rest
+    can then be assembled as a sparse matrix (see
+    `compute_local_eigenproblem_matrix`).
 
-    # Returns the product of the linearised llg times vector
-    def linearised_llg_times_vector(v):
-        assert v.shape == (3, 1, n)
-        # The linearised equation is
-        # dv/dt = - gamma m0 x (H' v - h_0 v)
-        v_array = v.view()
-        v_array.shape = (-1,)
+    The magnetisation of `sim` is restored to m0 after each evaluation.
+
+    """
+
+    def __init__(self, sim, differentiate_H_numerically=True, use_linear_fields=True,
+                 nonlinear_only=False):
+        if nonlinear_only and not use_linear_fields:
+            raise ValueError("The option nonlinear_only=True requires "
+                             "use_linear_fields=True.")
+        self.sim = sim
+        self.differentiate_H_numerically = differentiate_H_numerically
+        self.nonlinear_only = nonlinear_only
+
+        # N is the number of degrees of freedom of the magnetisation vector.
+        # It may be smaller than the number of mesh nodes if we are using
+        # periodic boundary conditions.
+        N = sim.llg.S3.dim()
+        self.n = N // 3
+        assert (N == 3 * self.n)
+
+        self.m0 = sim.m.copy()
+        # this corresponds to the vector 'm0_flat' in Simlib
+        m0_3xn = self.m0.reshape(3, self.n)
+        H0_3xn = sim.effective_field().reshape(3, self.n)
+        self.h0 = np.sum(H0_3xn * m0_3xn, axis=0)
+
+        if use_linear_fields:
+            self.linear_operator, others = \
+                sim.llg.effective_field.split_linear_interactions()
+            self.other_interactions = [
+                i for i in others if not isinstance(i, Zeeman)]
+        else:
+            self.linear_operator = None
+            self.other_interactions = None  # use the total effective field
+
+    def _field_for_m(self, m, normalise=True):
+        # Use llg.set_m rather than sim.set_m to avoid re-initialising
+        # the integrator for every evaluation.
+        self.sim.llg.set_m(m, normalise=normalise)
+        if self.other_interactions is None:
+            return self.sim.effective_field()
+        H = np.zeros(len(m))
+        for interaction in self.other_interactions:
+            H += interaction.compute_field()
+        return H
+
+    def _fields_for_batch(self, M, normalise=True):
+        # Like _field_for_m, but for all rows of the (k, 3n) array M at
+        # once. The rows are normalised in the same way as by llg.set_m.
+        llg = self.sim.llg
+        if normalise:
+            M_xxx = M[:, llg.v2d_xxx].reshape(len(M), 3, -1)
+            M_xxx /= np.sqrt(np.sum(M_xxx * M_xxx, axis=1))[:, np.newaxis, :]
+            M = M_xxx.reshape(len(M), -1)[:, llg.d2v_xxx]
+        if self.other_interactions is None:
+            return llg.effective_field.compute_field_batch(M, t=self.sim.t)
+        H = np.zeros(M.shape)
+        for interaction in self.other_interactions:
+            if hasattr(interaction, 'compute_field_batch'):
+                H += interaction.compute_field_batch(M)
+            else:
+                H += compute_field_batch_by_loop(interaction, llg.m_field, M)
+        return H
+
+    def _differentiate_fd4_batch(self, V):
+        # differentiate_fd4(self._field_for_m, self.m0, v) for all rows v
+        # of V, with the fields at all 4k points computed in one batch.
+        x_sq = np.dot(self.m0, self.m0)
+        dx_sq = np.sum(V * V, axis=1)
+        h = 0.001 * np.sqrt(x_sq + dx_sq) / np.sqrt(dx_sq + 1e-50)
+        h = h[:, np.newaxis]
+        weights = [1. / 12., -2. / 3., 2. / 3., -1. / 12.]
+        coefficients = [-2., -1., 1., 2.]
+        H = self._fields_for_batch(
+            np.concatenate([self.m0 + c * h * V for c in coefficients]))
+        H.shape = (4, len(V), -1)
+        return sum((w / h) * H_c for w, H_c in zip(weights, H))
+
+    def _apply(self, v):
         # Compute H'(m_0)*v, i.e. the "directional derivative" of H at
         # m_0 in the direction of v. Since H is linear in m (at least
         # theoretically, although this is not quite true in the case
         # of our demag computation), this is the same as H(v)!
-        if differentiate_H_numerically:
-            res = differentiate_fd4(effective_field_for_m, m0_array, v_array)
-        else:
-            res = effective_field_for_m(v_array, normalise=False)
-        res.shape = (3, -1)
-        # Subtract h0 v
-        res[0] -= h0 * v[0, 0]
-        res[1] -= h0 * v[1, 0]
-        res[2] -= h0 * v[2, 0]
-        # Multiply by -gamma m0x
-        res *= sim.gamma
-        res.shape = (3, 1, -1)
-        # Put res on the left in case v is complex
-        res = mf_cross(res, m0_column_vector)
+        res = np.zeros(len(v))
+        if self.linear_operator is not None and not self.nonlinear_only:
+            res += self.linear_operator.dot(v)
+        if self.other_interactions is None or len(self.other_interactions) > 0:
+            if self.differentiate_H_numerically:
+                res += differentiate_fd4(self._field_for_m, self.m0, v)
+            else:
+                res += self._field_for_m(v, normalise=False)
+            self.sim.llg.set_m(self.m0, normalise=False)
+        if not self.nonlinear_only:
+            # Subtract h0 v
+            res.shape = (3, -1)
+            res -= self.h0 * v.reshape(3, -1)
+            res.shape = (-1,)
         return res
 
-    # The linearised equation in the tangential basis
-    def linearised_llg_times_tangential_vector(w):
+    def __call__(self, v):
+        v = np.asarray(v).reshape(-1)
+        if np.iscomplexobj(v):
+            # The operator is real, so we can treat both parts separately.
+            return self._apply(v.real.copy()) + 1j * self._apply(v.imag.copy())
+        return self._apply(v)
+
+    def apply_batch(self, V):
+        """
+        Apply the operator to all rows of the (k, 3n) array `V` and return
+        the results as the rows of an array of the same shape. The fields
+        needed for all rows are computed together (see
+        `EffectiveField.compute_field_batch`), which is faster than
+        applying the operator to each row in turn.
+
+        """
+        V = np.atleast_2d(V)
+        if np.iscomplexobj(V):
+            return self.apply_batch(V.real.copy()) + \
+                1j * self.apply_batch(V.imag.copy())
+        res = np.zeros(V.shape)
+        if self.linear_operator is not None and not self.nonlinear_only:
+            res += self.linear_operator.dot(V.T).T
+        if self.other_interactions is None or len(self.other_interactions) > 0:
+            if self.differentiate_H_numerically:
+                res += self._differentiate_fd4_batch(V)
+            else:
+                res += self._fields_for_batch(V, normalise=False)
+        if not self.nonlinear_only:
+            # Subtract h0 v
+            res -= np.tile(self.h0, 3) * V
+        return res
+
+
+def _to_3d_batch(Q, W):
+    # Multiply each row w of the (k, 2n) array W by the tangential basis Q
+    # and return the resulting vectors as the rows of a (k, 3n) array.
+    k, n = len(W), Q.shape[2]
+    V = np.einsum('abi,jbi->jai', Q, W.reshape(k, 2, n))
+    return V.reshape(k, 3 * n)
+
+
+class D_times_w(object):
+
+    """
+    Product of the linearised LLG equation in the tangential basis with a
+    vector `w` of length 2n, i.e. the i-th column of the eigenproblem
+    matrix D is D_times_w(e_i). `H_lin` is a LinearisedEffectiveField.
+
+    """
+
+    def __init__(self, H_lin, Q, Qt, gamma, frequency_unit=1e9, dtype=complex):
+        self.H_lin = H_lin
+        self.Q = Q
+        self.Qt = Qt
+        self.gamma = gamma
+        self.frequency_unit = frequency_unit
+        self.dtype = dtype
+        self.m0_column_vector = H_lin.m0.reshape(3, 1, H_lin.n)
+
+    def __call__(self, w):
+        if self.dtype != complex and np.iscomplexobj(w):
+            return self(w.real) + 1j * self(w.imag)
+        n = self.H_lin.n
         w = w.view()
         w.shape = (2, 1, n)
         # Go to the 3d space
-        v = mf_mult(Q, w)
-        # Compute the linearised llg
-        L = linearised_llg_times_vector(v)
+        v = mf_mult(self.Q, w)
+        # The linearised equation is
+        # dv/dt = - gamma m0 x (H' v - h_0 v)
+        return self._project(self.H_lin(v))
+
+    def batch(self, W):
+        """
+        Return the products with all rows of the (k, 2n) array `W` as the
+        rows of a (k, 2n) array (see `LinearisedEffectiveField.apply_batch`).
+
+        """
+        if self.dtype != complex and np.iscomplexobj(W):
+            return self.batch(W.real) + 1j * self.batch(W.imag)
+        L = self.H_lin.apply_batch(_to_3d_batch(self.Q, W))
+        return np.array([self._project(L_i) for L_i in L])
+
+    def _project(self, L):
+        n = self.H_lin.n
+        # Multiply by -gamma m0x
+        L = L * self.gamma
+        L.shape = (3, 1, n)
+        # Put L on the left in case v is complex
+        L = mf_cross(L, self.m0_column_vector)
         # Go back to 2d space
-        res = np.empty(w.shape, dtype=dtype)
-        res[:] = mf_mult(Qt, L)
-        if dtype == complex:
+        res = np.empty((2, 1, n), dtype=self.dtype)
+        res[:] = mf_mult(self.Qt, L)
+        if self.dtype == complex:
             # Multiply by -i/(2*pi*U) so that we get frequencies as the real
             # part of eigenvalues
-            res *= -1j / (2 * pi * frequency_unit)
+            res *= -1j / (2 * pi * self.frequency_unit)
         else:
             # This will yield imaginary eigenvalues, but we divide by 1j in the
             # calling routine.
-            res *= 1. / (2 * pi * frequency_unit)
+            res *= 1. / (2 * pi * self.frequency_unit)
         res.shape = (-1,)
         return res
 
+
+class A_times_w(object):
+
+    """
+    Product of the matrix A of the generalised eigenproblem with a vector
+    `w` of length 2n. `H_lin` is a LinearisedEffectiveField.
+
+    """
+
+    def __init__(self, H_lin, Q, Qt, gamma, frequency_unit=1e9):
+        self.H_lin = H_lin
+        self.Q = Q
+        self.Qt = Qt
+        self.factor = -gamma / (2 * pi * frequency_unit)
+
+    def __call__(self, w):
+        n = self.H_lin.n
+        w = w.view()
+        w.shape = (2, 1, n)
+        return self._project(self.H_lin(mf_mult(self.Q, w)))
+
+    def batch(self, W):
+        """
+        Return the products with all rows of the (k, 2n) array `W` as the
+        rows of a (k, 2n) array (see `LinearisedEffectiveField.apply_batch`).
+
+        """
+        Av = self.H_lin.apply_batch(_to_3d_batch(self.Q, W))
+        return np.array([self._project(Av_i) for Av_i in Av])
+
+    def _project(self, Av):
+        n = self.H_lin.n
+        Av = Av.reshape(3, 1, n)
+        res = mf_mult(self.Qt, Av)
+        res *= self.factor
+        res.shape = (-1,)
+        return res
+
+
+def _setup_linearisation(sim, differentiate_H_numerically, use_linear_fields, nonlinear_only=False):
+    H_lin = LinearisedEffectiveField(
+        sim, differentiate_H_numerically=differentiate_H_numerically,
+        use_linear_fields=use_linear_fields, nonlinear_only=nonlinear_only)
+    logger.debug(
+        "Computing basis of the tangent space and transition matrices.")
+    Q, R, S, Mcross = compute_tangential_space_basis(
+        H_lin.m0.reshape(3, 1, H_lin.n))
+    Qt = mf_transpose(Q).copy()
+    return H_lin, Q, Qt, Mcross
+
+
+def compute_eigenproblem_operator(sim, frequency_unit=1e9, differentiate_H_numerically=True,
+                                  use_linear_fields=True, dtype=complex):
+    """
+    Return the eigenproblem matrix `D` (see `compute_eigenproblem_matrix`)
+    as a `scipy.sparse.linalg.LinearOperator` which is never assembled.
+    Each matrix-vector product costs a few evaluations of the non-linear
+    part of the effective field (see `LinearisedEffectiveField`), and the
+    memory needed is O(n), so that eigenmodes of large systems can be
+    computed with Krylov methods.
+
+    Note that `sim` needs to be in a relaxed state, otherwise the results will
+    be wrong. The operator refers to the state of `sim` at the time of this
+    call and must be recomputed if the magnetisation changes.
+
+    """
+    H_lin, Q, Qt, _ = _setup_linearisation(
+        sim, differentiate_H_numerically, use_linear_fields)
+    n = H_lin.n
+    return scipy.sparse.linalg.LinearOperator(
+        (2 * n, 2 * n), matvec=D_times_w(H_lin, Q, Qt, sim.gamma, frequency_unit, dtype),
+        dtype=dtype)
+
+
+def compute_local_eigenproblem_matrix(H_lin, Q, Qt, gamma, frequency_unit=1e9, dtype=complex):
+    """
+    Return the part of the eigenproblem matrix `D` which stems from the
+    interactions that are linear in m and from the term h0 (see
+    `LinearisedEffectiveField`) as a sparse matrix in CSR format. Since
+    these interactions are local, this matrix is assembled directly from
+    their sparse matrices without evaluating any fields.
+
+    """
+    n = H_lin.n
+    nodes = np.arange(n)
+
+    def nodewise(blocks):
+        # Sparse matrix acting on vectors with component-major layout
+        # (like m.reshape(3, n)), given the (k, l, n) array of nodewise
+        # k x l matrices.
+        k, l, _ = blocks.shape
+        rows = (np.arange(k)[:, np.newaxis, np.newaxis] * n + nodes)
+        cols = (np.arange(l)[np.newaxis, :, np.newaxis] * n + nodes)
+        rows, cols = np.broadcast_arrays(rows, cols)
+        return scipy.sparse.csr_matrix(
+            (blocks.ravel(), (rows.ravel(), cols.ravel())), shape=(k * n, l * n))
+
+    # Cross product L -> L x m0
+    m0 = H_lin.m0.reshape(3, n)
+    zero = np.zeros(n)
+    C = np.array([[zero, m0[2], -m0[1]],
+                  [-m0[2], zero, m0[0]],
+                  [m0[1], -m0[0], zero]])
+
+    J = scipy.sparse.diags(-np.tile(H_lin.h0, 3))
+    if H_lin.linear_operator is not None:
+        J = J + H_lin.linear_operator
+    D = nodewise(np.asarray(Qt)).dot(nodewise(C).dot(J.dot(nodewise(Q))))
+    if dtype == complex:
+        D = D * (-1j * gamma / (2 * pi * frequency_unit))
+    else:
+        D = D * (gamma / (2 * pi * frequency_unit))
+    return scipy.sparse.csr_matrix(D, dtype=dtype)
+
+
+# The function whose values are the columns assembled by `assemble_columns`.
+# It is set before the process pool is created, so that every (forked)
+# worker process owns its own copy of the simulation whose effective field
+# is evaluated.
+_column_function = None
+
+
+def _compute_columns(args):
+    start, stop, N, dtype = args
+    if hasattr(_column_function, 'batch'):
+        E = np.zeros((stop - start, N))
+        E[np.arange(stop - start), np.arange(start, stop)] = 1.0
+        return start, np.asarray(_column_function.batch(E), dtype=dtype).T
+    block = np.zeros((N, stop - start), dtype=dtype)
+    e = np.zeros(N)
+    for j in xrange(start, stop):
+        e[j] = 1.0
+        block[:, j - start] = _column_function(e)
+        e[j] = 0.0
+    return start, block
+
+
+def assemble_columns(f, N, dtype=complex, out=None, processes=1, batch_size=50):
+    """
+    Assemble the dense N x N matrix whose j-th column is f(e_j), where
+    e_j is the j-th standard basis vector. If `out` is given, the columns
+    are added to it.
+
+    The columns are computed in batches of `batch_size`. If `f` has a
+    method `batch` which takes the basis vectors of a batch as the rows of
+    an array and returns the values as rows, it is called once per batch
+    (e.g. `D_times_w.batch`, which evaluates the effective fields of the
+    whole batch together). Otherwise `f` is called for each column.
+
+    If `processes` is larger than 1, the batches are distributed over a
+    pool of this many worker processes. The workers are forked from the
+    current process, so each of them evaluates `f` on its own copy of the
+    simulation.
+
+    """
+    global _column_function
+
+    D = np.zeros((N, N), dtype=dtype) if out is None else out
+    batches = [(start, min(start + batch_size, N), N, dtype)
+               for start in xrange(0, N, batch_size)]
+
     df.tic()
-    logger.info("Assembling eigenproblem matrix.")
-    D = np.zeros((2 * n, 2 * n), dtype=dtype)
-    logger.debug("Eigenproblem matrix D will occupy {:.2f} MB of memory.".format(
-        D.nbytes / 1024. ** 2))
-    for i, w in enumerate(np.eye(2 * n)):
-        if i % 50 == 0:
+    _column_function = f
+    pool = None
+    try:
+        if processes > 1:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(_compute_columns, batches)
+        else:
+            results = imap(_compute_columns, batches)
+        done = 0
+        for start, block in results:
+            D[:, start:start + block.shape[1]] += block
+            done += block.shape[1]
             t_cur = df.toc()
-            completion_info = '' if (i == 0) else ', estimated remaining time: {}'.format(
-                helpers.format_time(t_cur * (2 * n / i - 1)))
-            logger.debug("Processing row {}/{}  (time elapsed: {}{})".format(i,
-                                                                             2 * n, helpers.format_time(t_cur), completion_info))
-        D[:, i] = linearised_llg_times_tangential_vector(w)
-    logger.debug("Eigenproblem matrix D occupies {:.2f} MB of memory.".format(
-        D.nbytes / 1024. ** 2))
+            logger.debug("Processed {}/{} columns (time elapsed: {}, estimated "
+                         "remaining time: {})".format(
+                             done, N, helpers.format_time(t_cur),
+                             helpers.format_time(t_cur * (N / done - 1))))
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _column_function = None
+    return D
+
+
+def compute_eigenproblem_matrix(sim, frequency_unit=1e9, filename=None, differentiate_H_numerically=True, dtype=complex,
+                                processes=1, batch_size=50, split_local=False):
+    """
+    Compute and return the square matrix `D` defining the eigenproblem which
+    has the normal mode frequencies and oscillation patterns as its solution.
+
+    Note that `sim` needs to be in a relaxed state, otherwise the results will
+    be wrong.
+
+    The columns of `D` are computed in batches of `batch_size`, using
+    `processes` worker processes (see `assemble_columns`).
+
+    If `split_local` is True, the part of `D` stemming from interactions
+    which are linear in m (exchange, DMI, ...) is assembled directly as a
+    sparse matrix and only the remaining interactions (e.g. demag) are
+    differentiated for each column. If there are no such interactions,
+    `D` is returned as a sparse matrix in CSR format.
+
+    """
+    # In order to compute the derivative of the effective field, the magnetisation needs to be set
+    # to many different values. Thus we store a backup so that we can restore
+    # it later.
+    m_orig = sim.m
+
+    H_lin, Q, Qt, _ = _setup_linearisation(
+        sim, differentiate_H_numerically, use_linear_fields=split_local,
+        nonlinear_only=split_local)
+    n = H_lin.n
+
+    df.tic()
+    logger.info("Assembling eigenproblem matrix.")
+    if split_local:
+        D_local = compute_local_eigenproblem_matrix(
+            H_lin, Q, Qt, sim.gamma, frequency_unit, dtype)
+    if split_local and not H_lin.other_interactions:
+        # All interactions are local, so D is sparse
+        D = D_local
+        logger.debug("Eigenproblem matrix D occupies {:.2f} MB of memory.".format(
+            (D.data.nbytes + D.indices.nbytes + D.indptr.nbytes) / 1024. ** 2))
+    else:
+        D = np.zeros((2 * n, 2 * n), dtype=dtype)
+        logger.debug("Eigenproblem matrix D will occupy {:.2f} MB of memory.".format(
+            D.nbytes / 1024. ** 2))
+        if split_local:
+            D_local = D_local.tocoo()
+            D[D_local.row, D_local.col] += D_local.data
+            del D_local
+        assemble_columns(D_times_w(H_lin, Q, Qt, sim.gamma, frequency_unit, dtype),
+                         2 * n, dtype=dtype, out=D, processes=processes,
+                         batch_size=batch_size)
     logger.info("Finished assembling eigenproblem matrix.")
 
     if filename != None:
         logger.info("Saving eigenproblem matrix to file '{}'".format(filename))
-        np.save(filename, D)
+        if scipy.sparse.issparse(D):
+            scipy.sparse.save_npz(filename, D)
+        else:
+            np.save(filename, D)
 
     # Restore the original magnetisation.
     # XXX TODO: Is this method safe, or does it leave any trace of the
@@ -327,82 +684,30 @@ def check_is_hermitian(A, matrix_name, atol=1e-8, rtol=1e-12):
 
 def compute_generalised_eigenproblem_matrices(sim, alpha=0.0, frequency_unit=1e9,
                                               filename_mat_A=None, filename_mat_M=None,
-                                              check_hermitian=False, differentiate_H_numerically=True):
+                                              check_hermitian=False, differentiate_H_numerically=True,
+                                              processes=1, batch_size=50):
     """
     XXX TODO: write me
 
+    The columns of A are computed in batches of `batch_size`, using
+    `processes` worker processes (see `assemble_columns`).
+
     """
     m_orig = sim.m
 
-    def effective_field_for_m(m, normalise=True):
-        if np.iscomplexobj(m):
-            raise NotImplementedError(
-                "XXX TODO: Implement the version for complex arrays!")
-        sim.set_m(m, normalise=normalise)
-        return sim.effective_field()
-
-    n = sim.mesh.num_vertices()
-    N = 3 * n  # number of degrees of freedom
-
-    m0_array = sim.m.copy()
-    # this corresponds to the vector 'm0_flat' in Simlib
-    m0_3xn = m0_array.reshape(3, n)
-    m0_column_vector = m0_array.reshape(3, 1, n)
-    H0_array = effective_field_for_m(m0_array)
-    H0_3xn = H0_array.reshape(3, n)
-    h0 = H0_3xn[0] * m0_3xn[0] + H0_3xn[1] * m0_3xn[1] + H0_3xn[2] * m0_3xn[2]
-
-    logger.debug(
-        "Computing basis of the tangent space and transition matrices.")
-    Q, R, S, Mcross = compute_tangential_space_basis(m0_column_vector)
-    Qt = mf_transpose(Q).copy()
+    H_lin, Q, Qt, Mcross = _setup_linearisation(
+        sim, differentiate_H_numerically, use_linear_fields=False)
+    n = H_lin.n
+    A_times_vector = A_times_w(H_lin, Q, Qt, sim.gamma, frequency_unit)
 
     logger.debug("Q.shape: {} ({} MB)".format(Q.shape, Q.nbytes / 1024. ** 2))
 
-    def A_times_vector(v):
-        # A = H' v - h_0 v
-        assert v.shape == (3, 1, n)
-        v_array = v.view()
-        v_array.shape = (-1,)
-        # Compute H'(m_0)*v, i.e. the "directional derivative" of H at
-        # m_0 in the direction of v. Since H is linear in m (at least
-        # theoretically, although this is not quite true in the case
-        # of our demag computation), this is the same as H(v)!
-        if differentiate_H_numerically:
-            res = differentiate_fd4(effective_field_for_m, m0_array, v_array)
-        else:
-            res = effective_field_for_m(v_array, normalise=False)
-        res.shape = (3, n)
-        # Subtract h0 v
-        res[0] -= h0 * v[0, 0]
-        res[1] -= h0 * v[1, 0]
-        res[2] -= h0 * v[2, 0]
-        res.shape = (3, 1, n)
-        return res
-
-    df.tic()
     logger.info("Assembling eigenproblem matrix.")
     A = np.zeros((2 * n, 2 * n), dtype=complex)
     logger.debug("Eigenproblem matrix A occupies {:.2f} MB of memory.".format(
         A.nbytes / 1024. ** 2))
-
-    # Compute A
-    w = np.zeros(2 * n)
-    for i in xrange(2 * n):
-        if i % 50 == 0:
-            logger.debug(
-                "Processing row {}/{}  (time taken so far: {:.2f} seconds)".format(i, 2 * n, df.toc()))
-
-        # Ensure that w is the i-th standard basis vector
-        w.shape = (2 * n,)
-        w[i - 1] = 0.0  # this will do no harm if i==0
-        w[i] = 1.0
-
-        w.shape = (2, 1, n)
-        Av = A_times_vector(mf_mult(Q, w))
-        A[:, i] = mf_mult(Qt, Av).reshape(-1)
-        # Multiply by (-gamma)/(2 pi U)
-        A[:, i] *= -sim.gamma / (2 * pi * frequency_unit)
+    assemble_columns(A_times_vector, 2 * n, dtype=complex, out=A,
+                     processes=processes, batch_size=batch_size)
 
     # Compute B, which is -i Mcross 2 pi U / gamma
     # B = np.zeros((2, n, 2, n), dtype=complex)
@@ -447,6 +752,28 @@ def compute_generalised_eigenproblem_matrices(sim, alpha=0.0, frequency_unit=1e9
     return A, M, Q, Qt
 
 
+def compute_generalised_eigenproblem_operators(sim, alpha=0.0, frequency_unit=1e9,
+                                               differentiate_H_numerically=True,
+                                               use_linear_fields=True):
+    """
+    Matrix-free version of `compute_generalised_eigenproblem_matrices`.
+    Returns the tuple (A, M, Q, Qt), where A and M are instances of
+    `scipy.sparse.linalg.LinearOperator` (see `compute_eigenproblem_operator`
+    for details).
+
+    """
+    H_lin, Q, Qt, Mcross = _setup_linearisation(
+        sim, differentiate_H_numerically, use_linear_fields)
+    n = H_lin.n
+    A_times_vector = A_times_w(H_lin, Q, Qt, sim.gamma, frequency_unit)
+    # A is Hermitian, so we can use the same function for rmatvec.
+    A = scipy.sparse.linalg.LinearOperator(
+        (2 * n, 2 * n), matvec=A_times_vector, rmatvec=A_times_vector, dtype=complex)
+    M = scipy.sparse.linalg.LinearOperator(
+        (2 * n, 2 * n), matvec=M_times_w(Mcross, n, alpha), dtype=complex)
+    return A, M, Q, Qt
+
+
 def compute_normal_modes(D, n_values=10, sigma=0., tol=1e-8, which='LM'):
     logger.debug("Solving eigenproblem. This may take a while...")
     df.tic()
@@ -1,6 +1,8 @@
 from finmag.util.mesh_templates import Box, Sphere, Nanodisk, EllipticalNanodisk
 from finmag.util.meshes import mesh_info, plot_mesh_with_paraview
 from finmag.normal_modes.deprecated.normal_modes_deprecated import *
+from finmag.normal_modes.deprecated.normal_modes_deprecated import \
+    _setup_linearisation
 from finmag import example
 from finmag import sim_with, normal_mode_simulation
 from math import pi
@@ -251,5 +253,65 @@ def test_is_hermitian():
     assert(is_hermitian(B, atol=1e-2))
 
 
+def test_eigenproblem_operator_agrees_with_matrix():
+    """
+    The matrix-free eigenproblem operators (which use the sparse matrix
+    of the exchange interaction directly) should agree with the dense
+    matrices obtained by differentiating the full effective field.
+
+    """
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 4), 3, 3, 1)
+    sim = sim_with(mesh, Ms=8e5, m_init=[0.1, 0.2, 1], A=13e-12,
+                   H_ext=[0, 0, 1e5], unit_length=1e-9, demag_solver='FK')
+
+    def dense(op):
+        return np.array([op.matvec(e) for e in np.eye(op.shape[1])]).T
+
+    for dtype in [float, complex]:
+        D = compute_eigenproblem_matrix(sim, dtype=dtype)
+        D_op = compute_eigenproblem_operator(sim, dtype=dtype)
+        assert np.allclose(dense(D_op), D, atol=1e-8 * abs(D).max(), rtol=0)
+
+    A, M, _, _ = compute_generalised_eigenproblem_matrices(sim)
+    A_op, M_op, _, _ = compute_generalised_eigenproblem_operators(sim)
+    assert np.allclose(dense(A_op), A, atol=1e-8 * abs(A).max(), rtol=0)
+
+    # Complex vectors are supported, too (eigenvectors are complex)
+    w = np.random.random_sample(D.shape[0]) + 1j * np.random.random_sample(D.shape[0])
+    assert np.allclose(D_op.matvec(w), np.dot(D, w), atol=1e-8 * abs(D).max(), rtol=0)
+
+
+def test_parallel_and_split_assembly_of_eigenproblem_matrix():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 4), 3, 3, 1)
+    sim = sim_with(mesh, Ms=8e5, m_init=[0.1, 0.2, 1], A=13e-12,
+                   H_ext=[0, 0, 1e5], unit_length=1e-9, demag_solver='FK')
+    D = compute_eigenproblem_matrix(sim)
+    tol = 1e-8 * abs(D).max()
+
+    D_parallel = compute_eigenproblem_matrix(sim, processes=2, batch_size=7)
+    assert np.allclose(D_parallel, D, atol=tol, rtol=0)
+
+    D_split = compute_eigenproblem_matrix(sim, split_local=True)
+    assert isinstance(D_split, np.ndarray)
+    assert np.allclose(D_split, D, atol=tol, rtol=0)
+
+    # The columns computed in batches agree with those computed one by one
+    for split_local in [False, True]:
+        H_lin, Q, Qt, _ = _setup_linearisation(
+            sim, True, use_linear_fields=split_local, nonlinear_only=split_local)
+        f = D_times_w(H_lin, Q, Qt, sim.gamma)
+        N = 2 * H_lin.n
+        D_columns = assemble_columns(lambda w: f(w), N)
+        D_batches = assemble_columns(f, N, batch_size=7)
+        assert np.allclose(D_batches, D_columns, atol=tol, rtol=0)
+
+    # Without demag, the eigenproblem matrix is sparse
+    sim.remove_interaction('Demag')
+    D = compute_eigenproblem_matrix(sim)
+    D_sparse = compute_eigenproblem_matrix(sim, split_local=True)
+    assert scipy.sparse.issparse(D_sparse)
+    assert np.allclose(D_sparse.toarray(), D, atol=1e-8 * abs(D).max(), rtol=0)
+
+
 if __name__ == '__main__':
     test_compute_generalised_eigenproblem_matrices_single_sphere('.')
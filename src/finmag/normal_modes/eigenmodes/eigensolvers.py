@@ -2,10 +2,11 @@ from __future__ import division
 import numpy as np
 import dolfin as df
 import scipy.linalg
+import scipy.sparse
 import scipy.sparse.linalg
 import logging
 from finmag.util.helpers import format_time
-from helpers import sort_eigensolutions, as_petsc_matrix, is_hermitian, compute_relative_error, as_dense_array
+from helpers import sort_eigensolutions, as_petsc_matrix, as_petsc_shell_matrix, is_hermitian, compute_relative_error, as_dense_array
 from types import NoneType
 
 logger = logging.getLogger("finmag")
@@ -90,12 +91,16 @@ class AbstractEigensolver(object):
         #           matrices (but the conversion would happen in
         #           compute_relative_error() anyway, so by doing it
         #           here we avoid doing it multiple times.
-        if not isinstance(A, np.ndarray):
+        #           Scipy sparse matrices and matrix-free operators are left
+        #           alone since they only need matrix-vector products.
+        if not (isinstance(A, (np.ndarray, scipy.sparse.linalg.LinearOperator)) or
+                scipy.sparse.issparse(A)):
             logger.warning(
                 "Converting sparse matrix A to dense array to check whether it is "
                 "Hermitian. This might consume a lot of memory if A is big!.")
             A = as_dense_array(A)
-        if not isinstance(M, (np.ndarray, NoneType)):
+        if not (isinstance(M, (np.ndarray, scipy.sparse.linalg.LinearOperator, NoneType)) or
+                scipy.sparse.issparse(M)):
             logger.warning(
                 "Converting sparse matrix M to dense array to check whether it is "
                 "Hermitian. This might consume a lot of memory if M is big!.")
@@ -223,6 +228,18 @@ class ScipySparseSolver(AbstractEigensolver):
         return sort_eigensolutions(omega, w)
 
 
+def as_petsc_matrix_or_shell(A):
+    """
+    Convert `A` to a PETSc matrix. Matrix-free operators (scipy
+    LinearOperators) are wrapped in a shell matrix instead of being
+    assembled column by column.
+
+    """
+    if isinstance(A, scipy.sparse.linalg.LinearOperator):
+        return as_petsc_shell_matrix(A)
+    return as_petsc_matrix(A)
+
+
 def id_op(A):
     return scipy.sparse.linalg.LinearOperator(
         shape=A.shape, matvec=(lambda v: v), dtype=A.dtype)
@@ -358,6 +375,13 @@ class SLEPcEigensolver(AbstractEigensolver):
             st = E.getST()
             st.setType(SLEPc.ST.Type.SINVERT)
             st.setShift(0.0)
+            if A.getType() == 'python':
+                # Shell matrices cannot be factorised, so the linear
+                # systems need to be solved iteratively without
+                # preconditioner.
+                ksp = st.getKSP()
+                ksp.setType('gmres')
+                ksp.getPC().setType('none')
         return E
 
     def _solve_eigenproblem(self, A, M=None, num=None, problem_type=None, method_type=None, which=None, tol=1e-12, maxit=100, swap_matrices=None, shift_invert=None):
@@ -379,8 +403,8 @@ class SLEPcEigensolver(AbstractEigensolver):
         if shift_invert == None:
             shift_invert = self.shift_invert
 
-        A_petsc = as_petsc_matrix(A)
-        M_petsc = None if (M == None) else as_petsc_matrix(M)
+        A_petsc = as_petsc_matrix_or_shell(A)
+        M_petsc = None if (M is None) else as_petsc_matrix_or_shell(M)
         if swap_matrices:
             A_petsc, M_petsc = M_petsc, A_petsc
         size, _ = A_petsc.size
@@ -5,7 +5,7 @@ import numpy as np
 import dolfin as df
 from finmag.util.helpers import make_human_readable
 from scipy.sparse.linalg import LinearOperator
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, issparse
 from scipy.optimize import minimize_scalar
 from custom_exceptions import EigenproblemVerifyError
 from types import NoneType
@@ -55,14 +55,20 @@ def print_eigenproblem_memory_usage(mesh, generalised=False):
 
 
 def compute_relative_error(A, M, omega, w):
-    if not isinstance(A, np.ndarray) or not isinstance(M, (np.ndarray, NoneType)):
+    def is_supported(X):
+        return isinstance(X, (np.ndarray, LinearOperator, NoneType)) or issparse(X)
+
+    def dot(X, v):
+        return np.dot(X, v) if isinstance(X, np.ndarray) else X.dot(v)
+
+    if not is_supported(A) or not is_supported(M):
         logger.warning(
             "Converting sparse matrix to numpy.array as this is the only "
             "supported matrix type at the moment for computing relative errors.")
         A = as_dense_array(A)
         M = as_dense_array(M)
-    lhs = np.dot(A, w)
-    rhs = omega * w if (M == None) else omega * np.dot(M, w)
+    lhs = dot(A, w)
+    rhs = omega * w if (M is None) else omega * dot(M, w)
     rel_err = np.linalg.norm(lhs - rhs) / np.linalg.norm(omega * w)
     return rel_err
 
@@ -283,6 +289,8 @@ def as_dense_array(A, dtype=None):
 
     if isinstance(A, LinearOperator):
         return scipy_sparse_linear_operator_to_dense_array(A, dtype=dtype)
+    elif issparse(A):
+        return np.asarray(A.toarray(), dtype=dtype)
     elif isinstance(A, PETSc.Mat):
         return petsc_matrix_to_numpy_array(A, dtype=dtype)
         #raise NotImplementedError()
@@ -295,6 +303,50 @@ def as_dense_array(A, dtype=None):
             "PETScMatrix or a petsc4py matrix. Got: {}".format(type(A)))
 
 
+class LinearOperatorShellContext(object):
+
+    """
+    Context of a PETSc matrix of type 'python' which applies the scipy
+    LinearOperator `A` (see `as_petsc_shell_matrix`).
+
+    """
+
+    def __init__(self, A):
+        self.A = A
+
+    def mult(self, mat, x, y):
+        res = self.A.matvec(x.getArray(readonly=True))
+        if np.iscomplexobj(res) and not np.iscomplexobj(y.getArray()):
+            if np.allclose(res.imag, 0.0):
+                res = res.real
+            else:
+                raise TypeError("Array with complex entries cannot be converted "
+                                "to a PETSc matrix with real entries.")
+        y.setArray(res)
+
+
+def as_petsc_shell_matrix(A):
+    """
+    Return a matrix of type `petsc4py.PETSc.Mat` which applies the scipy
+    LinearOperator `A` without assembling it (a so-called shell matrix).
+    This is what allows SLEPc to solve eigenproblems which are only
+    given in matrix-free form.
+
+    """
+    # XXX TODO: Move this import to the top once we have found an easy
+    #           and reliable (semi-)automatic way for users to install
+    #           petsc4py.  -- Max, 20.3.2014
+    from petsc4py import PETSc
+
+    if isinstance(A, PETSc.Mat):
+        return A
+
+    m, n = A.shape
+    A_petsc = PETSc.Mat().createPython([m, n], LinearOperatorShellContext(A))
+    A_petsc.setUp()
+    return A_petsc
+
+
 def as_petsc_matrix(A):
     """
     Return a (sparse) matrix of type `petsc4py.PETSc.Mat` containing
@@ -313,6 +365,16 @@ def as_petsc_matrix(A):
 
     m, n = A.shape
 
+    if issparse(A):
+        A = A.tocsr()
+        if np.iscomplexobj(A.data) and not np.iscomplexobj(PETSc.ScalarType()):
+            if np.allclose(A.data.imag, 0.0):
+                A = A.real
+            else:
+                raise TypeError("Array with complex entries cannot be converted "
+                                "to a PETSc matrix with real entries.")
+        return PETSc.Mat().createAIJ(size=(m, n), csr=(A.indptr, A.indices, A.data))
+
     if isinstance(A, np.ndarray):
         def get_jth_column(j):
             return A[:, j]
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the right-hand side of the LLG equation as seen by CVODE.
+
+Compares the default code path of `LLG.sundials_rhs` with the `fast_rhs`
+path on a box mesh with about 100k nodes. The effective field only contains
+exchange so that the numbers are dominated by the bookkeeping in LLG.solve
+rather than by the field computation.
+
+Besides the wall time per call, it reports whether the buffers which the
+right-hand side writes into (the magnetisation, effective field and dm/dt
+arrays of LLG and EffectiveField) are the same objects with the same data
+pointers after the timed calls, i.e. whether they are reused rather than
+reallocated on each call.
+
+"""
+import time
+import numpy as np
+import dolfin as df
+from finmag.physics.llg import LLG
+from finmag.energies import Exchange
+
+now = time.time
+n = 46  # (n+1)^3 = 103823 nodes
+repetitions = 20
+
+
+def setup_llg(fast_rhs):
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(n, n, n), n, n, n)
+    S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+    llg = LLG(S1, S3, unit_length=1e-9, fast_rhs=fast_rhs)
+    llg.set_m((1, 1, 0))
+    llg.effective_field.add(Exchange(13e-12))
+    return llg
+
+
+def rhs_buffers(llg):
+    return [llg._m_dof, llg._H_eff_xxx, llg._dmdt_xxx, llg.effective_field.H_eff]
+
+
+def data_pointers(buffers):
+    return [a.__array_interface__['data'][0] for a in buffers]
+
+
+def time_rhs(llg):
+    y = llg.sundials_m
+    ydot = np.zeros(y.shape)
+    llg.sundials_rhs(0, y, ydot)  # warm up
+    buffers = rhs_buffers(llg)
+    pointers = data_pointers(buffers)
+
+    start = now()
+    for i in xrange(repetitions):
+        llg.sundials_rhs(0, y, ydot)
+    runtime = (now() - start) / repetitions
+
+    reused = all(a is b for a, b in zip(rhs_buffers(llg), buffers)) and \
+        data_pointers(buffers) == pointers
+    return ydot, runtime, reused
+
+
+if __name__ == "__main__":
+    results = {}
+    for fast_rhs in (False, True):
+        llg = setup_llg(fast_rhs)
+        results[fast_rhs] = time_rhs(llg)
+        print "{} nodes, fast_rhs={}: {:.4f} s per call, buffers reused: {}".format(
+            llg.mesh.num_vertices(), fast_rhs, results[fast_rhs][1],
+            results[fast_rhs][2])
+
+    assert np.allclose(results[False][0], results[True][0], atol=0, rtol=1e-12)
+    print "speedup: {:.2f}".format(results[False][1] / results[True][1])
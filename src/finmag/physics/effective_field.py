@@ -3,14 +3,16 @@ import numpy as np
 from finmag.field import Field
 from finmag.util.helpers import vector_valued_function
 from finmag.energies import TimeZeeman
+from finmag.energies.energy_base import compute_field_batch_by_loop
 from finmag.physics.errors import UnknownInteraction
+from finmag.util.profiling import profiler
 
 logger = logging.getLogger(name="finmag")
 
 
 class EffectiveField(object):
 
-    def __init__(self, m, Ms, unit_length):
+    def __init__(self, m, Ms, unit_length, fuse_linear_interactions=False):
         """
         *Arguments*
 
@@ -19,6 +21,13 @@ class EffectiveField(object):
         Ms:  number (?)
 
         unit_length:  float
+
+        fuse_linear_interactions:  bool
+
+            If True, the fields of all interactions which are linear in m
+            (see `linear_field_matrix` of the interactions) are summed
+            into a single sparse matrix, so that `update` only needs one
+            sparse matrix-vector product for all of them.
         """
         assert isinstance(m, Field)
         assert isinstance(Ms, Field)
@@ -38,6 +47,98 @@ class EffectiveField(object):
         # explicitly to compute_field/compute_energy.
         self.need_time_update = []
 
+        self._fuse_linear_interactions = fuse_linear_interactions
+        self.reset_linear_operator()
+
+    @property
+    def fuse_linear_interactions(self):
+        return self._fuse_linear_interactions
+
+    @fuse_linear_interactions.setter
+    def fuse_linear_interactions(self, value):
+        self._fuse_linear_interactions = value
+        self.reset_linear_operator()
+
+    def reset_linear_operator(self):
+        """
+        Discard the fused operator of the linear interactions so that it is
+        rebuilt on the next call to `update`.
+
+        This happens automatically when interactions are added or removed,
+        and when a material parameter of one of the fused interactions is
+        set (see `EnergyBase.parameter_version`). Call it manually only
+        after changing an interaction in some other way, for example by
+        modifying the dolfin vector of a parameter directly.
+
+        """
+        self._linear_operator = None
+        self._linear_operator_valid = False
+        self._fused_versions = []
+        self._nonlinear_interactions = []
+        self._jacobian_operator = None
+        self._jacobian_interactions = []
+
+    def _ensure_linear_operator(self):
+        """
+        Build the fused operator of the linear interactions unless it is
+        up to date, i.e. no interaction has been added or removed and no
+        parameter of a fused interaction has been set since it was built.
+
+        """
+        if self._linear_operator_valid and all(
+                interaction.parameter_version() == version
+                for interaction, version in self._fused_versions):
+            return
+        self._build_linear_operator()
+
+    def _build_linear_operator(self):
+        self._linear_operator = None
+        self._nonlinear_interactions = []
+        self._jacobian_operator = None
+        self._jacobian_interactions = []
+        self._fused_versions = []
+        fused = []
+        for interaction in self.interactions.itervalues():
+            A = None
+            if hasattr(interaction, "linear_field_matrix"):
+                A = interaction.linear_field_matrix()
+            if A is None:
+                self._nonlinear_interactions.append(interaction)
+                if interaction.in_jacobian:
+                    self._jacobian_interactions.append(interaction)
+            else:
+                fused.append(interaction.name)
+                if hasattr(interaction, "parameter_version"):
+                    self._fused_versions.append(
+                        (interaction, interaction.parameter_version()))
+                if self._linear_operator is None:
+                    self._linear_operator = A.copy()
+                else:
+                    self._linear_operator = self._linear_operator + A
+                if interaction.in_jacobian:
+                    if self._jacobian_operator is None:
+                        self._jacobian_operator = A.copy()
+                    else:
+                        self._jacobian_operator = self._jacobian_operator + A
+        if fused:
+            logger.debug("Fused linear interactions {} into a single "
+                         "operator.".format(sorted(fused)))
+        self._linear_operator_valid = True
+
+    def split_linear_interactions(self):
+        """
+        Return a pair (A, others), where A is the sparse matrix (in dof
+        order) of the sum of all interactions which are linear in m, or
+        None if there are no such interactions, and `others` is the list
+        of the remaining interactions.
+
+        Since the field of the linear interactions is A * m, A is also
+        their exact Jacobian.
+
+        """
+        self._ensure_linear_operator()
+        return self._linear_operator, list(self._nonlinear_interactions)
+
     def add(self, interaction, with_time_update=None):
         """
         Add an interaction (such as Exchange, Anisotropy, Demag).
@@ -71,6 +172,8 @@ class EffectiveField(object):
         if with_time_update:
             self.need_time_update.append(with_time_update)
 
+        self.reset_linear_operator()
+
     def update(self, t=None):
         """
         Update the effective field internally so that its value
@@ -84,12 +187,26 @@ class EffectiveField(object):
             raise ValueError("Some interactions require a time update, "
                              "but no time step was given.")
 
-        for update in self.need_time_update:
-            update(t)
-
-        self.H_eff[:] = 0
-        for interaction in self.interactions.itervalues():
-            self.H_eff += interaction.compute_field()
+        profiler.count("field/updates")
+        with profiler("field/time update"):
+            for update in self.need_time_update:
+                update(t)
+
+        if self._fuse_linear_interactions:
+            self._ensure_linear_operator()
+            interactions = self._nonlinear_interactions
+            with profiler("field/linear interactions"):
+                if self._linear_operator is None:
+                    self.H_eff[:] = 0
+                else:
+                    self.H_eff[:] = self._linear_operator.dot(
+                        self.m_field.f.vector().array())
+        else:
+            interactions = self.interactions.itervalues()
+            self.H_eff[:] = 0
+        for interaction in interactions:
+            with profiler("field/" + interaction.name):
+                self.H_eff += interaction.compute_field()
 
     def compute(self, t=None):
         """
@@ -102,6 +219,90 @@ class EffectiveField(object):
         self.update(t)
         return self.H_eff.copy()
 
+    def compute_field_batch(self, M, t=None):
+        """
+        Compute and return the effective fields for several magnetisation
+        vectors at once.
+
+        `M` is an array of shape (k, 3n) whose rows are magnetisation
+        vectors (in the same order as m.f.vector()). Returns an array of
+        the same shape whose rows are the corresponding effective fields.
+
+        Interactions which provide a method `compute_field_batch` evaluate
+        all k fields at once; the others are evaluated for each vector in
+        turn. The argument `t` is only required if one or more interactions
+        require a time-update.
+
+        """
+        if t is None and self.need_time_update:
+            raise ValueError("Some interactions require a time update, "
+                             "but no time step was given.")
+
+        for update in self.need_time_update:
+            update(t)
+
+        M = np.atleast_2d(M)
+        interactions = self.interactions.values()
+        H = np.zeros(M.shape)
+        if self._fuse_linear_interactions:
+            self._ensure_linear_operator()
+            if self._linear_operator is not None:
+                H += self._linear_operator.dot(M.T).T
+            interactions = self._nonlinear_interactions
+        for interaction in interactions:
+            if hasattr(interaction, "compute_field_batch"):
+                H += interaction.compute_field_batch(M)
+            else:
+                H += compute_field_batch_by_loop(interaction, self.m_field, M)
+        return H
+
+    def compute_jacobian_field(self, mp, out=None):
+        """
+        Compute the directional derivative H' of the effective field in
+        the direction `mp` (in the same order as m.f.vector()), as needed
+        for the Jacobian-times-vector product of the time integrator.
+        Only interactions with `in_jacobian` set are included.
+
+        The result is written into `out` if given (and returned).
+
+        Interactions which are linear in m contribute A * mp, using a
+        single sparse operator for all of them. Interactions which
+        provide a method `compute_jacobian_field(mp)` (for example an
+        approximate demag, see FKDemag) are asked for their derivative
+        directly. For the remaining ones, the field is evaluated with the
+        magnetisation set to `mp`, which is only correct for linear
+        fields.
+
+        Unlike `compute_jacobian_only`, this does not call the time-update
+        functions: they only affect interactions which do not depend on m
+        (such as TimeZeeman), whose derivative is zero.
+
+        """
+        if out is None:
+            out = np.zeros(self.output_size)
+        self._ensure_linear_operator()
+        if self._jacobian_operator is None:
+            out[:] = 0
+        else:
+            out[:] = self._jacobian_operator.dot(mp)
+
+        fallback = []
+        for interaction in self._jacobian_interactions:
+            if hasattr(interaction, "compute_jacobian_field"):
+                out += interaction.compute_jacobian_field(mp)
+            else:
+                fallback.append(interaction)
+        if fallback:
+            m_vector = self.m_field.f.vector()
+            m = m_vector.array()
+            m_vector.set_local(mp)
+            try:
+                for interaction in fallback:
+                    out += interaction.compute_field()
+            finally:
+                m_vector.set_local(m)
+        return out
+
     def compute_jacobian_only(self, t):
         """
         Compute and return the total contribution of all interactions
@@ -162,6 +363,7 @@ class EffectiveField(object):
         if not self.exists(interaction_name):
             raise UnknownInteraction(interaction_name, self.all())
         del self.interactions[interaction_name]
+        self.reset_linear_operator()
 
     def get_dolfin_function(self, interaction_name, region=None):
         interaction = self.get(interaction_name)
@@ -35,12 +35,17 @@ class LLG(object):
 
     """
     @timer.method
-    def __init__(self, S1, S3, do_precession=True, average=False, unit_length=1):
+    def __init__(self, S1, S3, do_precession=True, average=False, unit_length=1, fast_rhs=False):
         """
         S1 and S3 are df.FunctionSpace and df.VectorFunctionSpace objects,
         and the boolean do_precession controls whether the precession of the
         magnetisation around the effective field is computed or not.
 
+        If `fast_rhs` is True, the right-hand side used by the time
+        integrator works on buffers which are allocated once, and alpha
+        and Ms are only re-read from their dolfin functions when they are
+        set via `set_alpha` or the `Ms` setter (see `solve_into`).
+
         """
         logger.debug("Creating LLG object.")
         self.S1 = S1
@@ -48,6 +53,11 @@ class LLG(object):
         self.mesh = S1.mesh()
         self.DG = df.FunctionSpace(self.mesh, "DG", 0)
 
+        self.v2d_xyz, self.v2d_xxx, self.d2v_xyz, self.d2v_xxx = helpers.build_maps(S3)
+        self.v2d_scale, self.d2v_scale = helpers.build_maps(S1, dim=1, scalar=True)
+        self._allocate_rhs_buffers()
+        self.fast_rhs = fast_rhs
+
         self.set_default_values()
         self.do_precession = do_precession
         self.unit_length = unit_length
@@ -58,13 +68,35 @@ class LLG(object):
         # will be computed on demand, and carries volume of the mesh
         self.Volume = None
 
-        self.v2d_xyz, self.v2d_xxx, self.d2v_xyz, self.d2v_xxx = helpers.build_maps(S3)
-        self.v2d_scale, self.d2v_scale = helpers.build_maps(S1, dim=1, scalar=True)
+    def _allocate_rhs_buffers(self):
+        """
+        Allocate the work arrays used by `solve_into`. Arrays with the
+        suffix _xxx are in vertex ("xxx") order, those with the suffix
+        _dof are in the dof order of the underlying dolfin vectors.
+
+        """
+        n_vertex = len(self.v2d_xxx)
+        n_dof = len(self.d2v_xxx)
+        self._m_dof = np.zeros(n_dof)
+        self._H_eff_xxx = np.zeros(n_vertex)
+        self._dmdt_xxx = np.zeros(n_vertex)
+        self._dmdt_dof = np.zeros(n_dof)
+        self._alpha_xxx = np.zeros(n_vertex // 3)
+        self._Ms_xxx = np.zeros(n_vertex // 3)
+        # used by sundials_jtimes
+        self._mp_dof = np.zeros(n_dof)
+        self._Hp_dof = np.zeros(n_dof)
+        # True if self._dmdt_xxx holds values which have not been
+        # copied to the dolfin function self._dmdt yet.
+        self._dmdt_stale = False
+        # Time of the last evaluation of dm/dt (None if there was none).
+        self._dmdt_t = None
 
     def set_default_values(self):
-        self.alpha = df.Function(self.S1)
-        self.alpha.assign(df.Constant(0.5))
-        self.alpha.rename('alpha', 'Gilbert damping constant')
+        alpha = df.Function(self.S1)
+        alpha.assign(df.Constant(0.5))
+        alpha.rename('alpha', 'Gilbert damping constant')
+        self.alpha = alpha
 
         self.gamma = consts.gamma
         self.c = 1e11  # 1/s numerical scaling correction \
@@ -104,6 +136,21 @@ class LLG(object):
         return self._pins
     pins = property(pins, set_pins)
 
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value):
+        # Cache alpha in vertex order for the fast right-hand side. Note
+        # that changing the values of the dolfin function in-place (rather
+        # than going through this setter) will not be picked up by it.
+        self._alpha = value
+        if isinstance(value, df.Function):
+            self._alpha_xxx[:] = value.vector().array()[self.v2d_scale]
+        else:
+            self._alpha_xxx[:] = value
+
     def set_alpha(self, value):
         """
         Set the damping constant :math:`\\alpha`.
@@ -126,7 +173,9 @@ class LLG(object):
         # We need a DG function here, so we should use
         # scalar_valued_dg_function
         dg_fun = Field(self.DG, value)#helpers.scalar_valued_dg_function(value, self.DG)
-        self._Ms_dg.vector().set_local(dg_fun.vector().get_local())
+        # Use Field.set so that interactions which depend on Ms notice
+        # the change (see EnergyBase.parameter_version).
+        self._Ms_dg.set(dg_fun)
         # FIXME: change back to DG space.
         #self._Ms_dg=helpers.scalar_valued_function(value, self.S1)
         self._Ms_dg.name = 'Saturation magnetisation'
@@ -134,7 +183,9 @@ class LLG(object):
         Ms = df.assemble(
             self._Ms_dg.f * df.TestFunction(self.S1) * df.dx).array() / self.volumes.array()
         self._Ms = Ms.copy()
+        self._Ms_xxx[:] = self._Ms[self.v2d_scale]
         self.Ms_av = np.average(self._Ms_dg.vector().array())
+        self._M_average_weights = None
 
     @property
     def M(self):
@@ -148,10 +199,19 @@ class LLG(object):
 
     @property
     def M_average(self):
-        """The average magnetisation, computed with m_average()."""
-        volume_Ms = df.assemble(self._Ms_dg * df.dx)
-        volume = df.assemble(self._Ms_dg * df.dx)
-        return self.m_average * volume_Ms / volume
+        """
+        The average magnetisation :math:`\\frac{1}{V} \\int M_s m \\: \\mathrm{d}V`
+        (in A/m).
+
+        """
+        if self._M_average_weights is None:
+            # Weights W such that W.dot(m) is the average above.
+            v = df.TestFunction(self.S3)
+            volume = df.assemble(df.Constant(1) * df.dx(self.mesh))
+            self._M_average_weights = np.array(
+                [df.assemble(self._Ms_dg.f * v[i] * df.dx).array()
+                 for i in xrange(3)]) / volume
+        return self._M_average_weights.dot(self._m_field.f.vector().array())
 
     @property
     def m(self):
@@ -180,8 +240,27 @@ class LLG(object):
     @property
     def dmdt(self):
         """ dmdt values for all mesh nodes """
+        if self._dmdt_stale:
+            np.take(self._dmdt_xxx, self.d2v_xxx, out=self._dmdt_dof)
+            self._dmdt.vector().set_local(self._dmdt_dof)
+            self._dmdt_stale = False
         return self._dmdt.vector().array()
 
+    def last_max_dmdt_norm(self):
+        """
+        Return the pair (t, max_dmdt), where max_dmdt is the maximum over
+        all nodes of the norm of dm/dt (in rad/s) as computed by the last
+        evaluation of the right-hand side at time t (for example by the
+        time integrator). Returns None if dm/dt was never computed.
+
+        This does not evaluate the effective field.
+
+        """
+        if self._dmdt_t is None:
+            return None
+        dmdt = self._dmdt_xxx.reshape((3, -1))
+        return self._dmdt_t, np.sqrt(np.max(np.einsum('ij,ij->j', dmdt, dmdt)))
+
     @property
     def sundials_m(self):
         """The unit magnetisation."""
@@ -233,10 +312,69 @@ class LLG(object):
         self._m_field.set_with_ordered_numpy_array_xxx(m0)
 
     def solve_for(self, m, t):
+        if self.fast_rhs:
+            self.solve_into(m, t, self._dmdt_xxx)
+            return self._dmdt_xxx.copy()
         self._m_field.set_with_ordered_numpy_array_xxx(m)
         value = self.solve(t)
         return value
 
+    def solve_into(self, m, t, dmdt):
+        """
+        Compute dm/dt for the magnetisation `m` (in "xxx" order) at time `t`
+        and write the result into the array `dmdt` (also in "xxx" order).
+
+        This is the allocation-free counterpart of `solve_for` which is
+        used by `sundials_rhs` when `fast_rhs` is enabled. The effective
+        field is permuted into vertex order once per call, alpha and Ms
+        are taken from their caches and `m` is used as given (instead of
+        being read back from the dolfin function). The dolfin function
+        holding dm/dt is only updated when `dmdt` is accessed.
+
+        """
+        np.take(m, self.d2v_xxx, out=self._m_dof)
+        self._m_field.f.vector().set_local(self._m_dof)
+
+        self.effective_field.update(t)
+        np.take(self.effective_field.H_eff, self.v2d_xxx, out=self._H_eff_xxx)
+
+        timer.start("solve", self.__class__.__name__)
+        char_time = 0.1 / self.c
+        m = m.reshape((3, -1))
+        H_eff = self._H_eff_xxx.reshape((3, -1))
+        out = dmdt.reshape((3, -1))
+        out.fill(0)
+
+        if self.do_slonczewski:
+            if self.fun_slonczewski_time_update != None:
+                J_new = self.fun_slonczewski_time_update(t)
+                self.J[:] = J_new
+            native_llg.calc_llg_slonczewski_dmdt(
+                m, H_eff, t, out, self.pins,
+                self.gamma, self._alpha_xxx,
+                char_time,
+                self.Lambda, self.epsilonprime,
+                self.J, self.P, self.d, self._Ms_xxx, self.p)
+        elif self.do_zhangli:
+            H_gradm = self.compute_gradient_field()
+            H_gradm.shape = (3, -1)
+            native_llg.calc_llg_zhang_li_dmdt(
+                m, H_eff, H_gradm, t, out, self.pins,
+                self.gamma, self._alpha_xxx,
+                char_time,
+                self.u0, self.beta, self._Ms_xxx)
+        else:
+            native_llg.calc_llg_dmdt(m, H_eff, t, out, self.pins,
+                                     self.gamma, self._alpha_xxx,
+                                     char_time, self.do_precession)
+        timer.stop("solve", self.__class__.__name__)
+
+        if dmdt is not self._dmdt_xxx:
+            self._dmdt_xxx[:] = dmdt
+        self._dmdt_stale = True
+        self._dmdt_t = t
+        return dmdt
+
     def solve(self, t):
         # we don't use self.effective_field.compute(t) for performance reasons
         self.effective_field.update(t)
@@ -262,7 +400,7 @@ class LLG(object):
                 self.gamma, alpha__,
                 char_time,
                 self.Lambda, self.epsilonprime,
-                self.J, self.P, self.d, self._Ms, self.p)
+                self.J, self.P, self.d, self._Ms_xxx, self.p)
         elif self.do_zhangli:
             H_gradm = self.compute_gradient_field()
             H_gradm.shape = (3, -1)
@@ -270,7 +408,7 @@ class LLG(object):
                 m, H_eff, H_gradm, t, dmdt, self.pins,
                 self.gamma, alpha__,
                 char_time,
-                self.u0, self.beta, self._Ms)
+                self.u0, self.beta, self._Ms_xxx)
             H_gradm.shape = (-1,)
         else:
             native_llg.calc_llg_dmdt(m, H_eff, t, dmdt, self.pins,
@@ -282,12 +420,18 @@ class LLG(object):
         timer.stop("solve", self.__class__.__name__)
 
         self._dmdt.vector().set_local(dmdt[self.d2v_xxx])
+        self._dmdt_xxx[:] = dmdt
+        self._dmdt_stale = False
+        self._dmdt_t = t
 
         return dmdt
 
     # Computes the dm/dt right hand side ODE term, as used by SUNDIALS CVODE
     def sundials_rhs(self, t, y, ydot):
-        ydot[:] = self.solve_for(y, t)
+        if self.fast_rhs:
+            self.solve_into(y, t, ydot)
+        else:
+            ydot[:] = self.solve_for(y, t)
         return 0
 
     def sundials_psetup(self, t, m, fy, jok, gamma, tmp1, tmp2, tmp3):
@@ -399,39 +543,46 @@ class LLG(object):
 
         The actual implementation of the jacobian-times-vector product is in src/llg/llg.cc,
         function calc_llg_jtimes(...), which in turn makes use of CVSpilsJacTimesVecFn in CVODE.
+
+        The derivative H' is computed by `EffectiveField.compute_jacobian_field`
+        from work arrays which are allocated once, without writing m' into
+        the magnetisation field and without calling the time-update
+        functions of the interactions. Which interactions contribute is
+        controlled by their attribute `in_jacobian`; some (e.g. FKDemag)
+        can contribute a cheap approximation of their derivative.
         """
-        assert m.shape == self._m_field.get_ordered_numpy_array_xxx().shape
-        assert mp.shape == m.shape
+        assert mp.shape == m.shape == (len(self.v2d_xxx),)
         assert tmp.shape == m.shape
 
-        # First, compute the derivative H' = dH_eff/dt
-        self._m_field.set_with_ordered_numpy_array_xxx(mp)
-        Hp = tmp.view()
-        Hp[:] = self.effective_field.compute_jacobian_only(t)[self.v2d_xxx]
+        # First, compute the derivative H' = dH_eff/dm * m'
+        np.take(mp, self.d2v_xxx, out=self._mp_dof)
+        self.effective_field.compute_jacobian_field(
+            self._mp_dof, out=self._Hp_dof)
+        Hp = tmp
+        np.take(self._Hp_dof, self.v2d_xxx, out=Hp)
 
-        if not hasattr(self, '_reuse_jacobean') or not self._reuse_jacobean:
+        if not getattr(self, '_reuse_jacobean', False):
             # If the field m has changed, recompute H_eff as well
-            if not np.array_equal(self.m_numpy, m):
-                self.m_field.set_with_ordered_numpy_array_xxx(m)
+            np.take(m, self.d2v_xxx, out=self._m_dof)
+            m_vector = self._m_field.f.vector()
+            if not np.array_equal(m_vector.array(), self._m_dof):
+                m_vector.set_local(self._m_dof)
                 self.effective_field.update(t)
-            else:
-                pass
-                # print "This actually happened."
-                #import sys; sys.exit()
 
-        m.shape = (3, -1)
-        mp.shape = (3, -1)
-        Hp.shape = (3, -1)
-        J_mp.shape = (3, -1)
+        np.take(self.effective_field.H_eff, self.v2d_xxx,
+                out=self._H_eff_xxx)
+        if self.fast_rhs:
+            alpha = self._alpha_xxx
+        else:
+            alpha = self.alpha.vector().array()[self.v2d_scale]
         # Use the same characteristic time as defined by c
         char_time = 0.1 / self.c
-        Heff2 = self.effective_field.H_eff[self.v2d_xxx]
-        native_llg.calc_llg_jtimes(m, Heff2.reshape((3, -1)), mp, Hp, t, J_mp, self.gamma,
-                                   self.alpha.vector().array()[self.v2d_scale], char_time, self.do_precession, self.pins)
-        J_mp.shape = (-1, )
-        m.shape = (-1,)
-        mp.shape = (-1,)
-        tmp.shape = (-1,)
+        native_llg.calc_llg_jtimes(m.reshape((3, -1)),
+                                   self._H_eff_xxx.reshape((3, -1)),
+                                   mp.reshape((3, -1)), Hp.reshape((3, -1)),
+                                   t, J_mp.reshape((3, -1)), self.gamma,
+                                   alpha, char_time, self.do_precession,
+                                   self.pins)
 
         # Nonnegative exit code indicates success
         return 0
@@ -0,0 +1,204 @@
+"""
+Preconditioner for the Krylov (GMRES) linear solver used by CVODE.
+
+In each Newton iteration of an implicit (BDF) step, CVODE has to solve
+linear systems with the matrix
+
+.. math::
+
+    P = I - \\gamma J
+
+where J is the Jacobian of the LLG right-hand side and :math:`\\gamma` is
+a multiple of the time step (not to be confused with the gyromagnetic
+ratio). For fine meshes the exchange interaction makes J very stiff and
+unpreconditioned GMRES needs many iterations per solve.
+
+The class `LLGPreconditioner` assembles a sparse approximation of J
+which contains
+
+- the exact contribution of all interactions which are linear in m (see
+  `EffectiveField.split_linear_interactions`; these are typically exchange
+  and anisotropy, which cause the stiffness), and
+
+- the local (node by node) part of the LLG equation, i.e. the derivative
+  of the precession, damping and relaxation terms with respect to m for
+  a fixed effective field.
+
+The non-local, dense contributions (demag) are left out. The matrix P is
+factorised with an incomplete LU decomposition.
+
+"""
+import logging
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg
+from aeon import timer
+
+logger = logging.getLogger(name='finmag')
+
+
+def _outer(a, b):
+    """
+    Node-wise outer products of the (3, n) arrays a and b, as an array of
+    shape (3, 3, n).
+    """
+    return a[:, np.newaxis, :] * b[np.newaxis, :, :]
+
+
+def _cross_product_blocks(a):
+    """
+    Return the array X of shape (3, 3, n) such that X[:, :, i] is the
+    matrix of the map w -> a[:, i] x w.
+    """
+    zero = np.zeros(a.shape[1])
+    return np.array([[zero, -a[2], a[1]],
+                     [a[2], zero, -a[0]],
+                     [-a[1], a[0], zero]])
+
+
+def _identity_blocks(n):
+    return np.eye(3)[:, :, np.newaxis] * np.ones(n)
+
+
+def block_diagonal_to_sparse(B):
+    """
+    Convert an array B of shape (3, 3, n) of node-wise 3x3 blocks into a
+    sparse matrix acting on vectors in "xxx" order (all x components
+    first, then all y components, then all z components).
+    """
+    return sp.bmat([[sp.diags(B[i, j], 0) for j in xrange(3)]
+                    for i in xrange(3)], format='csr')
+
+
+class LLGPreconditioner(object):
+
+    """
+    Incomplete LU preconditioner for the implicit time integration of the
+    LLG equation with CVODE.
+
+    Pass the methods `psetup` and `psolve` to
+    `cvode.set_spils_preconditioner`. The approximate Jacobian is only
+    re-assembled when CVODE asks for it (jok == False); otherwise the
+    cached Jacobian is combined with the new value of gamma and
+    re-factorised.
+
+    """
+
+    def __init__(self, llg, drop_tol=1e-4, fill_factor=10):
+        """
+        llg: LLG
+
+        drop_tol, fill_factor: float
+
+            Parameters of the incomplete LU factorisation (see
+            scipy.sparse.linalg.spilu). Smaller `drop_tol` and larger
+            `fill_factor` give a better but more expensive
+            preconditioner.
+
+        """
+        self.llg = llg
+        self.drop_tol = drop_tol
+        self.fill_factor = fill_factor
+        self.jacobian = None
+        self._gamma = None
+        self._factors = None
+        self._linear_operator_dof = None
+        self._linear_operator_xxx = None
+        self.n_jacobian_evals = 0
+        self.n_factorisations = 0
+
+    def _linear_operator(self):
+        """
+        Return the operator of all interactions linear in m, permuted
+        to "xxx" order, or None.
+        """
+        A, _ = self.llg.effective_field.split_linear_interactions()
+        if A is None:
+            return None
+        if A is not self._linear_operator_dof:
+            v2d = self.llg.v2d_xxx
+            self._linear_operator_xxx = A.tocsr()[v2d][:, v2d].tocsr()
+            self._linear_operator_dof = A
+        return self._linear_operator_xxx
+
+    @timer.method
+    def compute_jacobian(self, t, m):
+        """
+        Assemble and return the sparse approximation of the Jacobian of
+        the LLG right-hand side at the magnetisation `m` (in "xxx" order).
+        """
+        llg = self.llg
+        llg._m_field.set_with_ordered_numpy_array_xxx(m)
+        llg.effective_field.update(t)
+        H = llg.effective_field.H_eff[llg.v2d_xxx].reshape((3, -1))
+        m = m.reshape((3, -1))
+        n = m.shape[1]
+
+        alpha = llg.alpha.vector().array()[llg.v2d_scale]
+        gamma_LL = llg.gamma / (1 + alpha * alpha)
+        mh = np.sum(m * H, axis=0)
+        mm = np.sum(m * m, axis=0)
+        I = _identity_blocks(n)
+        m_times = _cross_product_blocks(m)
+        c = llg.c
+
+        # Derivative of the right-hand side for a fixed effective field ...
+        local = - alpha * gamma_LL * (_outer(m, H) + mh * I - 2 * _outer(H, m))
+        local += c * ((1 - mm) * I - 2 * _outer(m, m))
+        # ... and the factor in front of the derivative H' of the field.
+        field = - alpha * gamma_LL * (_outer(m, m) - mm * I)
+        if llg.do_precession:
+            local += gamma_LL * _cross_product_blocks(H)
+            field -= gamma_LL * m_times
+
+        pins = llg.pins
+        if len(pins) > 0:
+            local[:, :, pins] = 0
+            field[:, :, pins] = 0
+
+        J = block_diagonal_to_sparse(local)
+        A = self._linear_operator()
+        if A is not None:
+            J = J + block_diagonal_to_sparse(field).dot(A)
+        self.n_jacobian_evals += 1
+        return J.tocsr()
+
+    @timer.method
+    def factorise(self, gamma):
+        """
+        Compute the incomplete LU factorisation of I - gamma * J.
+        """
+        n = self.jacobian.shape[0]
+        P = (sp.identity(n, format='csr') - gamma * self.jacobian).tocsc()
+        self._factors = scipy.sparse.linalg.spilu(
+            P, drop_tol=self.drop_tol, fill_factor=self.fill_factor)
+        self._gamma = gamma
+        self.n_factorisations += 1
+
+    def psetup(self, t, m, fy, jok, gamma, tmp1, tmp2, tmp3):
+        # Keep the bookkeeping of the identity preconditioner, which is
+        # used by LLG.sundials_jtimes.
+        self.llg.sundials_psetup(t, m, fy, jok, gamma, tmp1, tmp2, tmp3)
+
+        jcur = not jok or self.jacobian is None
+        if jcur:
+            self.jacobian = self.compute_jacobian(t, m)
+        elif gamma == self._gamma:
+            return 0, False
+        try:
+            self.factorise(gamma)
+        except RuntimeError as e:
+            # A positive return value tells CVODE that the failure is
+            # recoverable (it will retry with a smaller step).
+            logger.debug("Factorisation of the preconditioner failed: "
+                         "{}".format(e))
+            self._factors = None
+            return 1, jcur
+        return 0, jcur
+
+    def psolve(self, t, y, fy, r, z, gamma, delta, lr, tmp):
+        if self._factors is None:
+            z[:] = r
+        else:
+            z[:] = self._factors.solve(r)
+        return 0
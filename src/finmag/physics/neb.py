@@ -15,6 +15,7 @@ from finmag.native import sundials
 import finmag.native.neb as native_neb
 
 from finmag.util.fileio import Tablewriter, Tablereader
+from finmag.physics.neb_pool import ImagePool
 
 from mpl_toolkits.mplot3d import Axes3D
 from matplotlib.colors import colorConverter
@@ -254,7 +255,8 @@ class NEB_Sundials(object):
     Nudged elastic band method by solving the differential equation using Sundials.
     """
 
-    def __init__(self, sim, initial_images, interpolations=None, spring=5e5, name='unnamed'):
+    def __init__(self, sim, initial_images, interpolations=None, spring=5e5, name='unnamed',
+                 processes=1):
         """
           *Arguments*
 
@@ -287,6 +289,13 @@ class NEB_Sundials(object):
               disable_tangent: this is an experimental option, by disabling the
               tangent, we can get a rough feeling about the local energy minima quickly.
 
+              processes: the number of worker processes over which the
+              images are distributed when computing their effective fields
+              and energies (see finmag.physics.neb_pool). The default is 1,
+              i.e. all images are evaluated in the current process. The
+              workers are shut down when `relax` or `run_until` returns, or
+              by calling `close` (or using the NEB in a `with` statement).
+
         """
 
         self.sim = sim
@@ -341,6 +350,8 @@ class NEB_Sundials(object):
 
         self.springs = np.zeros(self.image_num)
 
+        self.images = ImagePool(sim, self.image_num, processes=processes)
+
         self.t = 0
         self.step = 0
         self.ode_count = 1
@@ -583,15 +594,16 @@ class NEB_Sundials(object):
             # spherical2cartesian updates the full system vector (y), but to update
             # the magnetisation we only need the reduced vector, thus
             # we use the d2v map
-            self._m.vector().set_local(spherical2cartesian(y[i + 1])[self.sim.m_field.d2v_xxx])
-            #
-            self.effective_field.update()
-            # Compute effective field, which is the gradient of
-            # the energy in the NEB method (derivative with respect to
-            # the generalised coordinates)
-            #
+            self.images.m[i, :] = spherical2cartesian(y[i + 1])[self.sim.m_field.d2v_xxx]
+
+        # Compute effective field, which is the gradient of
+        # the energy in the NEB method (derivative with respect to
+        # the generalised coordinates), and the energy of all images
+        self.images.evaluate()
+
+        for i in range(self.image_num):
             # To get the effective field for the whole system we use the v2d map
-            h = self.effective_field.H_eff[self.sim.m_field.v2d_xxx]
+            h = self.images.H[i][self.sim.m_field.v2d_xxx]
             # Transform to spherical coordinates
             
             # DEBUG 
@@ -599,8 +611,7 @@ class NEB_Sundials(object):
             # print len(y[i + 1])
             
             self.Heff[i, :] = cartesian2spherical_field(h, y[i + 1])
-            # Compute the total energy
-            self.energy[i + 1] = self.effective_field.total_energy()
+            self.energy[i + 1] = self.images.energy[i]
 
             # Compute the 'distance' or difference between neighbouring states
             # around y[i+1]. This is used to compute the spring force
@@ -657,7 +668,27 @@ class NEB_Sundials(object):
         ys.shape = (-1, )
         self.distances = np.array(distance)
 
+    def close(self):
+        """
+        Shut down the worker processes evaluating the images (if any).
+        They are started again when the images are evaluated next time.
+
+        """
+        self.images.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def run_until(self, t):
+        try:
+            return self._run_until(t)
+        finally:
+            self.close()
+
+    def _run_until(self, t):
 
         if t <= self.t:
             return
@@ -689,56 +720,59 @@ class NEB_Sundials(object):
         if self.integrator is None:
             self.create_integrator()
 
-        log.debug("Relaxation parameters: "
-                  "stopping_dmdt={} (degrees per nanosecond), "
-                  "time_step={} s, max_steps={}.".format(stopping_dmdt,
-                                                         dt, max_steps))
+        try:
+            log.debug("Relaxation parameters: "
+                      "stopping_dmdt={} (degrees per nanosecond), "
+                      "time_step={} s, max_steps={}.".format(stopping_dmdt,
+                                                             dt, max_steps))
 
-        # Write the initial step (step=0)
-        self.compute_distance()
-        self.tablewriter.save()
-        self.tablewriter_dm.save()
+            # Write the initial step (step=0)
+            self.compute_distance()
+            self.tablewriter.save()
+            self.tablewriter_dm.save()
 
-        for i in range(max_steps):
+            for i in range(max_steps):
 
-            if i % save_vtk_steps == 0:
-                self.save_vtks()
+                if i % save_vtk_steps == 0:
+                    self.save_vtks()
 
-            if i % save_npy_steps == 0:
-                self.save_npys()
+                if i % save_npy_steps == 0:
+                    self.save_npys()
 
-            self.step += 1
+                self.step += 1
 
-            cvode_dt = self.integrator.get_current_step()
+                cvode_dt = self.integrator.get_current_step()
 
-            increment_dt = dt
+                increment_dt = dt
 
-            if cvode_dt > dt:
-                increment_dt = cvode_dt
+                if cvode_dt > dt:
+                    increment_dt = cvode_dt
 
-            dmdt = self.run_until(self.t + increment_dt)
+                dmdt = self._run_until(self.t + increment_dt)
 
-            self.compute_distance()
-            self.tablewriter.save()
-            self.tablewriter_dm.save()
+                self.compute_distance()
+                self.tablewriter.save()
+                self.tablewriter_dm.save()
 
-            log.debug("step: {:.3g}, step_size: {:.3g}"
-                      " and max_dmdt: {:.3g}.".format(self.step,
-                                                      increment_dt,
-                                                      dmdt))
+                log.debug("step: {:.3g}, step_size: {:.3g}"
+                          " and max_dmdt: {:.3g}.".format(self.step,
+                                                          increment_dt,
+                                                          dmdt))
 
-            if dmdt < stopping_dmdt:
-                break
+                if dmdt < stopping_dmdt:
+                    break
 
-        log.info("Relaxation finished at time step = {:.4g}, "
-                 "t = {:.2g}, call rhs = {:.4g} "
-                 "and max_dmdt = {:.3g}".format(self.step,
-                                                self.t,
-                                                self.ode_count,
-                                                dmdt))
+            log.info("Relaxation finished at time step = {:.4g}, "
+                     "t = {:.2g}, call rhs = {:.4g} "
+                     "and max_dmdt = {:.3g}".format(self.step,
+                                                    self.t,
+                                                    self.ode_count,
+                                                    dmdt))
 
-        self.save_vtks()
-        self.save_npys()
+            self.save_vtks()
+            self.save_npys()
+        finally:
+            self.close()
 
     def __adjust_coords_once(self):
 
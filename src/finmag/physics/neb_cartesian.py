@@ -15,6 +15,7 @@ from finmag.native import sundials
 import finmag.native.neb as native_neb
 
 from finmag.util.fileio import Tablewriter, Tablereader
+from finmag.physics.neb_pool import ImagePool
 
 # import matplotlib.pyplot as plt
 # from mpl_toolkits.mplot3d import Axes3D
@@ -86,7 +87,7 @@ class NEB_Sundials(object):
                  initial_images,
                  climbing_image=None,
                  interpolations=None,
-                 spring=5e5, name='unnamed'):
+                 spring=5e5, name='unnamed', processes=1):
         """
           *Arguments*
 
@@ -130,6 +131,13 @@ class NEB_Sundials(object):
               tangent, we can get a rough feeling about the local energy minima
               quickly.
 
+              processes: the number of worker processes over which the
+              images are distributed when computing their effective fields
+              and energies (see finmag.physics.neb_pool). The default is 1,
+              i.e. all images are evaluated in the current process. The
+              workers are shut down when `relax` or `run_until` returns, or
+              by calling `close` (or using the NEB in a `with` statement).
+
         """
 
         self.sim = sim
@@ -193,6 +201,8 @@ class NEB_Sundials(object):
 
         self.springs = np.zeros(self.image_num)
 
+        self.images = ImagePool(sim, self.image_num, processes=processes)
+
         self.t = 0
         self.step = 0
         self.ode_count = 1
@@ -410,19 +420,20 @@ class NEB_Sundials(object):
             # To update
             # the magnetisation we only need the reduced vector, thus
             # we use the d2v map
-            self._m.vector().set_local(y[i + 1][self.sim.m_field.d2v_xxx])
+            self.images.m[i, :] = y[i + 1][self.sim.m_field.d2v_xxx]
 
-            self.effective_field.update()
-            # Compute effective field, which is the gradient of
-            # the energy in the NEB method (derivative with respect to
-            # the generalised coordinates)
+        # Compute effective field, which is the gradient of
+        # the energy in the NEB method (derivative with respect to
+        # the generalised coordinates), and the energy of all images
+        self.images.evaluate()
+
+        for i in range(self.image_num):
             # We need the whole system effective field 
             # (thus we use the v2d map)
-            h = self.effective_field.H_eff[self.sim.m_field.v2d_xxx]
+            h = self.images.H[i][self.sim.m_field.v2d_xxx]
 
             self.Heff[i + 1, :] = h[:]
-            # Compute the total energy
-            self.energy[i + 1] = self.effective_field.total_energy()
+            self.energy[i + 1] = self.images.energy[i]
 
             # Compute the 'distance' or difference between neighbouring states
             # around y[i+1]. This is used to compute the spring force
@@ -518,7 +529,27 @@ class NEB_Sundials(object):
         ys.shape = (-1, )
         self.distances = np.array(distance)
 
+    def close(self):
+        """
+        Shut down the worker processes evaluating the images (if any).
+        They are started again when the images are evaluated next time.
+
+        """
+        self.images.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def run_until(self, t):
+        try:
+            return self._run_until(t)
+        finally:
+            self.close()
+
+    def _run_until(self, t):
 
         if t <= self.t:
             return
@@ -550,53 +581,56 @@ class NEB_Sundials(object):
         if self.integrator is None:
             self.create_integrator()
 
-        log.debug("Relaxation parameters: "
-                  "stopping_dmdt={} (degrees per nanosecond), "
-                  "time_step={} s, max_steps={}.".format(stopping_dmdt,
-                                                         dt, max_steps))
-        # Save the initial state i=0
-        self.compute_distance()
-        self.tablewriter.save()
-        self.tablewriter_dm.save()
+        try:
+            log.debug("Relaxation parameters: "
+                      "stopping_dmdt={} (degrees per nanosecond), "
+                      "time_step={} s, max_steps={}.".format(stopping_dmdt,
+                                                             dt, max_steps))
+            # Save the initial state i=0
+            self.compute_distance()
+            self.tablewriter.save()
+            self.tablewriter_dm.save()
 
-        for i in range(max_steps):
+            for i in range(max_steps):
 
-            if i % save_vtk_steps == 0:
-                self.save_vtks()
+                if i % save_vtk_steps == 0:
+                    self.save_vtks()
 
-            if i % save_npy_steps == 0:
-                self.save_npys()
+                if i % save_npy_steps == 0:
+                    self.save_npys()
 
-            self.step += 1
+                self.step += 1
 
-            cvode_dt = self.integrator.get_current_step()
+                cvode_dt = self.integrator.get_current_step()
 
-            increment_dt = dt
+                increment_dt = dt
 
-            if cvode_dt > dt:
-                increment_dt = cvode_dt
+                if cvode_dt > dt:
+                    increment_dt = cvode_dt
 
-            dmdt = self.run_until(self.t + increment_dt)
+                dmdt = self._run_until(self.t + increment_dt)
 
-            self.compute_distance()
-            self.tablewriter.save()
-            self.tablewriter_dm.save()
+                self.compute_distance()
+                self.tablewriter.save()
+                self.tablewriter_dm.save()
 
-            log.debug("step: {:.3g}, step_size: {:.3g}"
-                      " and max_dmdt: {:.3g}.".format(self.step,
-                                                      increment_dt,
-                                                      dmdt))
+                log.debug("step: {:.3g}, step_size: {:.3g}"
+                          " and max_dmdt: {:.3g}.".format(self.step,
+                                                          increment_dt,
+                                                          dmdt))
 
-            if dmdt < stopping_dmdt:
-                break
+                if dmdt < stopping_dmdt:
+                    break
 
-        log.info("Relaxation finished at time step = {:.4g}, "
-                 "t = {:.2g}, call rhs = {:.4g} "
-                 "and max_dmdt = {:.3g}".format(self.step,
-                                                self.t,
-                                                self.ode_count,
-                                                dmdt))
+            log.info("Relaxation finished at time step = {:.4g}, "
+                     "t = {:.2g}, call rhs = {:.4g} "
+                     "and max_dmdt = {:.3g}".format(self.step,
+                                                    self.t,
+                                                    self.ode_count,
+                                                    dmdt))
 
-        self.save_vtks()
-        self.save_npys()
+            self.save_vtks()
+            self.save_npys()
+        finally:
+            self.close()
 
@@ -0,0 +1,115 @@
+"""
+Evaluation of the effective field and energy of the images of a nudged
+elastic band, optionally distributed over a pool of worker processes.
+
+The worker processes are forked from the master process when the images
+are evaluated for the first time, so each of them owns a replica of the
+simulation and its interactions. Large read-only data such as the boundary
+element matrix of the demag field or the matrices of the exchange field
+are not copied but shared with the master (the operating system only
+copies memory pages which are modified). The magnetisation of the images,
+the resulting fields and the energies are exchanged through shared memory
+arrays, so only the image indices need to be sent to the workers.
+
+"""
+import ctypes
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing.sharedctypes import RawArray
+
+log = logging.getLogger(name="finmag")
+
+# The ImagePool whose images are evaluated by the worker processes. It is
+# set before the workers are forked.
+_pool = None
+
+
+def _evaluate_image(i):
+    _pool._evaluate(i)
+
+
+def _shared_array(shape):
+    size = int(np.prod(shape))
+    a = np.frombuffer(RawArray(ctypes.c_double, size), dtype=np.float64)
+    a.shape = shape
+    return a
+
+
+class ImagePool(object):
+
+    """
+    Compute the effective field and the total energy of `image_num`
+    magnetisation configurations of the simulation `sim`.
+
+    The magnetisation of image i is set (in dolfin dof order) in the row
+    `m[i]`. After calling `evaluate`, the effective field of image i is
+    stored in the row `H[i]` (in dof order) and its energy in `energy[i]`.
+
+    If `processes` is larger than 1, the images are distributed over this
+    many worker processes. Since the workers own replicas of the simulation
+    which are created on the first call of `evaluate`, changes to the
+    interactions of `sim` after that are not seen by the workers unless
+    `close` is called (which causes new workers to be created on the next
+    call of `evaluate`).
+
+    """
+
+    def __init__(self, sim, image_num, processes=1):
+        self.sim = sim
+        self.image_num = image_num
+        self.processes = processes
+        self._m = sim.m_field.f
+        self.effective_field = sim.llg.effective_field
+
+        n = self._m.vector().local_size()
+        if processes > 1:
+            self.m = _shared_array((image_num, n))
+            self.H = _shared_array((image_num, n))
+            self.energy = _shared_array((image_num,))
+        else:
+            self.m = np.zeros((image_num, n))
+            self.H = np.zeros((image_num, n))
+            self.energy = np.zeros(image_num)
+        self.pool = None
+
+    def _evaluate(self, i):
+        self._m.vector().set_local(self.m[i])
+        self.effective_field.update()
+        self.H[i, :] = self.effective_field.H_eff
+        self.energy[i] = self.effective_field.total_energy()
+
+    def evaluate(self):
+        """
+        Compute the effective fields and energies of all images.
+
+        """
+        if self.processes <= 1:
+            for i in xrange(self.image_num):
+                self._evaluate(i)
+            return
+
+        global _pool
+        if self.pool is None:
+            log.debug("Starting {} worker processes to evaluate {} NEB "
+                      "images.".format(self.processes, self.image_num))
+            _pool = self
+            self.pool = multiprocessing.Pool(self.processes)
+        elif _pool is not self:
+            raise RuntimeError("Only one ImagePool with worker processes "
+                               "can be active at the same time. Please "
+                               "call close() on the other one first.")
+        self.pool.map(_evaluate_image, xrange(self.image_num), chunksize=1)
+
+    def close(self):
+        """
+        Shut down the worker processes (if any).
+
+        """
+        global _pool
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if _pool is self:
+            _pool = None
@@ -50,6 +50,59 @@ def test_cartesian2spherical_field():
     assert abs(res[0] - pE_theta) < 1e-15
     assert abs(res[1] - pE_phi) < 1e-12
 
+def test_image_pool_with_worker_processes():
+    from finmag.physics.neb_pool import ImagePool
+
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 5, 2), 5, 2, 1)
+    sim = Sim(mesh, Ms=8.6e5, unit_length=1e-9)
+    sim.set_m((1, 0, 0))
+    sim.add(Exchange(A=13e-12))
+    sim.add(UniaxialAnisotropy(K1=1e5, axis=(0, 0, 1)))
+
+    n = len(sim.m_field.f.vector().array())
+    images = np.random.random_sample((4, n)) - 0.5
+
+    serial = ImagePool(sim, 4)
+    parallel = ImagePool(sim, 4, processes=2)
+    try:
+        for pool in [serial, parallel]:
+            pool.m[:] = images
+            pool.evaluate()
+        assert np.allclose(serial.H, parallel.H, rtol=1e-12, atol=0)
+        assert np.allclose(serial.energy, parallel.energy, rtol=1e-12, atol=0)
+
+        # The workers are reused when evaluating new images
+        parallel.m[:] = images[::-1]
+        parallel.evaluate()
+        assert np.allclose(serial.H[::-1], parallel.H, rtol=1e-12, atol=0)
+    finally:
+        parallel.close()
+
+
+def test_consecutive_nebs_with_worker_processes(tmpdir):
+    from finmag.physics.neb import NEB_Sundials
+
+    os.chdir(str(tmpdir))
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 5, 2), 5, 2, 1)
+    sim = Sim(mesh, Ms=8.6e5, unit_length=1e-9)
+    sim.set_m((1, 0, 0))
+    sim.add(UniaxialAnisotropy(K1=1e5, axis=(0, 0, 1)))
+
+    # Each NEB shuts down its workers when it is done, so that the
+    # second one can start its own.
+    for name in ['neb_1', 'neb_2']:
+        neb = NEB_Sundials(sim, [(0, 0, 1), (1, 0, 0), (0, 0, -1)],
+                           interpolations=[1, 1], name=name, processes=2)
+        neb.relax(max_steps=2, save_npy_steps=10, save_vtk_steps=10)
+        assert neb.images.pool is None
+
+    with NEB_Sundials(sim, [(0, 0, 1), (0, 0, -1)], interpolations=[2],
+                      name='neb_3', processes=2) as neb:
+        neb.compute_effective_field(neb.coords)
+        assert neb.images.pool is not None
+    assert neb.images.pool is None
+
+
 if __name__ == "__main__":
 
     test_compute_dm()
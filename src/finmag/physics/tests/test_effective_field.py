@@ -3,6 +3,8 @@ import dolfin as df
 import pytest
 import os
 from finmag.example import barmini
+from finmag.energies import UniaxialAnisotropy, DMI, ThinFilmDemag, Zeeman
+from finmag.energies.demag import TreecodeBEM
 
 
 def test_effective_field_compute_returns_copy(tmpdir):
@@ -23,3 +25,123 @@ def test_effective_field_compute_returns_copy(tmpdir):
 
     assert np.allclose(h0, h0_copy, atol=0, rtol=1e-8)
     assert not np.allclose(h0, h1, atol=0, rtol=1e-8)
+
+
+def test_fused_linear_interactions_give_same_field(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.add(UniaxialAnisotropy(1e5, (0, 0, 1)))
+    sim.add(DMI(1e-3))
+    sim.add(ThinFilmDemag())
+    h_ref = sim.effective_field()
+
+    sim.fuse_linear_interactions = True
+    assert np.allclose(sim.effective_field(), h_ref, atol=0, rtol=1e-10)
+    fused = sim.llg.effective_field._nonlinear_interactions
+    assert [i.name for i in fused] == ['Demag']
+
+    # the fused operator is rebuilt when interactions are removed
+    sim.remove_interaction('Exchange')
+    h_fused = sim.effective_field()
+    sim.fuse_linear_interactions = False
+    assert np.allclose(h_fused, sim.effective_field(), atol=0, rtol=1e-10)
+
+
+def test_compute_field_batch_agrees_with_compute(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.add(UniaxialAnisotropy(1e5, (0, 0, 1), assemble=False))
+    sim.add(Zeeman((0, 0, 1e5)))
+    m_orig = sim.m.copy()
+
+    M = np.random.random_sample((3, len(m_orig))) - 0.5
+    H_ref = []
+    for m in M:
+        sim.llg._m_field.f.vector().set_local(m)
+        H_ref.append(sim.llg.effective_field.compute(sim.t))
+    sim.llg._m_field.f.vector().set_local(m_orig)
+
+    for fused in [False, True]:
+        sim.fuse_linear_interactions = fused
+        H = sim.llg.effective_field.compute_field_batch(M, sim.t)
+        assert H.shape == M.shape
+        assert np.allclose(H, H_ref, atol=1e-8 * abs(H).max(), rtol=1e-6)
+    # the magnetisation is unchanged
+    assert np.allclose(sim.m, m_orig, atol=0, rtol=0)
+
+
+def test_compute_jacobian_field_agrees_with_field_of_direction(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.add(UniaxialAnisotropy(1e5, (0, 0, 1)))
+    sim.add(Zeeman((0, 0, 1e5)))
+    effective_field = sim.llg.effective_field
+    m = sim.m.copy()
+    mp = np.random.RandomState(0).uniform(-1, 1, len(m))
+
+    Hp = np.zeros(len(m))
+    effective_field.compute_jacobian_field(mp, out=Hp)
+    assert np.allclose(sim.m, m)
+
+    # Demag and Zeeman are not in the Jacobian, exchange and anisotropy
+    # are linear.
+    sim.llg.effective_field.m_field.f.vector().set_local(mp)
+    expected = effective_field.get('Exchange').compute_field() + \
+        effective_field.get('Anisotropy').compute_field()
+    assert np.allclose(Hp, expected, atol=1e-10 * np.max(abs(expected)),
+                       rtol=1e-10)
+
+
+def test_fused_operator_follows_parameter_changes(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.set_m(('x[0]', 'x[1]', '1'))
+    sim.add(UniaxialAnisotropy(1e5, (0, 0, 1)))
+    sim.fuse_linear_interactions = True
+
+    # setting a parameter of a fused interaction (or Ms, which enters all
+    # of them) invalidates the operator
+    for change in [lambda: sim.get_interaction('Exchange').A.set(26e-12),
+                   lambda: setattr(sim, 'Ms', 6e5)]:
+        h_before = sim.effective_field()
+        change()
+        h_fused = sim.effective_field()
+        assert not np.allclose(h_fused, h_before, atol=0, rtol=1e-10)
+
+        sim.fuse_linear_interactions = False
+        assert np.allclose(h_fused, sim.effective_field(), atol=0, rtol=1e-10)
+        sim.fuse_linear_interactions = True
+
+
+def test_compute_field_batch_with_treecode_demag(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.remove_interaction('Demag')
+    sim.add(TreecodeBEM())
+    m_orig = sim.m.copy()
+
+    M = np.random.RandomState(0).uniform(-1, 1, (2, len(m_orig)))
+    H_ref = []
+    for m in M:
+        sim.llg._m_field.f.vector().set_local(m)
+        H_ref.append(sim.llg.effective_field.compute(sim.t))
+    sim.llg._m_field.f.vector().set_local(m_orig)
+
+    H = sim.llg.effective_field.compute_field_batch(M, sim.t)
+    assert np.allclose(H, H_ref, atol=1e-8 * abs(H).max(), rtol=1e-6)
+    assert np.allclose(sim.m, m_orig, atol=0, rtol=0)
+
+
+def test_compute_field_batch_follows_parameter_changes(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    exchange = sim.get_interaction('Exchange')
+    M = np.random.RandomState(0).uniform(-1, 1, (2, len(sim.m)))
+    H_before = exchange.compute_field_batch(M)
+
+    exchange.A.set(26e-12)
+    H = exchange.compute_field_batch(M)
+    assert np.allclose(H, 2 * H_before, atol=1e-8 * abs(H).max(), rtol=1e-8)
+    assert np.allclose(sim.llg.effective_field.compute_field_batch(M, sim.t),
+                       H + sim.get_interaction('Demag').compute_field_batch(M),
+                       atol=1e-8 * abs(H).max(), rtol=1e-8)
@@ -0,0 +1,34 @@
+import numpy as np
+from finmag.drivers.llg_integrator import llg_integrator
+from finmag.physics.llg_preconditioner import LLGPreconditioner
+from finmag.tests.jacobean.domain_wall_cobalt import setup_domain_wall_cobalt
+
+
+def test_jacobian_agrees_with_jtimes_for_linear_interactions():
+    # With only exchange and anisotropy, the approximate Jacobian of the
+    # preconditioner is exact.
+    llg = setup_domain_wall_cobalt(node_count=20)
+    llg.set_alpha(0.3)
+    m = llg.m_field.get_ordered_numpy_array_xxx().copy()
+    precon = LLGPreconditioner(llg)
+    J = precon.compute_jacobian(0, m)
+
+    mp = np.random.RandomState(0).uniform(-1, 1, len(m))
+    J_mp = np.zeros(len(m))
+    llg.sundials_jtimes(mp, J_mp, 0, m, None, np.zeros(len(m)))
+
+    assert np.allclose(J.dot(mp), J_mp, atol=1e-10 * np.max(abs(J_mp)),
+                       rtol=1e-8)
+
+
+def test_preconditioner_reduces_linear_iterations():
+    def n_linear_iterations(method):
+        llg = setup_domain_wall_cobalt(node_count=200)
+        integrator = llg_integrator(llg, llg.m_field, method=method)
+        integrator.advance_time(1e-10)
+        return integrator.linear_solver_stats()['nliters']
+
+    n_id = n_linear_iterations("bdf_gmres_prec_id")
+    n_ilu = n_linear_iterations("bdf_gmres_prec_ilu")
+    print "Linear iterations: {} (identity), {} (ILU)".format(n_id, n_ilu)
+    assert n_ilu < 0.5 * n_id
@@ -43,6 +43,9 @@ class Event(object):
         """
         self.state = EV_ACTIVE  # The state of this event.
         self.trigger_on_stop = trigger_on_stop
+        # Whether the integrator must stop exactly at the times of this
+        # event (rather than interpolating) because it changes the system.
+        self.hard_stop = False
         self.last = None  # The previous time or step value with which this
         # event last triggered.
 
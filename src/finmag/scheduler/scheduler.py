@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from finmag.scheduler.derivedevents import SingleTimeEvent, RepeatingTimeEvent
 from finmag.scheduler.timeevent import same_time
 from finmag.scheduler.event import EV_DONE, EV_REQUESTS_STOP_INTEGRATION
+from finmag.util.profiling import profiler
 # This module will try to import the package apscheduler when a realtime event
 # is added. Install with "pip install apscheduler".
 # See http://pypi.python.org/pypi/APScheduler for documentation.
@@ -13,6 +14,15 @@ from finmag.scheduler.event import EV_DONE, EV_REQUESTS_STOP_INTEGRATION
 log = logging.getLogger(name="finmag")
 
 
+def _section_name(item):
+    """
+    Name under which the time spent in the callback of `item` is
+    recorded by the profiler.
+    """
+    func = getattr(item.callback, 'func', item.callback)
+    return "scheduled/" + getattr(func, '__name__', 'callback')
+
+
 class Scheduler(object):
 
     """
@@ -53,10 +63,15 @@ class Scheduler(object):
         return self
 
     def add(self, func, args=None, kwargs=None, at=None, at_end=False,
-            every=None, after=None, realtime=False):
+            every=None, after=None, realtime=False, hard_stop=False):
         """
         Register a function with the scheduler.
 
+        If `hard_stop` is True, the integrator is told not to step past the
+        times at which the function is called (if it supports this). This
+        should be used for functions which change the system. Otherwise the
+        integrator may step past these times and interpolate the solution.
+
         Returns the scheduled item, which can be removed again by
         calling Scheduler._remove(item). Note that this may change in
         the future, so use with care.
@@ -84,11 +99,13 @@ class Scheduler(object):
 
         if at or (at_end and not every):
             at_item = SingleTimeEvent(at, at_end, callback)
+            at_item.hard_stop = hard_stop
             self._add(at_item)
             return at_item
 
         if every:
             every_item = RepeatingTimeEvent(every, after, at_end, callback)
+            every_item.hard_stop = hard_stop
             self._add(every_item)
             return every_item
 
@@ -189,11 +206,21 @@ class Scheduler(object):
         """
         for item in self.items:
             if same_time(item.next_time, time):
-                item.check_and_trigger(time)
+                with profiler(_section_name(item)):
+                    item.check_and_trigger(time)
                 if item.state == EV_DONE:
                     self._remove(item)
         self.last = time
 
+    def hard_stop_at(self, time):
+        """
+        Return True if any of the items due at `time` requires the
+        integrator to stop exactly at that time.
+
+        """
+        return any(item.hard_stop and same_time(item.next_time, time)
+                   for item in self.items)
+
     def finalise(self, time):
         """
         Trigger all events that need to happen at the end of time integration.
@@ -201,7 +228,8 @@ class Scheduler(object):
         """
         for item in self.items:
             if item.trigger_on_stop:
-                item.check_and_trigger(time, is_stop=True)
+                with profiler(_section_name(item)):
+                    item.check_and_trigger(time, is_stop=True)
 
     def reset(self, time):
         """
@@ -256,7 +284,10 @@ class Scheduler(object):
             # However, this confuses the integrators so we don't integrate
             # in this case.
             if t != integrator.cur_t:
-                integrator.advance_time(t)
+                if self.hard_stop_at(t) and hasattr(integrator, "set_stop_time"):
+                    integrator.set_stop_time(t)
+                with profiler("integration"):
+                    integrator.advance_time(t)
 
             for f in callbacks_at_scheduler_events:
                 f(t)
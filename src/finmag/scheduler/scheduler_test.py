@@ -323,3 +323,30 @@ def test_reset_with_at():
     s.reset(30)
     s.reached(10)
     assert c.cnt_at == 2
+
+
+def test_run_only_hard_stops_for_events_which_request_it():
+    class FakeIntegrator(object):
+
+        def __init__(self):
+            self.cur_t = 0.0
+            self.stop_times = []
+
+        def set_stop_time(self, t):
+            self.stop_times.append(t)
+
+        def advance_time(self, t):
+            self.cur_t = t
+
+    c = Counter()
+    s = Scheduler()
+    s.add(c.inc_every, every=10)
+    s.add(c.inc_at, at=25, hard_stop=True)
+    s.add(lambda: False, at=40)  # stop integration
+
+    integrator = FakeIntegrator()
+    s.run(integrator)
+    assert integrator.cur_t == 40
+    assert c.cnt_every == 5
+    assert c.cnt_at == 1
+    assert integrator.stop_times == [25]
@@ -0,0 +1,62 @@
+"""
+Benchmark of the cost of checking for relaxation in `sim.relax()`.
+
+Relaxes the vortex state of a permalloy disk (diameter 60 nm, thickness
+10 nm, exchange and demag) and reports the wall time of the relaxation,
+the number of relaxation checks and the number of total energy
+evaluations needed by the checks.
+
+For comparison, the relaxation detector used to evaluate the total energy
+(which includes a full demag solve) at every check. The time this would
+have cost is estimated from the measured time of one energy evaluation.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+from finmag import Simulation
+from finmag.energies import Exchange, Demag
+from finmag.util.meshes import nanodisk
+
+Ms = 8.6e5
+A = 13e-12
+
+
+def vortex_disk():
+    mesh = nanodisk(d=60, h=10, maxh=3.0, save_result=False)
+    sim = Simulation(mesh, Ms, unit_length=1e-9, name='relax_disk')
+    sim.add(Exchange(A))
+    sim.add(Demag())
+    sim.set_m(lambda pt: (-pt[1], pt[0], 10.0))
+    return sim
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp()
+    os.chdir(tmpdir)
+    try:
+        sim = vortex_disk()
+        start = time.time()
+        sim.relax()
+        runtime = time.time() - start
+
+        repetitions = 5
+        start = time.time()
+        for i in xrange(repetitions):
+            sim.total_energy()
+        energy_time = (time.time() - start) / repetitions
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+    n_checks = len(sim.relaxation['dmdts'])
+    n_energies = sim.relaxation['n_energy_evals']
+    print "Relaxed to t = {:.3g} s in {:.2f} s.".format(sim.t, runtime)
+    print "Relaxation checks: {}, energy evaluations: {}".format(
+        n_checks, n_energies)
+    print "One energy evaluation takes {:.3f} s.".format(energy_time)
+    saved = (n_checks - n_energies) * energy_time
+    print "Time saved compared to an energy evaluation per check: " \
+        "{:.2f} s ({:.2f}x speedup)".format(saved, (runtime + saved) / runtime)
@@ -7,11 +7,13 @@ import dolfin as df
 from finmag.sim.sim import Simulation, sim_with
 from finmag.normal_modes.eigenmodes import eigensolvers
 from finmag.util import helpers
+from finmag.util.fileio import FIELD_HISTORY_EXT
 from finmag.util.fft import \
     compute_power_spectral_density, find_peak_near_frequency, _plot_spectrum, \
     export_normal_mode_animation_from_ringdown
 from finmag.normal_modes.deprecated.normal_modes_deprecated import \
     compute_eigenproblem_matrix, compute_generalised_eigenproblem_matrices, \
+    compute_eigenproblem_operator, compute_generalised_eigenproblem_operators, \
     export_normal_mode_animation, plot_spatially_resolved_normal_mode, \
     compute_tangential_space_basis, mf_mult
 from past.builtins import basestring
@@ -54,6 +56,8 @@ class NormalModeSimulation(Simulation):
         # XXX TODO: Remove me once we get rid of the option 'use_real_matrix'
         self.use_real_matrix = None
         #           in the method 'compute_normal_modes()' below.
+        self.matrix_free = None
+        self.split_local = None
 
         # Define a few eigensolvers which can be conveniently accesses using
         # strings
@@ -71,8 +75,13 @@ class NormalModeSimulation(Simulation):
         """
         Run the ringdown phase of a normal modes simulation, optionally saving
         averages, vtk snapshots and magnetisation snapshots to the respective
-        .ndt, .pvd and .npy files. Note that by default existing snapshots will
+        .ndt, .pvd and .fhist files. Note that by default existing snapshots will
         not be overwritten. Use `overwrite=True` to achieve this.
+
+        By default, all magnetisation snapshots are stored in a single .fhist
+        file (see finmag.util.fileio.FieldHistoryReader). If
+        `m_snapshots_filename` ends in '.npy', a separate .npy file is
+        written for each snapshot instead.
         Also note that `H_ext=None` has the same effect as `H_ext=[0, 0, 0]`, i.e.
         any existing external field will be switched off during the ringdown phase.
         If you would like to have a field applied during the ringdown, you need to
@@ -143,7 +152,7 @@ class NormalModeSimulation(Simulation):
 
         if save_m_every:
             schedule_saving(
-                'save_m', save_m_every, m_snapshots_filename, '_m.npy')
+                'save_m', save_m_every, m_snapshots_filename, '_m' + FIELD_HISTORY_EXT)
             log.debug("Setting self.t_step_m = {}".format(save_m_every))
             self.t_step_m = save_m_every
             self.t_ini_m = self.t
@@ -193,7 +202,7 @@ class NormalModeSimulation(Simulation):
                 filename = self.ndtfilename
             else:
                 # Create a wildcard pattern so that we can read the files using
-                # 'glob'.
+                # 'glob' (a .fhist file contains all snapshots).
                 filename = re.sub('\.npy$', '*.npy', self.m_snapshots_filename)
         log.debug(
             "Computing normal mode spectrum from file(s) '{}'.".format(filename))
@@ -365,7 +374,7 @@ class NormalModeSimulation(Simulation):
             peak_idx] / 1e9, psd_cmpnt[peak_idx], 'bo')
         return fig
 
-    def export_normal_mode_animation_from_ringdown(self, npy_files, f_approx=None, component=None,
+    def export_normal_mode_animation_from_ringdown(self, npy_files=None, f_approx=None, component=None,
                                                    peak_idx=None, outfilename=None, directory='',
                                                    t_step=None, scaling=0.2, dm_only=False,
                                                    num_cycles=1, num_frames_per_cycle=20,
@@ -389,6 +398,11 @@ class NormalModeSimulation(Simulation):
 
         *Arguments*:
 
+        npy_files:  str or list
+
+           The .npy files or the .fhist file containing the magnetisation
+           snapshots. Defaults to the snapshots saved by `run_ringdown()`.
+
         f_approx:  float
 
            Find and animate peak closest to this frequency. This is
@@ -448,31 +462,57 @@ class NormalModeSimulation(Simulation):
                 log.warning(
                     "Values of t_step for previously saved .ndt and .npy data differ! ({} != {}). Using t_step_ndt, but please double-check this is what you want.".format(self.t_step_ndt, self.t_step_m))
         t_step = t_step or self.t_step_ndt
+        if npy_files is None:
+            if self.m_snapshots_filename is None:
+                raise ValueError(
+                    "No magnetisation snapshots were saved during the "
+                    "ringdown. Please specify the argument 'npy_files'.")
+            npy_files = re.sub('\.npy$', '*.npy', self.m_snapshots_filename)
         export_normal_mode_animation_from_ringdown(npy_files, outfilename, self.mesh, t_step,
                                                    peak_idx, dm_only=dm_only, num_cycles=num_cycles,
                                                    num_frames_per_cycle=num_frames_per_cycle)
 
     def assemble_eigenproblem_matrices(self, filename_mat_A=None, filename_mat_M=None,  use_generalized=False,
                                        force_recompute_matrices=False, check_hermitian=False,
-                                       differentiate_H_numerically=True, use_real_matrix=True):
+                                       differentiate_H_numerically=True, use_real_matrix=True,
+                                       matrix_free=False, processes=1, split_local=False):
+        if matrix_free and (filename_mat_A != None or filename_mat_M != None):
+            raise ValueError("Cannot save the eigenproblem matrices to a file "
+                             "if matrix_free=True.")
         if use_generalized:
-            if (self.A == None or self.M == None) or force_recompute_matrices:
+            if (self.A == None or self.M == None) or (self.matrix_free != matrix_free) or force_recompute_matrices:
                 df.tic()
-                self.A, self.M, _, _ = compute_generalised_eigenproblem_matrices(
-                    self, frequency_unit=1e9, filename_mat_A=filename_mat_A, filename_mat_M=filename_mat_M,
-                    check_hermitian=check_hermitian, differentiate_H_numerically=differentiate_H_numerically)
+                if matrix_free:
+                    self.A, self.M, _, _ = compute_generalised_eigenproblem_operators(
+                        self, frequency_unit=1e9, differentiate_H_numerically=differentiate_H_numerically)
+                else:
+                    self.A, self.M, _, _ = compute_generalised_eigenproblem_matrices(
+                        self, frequency_unit=1e9, filename_mat_A=filename_mat_A, filename_mat_M=filename_mat_M,
+                        check_hermitian=check_hermitian, differentiate_H_numerically=differentiate_H_numerically,
+                        processes=processes)
+                self.matrix_free = matrix_free
                 log.debug("Assembling the eigenproblem matrices took {}".format(
                     helpers.format_time(df.toc())))
             else:
                 log.debug(
                     'Re-using previously computed eigenproblem matrices.')
         else:
-            if self.D == None or (self.use_real_matrix != use_real_matrix) or force_recompute_matrices:
+            if self.D is None or (self.use_real_matrix != use_real_matrix) or \
+                    (self.matrix_free != matrix_free) or \
+                    (self.split_local != split_local) or force_recompute_matrices:
                 df.tic()
-                self.D = compute_eigenproblem_matrix(
-                    self, frequency_unit=1e9, differentiate_H_numerically=differentiate_H_numerically,
-                    dtype=(float if use_real_matrix else complex))
+                if matrix_free:
+                    self.D = compute_eigenproblem_operator(
+                        self, frequency_unit=1e9, differentiate_H_numerically=differentiate_H_numerically,
+                        dtype=(float if use_real_matrix else complex))
+                else:
+                    self.D = compute_eigenproblem_matrix(
+                        self, frequency_unit=1e9, differentiate_H_numerically=differentiate_H_numerically,
+                        dtype=(float if use_real_matrix else complex), processes=processes,
+                        split_local=split_local)
                 self.use_real_matrix = use_real_matrix
+                self.matrix_free = matrix_free
+                self.split_local = split_local
                 log.debug("Assembling the eigenproblem matrix took {}".format(
                     helpers.format_time(df.toc())))
             else:
@@ -507,7 +547,8 @@ class NormalModeSimulation(Simulation):
                              filename_mat_A=None, filename_mat_M=None,
                              use_generalized=False, force_recompute_matrices=False,
                              check_hermitian=False, differentiate_H_numerically=True,
-                             use_real_matrix=True):
+                             use_real_matrix=True, matrix_free=False, processes=1,
+                             split_local=False):
         """
         Compute the eigenmodes of the simulation by solving a generalised
         eigenvalue problem and return the computed eigenfrequencies and
@@ -597,6 +638,32 @@ class NormalModeSimulation(Simulation):
             This option is for testing purposes only and will be removed in
             the future.
 
+        matrix_free:
+
+            If True (default: False), the eigenproblem matrices are not
+            assembled. Instead, they are represented by LinearOperators
+            which evaluate the linearised LLG equation on the fly (using
+            the sparse matrices of linear interactions such as exchange
+            directly), so that the memory requirements grow only linearly
+            with the number of mesh nodes. This should be combined with an
+            iterative solver such as "scipy_sparse" or "slepc_krylovschur"
+            (which then uses a PETSc shell matrix).
+
+        processes:
+
+            Number of worker processes used to assemble the eigenproblem
+            matrices (default: 1). Has no effect if `matrix_free` is True.
+
+        split_local:
+
+            If True (default: False), the contribution of interactions
+            which are linear in m (exchange, DMI, ...) to the matrix `D`
+            is assembled directly from their sparse matrices, so only the
+            remaining interactions (demag) need to be differentiated
+            numerically. If there is no demag, `D` is a sparse matrix.
+            This only applies if `use_generalized` and `matrix_free` are
+            False.
+
 
         *Returns*
 
@@ -625,7 +692,8 @@ class NormalModeSimulation(Simulation):
         self.assemble_eigenproblem_matrices(
             filename_mat_A=filename_mat_A, filename_mat_M=filename_mat_M, use_generalized=use_generalized,
             force_recompute_matrices=force_recompute_matrices, check_hermitian=check_hermitian,
-            differentiate_H_numerically=differentiate_H_numerically, use_real_matrix=use_real_matrix)
+            differentiate_H_numerically=differentiate_H_numerically, use_real_matrix=use_real_matrix,
+            matrix_free=matrix_free, processes=processes, split_local=split_local)
 
         if discard_negative_frequencies:
             # If negative frequencies should be discarded, we need to compute
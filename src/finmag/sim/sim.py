@@ -9,6 +9,7 @@ import dolfin as df
 import numpy as np
 import cProfile
 import pstats
+from collections import OrderedDict
 from aeon import timer
 from finmag.field import Field
 from finmag.physics.llg import LLG
@@ -16,12 +17,16 @@ from finmag.physics.llg_stt import LLG_STT
 from finmag.physics.llb.sllg import SLLG
 from finmag.sim import sim_details
 from finmag.sim import sim_relax
+from finmag.sim import sim_profiling
 from finmag.sim import sim_savers
 from finmag.util.meshes import mesh_volume, mesh_size_plausible, \
     describe_mesh_size, plot_mesh, plot_mesh_with_paraview
-from finmag.util.fileio import Tablewriter, FieldSaver
+from finmag.util.fileio import Tablewriter, BinaryTablewriter, FieldSaver
 from finmag.util import helpers
+from finmag.util.probing import ProbePlan, is_cg1
 from finmag.util.vtk_saver import VTKSaver
+from finmag.util.async_writer import AsyncWriter
+from finmag.util.profiling import profiler
 from finmag.sim.hysteresis import hysteresis as hyst, hysteresis_loop as hyst_loop
 from finmag.sim import sim_helpers, magnetisation_patterns
 from finmag.drivers.llg_integrator import llg_integrator
@@ -35,6 +40,9 @@ from finmag.energies import Exchange, Zeeman, TimeZeeman, Demag, UniaxialAnisotr
 
 log = logging.getLogger(name="finmag")
 
+# Number of ProbePlans kept by each simulation (see Simulation._probe_plan).
+MAX_CACHED_PROBE_PLANS = 10
+
 
 class Simulation(object):
 
@@ -53,7 +61,7 @@ class Simulation(object):
 
 
     @timer.method
-    def __init__(self, mesh, Ms, unit_length=1, name='unnamed', kernel='llg', integrator_backend="sundials", pbc=None, average=False, parallel=False):
+    def __init__(self, mesh, Ms, unit_length=1, name='unnamed', kernel='llg', integrator_backend="sundials", pbc=None, average=False, parallel=False, table_format='ndt'):
         """Simulation object.
 
         *Arguments*
@@ -73,6 +81,13 @@ class Simulation(object):
 
           average : take the cell averaged effective field, only for test, will delete it if doesn't work.
 
+          table_format : 'ndt' (default) to save the averages in a text
+                         based .ndt file, or 'binary' to save them in a
+                         buffered binary .ndtb file (which is much faster
+                         for frequent saves). Both can be read with
+                         finmag.util.fileio.Tablereader, and binary tables
+                         can be converted with finmag.util.fileio.export_ndt.
+
         """
         # Store the simulation name and a 'sanitized' version of it which
         # contains only alphanumeric characters and underscores. The latter
@@ -83,7 +98,13 @@ class Simulation(object):
         self.sanitized_name = helpers.clean_filename(name)
 
         self.logfilename = self.sanitized_name + '.log'
-        self.ndtfilename = self.sanitized_name + '.ndt'
+        if table_format == 'ndt':
+            self.ndtfilename = self.sanitized_name + '.ndt'
+        elif table_format == 'binary':
+            self.ndtfilename = self.sanitized_name + '.ndtb'
+        else:
+            raise ValueError("Unknown table format: '{}'. Expected 'ndt' or "
+                             "'binary'.".format(table_format))
 
         self.logging_handler = helpers.start_logging_to_file(
             self.logfilename, mode='w', level=logging.DEBUG)
@@ -101,7 +122,12 @@ class Simulation(object):
         # Create a Tablewriter object for ourselves which will be used
         # by various methods to save the average magnetisation at given
         # timesteps.
-        self.tablewriter = Tablewriter(self.ndtfilename, self, override=True)
+        if table_format == 'binary':
+            self.tablewriter = BinaryTablewriter(
+                self.ndtfilename, self, override=True)
+        else:
+            self.tablewriter = Tablewriter(
+                self.ndtfilename, self, override=True)
 
         # Note that we pass the simulation object ("self") to the Tablewrite in the line above, and
         # that the table writer stores a reference. This is just a cyclic reference. If we want 
@@ -154,6 +180,7 @@ class Simulation(object):
         self.unit_length = unit_length
         self.integrator_backend = integrator_backend
         self._integrator = None
+        self._probe_plans = OrderedDict()
         self.S1 = df.FunctionSpace(
             mesh, "Lagrange", 1, constrained_domain=self.pbc)
         self.S3 = df.VectorFunctionSpace(
@@ -176,6 +203,9 @@ class Simulation(object):
         self.Ms = Ms
 
         self.kernel = kernel
+        if kernel == 'llg':
+            # Lets the table writer average m together with other fields.
+            self.tablewriter.set_entity_field('m', lambda sim: sim.m_field)
 
         self.Volume = mesh_volume(mesh)
 
@@ -193,6 +223,7 @@ class Simulation(object):
         # we have a robust, unified field saving mechanism.
         self.vtk_savers = {}
         self.field_savers = {}
+        self.async_writer = None
         self._render_scene_indices = {}
 
         #log.debug("__init__:sim-object '{}' refcount 85={}".format(self.name, sys.getrefcount(self)))
@@ -210,6 +241,10 @@ class Simulation(object):
             'save_vtk': sim_savers.save_vtk,                                # <- this line creates a reference to the simulation object. Why?
             'switch_off_H_ext': Simulation.switch_off_H_ext,
             }
+        # Shortcuts which change the system, so that the integrator must
+        # stop exactly at their times (see the `hard_stop` option of
+        # `schedule`).
+        self.state_changing_shortcuts = ['switch_off_H_ext']
 
 
         #log.debug("__init__:sim-object '{}' refcount 86={}".format(self.name, sys.getrefcount(self)))
@@ -255,6 +290,17 @@ class Simulation(object):
         # now start to remove (potential) references to 'self':
 
         log.debug("   shutdown(): 1-refcount {} for {}".format(sys.getrefcount(self), self.name))
+        # An error of the background writer is re-raised once everything
+        # else has been closed.
+        output_error = None
+        try:
+            self.use_async_output(False)
+        except Exception:
+            output_error = sys.exc_info()
+            log.error("Error while writing output: {}".format(output_error[1]))
+        self.tablewriter.close()
+        for field_saver in self.field_savers.itervalues():
+            field_saver.close()
         self.tablewriter.delete_entity_get_methods()
         #'del self.tablewriter' would be sufficient?
         log.debug("   shutdown(): 2-refcount {} for {}".format(sys.getrefcount(self), self.name))
@@ -268,6 +314,8 @@ class Simulation(object):
         log.debug("   shutdown(): 6-refcount {} for {}".format(sys.getrefcount(self), self.name))
         self.close_logfile()
         log.debug("   shutdown(): 7-refcount {} for {}".format(sys.getrefcount(self), self.name))
+        if output_error is not None:
+            raise output_error[0], output_error[1], output_error[2]
         return sys.getrefcount(self)
 
     def instances_delete_all_others(self):
@@ -375,15 +423,19 @@ class Simulation(object):
         helpers.mark_subdomain_by_function(
             region, self.mesh, self.region_id, self.domains)
         self.dx = df.Measure("dx")[self.domains]
+        # The cell markers have changed, so cached averages are invalid.
+        self.llg._m_field.invalidate_average_weights()
 
         if name == 'unnamed':
             name = 'region_' + str(self.region_id)
 
-        region_id = self.region_id
-        self.tablewriter.entities[name] = {
+        dx = self.dx(self.region_id)
+        self.tablewriter.add_entity(name, {
             'unit': '<>',
-            'get': lambda sim: sim.llg.m_average_fun(dx=self.dx(region_id)),
-            'header': (name + '_m_x', name + '_m_y', name + '_m_z')}
+            'get': lambda sim: sim.llg.m_average_fun(dx=dx),
+            'field': lambda sim: sim.llg._m_field,
+            'dx': dx,
+            'header': (name + '_m_x', name + '_m_y', name + '_m_z')})
 
         self.tablewriter.update_entity_order()
 
@@ -692,7 +744,9 @@ class Simulation(object):
         shape of ``pts``.
 
         """
-        return helpers.probe(self.get_field_as_dolfin_function(field_type, region=region), pts)
+        field = self.get_field_as_dolfin_function(field_type, region=region)
+        pts = np.array(pts)
+        return helpers.probe(field, pts, plan=self._probe_plan(field, pts))
 
     def probe_field_along_line(self, field_type, pt_start, pt_end, N=100, region=None):
         """
@@ -711,7 +765,30 @@ class Simulation(object):
 
         """
         field = self.get_field_as_dolfin_function(field_type, region=region)
-        return helpers.probe_along_line(field, pt_start, pt_end, N)
+        pts = helpers.points_along_line(pt_start, pt_end, N)
+        return pts, helpers.probe(field, pts, plan=self._probe_plan(field, pts))
+
+    def _probe_plan(self, field, pts):
+        """
+        Return a ProbePlan for the mesh of the dolfin function `field` and
+        the points `pts` (or None if `field` is not a CG1 function).
+
+        The most recently used plans are kept, so that probing the same
+        points repeatedly (e.g. after every time step) does not need to
+        locate the points in the mesh again.
+
+        """
+        if not is_cg1(field.function_space()):
+            return None
+        mesh = field.function_space().mesh()
+        key = (mesh.id(), pts.shape, pts.tostring())
+        plan = self._probe_plans.pop(key, None)
+        if plan is None:
+            plan = ProbePlan(mesh, pts)
+        self._probe_plans[key] = plan
+        while len(self._probe_plans) > MAX_CACHED_PROBE_PLANS:
+            self._probe_plans.popitem(last=False)
+        return plan
 
     def has_integrator(self):
         return (self._integrator != None)
@@ -815,27 +892,40 @@ class Simulation(object):
         # Define function that stops integration and add it to scheduler. The
         # at_end parameter is required because t can be zero, which is
         # considered as False for comparison purposes in scheduler.add.
+        # The integrator must not step past t (hard_stop), since the system
+        # is usually changed before the simulation continues.
         def call_to_end_integration():
             return False
-        self.scheduler.add(call_to_end_integration, at=t, at_end=True)
+        self.scheduler.add(call_to_end_integration, at=t, at_end=True,
+                           hard_stop=True)
 
-        self.scheduler.run(self.integrator, self.callbacks_at_scheduler_events)
+        with sim_profiling.profiled_run(self, 'run_until'):
+            self.scheduler.run(self.integrator,
+                               self.callbacks_at_scheduler_events)
 
-        if self.parallel:
-            # print self.llg._m_field.f.vector().array()
-            # TODO: maybe this is not necessary, check it later.
-            pass
-            # self.llg._m_field.f.vector().set_local(self.integrator.y_np)
+            if self.parallel:
+                # print self.llg._m_field.f.vector().array()
+                # TODO: maybe this is not necessary, check it later.
+                pass
+                # self.llg._m_field.f.vector().set_local(self.integrator.y_np)
 
-        # The following line is necessary because the time integrator may
-        # slightly overshoot the requested end time, so here we make sure
-        # that the field values represent that requested time exactly.
-        self.llg.effective_field.update(t)
+            # The following line is necessary because the time integrator may
+            # slightly overshoot the requested end time, so here we make sure
+            # that the field values represent that requested time exactly.
+            self.llg.effective_field.update(t)
+
+            self.flush_output()
 
         log.info("Simulation has reached time t = {:.2g} s.".format(self.t))
 
     relax = sim_relax.relax
 
+    enable_profiling = sim_profiling.enable_profiling
+
+    profiling_report = sim_profiling.profiling_report
+
+    save_profiling_report = sim_profiling.save_profiling_report
+
     save_restart_data = sim_helpers.save_restart_data
 
     def restart(self, filename=None, t0=None):
@@ -853,6 +943,8 @@ class Simulation(object):
         if filename == None:
             filename = sim_helpers.canonical_restart_filename(self)
         log.debug("Loading restart data from {}. ".format(filename))
+        # The restart data may still be being written in the background.
+        self.flush_output()
 
         data = sim_helpers.load_restart_data(filename)
 
@@ -925,6 +1017,33 @@ class Simulation(object):
     def do_precession(self, value):
         self.llg.do_precession = value
 
+    @property
+    def fast_rhs(self):
+        """
+        If True, the LLG right-hand side uses preallocated buffers and
+        cached values of alpha and Ms (see `LLG.solve_into`).
+
+        """
+        return self.llg.fast_rhs
+
+    @fast_rhs.setter
+    def fast_rhs(self, value):
+        self.llg.fast_rhs = value
+
+    @property
+    def fuse_linear_interactions(self):
+        """
+        If True, the fields of all interactions which are linear in m are
+        computed with a single sparse matrix-vector product (see
+        `EffectiveField`).
+
+        """
+        return self.llg.effective_field.fuse_linear_interactions
+
+    @fuse_linear_interactions.setter
+    def fuse_linear_interactions(self, value):
+        self.llg.effective_field.fuse_linear_interactions = value
+
     @property
     def alpha(self):
         """
@@ -967,6 +1086,45 @@ class Simulation(object):
 
     run_normal_modes_computation = sim_helpers.run_normal_modes_computation
 
+    def use_async_output(self, enabled=True, max_pending=8):
+        """
+        If `enabled` is True, scheduled saving of data ('save_ndt',
+        'save_field', 'save_m', 'save_vtk', 'save_restart_data') only
+        takes a snapshot of the data; formatting, compression and writing
+        to disk happen in a background thread while the time integration
+        continues. At most `max_pending` saves can be waiting to be
+        written; further saves block until the writer has caught up.
+
+        All data is written by the end of `run_until` and `relax`, and
+        when calling `flush_output` or `shutdown`.
+
+        Call with `enabled=False` to write all pending data and return to
+        saving synchronously.
+
+        """
+        writer = self.async_writer
+        try:
+            if writer is not None:
+                writer.close()  # re-raises errors of the background writer
+        finally:
+            # Detach the writer even then, so that saving goes back to
+            # being synchronous.
+            self.async_writer = None
+            self.tablewriter.async_writer = None
+        if enabled:
+            self.async_writer = AsyncWriter(max_pending=max_pending)
+            self.tablewriter.async_writer = self.async_writer
+
+    def flush_output(self):
+        """
+        Make sure that all data saved so far has been written to disk.
+
+        """
+        if self.async_writer is not None:
+            with profiler("flush output"):
+                self.async_writer.flush()
+        self.tablewriter.flush()
+
     # TODO: Remove debug flag again once we are sure that re-initialising the integrator
     #       doesn't cause a performance overhead.
     def reinit_integrator(self, debug=True):
@@ -1063,10 +1221,18 @@ class Simulation(object):
         time by setting the `realtime` option to True. In this case you can
         use the `after` keyword on its own.
 
+        Scheduled functions which only read the state of the simulation
+        (such as 'save_ndt' or 'save_field') are served by interpolating
+        the solution, so they do not force the time integrator to stop at
+        the scheduled times. If your function changes the system (e.g. the
+        applied field), set `hard_stop` to True so that the integrator does
+        not step past the scheduled time. This is the default for the
+        shortcuts which change the system, such as 'switch_off_H_ext'.
+
         The function func(sim) you provide should expect the simulation object
         as its first argument. All arguments to the 'schedule' function (except
-        the special ones 'at', 'every', 'at_end' and 'realtime' mentioned
-        above) will be passed on to this function.
+        the special ones 'at', 'every', 'at_end', 'realtime' and 'hard_stop'
+        mentioned above) will be passed on to this function.
 
         If func is a string, it will be looked up in self.scheduler_shortcuts,
         which includes 'save_restart_data', 'save_ndt', 'save_vtk' and
@@ -1084,6 +1250,8 @@ class Simulation(object):
         'm_00000.npy', 'm_000001.npy', etc.
 
         """
+        hard_stop = kwargs.pop('hard_stop',
+                               func in self.state_changing_shortcuts)
         if isinstance(func, str):
             if func in self.scheduler_shortcuts:
                 if func == 'save_vtk':
@@ -1129,7 +1297,8 @@ class Simulation(object):
             func_args = None
 
         if func_args != None:
-            illegal_argnames = ['at', 'after', 'every', 'at_end', 'realtime']
+            illegal_argnames = ['at', 'after', 'every', 'at_end', 'realtime',
+                                'hard_stop']
             for kw in illegal_argnames:
                 if kw in func_args:
                     raise ValueError(
@@ -1144,7 +1313,8 @@ class Simulation(object):
 
         scheduled_item = self.scheduler.add(func, [self] + list(args), kwargs,
                                             at=at, at_end=at_end, every=every,
-                                            after=after, realtime=realtime)
+                                            after=after, realtime=realtime,
+                                            hard_stop=hard_stop)
         return scheduled_item
 
     def unschedule(self, item):
@@ -1362,6 +1532,10 @@ class Simulation(object):
         the generated file to visualise the profiled results in a
         graphical way.
 
+        For a cheaper, structured breakdown (right-hand side evaluations,
+        time per interaction, demag solver phases and scheduled output)
+        use `enable_profiling` instead.
+
         """
         if filename is None:
             filename = self.name + '.prof'
@@ -82,18 +82,30 @@ def save_restart_data(sim, filename=None):
     if filename == None:
         filename = canonical_restart_filename(sim)
 
+    m = sim.integrator.llg._m_field.get_numpy_array_debug()
+    if sim.async_writer is None:
+        _write_restart_data(filename, m, integrator_stats, simtime,
+                            datetimetuple, sim.name, drivertype)
+    else:
+        # Compression and writing happen in the background.
+        sim.async_writer.submit(_write_restart_data, filename, m,
+                                integrator_stats, simtime, datetimetuple,
+                                sim.name, drivertype)
+
+
+def _write_restart_data(filename, m, stats, simtime, datetimetuple, simname, drivertype):
     create_backup_file_if_file_exists(filename)
     create_non_existing_parent_directories(filename)
 
     np.savez_compressed(filename,
-                        m=sim.integrator.llg._m_field.get_numpy_array_debug(),
-                        stats=integrator_stats,
+                        m=m,
+                        stats=stats,
                         simtime=simtime,
                         datetime=datetimetuple,
-                        simname=sim.name,
+                        simname=simname,
                         driver=drivertype)
     log.debug("Have saved restart data at t=%g to %s "
-              "(sim.name=%s)" % (sim.t, filename, sim.name))
+              "(sim.name=%s)" % (simtime, filename, simname))
 
 
 def load_restart_data(filename_or_simulation):
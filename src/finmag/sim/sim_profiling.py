@@ -0,0 +1,192 @@
+"""
+Structured profiling reports for the Simulation class.
+
+When profiling is enabled (see `enable_profiling`), each call of
+`run_until` or `relax` appends a report to `sim.profiling_reports`. A
+report is a dictionary with the keys
+
+    'call'          name of the method ('run_until' or 'relax')
+    't_start'       simulation time at the start of the call
+    't_end'         simulation time at the end of the call
+    'wall_time'     wall clock time of the call in seconds
+    'integrator'    increase of the integrator counters during the call
+                    (such as 'nsteps', 'nfevals' = number of right-hand
+                    side evaluations and 'njvevals' = number of Jacobian
+                    times vector products) and the step sizes at the end
+    'times'         seconds spent per profiled section
+    'calls'         number of calls per profiled section
+    'counts'        increase of the profiler counters (e.g. the Krylov
+                    iterations of the demag solvers)
+
+The profiled sections are nested. Their names are
+
+    'integration'                   time integration (including all
+                                    evaluations of the effective field)
+    'field/<interaction name>'      computation of each interaction's field
+    'field/time update'             time updates (e.g. of TimeZeeman)
+    'field/linear interactions'     fused linear interactions, if enabled
+    'demag/first linear solve'      sub-phases of the FK demag solver
+    'demag/BEM matvec'
+    'demag/second linear solve'
+    'demag/gradient'
+    'scheduled/<function name>'     scheduled functions, such as savers
+    'flush output'                  waiting for the background writer
+
+"""
+import json
+import time
+import logging
+import contextlib
+from finmag.util.profiling import profiler
+
+log = logging.getLogger(name="finmag")
+
+# Integrator statistics which are counters (and thus reported as the
+# increase during a call). All other statistics are reported as is.
+_CUMULATIVE_STATS = ['nsteps', 'nfevals', 'nlinsetups', 'netfails',
+                     'nliters', 'nlcfails', 'npevals', 'npsolves', 'njvevals']
+
+
+def enable_profiling(sim, enabled=True, ndt_columns=False):
+    """
+    Switch the recording of profiling reports for `run_until` and `relax`
+    on (or off, if `enabled` is False). The reports are stored in the
+    list `sim.profiling_reports`; see `profiling_report` and
+    `save_profiling_report`.
+
+    If `ndt_columns` is True, the number of right-hand side and
+    Jacobian-vector evaluations and the time spent computing the
+    effective field, in the demag solver and in scheduled functions
+    (all counted from the moment profiling was enabled) are added as
+    columns to the .ndt file. This is only possible before the first
+    line of the file has been written.
+
+    Note that the profiler is shared by all simulations in the same
+    process. When it is disabled, the overhead of the instrumentation is
+    negligible.
+
+    """
+    profiler.enabled = enabled
+    if not enabled:
+        return
+    if not hasattr(sim, 'profiling_reports'):
+        sim.profiling_reports = []
+    if ndt_columns:
+        _add_ndt_columns(sim)
+
+
+def _total_time(prefix):
+    return sum(t for name, t in profiler.times.iteritems()
+               if name.startswith(prefix))
+
+
+def _add_ndt_columns(sim):
+    columns = [
+        ('profile_rhs_evals', '<1>',
+         lambda sim: _integrator_stats(sim).get('nfevals', 0)),
+        ('profile_jv_evals', '<1>',
+         lambda sim: _integrator_stats(sim).get('njvevals', 0)),
+        ('profile_time_field', '<s>',
+         lambda sim: _total_time('field/')),
+        ('profile_time_demag', '<s>',
+         lambda sim: _total_time('demag/')),
+        ('profile_time_scheduled', '<s>',
+         lambda sim: _total_time('scheduled/'))]
+    for name, unit, get in columns:
+        if name not in sim.tablewriter._entities:
+            sim.tablewriter.add_entity(
+                name, {'unit': unit, 'get': get, 'header': name})
+
+
+def _integrator_stats(sim):
+    """
+    Return the statistics of the time integrator (merged with those of
+    its linear solver, if available) or an empty dictionary.
+    """
+    if not sim.has_integrator():
+        return {}
+    integrator = sim.integrator
+    stats = {}
+    if hasattr(integrator, 'stats'):
+        stats.update(integrator.stats())
+    if hasattr(integrator, 'linear_solver_stats'):
+        try:
+            stats.update(integrator.linear_solver_stats())
+        except Exception:
+            # Not available for the integration methods without GMRES.
+            pass
+    return stats
+
+
+def _difference(after, before):
+    diff = {}
+    for key, value in after.iteritems():
+        if key in _CUMULATIVE_STATS:
+            # The counters are reset when the integrator is re-initialised.
+            previous = before.get(key, 0)
+            diff[key] = value - previous if value >= previous else value
+        else:
+            diff[key] = value
+    return diff
+
+
+@contextlib.contextmanager
+def profiled_run(sim, name):
+    """
+    Context manager which records a profiling report for its body (if
+    profiling is enabled and this is not nested in another profiled run).
+    """
+    if not profiler.enabled or getattr(sim, '_profiled_run_active', False):
+        yield
+        return
+
+    if not hasattr(sim, 'profiling_reports'):
+        sim.profiling_reports = []
+    sim._profiled_run_active = True
+    t_start = sim.t
+    stats_before = _integrator_stats(sim)
+    profile_before = profiler.report()
+    start = time.time()
+    try:
+        yield
+    finally:
+        sim._profiled_run_active = False
+    wall_time = time.time() - start
+
+    profile_after = profiler.report()
+    report = {'call': name,
+              't_start': t_start,
+              't_end': sim.t,
+              'wall_time': wall_time,
+              'integrator': _difference(_integrator_stats(sim), stats_before)}
+    for key in ['times', 'calls', 'counts']:
+        before = profile_before[key]
+        report[key] = dict((k, v - before.get(k, 0))
+                           for k, v in profile_after[key].iteritems()
+                           if v != before.get(k, 0))
+    sim.profiling_reports.append(report)
+    log.debug("Profiling report for {}: {}".format(name, report))
+
+
+def profiling_report(sim):
+    """
+    Return the profiling report of the last call of `run_until` or
+    `relax` (see the module docstring of finmag.sim.sim_profiling for the
+    contents), or None if there is none.
+    """
+    reports = getattr(sim, 'profiling_reports', [])
+    return reports[-1] if reports else None
+
+
+def save_profiling_report(sim, filename=None):
+    """
+    Save all profiling reports recorded so far as a JSON list to
+    `filename` (default: 'SIMULATION_NAME-profile.json').
+    """
+    if filename is None:
+        filename = sim.sanitized_name + '-profile.json'
+    with open(filename, 'w') as f:
+        json.dump(getattr(sim, 'profiling_reports', []), f, indent=2,
+                  sort_keys=True, default=float)
+    log.info("Saved profiling reports to '{}'.".format(filename))
+    return filename
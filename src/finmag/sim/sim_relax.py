@@ -1,14 +1,26 @@
 import functools
 import logging
+import numpy as np
 
 from finmag.util.consts import ONE_DEGREE_PER_NS
 from finmag.util.helpers import compute_dmdt
+from finmag.sim.sim_profiling import profiled_run
 
 log = logging.getLogger(name="finmag")
 
 ONE_DEGREE_PER_NS = 17453292.5  # in rad/s
 
 
+def _last_step_size(integrator):
+    """
+    Return the size of the last internal step of the integrator, or None
+    if it is not known.
+    """
+    if not hasattr(integrator, 'stats'):
+        return None
+    return integrator.stats().get('hlast')
+
+
 def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
           stopping_dmdt=1.0, dt_limit=1e-10, dmdt_increased_counter_limit=10):
     """
@@ -25,6 +37,14 @@ def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
     Note that any previously existing files with the same name
     will be automatically overwritten!
 
+    The relaxation is checked at increasing intervals (up to `dt_limit`).
+    At each check, dm/dt is taken from the last evaluation of the LLG
+    right-hand side by the integrator, so checking does not require any
+    extra evaluation of the effective field. The total energy is only
+    computed when dm/dt has increased since the last check (to detect
+    diverging simulations). The history of dm/dt and the energies (NaN
+    where they were not needed) is stored in `sim.relaxation`.
+
     """
     log.info("Simulation will run until relaxation of the magnetisation.")
     log.debug("Relaxation parameters: stopping_dmdt={} (degrees per "
@@ -37,6 +57,12 @@ def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
     # another relaxation takes place after this one.
     sim.relaxation = {}
 
+    # The magnetisation at the last two checkpoints is kept in a ring buffer
+    # which is allocated once. It is used for the finite difference estimate
+    # of dm/dt (if the integrator has not evaluated dm/dt since the last
+    # checkpoint) and for computing energies lazily.
+    history = np.zeros((2, len(sim.m)))
+
     # Define relaxation event.
     def dt_interval(self):
         """
@@ -69,33 +95,88 @@ def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
             else:
                 sim.relaxation['dt'] = sim.relaxation['dt_limit']
 
+            # Checking more often than the integrator takes steps gives
+            # no new information, since dm/dt would be the same.
+            h = _last_step_size(sim.integrator)
+            if h is not None and sim.relaxation['dt'] < h:
+                sim.relaxation['dt'] = min(h, sim.relaxation['dt_limit'])
+
         return sim.relaxation['dt']
 
+    def max_dmdt():
+        """
+        Return the maximum norm of dm/dt at the current checkpoint, using
+        the last evaluation of dm/dt by the integrator if it happened after
+        the previous checkpoint, and the difference of the magnetisation
+        between the two checkpoints otherwise.
+
+        """
+        last = None
+        if hasattr(sim.llg, 'last_max_dmdt_norm'):
+            last = sim.llg.last_max_dmdt_norm()
+        if last is not None and last[0] > sim.relaxation['last_time']:
+            return last[1]
+        return compute_dmdt(sim.relaxation['last_time'],
+                            sim.relaxation['last_m'], sim.t, current_m())
+
+    def current_m():
+        return history[sim.relaxation['n_checkpoints'] % 2]
+
+    def energy(i):
+        """
+        Return the total energy at checkpoint i, where -1 is the current
+        and -2 the previous one. Energies are only computed on demand.
+
+        """
+        energies = sim.relaxation['energies']
+        if np.isnan(energies[i]):
+            if i == -1:
+                energies[i] = sim.total_energy()
+            else:
+                # Evaluate the energy of the previous magnetisation and
+                # restore the current one afterwards.
+                m_field = sim.llg._m_field
+                m_field.set_with_numpy_array_debug(sim.relaxation['last_m'])
+                try:
+                    energies[i] = sim.total_energy()
+                finally:
+                    m_field.set_with_numpy_array_debug(current_m())
+            sim.relaxation['n_energy_evals'] += 1
+        return energies[i]
+
     def trigger():
         """
-        This function calculates dm/dt and the energy of the magnetisation 'm',
-        and determines whether or not the magnetisation in this simulation is
+        This function calculates dm/dt of the magnetisation 'm' and
+        determines whether or not the magnetisation in this simulation is
         relaxed.
 
-        The above result is differenced with the result from the previous
-        iteration (if any). The integration is stopped when dm/dt falls below
-        'stopping_dmdt', or when the system is deemed to be diverging (that is
-        to say, when dm/dt and energy increase simultaneously more than
-        'dmdt_increased_counter_limit' times).
+        The maximum of dm/dt is taken from the last evaluation of the
+        right-hand side by the integrator (so that no extra evaluation of the
+        effective field is needed). The integration is stopped when dm/dt
+        falls below 'stopping_dmdt', or when the system is deemed to be
+        diverging (that is to say, when dm/dt and energy increase
+        simultaneously more than 'dmdt_increased_counter_limit' times).
+
+        The energy is only computed when dm/dt has increased, so the entries
+        of sim.relaxation['energies'] are NaN for the other checkpoints.
 
         """
         # If this is the first iteration, define initial variables.
         if 'energies' not in sim.relaxation.keys():
             sim.relaxation['energies'] = []
+            sim.relaxation['n_energy_evals'] = 0
+            sim.relaxation['n_checkpoints'] = 0
             sim.relaxation['dmdt_increased_counter'] = 0
             sim.relaxation[
                 'dmdt_increased_counter_limit'] = dmdt_increased_counter_limit
+            history[0] = sim.m
 
-        # Otherwise, find dm/dt and energy and compare.
+        # Otherwise, find dm/dt and compare.
         else:
-            sim.relaxation['dmdts'].append([sim.t, compute_dmdt(
-                sim.relaxation['last_time'], sim.relaxation['last_m'], sim.t, sim.m)])
-            sim.relaxation['energies'].append(sim.total_energy())
+            sim.relaxation['n_checkpoints'] += 1
+            current_m()[:] = sim.m
+            sim.relaxation['dmdts'].append([sim.t, max_dmdt()])
+            sim.relaxation['energies'].append(np.nan)
 
             # Continue iterating if dm/dt is not low enough.
             if sim.relaxation['dmdts'][-1][1] >\
@@ -111,8 +192,7 @@ def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
             if len(sim.relaxation['dmdts']) >= 2:
                 if (sim.relaxation['dmdts'][-1][1] >
                         sim.relaxation['dmdts'][-2][1] and
-                        sim.relaxation['energies'][-1] >
-                        sim.relaxation['energies'][-2]):
+                        energy(-1) > energy(-2)):
 
                     # Since dm/dt has increased, we increment the counter.
                     sim.relaxation['dmdt_increased_counter'] += 1
@@ -143,17 +223,22 @@ def relax(sim, save_vtk_snapshot_as=None, save_restart_data_as=None,
                 return False
 
         # Update values for the next integration.
-        sim.relaxation['last_m'] = sim.m.copy()
+        sim.relaxation['last_m'] = current_m()
         sim.relaxation['last_time'] = sim.t
 
     dt_interval = functools.partial(dt_interval, sim)
+    # The checks compare the magnetisation at successive check times, and
+    # the relaxation ends at one of them, so the integrator has to stop
+    # there exactly (hard_stop) rather than interpolate.
     sim.scheduler.add(trigger, every=dt_interval,
-                      after=1e-14 if sim.t < 1e-14 else sim.t)
+                      after=1e-14 if sim.t < 1e-14 else sim.t, hard_stop=True)
 
-    sim.scheduler.run(sim.integrator, sim.callbacks_at_scheduler_events)
+    with profiled_run(sim, 'relax'):
+        sim.scheduler.run(sim.integrator, sim.callbacks_at_scheduler_events)
     sim.integrator.reinit()  # TODO: Is this still needed now that set_m also calls reinit()?
                              #       However, there it happens *after* setting m.
     sim.set_m(sim.m)
+    sim.flush_output()
     log.info("Relaxation finished at time t = {:.2g}.".format(sim.t))
 
     # Save a vtk snapshot and/or restart data of the relaxed state.
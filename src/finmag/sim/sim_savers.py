@@ -1,7 +1,7 @@
 import finmag
 
 from finmag.util.vtk_saver import VTKSaver
-from finmag.util.fileio import FieldSaver
+from finmag.util.fileio import FieldSaver, FieldHistoryWriter, FIELD_HISTORY_EXT
 
 #-------------------------------------------------------------------------
 # npy savers
@@ -20,6 +20,13 @@ def _save_m_incremental(sim, filename=None, overwrite=False):
 def _get_field_saver(sim, field_name, filename=None, overwrite=False, incremental=False):
     if filename is None:
         filename = '{}_{}.npy'.format(sim.sanitized_name, field_name.lower())
+    if incremental and filename.endswith(FIELD_HISTORY_EXT):
+        # Save all snapshots into a single file.
+        s = sim.field_savers.get(filename, None)
+        if s is None:
+            s = FieldHistoryWriter(filename, overwrite=overwrite)
+            sim.field_savers[filename] = s
+        return s
     if not filename.endswith('.npy'):
         filename += '.npy'
 
@@ -38,6 +45,11 @@ def save_field(sim, field_name, filename=None, incremental=False, overwrite=Fals
     """
     Save the given field data to a .npy file.
 
+    If `incremental` is True and `filename` ends in '.fhist', all
+    snapshots (together with the simulation time) are appended to this
+    single file instead of being saved to separate .npy files. Such
+    files can be read with finmag.util.fileio.FieldHistoryReader.
+
     *Arguments*
 
     field_name : string
@@ -65,7 +77,21 @@ def save_field(sim, field_name, filename=None, incremental=False, overwrite=Fals
     field_data = sim.get_field_as_dolfin_function(field_name, region=region)
     field_saver = _get_field_saver(
         sim, field_name, filename, incremental=incremental, overwrite=overwrite)
-    field_saver.save(field_data.vector().array())
+    kwargs = {}
+    if isinstance(field_saver, FieldHistoryWriter):
+        kwargs['t'] = sim.t
+    if sim.async_writer is None:
+        field_saver.save(field_data.vector().array(), **kwargs)
+    else:
+        # Copy into a recycled buffer function; the conversion to a numpy
+        # array then happens in the writer thread.
+        sim.async_writer.submit(
+            _save_function_values, field_saver,
+            sim.async_writer.snapshot_function(field_data), **kwargs)
+
+
+def _save_function_values(field_saver, f, **kwargs):
+    field_saver.save(f.vector().array(), **kwargs)
 
 
 #-------------------------------------------------------------------------
@@ -78,13 +104,23 @@ def save_field(sim, field_name, filename=None, incremental=False, overwrite=Fals
 #-------------------------------------------------------------------------
 
 def _save_m_to_vtk(sim, vtk_saver):
-    vtk_saver.save_field(sim.llg._m_field.f, sim.t)
+    if sim.async_writer is None:
+        vtk_saver.save_field(sim.llg._m_field.f, sim.t)
+    else:
+        sim.async_writer.submit(
+            vtk_saver.save_field,
+            sim.async_writer.snapshot_function(sim.llg._m_field.f), sim.t)
 
 def _save_field_to_vtk(sim, field_name, vtk_saver, region=None):
     field_data = sim.get_field_as_dolfin_function(
         field_name, region=region)
+    if sim.async_writer is not None:
+        field_data = sim.async_writer.snapshot_function(field_data)
     field_data.rename(field_name, field_name)
-    vtk_saver.save_field(field_data, sim.t)
+    if sim.async_writer is None:
+        vtk_saver.save_field(field_data, sim.t)
+    else:
+        sim.async_writer.submit(vtk_saver.save_field, field_data, sim.t)
 
 def save_vtk(sim, filename=None, overwrite=False, region=None):
     """
@@ -162,6 +162,19 @@ class TestSimulation(object):
         m_probed_outside = sim.probe_field("m", [5, -6,  1])
         assert((np.ma.getmask(m_probed_outside) == True).all())
 
+    def test_probe_plans_are_reused(self):
+        mesh = df.BoxMesh(df.Point(-2, -2, -2), df.Point(2, 2, 2), 5, 5, 5)
+        sim = sim_with(mesh, Ms=8.6e5, m_init=(1, 0, 0), unit_length=1e-9,
+                       demag_solver=None)
+        pts = [[0, 0, 0], [1, 1, -0.5], [5, -6, 1]]
+        vals1 = sim.probe_field('m', pts)
+        sim.set_m((0, 1, 0))
+        vals2 = sim.probe_field('m', pts)
+        assert len(sim._probe_plans) == 1
+        assert np.allclose(vals1[:2], [1, 0, 0])
+        assert np.allclose(vals2[:2], [0, 1, 0])
+        assert np.ma.getmask(vals2)[2].all()
+
     def test_probe_nonconstant_m_at_individual_points(self):
         TOL = 1e-5
 
@@ -728,6 +741,38 @@ class TestSimulation(object):
         assert(len(glob('barmini_m_[0-9]*.npy')) == 6)
         assert(len(glob('mag_[0-9]*.npy')) == 3)
 
+    def test_save_field_with_async_output(self, tmpdir):
+        os.chdir(str(tmpdir))
+        sim = barmini()
+        sim.use_async_output()
+        sim.schedule('save_field', 'm', every=1e-12)
+        sim.run_until(2.5e-12)
+        sim.use_async_output(False)
+        files = sorted(glob('barmini_m_[0-9]*.npy'))
+        assert(len(files) == 3)
+        assert np.load(files[-1]).shape == sim.m.shape
+
+    def test_async_output_is_detached_after_writer_error(self, tmpdir):
+        os.chdir(str(tmpdir))
+        sim = barmini()
+        sim.use_async_output()
+
+        def fail():
+            raise IOError("disk full")
+        sim.async_writer.submit(fail)
+        with pytest.raises(IOError):
+            sim.use_async_output(False)
+        assert sim.async_writer is None
+        assert sim.tablewriter.async_writer is None
+        sim.save_ndt()  # synchronous saving works again
+
+        sim.use_async_output()
+        sim.async_writer.submit(fail)
+        with pytest.raises(IOError):
+            sim.shutdown()
+        # the rest of the shutdown still happened
+        assert not hasattr(sim.tablewriter, 'sim')
+
     def test_sim_sllg(self, do_plot=False):
         mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(2, 2, 2), 1, 1, 1)
         sim = Simulation(mesh, 8.6e5, unit_length=1e-9, kernel='sllg')
@@ -1981,6 +2026,42 @@ def test_profile(tmpdir):
     os.path.exists('foobar.prof')
 
 
+def test_profiling_reports(tmpdir):
+    os.chdir(str(tmpdir))
+    sim = barmini()
+    sim.enable_profiling(ndt_columns=True)
+    try:
+        sim.schedule('save_ndt', every=1e-12)
+        sim.run_until(5e-12)
+        sim.relax(stopping_dmdt=100)
+    finally:
+        sim.enable_profiling(False)
+    sim.run_until(6e-12)  # not recorded
+
+    assert [r['call'] for r in sim.profiling_reports] == ['run_until', 'relax']
+    report = sim.profiling_report()
+    assert report['t_start'] == 5e-12 and report['t_end'] == sim.t
+
+    report = sim.profiling_reports[0]
+    assert report['integrator']['nfevals'] > 0
+    assert report['counts']['field/updates'] >= report['integrator']['nfevals']
+    for section in ['integration', 'field/Exchange', 'demag/first linear solve',
+                    'demag/BEM matvec', 'demag/second linear solve',
+                    'demag/gradient', 'scheduled/save_ndt']:
+        assert report['times'][section] > 0
+    assert report['counts']['demag/first linear solve iterations'] > 0
+    assert report['calls']['scheduled/save_ndt'] == 6
+
+    import json
+    filename = sim.save_profiling_report()
+    with open(filename) as f:
+        assert len(json.load(f)) == 2
+
+    from finmag.util.fileio import Tablereader
+    data = Tablereader('barmini.ndt')
+    assert np.all(np.diff(data['profile_rhs_evals']) >= 0)
+
+
 def test_clean_up():
     """Fake test to shutdown simulation objects"""
     s = barmini()
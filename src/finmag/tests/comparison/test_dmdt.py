@@ -3,6 +3,7 @@ import numpy as np
 from finmag.physics.llg import LLG
 from finmag.energies import Zeeman
 from finmag.util.oommf import mesh, oommf_dmdt
+from finmag.util.oommf.comparison import finmag_to_oommf
 from finmag.util.helpers import stats
 
 TOLERANCE = 1e-15
@@ -47,15 +48,10 @@ def test_dmdt_computation_with_oommf():
         m0, Ms, A=0, H=H_app, alpha=0.5, gamma_G=llg.gamma).flat
 
     # extract finmag data for comparison with oommf
-    dmdt_finmag_like_oommf = msh.new_field(3)
-    for i, (x, y, z) in enumerate(msh.iter_coords()):
-        dmdt_x, dmdt_y, dmdt_z = dmdt_finmag(x, y, z)
-        dmdt_finmag_like_oommf.flat[0, i] = dmdt_x
-        dmdt_finmag_like_oommf.flat[1, i] = dmdt_y
-        dmdt_finmag_like_oommf.flat[2, i] = dmdt_z
+    dmdt_finmag_like_oommf = finmag_to_oommf(dmdt_finmag, msh, dims=3)
 
     # compare
-    difference = np.abs(dmdt_finmag_like_oommf.flat - dmdt_oommf)
+    difference = np.abs(dmdt_finmag_like_oommf - dmdt_oommf)
     relative_difference = difference / np.max(np.sqrt(dmdt_oommf[0] ** 2 +
                                                       dmdt_oommf[1] ** 2 + dmdt_oommf[2] ** 2))
     print "comparison with oommf, dm/dt, relative difference:"
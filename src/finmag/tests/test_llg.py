@@ -2,6 +2,7 @@ import numpy as np
 import dolfin as df
 from finmag.physics.llg import LLG
 from finmag.util.helpers import components
+from finmag.energies import Exchange
 
 
 def test_method_of_computing_the_average_matters():
@@ -21,3 +22,86 @@ def test_method_of_computing_the_average_matters():
     average2 = np.mean(components(llg.m_numpy), axis=1)
     diff = np.abs(average1 - average2)
     assert diff.max() > 5e-2
+
+
+def test_fast_rhs_agrees_with_default_rhs():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 10), 3, 3, 3)
+    S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+
+    llg = LLG(S1, S3, unit_length=1e-9)
+    llg.set_m(('x[0]', 'x[1]', '1'))
+    llg.set_alpha(df.Expression('0.1 + 0.01 * x[2]', degree=1))
+    llg.effective_field.add(Exchange(13e-12))
+    llg.pins = [0, 5]
+
+    y = llg.sundials_m
+    ydot_default = np.zeros(y.shape)
+    llg.sundials_rhs(0, y, ydot_default)
+    dmdt_default = llg.dmdt
+
+    llg.fast_rhs = True
+    ydot_fast = np.zeros(y.shape)
+    llg.sundials_rhs(0, y, ydot_fast)
+
+    assert np.allclose(ydot_fast, ydot_default, atol=0, rtol=1e-14)
+    assert np.allclose(llg.dmdt, dmdt_default, atol=0, rtol=1e-14)
+    assert np.allclose(llg.solve_for(y, 0), ydot_default, atol=0, rtol=1e-14)
+
+    # alpha is cached, so the fast path must notice when it is set again
+    llg.set_alpha(0.5)
+    llg.sundials_rhs(0, y, ydot_fast)
+    llg.fast_rhs = False
+    llg.sundials_rhs(0, y, ydot_default)
+    assert np.allclose(ydot_fast, ydot_default, atol=0, rtol=1e-14)
+
+
+def test_fast_rhs_reuses_its_buffers():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 10), 3, 3, 3)
+    S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+
+    llg = LLG(S1, S3, unit_length=1e-9, fast_rhs=True)
+    llg.set_m(('x[0]', 'x[1]', '1'))
+    llg.effective_field.add(Exchange(13e-12))
+
+    y = llg.sundials_m
+    ydot = np.zeros(y.shape)
+    llg.sundials_rhs(0, y, ydot)
+    buffers = [llg._m_dof, llg._H_eff_xxx, llg._dmdt_xxx,
+               llg.effective_field.H_eff]
+    addresses = [b.__array_interface__['data'][0] for b in buffers]
+
+    for t in [1e-12, 2e-12, 3e-12]:
+        llg.sundials_rhs(t, y, ydot)
+    assert llg._m_dof is buffers[0]
+    assert llg._H_eff_xxx is buffers[1]
+    assert llg._dmdt_xxx is buffers[2]
+    assert llg.effective_field.H_eff is buffers[3]
+    assert [b.__array_interface__['data'][0] for b in buffers] == addresses
+
+
+def test_fast_rhs_agrees_with_default_rhs_with_spin_torque():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 10, 10), 3, 3, 3)
+    S1 = df.FunctionSpace(mesh, "Lagrange", 1)
+    S3 = df.VectorFunctionSpace(mesh, "Lagrange", 1, dim=3)
+
+    for use_stt in [lambda llg: llg.use_slonczewski(1e10, 0.4, 10e-9, (0, 1, 0)),
+                    lambda llg: llg.use_zhangli(J_profile=(1e10, 0, 0))]:
+        llg = LLG(S1, S3, unit_length=1e-9)
+        llg.set_m(('x[0]', 'x[1]', '1'))
+        # Ms must be non-uniform, otherwise a mix-up between dof and
+        # vertex order goes unnoticed
+        llg.Ms = df.Expression('8e5 * (1 + 0.1 * x[0])', degree=1)
+        llg.effective_field.add(Exchange(13e-12))
+        use_stt(llg)
+
+        y = llg.sundials_m
+        ydot_default = np.zeros(y.shape)
+        llg.sundials_rhs(0, y, ydot_default)
+
+        llg.fast_rhs = True
+        ydot_fast = np.zeros(y.shape)
+        llg.sundials_rhs(0, y, ydot_fast)
+
+        assert np.allclose(ydot_fast, ydot_default, atol=0, rtol=1e-14)
@@ -0,0 +1,157 @@
+"""
+Background thread which performs the (slow) formatting, compression and
+writing of output data so that time integration can continue meanwhile.
+
+The simulation thread takes snapshots of the data to be saved (into
+buffers which are recycled once the data has been written) and submits
+jobs to a bounded queue. If the queue is full, submitting blocks until
+the writer thread catches up, so the amount of memory used for pending
+output is limited.
+
+"""
+import sys
+import logging
+import threading
+import Queue
+import numpy as np
+
+log = logging.getLogger(name="finmag")
+
+
+class AsyncWriter(object):
+
+    """
+    Execute output jobs in a background thread, in the order in which
+    they were submitted.
+
+    Example:
+
+        writer = AsyncWriter()
+        writer.submit(np.save, 'm.npy', writer.snapshot(m))
+        ...
+        writer.flush()  # wait until everything has been written
+
+    If a job raises an exception, the jobs which are still pending are
+    skipped and no further jobs are accepted: the exception is re-raised
+    in the simulation thread by every subsequent call of `submit`,
+    `flush` or `close`.
+
+    """
+
+    def __init__(self, max_pending=8):
+        self.max_pending = max_pending
+        self._queue = Queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._free = {}     # buffers which can be reused, by key
+        self._in_use = {}   # id(buffer) -> (key, buffer)
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name="finmag-async-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            func, args, kwargs = job
+            try:
+                if self._error is None:
+                    func(*args, **kwargs)
+                else:
+                    log.warning("Skipping output job {} because of an "
+                                "earlier error in the background writer.".format(
+                                    getattr(func, '__name__', func)))
+            except Exception:
+                self._error = sys.exc_info()
+                log.error("Error in background writer: {}".format(
+                    self._error[1]))
+            finally:
+                self._release(list(args) + kwargs.values())
+                self._queue.task_done()
+
+    def _take(self, key):
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+        return None
+
+    def _hold(self, key, buf):
+        with self._lock:
+            self._in_use[id(buf)] = (key, buf)
+        return buf
+
+    def _release(self, args):
+        with self._lock:
+            for a in args:
+                entry = self._in_use.pop(id(a), None)
+                if entry is not None:
+                    key, buf = entry
+                    self._free.setdefault(key, []).append(buf)
+
+    def snapshot(self, a):
+        """
+        Return a copy of the numpy array `a` in a buffer which is reused
+        once the job it is passed to has been executed.
+        """
+        a = np.asarray(a)
+        key = (a.shape, a.dtype.str)
+        buf = self._take(key)
+        if buf is None:
+            buf = np.empty_like(a)
+        buf[...] = a
+        return self._hold(key, buf)
+
+    def snapshot_function(self, f):
+        """
+        Return a copy of the dolfin Function `f` which is reused once the
+        job it is passed to has been executed.
+        """
+        # the key holds a reference to the function space, so that it
+        # cannot be confused with a later one at the same address
+        key = ('function', f.function_space())
+        g = self._take(key)
+        if g is None:
+            g = f.copy(deepcopy=True)
+        else:
+            g.assign(f)
+        g.rename(f.name(), f.label())
+        return self._hold(key, g)
+
+    def _check_error(self):
+        if self._error is not None:
+            error = self._error
+            raise error[0], error[1], error[2]
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Call `func(*args, **kwargs)` in the writer thread. Blocks if
+        `max_pending` jobs are waiting already.
+
+        Snapshots (see `snapshot`) passed as arguments are recycled after
+        the call. Any other arrays must not be modified by the caller
+        afterwards.
+        """
+        self._check_error()
+        if not self._thread.is_alive():
+            raise RuntimeError("The background writer has been closed.")
+        self._queue.put((func, args, kwargs))
+
+    def flush(self):
+        """
+        Wait until all submitted jobs have been executed.
+        """
+        self._queue.join()
+        self._check_error()
+
+    def close(self):
+        """
+        Execute all pending jobs and stop the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check_error()
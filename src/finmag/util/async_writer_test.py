@@ -0,0 +1,95 @@
+import threading
+import numpy as np
+import pytest
+from async_writer import AsyncWriter
+
+
+def test_jobs_are_executed_in_order():
+    writer = AsyncWriter(max_pending=2)
+    results = []
+    for i in xrange(20):
+        writer.submit(results.append, i)
+    writer.flush()
+    assert results == range(20)
+    writer.close()
+
+
+def test_snapshots_are_copies_and_buffers_are_reused():
+    writer = AsyncWriter()
+    results = []
+
+    def record(a):
+        results.append((id(a), a.copy()))
+
+    a = np.arange(5.0)
+    for i in xrange(3):
+        snapshot = writer.snapshot(a)
+        a += 1  # does not affect the snapshot
+        writer.submit(record, snapshot)
+        writer.flush()
+    writer.close()
+
+    for i, (_, saved) in enumerate(results):
+        assert np.allclose(saved, np.arange(5.0) + i)
+    # Since each job finished before the next snapshot was taken,
+    # the same buffer was used every time.
+    assert len(set(buf_id for buf_id, _ in results)) == 1
+
+
+def test_submit_blocks_when_queue_is_full():
+    writer = AsyncWriter(max_pending=1)
+    release = threading.Event()
+    writer.submit(release.wait)  # occupies the writer thread
+    writer.submit(lambda: None)  # fills the queue
+
+    submitted = threading.Event()
+
+    def submit_another():
+        writer.submit(lambda: None)
+        submitted.set()
+
+    t = threading.Thread(target=submit_another)
+    t.start()
+    assert not submitted.wait(0.2)
+    release.set()
+    t.join()
+    assert submitted.is_set()
+    writer.close()
+
+
+def test_errors_are_reraised():
+    writer = AsyncWriter()
+
+    def fail():
+        raise IOError("disk full")
+
+    writer.submit(fail)
+    with pytest.raises(IOError):
+        writer.flush()
+
+    # Later jobs are refused instead of being dropped silently
+    results = []
+    with pytest.raises(IOError):
+        writer.submit(results.append, 1)
+    with pytest.raises(IOError):
+        writer.close()
+    assert results == []
+
+
+def test_jobs_pending_after_an_error_are_not_lost_silently():
+    writer = AsyncWriter()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise IOError("disk full")
+
+    results = []
+    writer.submit(fail)
+    writer.submit(results.append, 1)  # queued before the error occurs
+    release.set()
+    with pytest.raises(IOError):
+        writer.flush()
+    with pytest.raises(IOError):
+        writer.submit(results.append, 2)
+    assert results == []
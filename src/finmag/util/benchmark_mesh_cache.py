@@ -0,0 +1,41 @@
+"""
+Benchmark of the time it takes to load a mesh from the mesh cache (HDF5)
+compared to reading it from the gzipped XML files which `from_geofile`
+writes next to the .geo file.
+
+"""
+import os
+import time
+import shutil
+import tempfile
+import dolfin as df
+from finmag.util.mesh_cache import MeshCache
+
+
+def timed(f, *args):
+    start = time.time()
+    result = f(*args)
+    return result, time.time() - start
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    cache = MeshCache(directory=os.path.join(directory, 'cache'),
+                      max_size=1e12)
+    print "{:>10} {:>10} | {:>10} {:>10} | {:>8}".format(
+        "cells", "vertices", "xml.gz [s]", "cache [s]", "speedup")
+    try:
+        for n in [10, 20, 40, 60, 80]:
+            mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(1, 1, 1), n, n, n)
+            xmlfile = os.path.join(directory, 'mesh_{}.xml.gz'.format(n))
+            df.File(xmlfile) << mesh
+            key = 'box_{}'.format(n)
+            cache.store(key, mesh)
+
+            _, t_xml = timed(df.Mesh, xmlfile)
+            _, t_cache = timed(cache.load, key)
+            print "{:10d} {:10d} | {:10.3f} {:10.3f} | {:8.1f}".format(
+                mesh.num_cells(), mesh.num_vertices(), t_xml, t_cache,
+                t_xml / t_cache)
+    finally:
+        shutil.rmtree(directory)
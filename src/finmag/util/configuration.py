@@ -114,4 +114,26 @@ use_xpra = True
 # Tell xpra which display to use ('None' means try to find any available
 # unused X display). This setting has no effect if xpra is disabled.
 use_display = None
+
+[demag]
+# Boundary element matrices computed by the FK demag solver are stored in
+# this directory and reused for later simulations on the same geometry.
+# Set bem_cache = False to switch this off.
+bem_cache = True
+bem_cache_dir = ~/.finmag/bem_cache
+
+# Maximum size of the cache in bytes (default: 2 GB). The least recently
+# used matrices are removed when this limit is exceeded.
+bem_cache_max_size = 2147483648
+
+[meshes]
+# Meshes generated with Netgen are stored in this directory in HDF5 format
+# and reused when the same geometry is meshed again. Set mesh_cache = False
+# to switch this off.
+mesh_cache = True
+mesh_cache_dir = ~/.finmag/mesh_cache
+
+# Maximum size of the cache in bytes (default: 2 GB). The least recently
+# used meshes are removed when this limit is exceeded.
+mesh_cache_max_size = 2147483648
 """
@@ -0,0 +1,127 @@
+"""
+Base class for persistent on-disk caches of expensive results.
+
+Each entry is a directory named after its key (usually a hash of the
+input data) inside the cache directory. Several processes may use the
+same cache directory: entries are written to a temporary directory first
+and then renamed into place (which is atomic), and eviction of the least
+recently used entries is serialised with a lock file.
+
+"""
+import os
+import time
+import errno
+import fcntl
+import shutil
+import tempfile
+import logging
+
+logger = logging.getLogger('finmag')
+
+
+class DiskCache(object):
+
+    """
+    A directory of cache entries with a maximum total size of `max_size`
+    bytes. Subclasses implement loading and storing the entries, using
+    `_entry` and `_store`. `description` is used in log messages.
+
+    """
+    description = 'cache entry'
+
+    def __init__(self, directory, max_size):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = int(max_size)
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def _touch(self, key):
+        try:
+            os.utime(self._entry(key), None)  # mark as recently used
+        except OSError:
+            pass
+
+    def _store(self, key, write):
+        """
+        Call `write(path)` to write the files of the entry `key` into the
+        directory `path`, then move them into place. If another process
+        stores the same entry at the same time, the first one to finish
+        wins.
+
+        """
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            tmpdir = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                logger.warning("Could not create cache directory '{}' "
+                               "({}).".format(self.directory, e.strerror))
+            return
+        try:
+            write(tmpdir)
+            os.rename(tmpdir, self._entry(key))
+            logger.debug("Stored {} in cache '{}'.".format(
+                self.description, self._entry(key)))
+        except (IOError, OSError, RuntimeError) as e:
+            # Either the entry exists already because another process was
+            # faster, or the disk is full; in both cases we just carry on.
+            logger.debug("Could not store {} in cache ({}).".format(
+                self.description, e))
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        Return a list of tuples (last_used, size, path) of all entries.
+
+        """
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f))
+                           for f in os.listdir(path))
+                result.append((os.path.getmtime(path), size, path))
+            except OSError:
+                pass  # removed by another process in the meantime
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the total size of the
+        cache is below `max_size`.
+
+        """
+        if not os.path.isdir(self.directory):
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                entries = sorted(self.entries())
+                total = sum(size for _, size, _ in entries)
+                for _, size, path in entries:
+                    if total <= self.max_size:
+                        break
+                    # Rename first so that concurrent readers never see a
+                    # partially deleted entry. Memory-mapped files which are
+                    # still open remain valid after deletion.
+                    trash = os.path.join(self.directory, '.deleted-{}-{}'.format(
+                        os.path.basename(path), time.time()))
+                    try:
+                        os.rename(path, trash)
+                    except OSError:
+                        continue
+                    shutil.rmtree(trash, ignore_errors=True)
+                    total -= size
+                    logger.debug("Evicted '{}' from cache.".format(path))
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
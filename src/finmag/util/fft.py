@@ -1,7 +1,7 @@
 from __future__ import division
 from scipy.interpolate import InterpolatedUnivariateSpline
-from finmag.util.helpers import probe
-from finmag.util.fileio import Tablereader
+from finmag.util.probing import ProbePlan
+from finmag.util.fileio import Tablereader, FieldHistoryReader, FIELD_HISTORY_EXT
 from glob import glob
 from time import time
 import numpy as np
@@ -16,18 +16,25 @@ def _aux_fft_m(filename, t_step=None, t_ini=None, t_end=None, subtract_values='f
     """
     Helper function to compute the Fourier transform of magnetisation
     data, which is either read from a single .ndt file (for spatially
-    averaged magnetisation) or from a series of .npy files (for
-    spatially resolved data). If necessary, the data is first
-    resampled at regularly spaced time intervals.
+    averaged magnetisation) or from a single .fhist file or a series of
+    .npy files (for spatially resolved data). If necessary, the data is
+    first resampled at regularly spaced time intervals.
 
     """
     # Load the data; extract time steps and magnetisation
-    if filename.endswith('.ndt'):
+    if filename.endswith('.ndt') or filename.endswith('.ndtb'):
         data = Tablereader(filename)
         ts = data['time']
         mx = data['m_x']
         my = data['m_y']
         mz = data['m_z']
+    elif filename.endswith(FIELD_HISTORY_EXT):
+        # Only read the requested time window and vertices.
+        ts, m = FieldHistoryReader(filename).read(
+            t_ini=t_ini, t_end=t_end, vertex_indices=vertex_indices)
+        mx = m[:, 0, :]
+        my = m[:, 1, :]
+        mz = m[:, 2, :]
     elif filename.endswith('.npy'):
         if t_ini == None or t_end == None or t_step == None:
             raise ValueError(
@@ -58,7 +65,7 @@ def _aux_fft_m(filename, t_step=None, t_ini=None, t_end=None, subtract_values='f
             mz[i, :] = aa[2, vertex_indices]
     else:
         raise ValueError(
-            "Expected a single .ndt file or a wildcard pattern referring to a series of .npy files. Got: {}.".format(filename))
+            "Expected a single .ndt or .fhist file or a wildcard pattern referring to a series of .npy files. Got: {}.".format(filename))
 
     # If requested, subtract the first value of the time series
     # (= relaxed state), or the average, or some other value.
@@ -198,9 +205,9 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
     values of the Fourier coefficients) of the x, y and z components
     of the magnetisation m, where the magnetisation data is either
     read from a .ndt file (for spatially averages magnetisation; not
-    recommended, see below) or from a series of data files in .npy
-    format (recommended). If necessary, the data is first resampled at
-    regularly spaced time intervals.
+    recommended, see below) or from a .fhist file or a series of data
+    files in .npy format (recommended). If necessary, the data is first
+    resampled at regularly spaced time intervals.
 
     Note that this performs a real-valued Fourier transform (i.e. it
     uses np.fft.rfft internally) and thus does not return Fourier
@@ -210,7 +217,8 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
     transform of the average magneisation is computed. Note that this
     is *not* recommended since it may not detect modes that have
     certain symmetries which are averaged out by this method. A better
-    way is to pass in a series of .npy files, which takes the
+    way is to pass in a .fhist file (as written by `sim.save_m` with
+    `incremental=True`) or a series of .npy files, which takes the
     spatially resolved magnetisation into account.
 
 
@@ -218,8 +226,9 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
 
     filename:
 
-        The .ndt file or .npy files containing the magnetisation values.
-        In the second case a pattern should be given (e.g. 'm_ringdown*.npy').
+        The .ndt file, .fhist file or .npy files containing the
+        magnetisation values. In the last case a pattern should be
+        given (e.g. 'm_ringdown*.npy').
 
     t_step:
 
@@ -253,7 +262,7 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
 
         This argument only has an effect when computing the spectrum
         from spatially resolved magnetisation data (i.e., from a
-        series of .npy files). If `restrict_to_vertices` is `None`
+        .fhist file or a series of .npy files). If `restrict_to_vertices` is `None`
         (the default), all mesh vertices are taken into account.
         Otherwise `restrict_to_vertices` should be a list of vertex
         indices. The spectrum then is then computed for the
@@ -267,10 +276,13 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
     of the magnetisation and freqs are the corresponding frequencies.
 
     """
-    if not filename.endswith('.npy') and restrict_to_vertices != None:
+    spatially_resolved = filename.endswith('.npy') or \
+        filename.endswith(FIELD_HISTORY_EXT)
+    if not spatially_resolved and restrict_to_vertices != None:
         logger.warning("Ignoring argument 'restrict_to_vertices' because it "
                        "can only be used when reading the spatially resolved "
-                       "magnetisation from a list of .npy files.")
+                       "magnetisation from a .fhist file or a list of .npy "
+                       "files.")
 
     freqs, fft_mx, fft_my, fft_mz = \
         _aux_fft_m(filename, t_step=t_step, t_ini=t_ini, t_end=t_end,
@@ -280,7 +292,7 @@ def compute_power_spectral_density(filename, t_step=None, t_ini=None, t_end=None
     psd_my = np.absolute(fft_my) ** 2
     psd_mz = np.absolute(fft_mz) ** 2
 
-    if filename.endswith('.npy'):
+    if spatially_resolved:
         # Compute the power spectra and then do the spatial average
         psd_mx = psd_mx.sum(axis=-1)
         psd_my = psd_my.sum(axis=-1)
@@ -479,7 +491,8 @@ def fft_at_probing_points(dolfin_funcs, pts):
     over time as probed at the point (X[...], Y[...], Z[...]).
 
     """
-    vals_probed = np.ma.masked_array([probe(f, pts) for f in dolfin_funcs])
+    plan = ProbePlan(dolfin_funcs[0].function_space().mesh(), pts)
+    vals_probed = plan.evaluate_many(dolfin_funcs)
     # vals_fft = np.ma.masked_array(np.fft.fft(vals_probed, axis=0),
     #                              mask=np.ma.getmask(vals_probed))
     # freqs = np.fft.fftfreq(
@@ -591,14 +604,16 @@ def plot_spatially_resolved_normal_modes(m_vals_on_grid, idx_fourier_coeff,
 
 def export_normal_mode_animation_from_ringdown(npy_files, outfilename, mesh, t_step, k, scaling=0.2, dm_only=False, num_cycles=1, num_frames_per_cycle=20):
     """
-    Read a bunch of .npy files (containing the magnetisation sampled
-    at regular time steps) and export an animation of the normal mode
-    corresponding to a specific frequency.
+    Read a bunch of .npy files or a .fhist file (containing the
+    magnetisation sampled at regular time steps) and export an animation
+    of the normal mode corresponding to a specific frequency.
 
     npy_files :  string (including shell wildcards) or list of filenames
 
         The list of files containing the magnetisation values sampled
         at the mesh vertices. There should be one file per stime step.
+        Alternatively, the name of a single .fhist file containing all
+        time steps.
 
     outfilename :  string
 
@@ -640,38 +655,43 @@ def export_normal_mode_animation_from_ringdown(npy_files, outfilename, mesh, t_s
         total number of exported frames is (num_frames_per_cycle * num_cycles).
 
     """
-    files = sorted(glob(npy_files)) if isinstance(
-        npy_files, str) else list(npy_files)
-    if len(files) == 0:
-        logger.error("Cannot produce normal mode animation. No input .npy "
-                     "files found matching '{}'".format(npy_files))
+    if isinstance(npy_files, str) and npy_files.endswith(FIELD_HISTORY_EXT):
+        history = FieldHistoryReader(npy_files)
+        N = len(history)  # number of timesteps
+        snapshots = history.iter_chunks()
+    else:
+        files = sorted(glob(npy_files)) if isinstance(
+            npy_files, str) else list(npy_files)
+        N = len(files)  # number of timesteps
+        snapshots = ((i, np.load(filename)[np.newaxis, :])
+                     for (i, filename) in enumerate(files))
+    if N == 0:
+        logger.error("Cannot produce normal mode animation. No input "
+                     "data found in '{}'".format(npy_files))
         return
 
     if isinstance(mesh, str):
         mesh = df.Mesh(mesh)
 
-    N = len(files)  # number of timesteps
     num_nodes = mesh.num_vertices()
 
-    # Read in the magnetisation dynamics from each .npy file and store
-    # it as successive time steps in the array 'signal'.
-    signal = np.empty([N, 3 * num_nodes])
-    for (i, filename) in enumerate(files):
-        signal[i, :] = np.load(filename)
-    logger.debug("Array with magnetisation dynamics occupies "
-                 "{} MB of memory".format(signal.nbytes / 1024 ** 2))
-
-    # Fourier transform the signal
+    # Only the k-th Fourier coefficient (at each mesh node) and the mean
+    # of the magnetisation dynamics are needed, so we accumulate them
+    # while reading the snapshots instead of keeping all of them in
+    # memory and transforming the whole signal.
     t0 = time()
-    fft_vals = np.fft.rfft(signal, axis=0)
+    A_k = np.zeros(3 * num_nodes, dtype=complex)
+    signal_mean = np.zeros(3 * num_nodes)
+    for (start, values) in snapshots:
+        n = start + np.arange(len(values))
+        A_k += np.exp(-2j * pi * k * n / N).dot(values)
+        signal_mean += values.sum(axis=0)
+    signal_mean /= N
     t1 = time()
     logger.debug(
-        "Computing the Fourier transform took {:.2g} seconds".format(t1 - t0))
-    fft_freqs = np.fft.fftfreq(N, d=t_step)[:len(fft_vals)]
+        "Computing the Fourier coefficient took {:.2g} seconds".format(t1 - t0))
+    fft_freqs = np.fft.fftfreq(N, d=t_step)[:N // 2 + 1]
 
-    # Only keep the k-th Fourier coefficient at each mesh node
-    # (combined in the array A_k).
-    A_k = fft_vals[k]
     abs_k = np.abs(A_k)[np.newaxis, :]
     theta_k = np.angle(A_k)[np.newaxis, :]
 
@@ -705,8 +725,7 @@ def export_normal_mode_animation_from_ringdown(npy_files, outfilename, mesh, t_s
     if dm_only == True:
         signal_normal_mode = 1 / maxval * signal_filtered
     else:
-        signal_normal_mode = signal.mean(
-            axis=0).T + scaling / maxval * signal_filtered
+        signal_normal_mode = signal_mean + scaling / maxval * signal_filtered
 
     # XXX TODO: Should check for an existing file and ask for confirmation
     # whether it should be overwritten!
@@ -2,8 +2,10 @@ from __future__ import division
 from fft import *
 from numpy import sqrt, sin, cos, pi, exp, real, conj
 from finmag.util.consts import gamma
+from finmag.util.fileio import FieldHistoryWriter
 import numpy as np
 import os
+from glob import glob
 import pytest
 import matplotlib.pyplot as plt
 import fft_test_helpers
@@ -336,6 +338,40 @@ def test_power_spectral_density_from_spatially_resolved_magnetisation_confined_t
         fig.savefig('psd_m_McMichaelStiles.png')
 
 
+def test_power_spectral_density_from_field_history_agrees_with_npy_files(tmpdir):
+    """
+    Save the same artificial magnetisation dynamics to a series of .npy
+    files and to a single .fhist file and check that the spectra computed
+    from them (for a subset of the vertices) agree.
+
+    """
+    os.chdir(str(tmpdir))
+    t_step = 1e-11
+    t_ini = 0
+    t_end = 2e-9
+    N1 = 42
+    N2 = 23
+    fft_test_helpers.create_test_npy_files_with_two_regions(
+        str(tmpdir), t_step, t_ini, t_end, gamma * 1e6, 0.5, N1, gamma * 2.8e4, 0.3, N2)
+
+    npy_files = sorted(glob('m_ringdown*.npy'))
+    writer = FieldHistoryWriter('m_ringdown.fhist')
+    for (i, filename) in enumerate(npy_files):
+        writer.save(np.load(filename), t=t_ini + i * t_step)
+    writer.close()
+    t_end = t_ini + (len(npy_files) - 1) * t_step
+
+    vertices = range(0, N1 + N2, 3)
+    res_npy = compute_power_spectral_density(
+        'm_ringdown*.npy', t_step, t_ini=t_ini, t_end=t_end,
+        restrict_to_vertices=vertices)
+    res_fhist = compute_power_spectral_density(
+        'm_ringdown.fhist', t_step, t_ini=t_ini, t_end=t_end,
+        restrict_to_vertices=vertices)
+    for a, b in zip(res_npy, res_fhist):
+        assert np.allclose(a, b, atol=0, rtol=1e-12)
+
+
 def test_find_peak_near_frequency(tmpdir, debug=False):
     """
     Check that `find_peak_near_frequency` works as expected, including
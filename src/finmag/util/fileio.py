@@ -1,4 +1,7 @@
 import os
+import json
+import time
+import struct
 import logging
 import types
 import numpy as np
@@ -84,6 +87,9 @@ class Tablewriter(object):
 
         self.filename = filename
         self.sim = simulation
+        # If set to an AsyncWriter, rows are written in its background
+        # thread (the values are still obtained when `save` is called).
+        self.async_writer = None
         # in what order to write data
         if entity_order:
             self.entity_order = entity_order
@@ -121,6 +127,13 @@ class Tablewriter(object):
             dic = {'unit': '<>',
                   'get': lambda sim: sim.m_average,
                   'header': ('m_x', 'm_y', 'm_z')}
+
+        If the entity is the spatial average of a finmag.Field, the
+        dictionary may also contain the key 'field' (a function that
+        takes the simulation object and returns the Field) and optionally
+        'dx' (the measure to average over). All such entities with the same
+        measure are then averaged together by `finmag.field.average_many`
+        instead of calling their 'get' functions one by one.
         """
         if self.save_head:
             raise RuntimeError("Attempt to add entity '{}'->'{}' to ndt file {}" +
@@ -153,6 +166,18 @@ class Tablewriter(object):
         #    name, self.filename, self._entities[name]['get'], new_get_method))
 
         self._entities[name]['get'] = new_get_method
+        self._entities[name].pop('field', None)
+
+    def set_entity_field(self, name, field, dx=None):
+        """
+        Declare that the entity `name` is the spatial average of the Field
+        returned by `field(sim)` over the measure `dx` (see `add_entity`).
+        """
+        assert name in self._entities, "Couldn't find '{}' in {}".format(
+            name, self._entities.keys())
+        self._entities[name]['field'] = field
+        if dx is not None:
+            self._entities[name]['dx'] = dx
 
     def delete_entity_get_method(self, name):
         """We cannot delete entities once they are created (as this would change the number of columns in the
@@ -165,6 +190,7 @@ class Tablewriter(object):
             name, self.filename))
 
         self._entities[name]['get'] = lambda sim: np.NAN
+        self._entities[name].pop('field', None)
 
     def delete_entity_get_methods(self):
         """Method to delete all get_methods. 
@@ -207,18 +233,58 @@ class Tablewriter(object):
                              self._entities[entityname]['unit'])
         return "".join(line1) + "\n" + "".join(line2) + "\n"
 
+    def _write_head(self):
+        f = open(self.filename, 'w')
+        # Write header
+        f.write(self.headers())
+        f.close()
+        self.save_head = True
+
     @timer.method
     def save(self):
         """Append data (spatial averages of fields) for current
         configuration"""
 
         if not self.save_head:
-            f = open(self.filename, 'w')
-            # Write header
-            f.write(self.headers())
-            f.close()
-            self.save_head = True
+            self._write_head()
+
+        values = self._get_values()
+        if self.async_writer is None:
+            self._write_row(values)
+        else:
+            # The values are written later, so make sure they are not
+            # modified in the meantime.
+            values = [np.array(v) if isinstance(v, np.ndarray) else v
+                      for v in values]
+            self.async_writer.submit(self._write_row, values)
+
+    def _get_values(self):
+        """
+        Return the list of the current values of all entities.
+        """
+        averages = {}
+        batches = {}
+        for name in self.entity_order:
+            entity = self._entities[name]
+            if 'field' in entity:
+                dx = entity.get('dx')
+                batches.setdefault(repr(dx), (dx, []))[1].append(name)
+        if batches:
+            from finmag.field import average_many
+            for dx, names in batches.itervalues():
+                fields = [self._entities[name]['field'](self.sim)
+                          for name in names]
+                if dx is None:
+                    values = average_many(fields)
+                else:
+                    values = average_many(fields, dx=dx)
+                averages.update(zip(names, values))
+
+        return [averages[name] if name in averages
+                else self._entities[name]['get'](self.sim)
+                for name in self.entity_order]
 
+    def _write_row(self, values):
         # open file
         with open(self.filename, 'a') as f:
             f.write(' ' * len(self.comment_symbol))  # account for comment
@@ -238,8 +304,7 @@ class Tablewriter(object):
 #                    self.ncolumn_headings_written, len(self.entity_order))
 #                logger.error(msg)
 #                raise ValueError(msg)
-            for entityname in self.entity_order:
-                value = self._entities[entityname]['get'](self.sim)
+            for value in values:
                 if isinstance(value, np.ndarray):
 
                     for v in value:
@@ -257,6 +322,179 @@ class Tablewriter(object):
 
             f.write('\n')
 
+    def flush(self):
+        """
+        Make sure all saved data has been written to the file. This is a
+        no-op because `save` writes each row directly.
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+# Binary tables start with this magic string, followed by the length of
+# a JSON header (as a little-endian unsigned 64 bit integer), the header
+# itself and then the rows of the table as little-endian float64 values.
+BINARY_TABLE_MAGIC = 'FMGTABLE'
+BINARY_TABLE_VERSION = 1
+
+
+def _read_json_head(f, magic, filename):
+    if f.read(len(magic)) != magic:
+        raise IOError("File '{}' is not of the expected format.".format(filename))
+    head_len, = struct.unpack('<Q', f.read(8))
+    head = json.loads(f.read(head_len))
+    return head, len(magic) + 8 + head_len
+
+
+def _json_head(magic, head):
+    head = json.dumps(head)
+    # Pad the header so that the data is aligned to 8 bytes.
+    head += ' ' * (-(len(head) + len(magic) + 8) % 8)
+    return magic + struct.pack('<Q', len(head)) + head
+
+
+def _row_values(value):
+    """
+    Convert the value returned by the 'get' method of an entity into a
+    list of floats.
+    """
+    if isinstance(value, np.ndarray):
+        return [float(v) for v in value.ravel()]
+    elif isinstance(value, float) or isinstance(value, int):
+        return [float(value)]
+    elif isinstance(value, types.NoneType):
+        return [np.NAN]
+    else:
+        msg = "Can only deal with numpy arrays, float and int " + \
+            "so far, but type is %s" % type(value)
+        raise NotImplementedError(msg)
+
+
+class BinaryTablewriter(Tablewriter):
+
+    """
+    Drop-in replacement for Tablewriter which stores the table in a
+    binary file instead of the text based .ndt format.
+
+    The file is kept open and saved rows are collected in a buffer which
+    is written to disk once it holds `buffer_size` rows, if more than
+    `flush_interval` seconds (of wall clock time) have passed since the
+    last write, or when `flush` or `close` are called. This avoids
+    reopening the file and formatting every value as text for each call
+    of `save`.
+
+    The file can be read with Tablereader (which memory-maps the data
+    instead of parsing it) and converted into an .ndt file using
+    `export_ndt`.
+
+    """
+
+    def __init__(self, filename, simulation, override=False, entity_order=None,
+                 entities=None, buffer_size=1000, flush_interval=60):
+        super(BinaryTablewriter, self).__init__(
+            filename, simulation, override=override,
+            entity_order=entity_order, entities=entities)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.ncolumns = None
+        self.f = None
+        self._buffer = []
+        self._last_flush = time.time()
+
+    def column_headers(self):
+        """
+        Return two lists with the column headers and units of the table.
+        """
+        headers = []
+        units = []
+        for entityname in self.entity_order:
+            colheaders = self._entities[entityname]['header']
+            if isinstance(colheaders, str):
+                colheaders = [colheaders]
+            for colhead in colheaders:
+                headers.append(colhead)
+                units.append(self._entities[entityname]['unit'])
+        return headers, units
+
+    def _write_head(self):
+        headers, units = self.column_headers()
+        self.f = open(self.filename, 'wb')
+        self.f.write(_json_head(BINARY_TABLE_MAGIC,
+                                {'version': BINARY_TABLE_VERSION,
+                                 'headers': headers,
+                                 'units': units}))
+        self.f.flush()
+        self.ncolumns = len(headers)
+        self.save_head = True
+
+    def _write_row(self, values):
+        if self.f is None:
+            # The table has been closed before, continue appending.
+            self.f = open(self.filename, 'ab')
+
+        row = []
+        for value in values:
+            row.extend(_row_values(value))
+        if len(row) != self.ncolumns:
+            raise ValueError(
+                "Expected {} values for a row of table '{}' but got {}.".format(
+                    self.ncolumns, self.filename, len(row)))
+        self._buffer.append(row)
+
+        if (len(self._buffer) >= self.buffer_size or
+                time.time() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered rows to the file.
+        """
+        if self.f is not None and self._buffer:
+            np.array(self._buffer, dtype='<f8').tofile(self.f)
+            self.f.flush()
+            self._buffer = []
+        self._last_flush = time.time()
+
+    def close(self):
+        """
+        Write all buffered rows and close the file. Calling `save`
+        afterwards reopens the file and appends to it.
+        """
+        self.flush()
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def export_ndt(self, ndt_filename):
+        """
+        Write the data saved so far to the text file `ndt_filename`.
+        """
+        self.flush()
+        export_ndt(self.filename, ndt_filename)
+
+
+def export_ndt(filename, ndt_filename):
+    """
+    Convert the table in `filename` (as written by Tablewriter or
+    BinaryTablewriter) into the text based .ndt format and save it as
+    `ndt_filename`.
+    """
+    table = Tablereader(filename)
+    comment_symbol = Tablewriter.comment_symbol
+    # Use the same formatting as Tablewriter.
+    float_format = "%18.12g "
+    string_format = "%18s "
+    with open(ndt_filename, 'w') as f:
+        for line in (table.headers, table.units):
+            f.write(comment_symbol +
+                    "".join(string_format % h for h in line) + "\n")
+        fmt = [' ' * len(comment_symbol) + float_format] + \
+            [float_format] * (len(table.headers) - 1)
+        np.savetxt(f, table.data, fmt=fmt, delimiter='')
+    logger.debug("Exported table '{}' to '{}'.".format(filename, ndt_filename))
+
 
 class Tablereader(object):
 
@@ -277,12 +515,20 @@ class Tablereader(object):
         except IOError:
             raise RuntimeError("Cannot see file '%s'" % self.filename)
 
+        is_binary = self.f.read(len(BINARY_TABLE_MAGIC)) == BINARY_TABLE_MAGIC
+        self.f.seek(0)
+        if is_binary:
+            self._load_binary()
+            return
+
         line1 = self.f.readline()
         line2 = self.f.readline()
         headers = line1.split()
         units = line2.split()
 
         assert len(headers) == len(units)
+        self.headers = headers[1:]
+        self.units = units[1:]
 
         # use numpy to read remaining data (genfromtxt will
         # complain if there are rows with different sizes)
@@ -309,6 +555,37 @@ class Tablereader(object):
 
         self.datadic = datadic
 
+    def _load_binary(self):
+        """
+        Memory-map the data of a table written by BinaryTablewriter. The
+        columns in `datadic` are views into the file, so only the parts
+        which are accessed are actually read from disk.
+        """
+        head, offset = _read_json_head(self.f, BINARY_TABLE_MAGIC, self.filename)
+        self.f.close()
+        if head['version'] != BINARY_TABLE_VERSION:
+            raise RuntimeError("Unsupported version {} of binary table "
+                               "'{}'.".format(head['version'], self.filename))
+        self.headers = head['headers']
+        self.units = head['units']
+
+        ncolumns = len(self.headers)
+        row_bytes = 8 * ncolumns
+        nbytes = os.path.getsize(self.filename) - offset
+        nrows = nbytes // row_bytes
+        if nbytes % row_bytes != 0:
+            logger.warning("Ignoring incomplete last row of table '{}'. Maybe "
+                           "the file is still being written?".format(self.filename))
+        if nrows > 0:
+            # Map copy-on-write so that (like for text files) the columns
+            # can be modified without touching the file.
+            self.data = np.memmap(self.filename, dtype='<f8', mode='c',
+                                  offset=offset, shape=(nrows, ncolumns))
+        else:
+            self.data = np.zeros((0, ncolumns))
+        self.datadic = dict((entity, self.data[:, i])
+                            for i, entity in enumerate(self.headers))
+
     def entities(self):
         """Returns list of available entities"""
         return self.datadic.keys()
@@ -395,6 +672,186 @@ class FieldSaver(object):
         np.save(cur_filename, data)
         self.counter += 1
 
+    def close(self):
+        pass
+
+
+# Field histories start with this magic string, followed by the length
+# of a JSON header (as a little-endian unsigned 64 bit integer) and the
+# header itself. After that there is one record per snapshot, consisting
+# of the time followed by the field values (all as little-endian float64).
+FIELD_HISTORY_MAGIC = 'FMGFHIST'
+FIELD_HISTORY_VERSION = 1
+FIELD_HISTORY_EXT = '.fhist'
+
+
+class FieldHistoryWriter(object):
+
+    """
+    Save snapshots of a field (e.g. the magnetisation during a ringdown)
+    into a single file instead of one .npy file per snapshot.
+
+    The file is kept open and each call of `save` appends one record,
+    so saving is cheap even for many thousands of snapshots. Use
+    FieldHistoryReader to read the snapshots (or parts of them).
+
+    This can be used in place of an incremental FieldSaver.
+
+    """
+
+    incremental = True
+
+    def __init__(self, filename, overwrite=False):
+        if not filename.endswith(FIELD_HISTORY_EXT):
+            filename += FIELD_HISTORY_EXT
+
+        dirname = os.path.dirname(filename)
+        if dirname != '' and not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        if os.path.exists(filename):
+            if overwrite == False:
+                raise IOError(
+                    "Will not overwrite existing file '{}'. Use 'overwrite=True' "
+                    "if this is what you want.".format(filename))
+            logger.debug("Overwriting existing file '{}'.".format(filename))
+            os.remove(filename)
+
+        self.filename = filename
+        self.size = None
+        self.counter = 0
+        self.f = None
+
+    def save(self, data, t=np.NAN):
+        """
+        Append the snapshot `data` (a 1D numpy array) taken at time `t`.
+        All snapshots must have the same size.
+
+        """
+        data = np.asarray(data, dtype='<f8').ravel()
+        if self.size is None:
+            self.size = len(data)
+            self.f = open(self.filename, 'wb')
+            self.f.write(_json_head(FIELD_HISTORY_MAGIC,
+                                    {'version': FIELD_HISTORY_VERSION,
+                                     'size': self.size}))
+        elif self.f is None:
+            self.f = open(self.filename, 'ab')
+        if len(data) != self.size:
+            raise ValueError(
+                "All snapshots saved to '{}' must have size {}, got {}.".format(
+                    self.filename, self.size, len(data)))
+
+        self.f.write(struct.pack('<d', t))
+        data.tofile(self.f)
+        # Make the snapshot visible to readers without closing the file.
+        self.f.flush()
+        self.counter += 1
+
+    def close(self):
+        """
+        Close the file. Calling `save` afterwards appends to it again.
+        """
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+class FieldHistoryReader(object):
+
+    """
+    Read snapshots saved by FieldHistoryWriter.
+
+    The file is memory-mapped, so only those parts of it which are
+    actually accessed are read from disk. This makes it cheap to
+    extract a time window or the values at a subset of the vertices.
+
+    The snapshots are assumed to be vectors of a 3D field whose
+    components are stored one after the other (i.e. they are reshaped
+    as (3, num_vertices), like the magnetisation saved with `save_m`).
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        if not os.path.exists(filename):
+            raise RuntimeError("Cannot see file '%s'" % filename)
+        self.reload()
+
+    def reload(self):
+        """
+        Map the file again (e.g. to see snapshots saved since the last
+        time it was read).
+        """
+        with open(self.filename, 'rb') as f:
+            head, offset = _read_json_head(f, FIELD_HISTORY_MAGIC, self.filename)
+        if head['version'] != FIELD_HISTORY_VERSION:
+            raise RuntimeError("Unsupported version {} of field history "
+                               "'{}'.".format(head['version'], self.filename))
+        self.size = head['size']
+        self.num_vertices = self.size // 3
+
+        record_len = self.size + 1
+        nbytes = os.path.getsize(self.filename) - offset
+        N = nbytes // (8 * record_len)
+        if N > 0:
+            self._records = np.memmap(self.filename, dtype='<f8', mode='r',
+                                      offset=offset, shape=(N, record_len))
+        else:
+            self._records = np.zeros((0, record_len))
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def times(self):
+        """Array with the times at which the snapshots were saved."""
+        return np.array(self._records[:, 0])
+
+    def __getitem__(self, i):
+        """Return the i-th snapshot as a 1D array."""
+        return np.array(self._records[i, 1:])
+
+    def time_window(self, t_ini=None, t_end=None, rtol=1e-8):
+        """
+        Return the slice of snapshot indices whose times t satisfy
+        t_ini <= t <= t_end (up to a relative tolerance `rtol` of the
+        total time span).
+        """
+        ts = self.times
+        if len(ts) == 0:
+            return slice(0, 0)
+        eps = rtol * max(abs(ts[-1] - ts[0]), abs(ts[-1]))
+        start = 0 if t_ini is None else np.searchsorted(ts, t_ini - eps, 'left')
+        stop = len(ts) if t_end is None else np.searchsorted(ts, t_end + eps, 'right')
+        return slice(start, stop)
+
+    def read(self, t_ini=None, t_end=None, vertex_indices=None):
+        """
+        Return a pair (ts, values), where `ts` are the times of the
+        snapshots between `t_ini` and `t_end` (default: all snapshots)
+        and `values` is an array of shape (len(ts), 3, k) which contains
+        the field values at the given k vertices (default: all vertices).
+
+        """
+        window = self.time_window(t_ini, t_end)
+        values = self._records[window, 1:].reshape(-1, 3, self.num_vertices)
+        if vertex_indices is None:
+            values = np.array(values)
+        else:
+            values = np.array(values[:, :, np.asarray(vertex_indices)])
+        return np.array(self._records[window, 0]), values
+
+    def iter_chunks(self, chunk_size=100):
+        """
+        Iterate over the snapshots in chunks of `chunk_size`. Yields
+        pairs (start, values), where `values` is an array of shape
+        (n, size) containing the snapshots start, ..., start + n - 1.
+
+        """
+        for start in xrange(0, len(self), chunk_size):
+            yield start, np.array(self._records[start:start + chunk_size, 1:])
+
 
 def demo2():
 
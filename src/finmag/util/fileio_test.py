@@ -51,6 +51,79 @@ def test_Table_writer_and_reader(tmpdir):
         Tablereader(os.path.join(MODULE_DIR, 'test-incomplete-data.ndt'))
 
 
+def test_binary_Tablewriter_and_export_ndt(tmpdir):
+    os.chdir(str(tmpdir))
+
+    class FakeSim(object):
+        t = 0.0
+        m_average = np.array([1.0, 0.0, 0.0])
+
+    sim = FakeSim()
+    ndt = Tablewriter('data.ndt', sim)
+    ndtb = BinaryTablewriter('data.ndtb', sim, buffer_size=3)
+    times = np.linspace(0, 1e-11, 8)
+    for t in times:
+        sim.t = t
+        sim.m_average = np.array([np.cos(t * 1e11), np.sin(t * 1e11), 0.1])
+        ndt.save()
+        ndtb.save()
+
+    # Only complete buffers have been written so far
+    assert len(Tablereader('data.ndtb').timesteps()) == 6
+    ndtb.flush()
+
+    text = Tablereader('data.ndt')
+    binary = Tablereader('data.ndtb')
+    assert sorted(binary.entities()) == sorted(text.entities())
+    assert np.allclose(binary.timesteps(), times, rtol=0, atol=1e-25)
+    for entity in text.entities():
+        assert np.allclose(binary[entity], text[entity], equal_nan=True)
+
+    # Saving after closing appends to the file
+    ndtb.close()
+    ndtb.save()
+    ndtb.close()
+    assert len(Tablereader('data.ndtb').timesteps()) == 9
+
+    ndtb.export_ndt('exported.ndt')
+    exported = Tablereader('exported.ndt')
+    assert exported.headers == binary.headers
+    assert exported.units == binary.units
+    assert np.allclose(exported['m_x'][:-1], text['m_x'])
+
+
+def test_Tablewriter_with_async_writer(tmpdir):
+    from finmag.util.async_writer import AsyncWriter
+    os.chdir(str(tmpdir))
+
+    class FakeSim(object):
+        t = 0.0
+        m_average = np.array([1.0, 0.0, 0.0])
+
+    sim = FakeSim()
+    sync = Tablewriter('sync.ndt', sim)
+    writer = AsyncWriter(max_pending=2)
+    for filename in ['async.ndt', 'async.ndtb']:
+        cls = BinaryTablewriter if filename.endswith('.ndtb') else Tablewriter
+        ndt = cls(filename, sim)
+        ndt.async_writer = writer
+        for t in np.linspace(0, 1e-11, 5):
+            sim.t = t
+            # Modified in place after saving, must not affect the table
+            sim.m_average[:] = [np.cos(t * 1e11), np.sin(t * 1e11), 0.0]
+            ndt.save()
+            if cls is Tablewriter:
+                sync.save()
+            sim.m_average[:] = 0
+        writer.flush()
+        ndt.close()
+        expected = Tablereader('sync.ndt')
+        data = Tablereader(filename)
+        for entity in expected.entities():
+            assert np.allclose(data[entity], expected[entity], equal_nan=True)
+    writer.close()
+
+
 def test_Tablewriter_complains_about_changing_entities():
     import finmag
     sim = finmag.example.barmini(name='tmp-test-fileio2')
@@ -98,6 +171,23 @@ def test_Tablewriter_complains_about_incomplete_entities():
         sim.tablewriter.add_entity('test4', {})
 
 
+def test_Tablewriter_averages_field_entities_together(tmpdir):
+    os.chdir(str(tmpdir))
+    import finmag
+    sim = finmag.example.barmini(name='tmp-test-fileio3')
+    sim.tablewriter.add_entity(
+        'M', {'header': ('M_x', 'M_y', 'M_z'), 'unit': '<A/m>',
+              'get': lambda s: s.llg.M_average,
+              'field': lambda s: s.llg._m_field})
+    values = sim.tablewriter._get_values()
+    m_average = values[sim.tablewriter.entity_order.index('m')]
+    assert np.allclose(m_average, sim.m_average)
+    # The 'field' key takes precedence over 'get'.
+    M_average = values[sim.tablewriter.entity_order.index('M')]
+    assert np.allclose(M_average, sim.m_average)
+
+
+
 def test_field_saver(tmpdir):
     os.chdir(str(tmpdir))
 
@@ -143,6 +233,46 @@ def test_field_saver(tmpdir):
     assert(len(glob('data_npy.foo*.npy')) == 1)
 
 
+def test_field_history(tmpdir):
+    os.chdir(str(tmpdir))
+
+    snapshots = np.random.random_sample((7, 3 * 5))
+    ts = np.linspace(0, 6e-12, 7)
+
+    s = FieldHistoryWriter('history/m')
+    assert s.filename == 'history/m.fhist'
+    for t, a in zip(ts, snapshots):
+        s.save(a, t=t)
+
+    # Snapshots are readable before the writer is closed
+    h = FieldHistoryReader('history/m.fhist')
+    assert len(h) == 7
+    assert np.allclose(h.times, ts)
+    assert np.allclose(h[3], snapshots[3])
+
+    # All snapshots must have the same size
+    with pytest.raises(ValueError):
+        s.save(np.zeros(3))
+    s.close()
+
+    # Reading a time window and a subset of the vertices
+    ts_read, values = h.read(t_ini=1e-12, t_end=4e-12, vertex_indices=[0, 3])
+    assert np.allclose(ts_read, ts[1:5])
+    expected = snapshots.reshape(7, 3, 5)[1:5][:, :, [0, 3]]
+    assert values.shape == (4, 3, 2)
+    assert np.allclose(values, expected)
+
+    chunks = list(h.iter_chunks(chunk_size=3))
+    assert [start for start, _ in chunks] == [0, 3, 6]
+    assert np.allclose(np.concatenate([c for _, c in chunks]), snapshots)
+
+    with pytest.raises(IOError):
+        # Existing files should not be overwritten
+        FieldHistoryWriter('history/m.fhist')
+    FieldHistoryWriter('history/m.fhist', overwrite=True)
+    assert not os.path.exists('history/m.fhist')
+
+
 if __name__ == "__main__":
     test_Table_writer_and_reader()
     test_field_saver()
@@ -6,6 +6,7 @@ from finmag.util.fileio import Tablereader
 from finmag.util.visualization import render_paraview_scene
 from finmag.util.versions import get_version_dolfin
 from finmag.util import ansistrm
+from finmag.util.probing import ProbePlan, is_cg1
 from threading import Timer
 from distutils.version import LooseVersion
 import subprocess as sp
@@ -1231,7 +1232,7 @@ def vector_field_from_dolfin_function(f, xlims=None, ylims=None, zlims=None,
     return X, Y, Z, U, V, W
 
 
-def probe(dolfin_function, points, apply_func=None):
+def probe(dolfin_function, points, apply_func=None, plan=None):
     """
     Probe the dolfin function at the given points.
 
@@ -1254,6 +1255,12 @@ def probe(dolfin_function, points, apply_func=None):
         Optional function to be applied to the returned values. If not
         provided, the values are returned unchanged.
 
+    plan: finmag.util.probing.ProbePlan
+
+        Optional probe plan for the mesh of `dolfin_function` and
+        `points`. If the same points are probed repeatedly, pass a plan
+        to avoid locating the points in the mesh each time.
+
     *Returns*
 
     A numpy.ma.masked_array of the same shape as `pts`, where the last
@@ -1262,6 +1269,11 @@ def probe(dolfin_function, points, apply_func=None):
     Elements in the output array corresponding to probing point outside
     the mesh are masked out.
 
+    CG1 functions are interpolated with a `ProbePlan`; other functions
+    are evaluated point by point. Building the plan still locates the
+    points one at a time, so only repeated probing of the same points
+    with the same plan is faster than pointwise evaluation.
+
     """
     points = np.array(points)
     if not points.shape[-1] == 3:
@@ -1270,6 +1282,36 @@ def probe(dolfin_function, points, apply_func=None):
             "i.e. the last axis must have dimension 3. Shape of "
             "'pts' is: {}".format(points.shape))
 
+    if not is_cg1(dolfin_function.function_space()):
+        return _probe_pointwise(dolfin_function, points, apply_func)
+
+    if plan is None:
+        plan = ProbePlan(dolfin_function.function_space().mesh(), points)
+    vals = plan(dolfin_function)
+
+    output_shape = np.array(
+        apply_func([0, 0, 0]) if apply_func else [0, 0, 0]).shape
+    inside = ~plan.outside
+    values = vals.data[inside]
+    if apply_func is not None:
+        values = np.array([apply_func(v) for v in values])
+
+    res = np.ma.empty(points.shape[:-1] + output_shape)
+    res.mask = np.zeros_like(res, dtype=bool)
+    res_inside = np.empty((len(values),) + output_shape)
+    # Scalar fields are broadcast to all three components (as they would
+    # be when evaluated point by point).
+    res_inside[:] = values.reshape(
+        values.shape + (1,) * (1 + len(output_shape) - values.ndim))
+    res[inside] = res_inside
+    res.mask[plan.outside] = True
+    return res
+
+
+def _probe_pointwise(dolfin_function, points, apply_func=None):
+    """
+    Like `probe`, but evaluates the function at one point at a time.
+    """
     if apply_func == None:
         # use the identity operation by default
         apply_func = lambda x: x
@@ -1304,7 +1346,8 @@ def probe(dolfin_function, points, apply_func=None):
     return res
 
 
-def probe_along_line(dolfin_function, pt_start, pt_end, N, apply_func=None):
+def probe_along_line(dolfin_function, pt_start, pt_end, N, apply_func=None,
+                     plan=None):
     """
     Probe the dolfin function at the `N` equidistant points along a straight
     line connecting `pt_start` and `pt_end`.
@@ -1328,6 +1371,10 @@ def probe_along_line(dolfin_function, pt_start, pt_end, N, apply_func=None):
         Optional function to be applied to the returned values. If not
         provided, the values are returned unchanged.
 
+    plan: finmag.util.probing.ProbePlan
+
+        Optional probe plan for these points (see `probe`).
+
     *Returns*
 
     A tuple `(pts, vals)` where `pts` is the list of probing points
@@ -1337,13 +1384,21 @@ def probe_along_line(dolfin_function, pt_start, pt_end, N, apply_func=None):
     the field values in case it is provided.). Elements in the output
     array corresponding to probing point outside the mesh are masked out.
 
+    """
+    pts = points_along_line(pt_start, pt_end, N)
+    vals = probe(dolfin_function, pts, apply_func=apply_func, plan=plan)
+    return pts, vals
+
+
+def points_along_line(pt_start, pt_end, N):
+    """
+    Return the `N` equidistant points on the straight line connecting
+    `pt_start` and `pt_end` as an array of shape (N, 3).
     """
     pt_start = np.asarray(pt_start)
     pt_end = np.asarray(pt_end)
-    pts = np.array(
-        [(1 - t) * pt_start + t * pt_end for t in np.linspace(0, 1, N)])
-    vals = probe(dolfin_function, pts, apply_func=apply_func)
-    return pts, vals
+    ts = np.linspace(0, 1, N)[:, np.newaxis]
+    return (1 - ts) * pt_start + ts * pt_end
 
 
 def compute_dmdt(t0, m0, t1, m1):
@@ -1814,6 +1869,23 @@ def print_boundary_element_matrix_size(mesh, generalised=False):
                      mesh.num_vertices(), N, make_human_readable(memory_usage)))
 
 
+def petsc_matrix_to_csr(A, row_scale=None):
+    """
+    Convert the dolfin PETScMatrix `A` into a scipy.sparse.csr_matrix.
+
+    If `row_scale` is given, row i of the result is multiplied by
+    row_scale[i] (for example the inverse nodal volumes, so that the
+    result maps m directly onto the field instead of onto g * m).
+
+    """
+    from scipy.sparse import csr_matrix, diags
+    indptr, indices, data = df.as_backend_type(A).mat().getValuesCSR()
+    A_csr = csr_matrix((data, indices, indptr), shape=(A.size(0), A.size(1)))
+    if row_scale is not None:
+        A_csr = diags(row_scale, 0).dot(A_csr).tocsr()
+    return A_csr
+
+
 def build_maps(functionspace, dim=3, scalar=False):
     v2d_xyz = df.vertex_to_dof_map(functionspace)
     d2v_xyz = df.dof_to_vertex_map(functionspace)
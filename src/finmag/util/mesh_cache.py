@@ -0,0 +1,169 @@
+"""
+Persistent on-disk cache for meshes generated with Netgen.
+
+Running Netgen and reading the result back from a gzipped XML file is slow
+for large meshes. Since the mesh only depends on the geometry description
+(the contents of the .geo file) and the options passed to Netgen, it is
+stored in a shared cache directory under a hash of these and reused by
+`finmag.util.meshes.from_geofile` and all the functions based on it
+(`from_csg`, `box`, `sphere`, ...). Meshes are stored in dolfin's HDF5
+format, which loads much faster than XML, together with the cell markers
+of the mesh domains.
+
+The cache directory and its maximum size can be set in the [meshes]
+section of the .finmagrc file (see `finmag.util.configuration`). When the
+size limit is exceeded, the least recently used meshes are removed.
+Several processes may use the same cache directory (see
+`finmag.util.disk_cache`).
+
+"""
+import os
+import hashlib
+import logging
+import numpy as np
+import dolfin as df
+from finmag.util import configuration
+from finmag.util.disk_cache import DiskCache
+
+logger = logging.getLogger('finmag')
+
+DEFAULT_CACHE_DIR = "~/.finmag/mesh_cache"
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # bytes
+
+# Part of the cache key, to be increased when the format of the entries
+# changes.
+FORMAT_VERSION = 1
+
+
+def mesh_cache_enabled():
+    """
+    Return False if the mesh cache was switched off in the .finmagrc file
+    (option 'mesh_cache' in section [meshes]), otherwise True.
+
+    """
+    value = configuration.get_config_option('meshes', 'mesh_cache', 'True')
+    return value.strip().lower() not in ['false', 'no', 'off', '0']
+
+
+def get_mesh_cache(mesh_cache=None):
+    """
+    Return the MeshCache to use for the argument `mesh_cache` of the mesh
+    generation functions, or None: the default cache if `mesh_cache` is
+    None (and the cache is enabled in the .finmagrc file) or True, no cache
+    if it is False, and `mesh_cache` itself if it is a MeshCache.
+
+    """
+    if mesh_cache is None:
+        return MeshCache() if mesh_cache_enabled() else None
+    if mesh_cache is True:
+        return MeshCache()
+    return mesh_cache or None
+
+
+def get_cell_markers(mesh):
+    """
+    Return the markers of the cells of `mesh` (as stored in mesh.domains())
+    as an array of pairs (cell index, marker).
+
+    """
+    markers = mesh.domains().markers(mesh.topology().dim())
+    return np.array(sorted(markers.items()), dtype=np.int64).reshape(-1, 2)
+
+
+def set_cell_markers(mesh, markers):
+    """
+    Set the cell markers of `mesh` to the pairs (cell index, marker) in
+    `markers`, unless the mesh has cell markers already.
+
+    """
+    dim = mesh.topology().dim()
+    domains = mesh.domains()
+    if len(markers) == 0 or len(domains.markers(dim)) > 0:
+        return
+    for cell, marker in markers.tolist():
+        domains.set_marker((cell, marker), dim)
+
+
+class MeshCache(DiskCache):
+
+    """
+    Content-addressed cache of meshes generated with Netgen.
+
+    *Arguments*
+
+    directory: string
+
+        The cache directory. Defaults to the option 'mesh_cache_dir' in the
+        [meshes] section of the .finmagrc file, or '~/.finmag/mesh_cache'.
+
+    max_size: int
+
+        Maximum total size of the cache in bytes. Defaults to the option
+        'mesh_cache_max_size' in the [meshes] section of the .finmagrc
+        file, or 2 GB.
+
+    """
+    description = 'mesh'
+
+    def __init__(self, directory=None, max_size=None):
+        if directory is None:
+            directory = configuration.get_config_option(
+                'meshes', 'mesh_cache_dir', DEFAULT_CACHE_DIR)
+        if max_size is None:
+            max_size = configuration.get_config_option(
+                'meshes', 'mesh_cache_max_size', DEFAULT_MAX_SIZE)
+        super(MeshCache, self).__init__(directory, max_size)
+
+    @staticmethod
+    def key(geo, netgen_options=''):
+        """
+        Return the cache key for the mesh generated by Netgen with the
+        command line options `netgen_options` from the geometry
+        description `geo` (the contents of a .geo file).
+
+        """
+        h = hashlib.sha1()
+        h.update('format {}\n'.format(FORMAT_VERSION))
+        h.update(netgen_options + '\n')
+        h.update(geo)
+        return h.hexdigest()
+
+    def load(self, key):
+        """
+        Return the mesh stored under `key`, or None if there is no such
+        entry.
+
+        """
+        entry = self._entry(key)
+        filename = os.path.join(entry, 'mesh.h5')
+        if not os.path.isfile(filename):
+            return None
+        try:
+            mesh = df.Mesh()
+            h5file = df.HDF5File(mesh.mpi_comm(), filename, 'r')
+            h5file.read(mesh, 'mesh', False)
+            h5file.close()
+            markers = np.load(os.path.join(entry, 'cell_markers.npy'))
+        except (IOError, OSError, RuntimeError, ValueError) as e:
+            logger.debug("Could not load mesh from cache '{}' ({}).".format(
+                entry, e))
+            return None
+        set_cell_markers(mesh, markers)
+        self._touch(key)
+        logger.debug("Loaded mesh from cache '{}'.".format(entry))
+        return mesh
+
+    def store(self, key, mesh):
+        """
+        Store `mesh` under `key`. If another process stores the same entry
+        at the same time, the first one to finish wins.
+
+        """
+        def write(path):
+            h5file = df.HDF5File(
+                mesh.mpi_comm(), os.path.join(path, 'mesh.h5'), 'w')
+            h5file.write(mesh, 'mesh')
+            h5file.close()
+            np.save(os.path.join(path, 'cell_markers.npy'),
+                    get_cell_markers(mesh))
+        self._store(key, write)
@@ -0,0 +1,81 @@
+import numpy as np
+import dolfin as df
+import pytest
+from finmag.util import meshes
+from finmag.util.mesh_cache import MeshCache, get_cell_markers
+
+
+def marked_mesh():
+    mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(4, 2, 1), 4, 2, 1)
+    for cell in df.cells(mesh):
+        mesh.domains().set_marker(
+            (cell.index(), int(cell.midpoint().x() > 2)), 3)
+    return mesh
+
+
+def test_store_and_load(tmpdir):
+    cache = MeshCache(directory=str(tmpdir))
+    mesh = marked_mesh()
+    assert cache.load('abc') is None
+
+    cache.store('abc', mesh)
+    loaded = cache.load('abc')
+    assert np.array_equal(loaded.coordinates(), mesh.coordinates())
+    assert np.array_equal(loaded.cells(), mesh.cells())
+    assert np.array_equal(get_cell_markers(loaded), get_cell_markers(mesh))
+    assert len(cache.entries()) == 1
+
+
+def test_key_depends_on_geometry_and_options():
+    key = MeshCache.key("algebraic3d\nsolid s = sphere (0, 0, 0; 1);\n")
+    assert key == MeshCache.key("algebraic3d\nsolid s = sphere (0, 0, 0; 1);\n")
+    assert key != MeshCache.key("algebraic3d\nsolid s = sphere (0, 0, 0; 2);\n")
+    assert key != MeshCache.key("algebraic3d\nsolid s = sphere (0, 0, 0; 1);\n",
+                                netgen_options="-fine")
+
+
+def test_least_recently_used_meshes_are_evicted(tmpdir):
+    cache = MeshCache(directory=str(tmpdir))
+    mesh = marked_mesh()
+    cache.store('a', mesh)
+    cache.max_size = 1.5 * cache.size()
+    cache.store('b', mesh)
+    assert cache.load('a') is None
+    assert cache.load('b') is not None
+
+
+def test_from_csg_reuses_cached_mesh(tmpdir, monkeypatch):
+    cache = MeshCache(directory=str(tmpdir.join('cache')))
+    csg = "algebraic3d\nsolid main = orthobrick (0, 0, 0; 10, 10, 2) -maxh = 2.0;\ntlo main;\n"
+    mesh = meshes.from_csg(csg, save_result=False, mesh_cache=cache)
+    assert len(cache.entries()) == 1
+
+    def netgen_must_not_run(geofile):
+        raise AssertionError("Netgen should not be called.")
+    monkeypatch.setattr(meshes, 'run_netgen', netgen_must_not_run)
+
+    # the same geometry under another name is found in the cache
+    mesh2 = meshes.from_csg(csg, filename='other_name',
+                            directory=str(tmpdir), mesh_cache=cache)
+    assert np.array_equal(mesh2.coordinates(), mesh.coordinates())
+    assert np.array_equal(get_cell_markers(mesh2), get_cell_markers(mesh))
+
+    with pytest.raises(AssertionError):
+        meshes.from_csg(csg.replace('2.0', '1.0'), save_result=False,
+                        mesh_cache=cache)
+
+
+def test_cache_hit_still_saves_result(tmpdir, monkeypatch):
+    cache = MeshCache(directory=str(tmpdir.join('cache')))
+    csg = "algebraic3d\nsolid main = orthobrick (0, 0, 0; 10, 10, 2) -maxh = 2.0;\ntlo main;\n"
+    meshes.from_csg(csg, save_result=False, mesh_cache=cache)
+
+    def netgen_must_not_run(geofile):
+        raise AssertionError("Netgen should not be called.")
+    monkeypatch.setattr(meshes, 'run_netgen', netgen_must_not_run)
+
+    mesh = meshes.from_csg(csg, filename='saved', directory=str(tmpdir),
+                           mesh_cache=cache)
+    assert tmpdir.join('saved.xml.gz').check(file=1)
+    saved = df.Mesh(str(tmpdir.join('saved.xml.gz')))
+    assert np.array_equal(saved.coordinates(), mesh.coordinates())
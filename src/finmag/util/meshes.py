@@ -25,11 +25,15 @@ import dolfin as df
 import numpy as np
 from types import ListType, TupleType
 from math import sin, cos, pi
+from finmag.util.mesh_cache import get_mesh_cache
 
 logger = logging.getLogger(name='finmag')
 
+# Command line options for Netgen (besides the input and output files).
+NETGEN_OPTIONS = "-meshfiletype='DIFFPACK Format' -batchmode"
 
-def from_geofile(geofile, save_result=True):
+
+def from_geofile(geofile, save_result=True, mesh_cache=None):
     """
     Using netgen, returns a dolfin mesh object built from the given geofile.
 
@@ -45,6 +49,14 @@ def from_geofile(geofile, save_result=True):
             will have the same basename as the geofile, just with the
             extension .xml.gz instead of .geo, and will be placed in
             the same directory.
+        mesh_cache (bool or MeshCache) [optional]
+            Meshes are also stored in a shared cache directory, under a
+            hash of the contents of the geofile, and loaded from there
+            if the same geometry is requested again (even from a
+            different geofile). The default (None) is to use the cache
+            unless it is switched off in the .finmagrc file. Pass False
+            to skip the cache, or a MeshCache instance to use another
+            cache directory (see `finmag.util.mesh_cache`).
 
     *Return*
         mesh
@@ -63,6 +75,23 @@ def from_geofile(geofile, save_result=True):
 
     """
     result_filename = os.path.splitext(geofile)[0] + ".xml.gz"
+
+    cache = get_mesh_cache(mesh_cache)
+    if cache is not None and os.path.isfile(geofile):
+        with open(geofile) as f:
+            key = cache.key(f.read(), NETGEN_OPTIONS)
+        mesh = cache.load(key)
+        if mesh is not None:
+            if save_result and (
+                    not os.path.isfile(result_filename) or
+                    os.path.getmtime(result_filename) < os.path.getmtime(geofile)):
+                logger.debug("Saving cached mesh to '{}'.".format(
+                    result_filename))
+                df.File(result_filename) << mesh
+            return mesh
+    else:
+        cache = None
+
     result_file_exists = False
     skip_mesh_creation = False
 
@@ -86,6 +115,8 @@ def from_geofile(geofile, save_result=True):
         result_filename = compress(xml)
 
     mesh = df.Mesh(result_filename)
+    if cache is not None:
+        cache.store(key, mesh)
     if not save_result and not result_file_exists:
         # We delete the .xml.gz file only if it didn't exist previously
         os.remove(result_filename)
@@ -94,7 +125,7 @@ def from_geofile(geofile, save_result=True):
     return mesh
 
 
-def from_csg(csg, save_result=True, filename="", directory=""):
+def from_csg(csg, save_result=True, filename="", directory="", mesh_cache=None):
     """
     Using netgen, returns a dolfin mesh object built from the given CSG string.
 
@@ -114,6 +145,8 @@ def from_csg(csg, save_result=True, filename="", directory=""):
 
     Caveat: if `filename` contains an absolute path then value of
     `directory` is ignored.
+
+    For the argument `mesh_cache` see `from_geofile`.
     """
     if filename == "":
         filename = hashlib.md5(csg).hexdigest()
@@ -147,12 +180,12 @@ def from_csg(csg, save_result=True, filename="", directory=""):
         if not os.path.exists(geofile):
             with open(geofile, "w") as f:
                 f.write(csg)
-        mesh = from_geofile(geofile, save_result=True)
+        mesh = from_geofile(geofile, save_result=True, mesh_cache=mesh_cache)
     else:
         tmp = tempfile.NamedTemporaryFile(suffix='.geo', delete=False)
         tmp.write(csg)
         tmp.close()
-        mesh = from_geofile(tmp.name, save_result=False)
+        mesh = from_geofile(tmp.name, save_result=False, mesh_cache=mesh_cache)
         # Since we used delete=False in NamedTemporaryFile, we are
         # responsible for the deletion of the file.
         os.remove(tmp.name)
@@ -177,8 +210,8 @@ def run_netgen(geofile):
 
     logger.debug(
         "Using netgen to convert {} to DIFFPACK format.".format(geofile))
-    netgen_cmd = "netgen -geofile={} -meshfiletype='DIFFPACK Format' -meshfile={} -batchmode".format(
-        geofile, diffpackfile)
+    netgen_cmd = "netgen -geofile={} -meshfile={} {}".format(
+        geofile, diffpackfile, NETGEN_OPTIONS)
 
     status, output = commands.getstatusoutput(netgen_cmd)
     if status == 34304:
@@ -1,6 +1,7 @@
 import dolfin as df
 import numpy as np
 from finmag.field import Field
+from finmag.util.probing import ProbePlan
 from finmag.energies import UniaxialAnisotropy, Exchange
 from finmag.util.oommf import oommf_uniform_exchange, oommf_uniaxial_anisotropy
 
@@ -74,7 +75,7 @@ def compute_finmag_exc(dolfin_mesh, m_gen, Ms, A):
 
 
 def oommf_m0(m_gen, oommf_mesh):
-    coords = np.array(zip(* oommf_mesh.iter_coords()))
+    coords = oommf_mesh.get_coords().T
     m0 = oommf_mesh.new_field(3)
     m0.flat = m_gen(coords)
     m0.flat /= np.sqrt(
@@ -82,20 +83,38 @@ def oommf_m0(m_gen, oommf_mesh):
     return m0
 
 
-def finmag_to_oommf(f, oommf_mesh, dims=1):
+def oommf_probe_plan(dolfin_mesh, oommf_mesh):
+    """
+    Return a ProbePlan which interpolates CG1 fields on `dolfin_mesh` at the
+    cell centres of `oommf_mesh`, for use with finmag_to_oommf. The plan
+    can be reused for all the fields which are transferred between the
+    same two meshes.
+
+    """
+    plan = ProbePlan(dolfin_mesh, oommf_mesh.get_coords())
+    if plan.outside.any():
+        raise RuntimeError("Some of the coordinates of the OOMMF mesh lie "
+                           "outside the dolfin mesh.")
+    return plan
+
+
+def finmag_to_oommf(f, oommf_mesh, dims=1, plan=None):
     """
     Given a dolfin.Function f and a mesh oommf_mesh as defined in
     finmag.util.oommf.mesh, it will probe the values of f at the coordinates
     of oommf_mesh and return the resulting, oommf_compatible mesh_field.
 
+    For a dolfin mesh of dimension `dims` < 3, only the first `dims`
+    coordinates of the oommf_mesh are used. The dolfin.Function f must be
+    a CG1 function.
+
+    If `plan` is given, it must be the result of oommf_probe_plan for the
+    mesh of f and oommf_mesh, and the interpolation operator is not
+    recomputed.
+
     """
+    if plan is None:
+        plan = oommf_probe_plan(f.function_space().mesh(), oommf_mesh)
     f_for_oommf = oommf_mesh.new_field(3)
-    for i, (x, y, z) in enumerate(oommf_mesh.iter_coords()):
-        if dims == 1:
-            f_x, f_y, f_z = f(x)
-        else:
-            f_x, f_y, f_z = f(x, y, z)
-        f_for_oommf.flat[0, i] = f_x
-        f_for_oommf.flat[1, i] = f_y
-        f_for_oommf.flat[2, i] = f_z
+    f_for_oommf.flat[:] = plan(f).data.T
     return f_for_oommf.flat
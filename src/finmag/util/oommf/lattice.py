@@ -116,19 +116,39 @@ class Lattice(object):
 
     nodes = property(get_shape)
 
+    def get_coordinates(self, i):
+        """Returns an array with the coordinates of the points of the lattice
+        along the i-th dimension, taking into account the reduction. These
+        are the coordinates which 'foreach' passes to its function."""
+        x_min, x_max, num_steps = self.min_max_num_list[i]
+        assert num_steps > 0, ("Number of steps is less than 1 for "
+                               "dimension %d of the lattice!" % i)
+        x_min += self.reduction
+        x_max -= self.reduction
+        if num_steps == 1:
+            return numpy.array([x_min], dtype=float)
+        return numpy.linspace(x_min, x_max, num_steps)
+
     def get_positions(self, flat=False):
-        slices = []
-        for xstart, xend, num_xs in self.min_max_num_list:
-            if num_xs > 1:
-                dx = (xend - xstart) / float(num_xs - 1)
-                s = slice(xstart, xend + 0.5 * dx, dx)
-            else:
-                s = slice(xstart, xend + 1.0, xstart + 0.5)
-            slices.append(s)
-        ps = numpy.lib.index_tricks.mgrid.__getitem__(slices)
+        """Returns the positions of all the points of the lattice as an array,
+        without iterating over the points in Python.
+
+        If flat=False, the array has the layout of the data of a FieldLattice
+        of dimension 'self.dim' on this lattice, i.e. its shape is
+        [dim] + nodes for order "F" and nodes + [dim] for order "C". For
+        example, positions[:, i, j, k] is the position of the point with
+        index [i, j, k] of a 3D lattice with order "F".
+
+        If flat=True, the array has shape (num_points, dim) and contains the
+        positions in the order in which 'foreach' visits them."""
+        grids = numpy.meshgrid(*[self.get_coordinates(i)
+                                 for i in range(self.dim)], indexing='ij')
         if flat:
-            ps.shape = (ps.shape[0], -1)
-        return ps.swapaxes(0, -1)
+            return numpy.array([g.ravel(self.order) for g in grids]).T
+        elif self.order == "F":
+            return numpy.array(grids)
+        else:
+            return numpy.rollaxis(numpy.array(grids), 0, self.dim + 1)
 
     def _get_stepsizes(self, scale=1.0):
         return [(scale * (mx - mn) / (ns - 1) if ns > 1 else (mx - mn))
@@ -192,40 +212,31 @@ class Lattice(object):
                 mn, mx, nm = self.min_max_num_list[i]
                 self.min_max_num_list[i] = (mn * f, mx * f, nm)
 
-    def _foreach(self, nr_idx, idx, pos, fn, fastest_idx, idx_order):
+    def _foreach(self, nr_idx, idx, pos, fn, fastest_idx, idx_order, coords):
         if nr_idx == fastest_idx:
             fn(idx, pos)
 
         else:
-            x_min, x_max, num_steps = self.min_max_num_list[nr_idx]
-            x_min += self.reduction
-            x_max -= self.reduction
-            xi = x_min
-            assert num_steps > 0, ("Number of steps is less than 1 for "
-                                   "dimension %d of the lattice!" % nr_idx)
-            if num_steps == 1:
-                delta_xi = 0.0
-            else:
-                delta_xi = (x_max - x_min) / (num_steps - 1)
-
-            for i in range(num_steps):
+            for i, xi in enumerate(coords[nr_idx]):
                 pos[nr_idx] = xi
                 idx[nr_idx] = i
-                xi += delta_xi
                 self._foreach(nr_idx + idx_order, idx, pos, fn,
-                              fastest_idx, idx_order)
+                              fastest_idx, idx_order, coords)
 
     def foreach(self, fn):
         """Iterates over all the points in the lattice and, for each of those,
         call 'fn(idx, pos)' where 'idx' is the index of the current point,
         while 'pos' is its position as given by the method 'get_pos_from_idx'.
+        Note that this calls 'fn' once per point: use 'get_positions' to get
+        all the positions at once.
         """
         idx = [0] * self.dim
         pos = [0.0] * self.dim
+        coords = [self.get_coordinates(i).tolist() for i in range(self.dim)]
         if self.order == "C":
-            self._foreach(0, idx, pos, fn, self.dim, 1)
+            self._foreach(0, idx, pos, fn, self.dim, 1, coords)
         else:
-            self._foreach(self.dim - 1, idx, pos, fn, -1, -1)
+            self._foreach(self.dim - 1, idx, pos, fn, -1, -1, coords)
 
 
 class FieldLattice(object):
@@ -241,19 +252,38 @@ class FieldLattice(object):
         self.field_dim = dim
         nodes = self.lattice.nodes
         shape = self.lattice._combine_idx(nodes, [dim])
-        if data != None:
+        if data is not None:
             self.field_data = data
         else:
             self.field_data = \
                 numpy.ndarray(dtype=float, shape=shape, order=order)
 
-    def set(self, setter):
+    def set(self, setter, vectorised=False):
+        """Sets the field from the function 'setter'.
+
+        By default, 'setter' is called for each point of the lattice with the
+        position of the point and should return the 'dim' components of the
+        field there. If vectorised=True, 'setter' is called only once with
+        an array of shape (num_points, lattice dimension) containing all the
+        positions and should return an array of shape (num_points, dim)."""
+        if vectorised:
+            positions = self.lattice.get_positions(flat=True)
+            values = numpy.asarray(setter(positions), dtype=float)
+            values = values.reshape((len(positions), self.field_dim))
+            shape = self.lattice._combine_idx(self.lattice.nodes,
+                                              [self.field_dim])
+            if self.lattice.order == 'C':
+                self.field_data[...] = values.reshape(shape)
+            else:
+                self.field_data[...] = values.T.reshape(shape, order='F')
+            return
+
         all_components = [slice(None)]
         if self.lattice.order == 'C':
             def fn(idx, pos):
-                self.field_data[idx + all_components] = setter(pos)
+                self.field_data[tuple(idx + all_components)] = setter(pos)
         else:
             def fn(idx, pos):
-                self.field_data[all_components + idx] = setter(pos)
+                self.field_data[tuple(all_components + idx)] = setter(pos)
 
         self.lattice.foreach(fn)
@@ -124,20 +124,26 @@ class Mesh(object):
         a.shape = (dims, -1)
         return MeshField(self, a, [dims])
 
+    # Returns the integer XYZ coordinates of all the cells as an array of
+    # shape (n, 3), in the order of the cells in the flat field arrays
+    def get_coords_int(self):
+        idx = np.indices(self.mesh_size_ao).reshape(3, -1)
+        res = np.empty((self.n, 3), dtype=int)
+        res[:, list(self.array_order)] = idx.T
+        return res
+
+    # Returns the positions of the cell centres as an array of shape (n, 3),
+    # in the same order as get_coords_int
+    def get_coords(self):
+        return self.origin + (0.5 + self.get_coords_int()) * self.cell_size
+
     def iter_coords_int(self):
-        l, m, n = self.array_order
-        for i in xrange(self.mesh_size[l]):
-            for j in xrange(self.mesh_size[m]):
-                for k in xrange(self.mesh_size[n]):
-                    r = [-1] * 3
-                    r[l] = i
-                    r[m] = j
-                    r[n] = k
-                    yield tuple(r)
+        for r in self.get_coords_int().tolist():
+            yield tuple(r)
 
     def iter_coords(self):
-        for i in self.iter_coords_int():
-            yield([self.origin[d] + (0.5 + i[d]) * self.cell_size[d] for d in xrange(3)])
+        for r in self.get_coords().tolist():
+            yield r
 
     endpoint = property(
         lambda self: self.origin + self.cell_size * self.mesh_size)
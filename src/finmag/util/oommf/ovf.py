@@ -23,6 +23,10 @@ EXAMPLE 1: reading an OVF file and retrieving the data
   # fl.lattice is a Lattice object, describing the mesh (lattice.py)
   # fl.field_data is the numpy array containing the data
 
+  For large binary files, use OVFFile("filename.ovf", lazy=True): the data
+  is then memory-mapped rather than read, so that fl.field_data is only
+  loaded from the file when (and as far as) it is used.
+
 EXAMPLE 2: creating a new OVF file
 
     from ovf import OVFFile, OVF10, OVF20
@@ -107,8 +111,7 @@ NOTE: The OVF file defines fields over a grid of cubes while the FieldLattice
 
 __all__ = ["OVF10", "OVF20", "OVFFile", "OVFValueUnits", "OVFValueLabels"]
 
-import struct
-from numpy import array, ndarray
+import numpy as np
 
 from lattice import FieldLattice
 
@@ -411,16 +414,22 @@ class OVFHeaderSectionNode(OVFSectionNode):
 
 
 def _info_binary(oommf_version, data_size):
-    endianness = '!' if oommf_version == OVF10 else '<'
+    """Return the numpy dtype of the binary data (OVF 1.0 uses big endian,
+    OVF 2.0 little endian floats) and the expected verification tag."""
+    endianness = '>' if oommf_version == OVF10 else '<'
     if data_size == 8:
-        float_type = 'd'
+        float_type = 'f8'
         expected_tag = 123456789012345.0
 
     else:
         assert data_size == 4
-        float_type = 'f'
+        float_type = 'f4'
         expected_tag = 1234567.0
-    return endianness, float_type, expected_tag
+    return np.dtype(endianness + float_type), expected_tag
+
+
+# Number of floats converted at once when writing data
+_WRITE_CHUNK_SIZE = 2 ** 18
 
 
 class OVFDataSectionNode(OVFSectionNode):
@@ -479,11 +488,11 @@ class OVFDataSectionNode(OVFSectionNode):
                 return
 
     def _read_binary(self, stream, root=None, data_size=8):
-        endianness, float_type, expected_tag = \
+        dtype, expected_tag = \
             _info_binary(root.a_oommf.value.version, data_size)
 
-        fmt = endianness + float_type
-        verification_tag, = struct.unpack(fmt, stream.read_bytes(data_size))
+        verification_tag = \
+            np.frombuffer(stream.read_bytes(data_size), dtype=dtype)[0]
         if verification_tag != expected_tag:
             raise OVFReadError("Data carries wrong signature: got '%s' but "
                                "'%s' was expected. This usually means that "
@@ -492,29 +501,37 @@ class OVFDataSectionNode(OVFSectionNode):
                                % (verification_tag, expected_tag))
 
         num_floats = self.num_stored_nodes * self.floats_per_node
-        fmt = endianness + float_type * num_floats
-        data = stream.read_bytes(num_floats * data_size)
-        big_float_tuple = struct.unpack(fmt, data)
-
-        # Reshape the data
+        if stream.lazy and stream.filename is not None:
+            # Map the data into memory rather than reading it: it is only
+            # loaded (and converted to the native byte order) when used.
+            data = np.memmap(stream.filename, dtype=dtype, mode='r',
+                             offset=stream.tell(), shape=(num_floats,))
+            stream.skip_bytes(num_floats * data_size)
+        else:
+            data = np.frombuffer(stream.read_bytes(num_floats * data_size),
+                                 dtype=dtype).astype(float)
+        if len(data) != num_floats:
+            raise OVFReadError("Expected %d floats in the data section, but "
+                               "the file ended after %d."
+                               % (num_floats, len(data)))
+
+        # Reshape the data (without copying it)
         xn, yn, zn = self.nodes
         fn = self.floats_per_node
-        self.field = array(big_float_tuple).reshape((fn, xn, yn, zn),
-                                                    order="F")
+        self.field = data.reshape((fn, xn, yn, zn), order="F")
 
     def _read_ascii(self, stream, root=None):
-        semiflat_array = ndarray(dtype='float', order="F",
-                                 shape=(self.floats_per_node, self.num_nodes))
-
-        for i in range(self.num_nodes):
-            l = stream.next_line()
-            v = [float(vi) for vi in l.split()]
-            semiflat_array[:, i] = v
-
-        # Reshape the data
+        lines = stream.read_lines(self.num_nodes)
+        values = np.array(" ".join(lines).split(), dtype=float)
         xn, yn, zn = self.nodes
         fn = self.floats_per_node
-        self.field = semiflat_array.reshape((fn, xn, yn, zn))
+        if len(values) != fn * self.num_nodes:
+            raise OVFReadError("Expected %d values in the data section, but "
+                               "got %d." % (fn * self.num_nodes, len(values)))
+
+        # There is one line per node and the nodes are ordered with the
+        # x index varying fastest, like in the binary case.
+        self.field = values.reshape((fn, xn, yn, zn), order="F")
 
     def write(self, stream, root=None):
         self._retrieve_info_from_root(root)
@@ -531,25 +548,28 @@ class OVFDataSectionNode(OVFSectionNode):
                              % self.data_type)
         stream.write_line("# End: %s" % self.name)
 
+    def _flat_field(self):
+        return np.asarray(self.field).ravel('F')
+
     def _write_binary(self, stream, root=None, data_size=8):
-        endianness, float_type, expected_tag = \
+        dtype, expected_tag = \
             _info_binary(root.a_oommf.value.version, data_size)
 
-        fmt = endianness + float_type
-        out_data = struct.pack(fmt, expected_tag)
-
-        num_floats = self.num_stored_nodes * self.floats_per_node
-        fmt = endianness + float_type * num_floats
-        flat_array = self.field.ravel('F')
-        out_data += struct.pack(fmt, *flat_array) + "\n"
-        stream.write(out_data)
+        stream.write(np.array([expected_tag], dtype=dtype).tostring())
+        flat_array = self._flat_field()
+        for i in xrange(0, len(flat_array), _WRITE_CHUNK_SIZE):
+            chunk = flat_array[i:i + _WRITE_CHUNK_SIZE]
+            stream.write(chunk.astype(dtype).tostring())
+        stream.write("\n")
 
     def _write_ascii(self, stream, root=None):
-        semiflat_array = \
-            self.field.reshape((self.floats_per_node, self.num_nodes))
-        for i in range(self.num_nodes):
-            v = semiflat_array[:, i]
-            stream.write_line(" ".join([repr(vi) for vi in v]))
+        fn = self.floats_per_node
+        line = " ".join(["%r"] * fn) + "\n"
+        flat_array = self._flat_field()
+        step = _WRITE_CHUNK_SIZE * fn
+        for i in xrange(0, len(flat_array), step):
+            rows = flat_array[i:i + step].reshape((-1, fn)).tolist()
+            stream.write("".join([line % tuple(row) for row in rows]))
 
 
 def remove_comment(line, marker="##"):
@@ -716,7 +736,7 @@ class OVFRootNode(OVFSectionNode):
 
 class OVFStream(object):
 
-    def __init__(self, filename, mode="r"):
+    def __init__(self, filename, mode="r", lazy=False):
         if type(filename) == str:
             self.filename = filename
             self.f = open(filename, mode)
@@ -725,6 +745,8 @@ class OVFStream(object):
             self.f = filename
         self.no_line = 0
         self.lines = []
+        # Whether binary data should be memory-mapped rather than read
+        self.lazy = lazy
 
     def __del__(self):
         self.f.close()
@@ -747,10 +769,27 @@ class OVFStream(object):
 
     def read_bytes(self, num_bytes):
         l = self.f.read(num_bytes)
-        self.lines.append(l)
+        # Binary data is not kept in self.lines, only a placeholder
+        self.lines.append("")
         self.no_line = len(self.lines)
         return l
 
+    def skip_bytes(self, num_bytes):
+        self.f.seek(num_bytes, 1)
+        self.lines.append("")
+        self.no_line = len(self.lines)
+
+    def read_lines(self, num_lines):
+        """Read the next num_lines lines (without the trailing newlines)."""
+        assert self.no_line == len(self.lines)
+        lines = [self.f.readline().rstrip("\r\n") for _ in xrange(num_lines)]
+        self.lines.append("")
+        self.no_line = len(self.lines)
+        return lines
+
+    def tell(self):
+        return self.f.tell()
+
     def read_lines_ahead(self):
         self.lines += self.f.readlines()
 
@@ -763,11 +802,11 @@ class OVFStream(object):
 
 class OVFFile:
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, lazy=False):
         self.content = OVFRootNode()
 
         if filename != None:
-            self.read(filename)
+            self.read(filename, lazy=lazy)
 
     def new(self, fieldlattice, version=OVF10, mesh_type="rectangular",
             data_type="binary8"):
@@ -858,8 +897,8 @@ class OVFFile:
         if version == OVF10:
             h.a_valueunit.value = "1.0"
             h.a_valuemultiplier.value = 1.0
-            h.a_valuerangeminmag.value = min(fl.field_data.flat)
-            h.a_valuerangemaxmag.value = max(fl.field_data.flat)
+            h.a_valuerangeminmag.value = np.min(fl.field_data)
+            h.a_valuerangemaxmag.value = np.max(fl.field_data)
 
         else:
             h.a_valuedim.value = fl.field_dim
@@ -886,9 +925,14 @@ class OVFFile:
         return FieldLattice(min_max_ndim, dim=field_dim,
                             data=field_data, order='F')
 
-    def read(self, stream):
+    def read(self, stream, lazy=False):
+        """Read the OVF file `stream` (a filename, file object or
+        OVFStream). If `lazy` is True, binary data is memory-mapped
+        rather than read into memory (only possible if a filename is
+        given); `get_field` then returns a FieldLattice backed by the
+        file."""
         if not isinstance(stream, OVFStream):
-            stream = OVFStream(stream)
+            stream = OVFStream(stream, lazy=lazy)
         self.content.read(stream, root=self.content)
         self.content._end_section("main")
 
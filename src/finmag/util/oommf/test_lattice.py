@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from finmag.util.oommf.lattice import Lattice, FieldLattice
+
+
+def positions_from_foreach(lattice):
+    positions = []
+    lattice.foreach(lambda idx, pos: positions.append(list(pos)))
+    return np.array(positions)
+
+
+@pytest.mark.parametrize("order", ["F", "C"])
+def test_get_positions_agrees_with_foreach(order):
+    lattice = Lattice("0,1,3/-1,1,5/2.5,2.5,1/0,0.3,4", order=order,
+                      reduction=0.1)
+    flat = lattice.get_positions(flat=True)
+    assert flat.shape == (3 * 5 * 1 * 4, 4)
+    assert np.array_equal(flat, positions_from_foreach(lattice))
+    assert np.allclose(lattice.get_coordinates(1), [-0.9, -0.45, 0, 0.45, 0.9])
+    assert np.array_equal(lattice.get_coordinates(2), [2.6])
+
+    positions = lattice.get_positions()
+    expected = [lattice.get_coordinates(i)[j]
+                for i, j in enumerate([2, 1, 0, 3])]
+    if order == "F":
+        assert positions.shape == (4, 3, 5, 1, 4)
+        assert np.array_equal(positions[:, 2, 1, 0, 3],
+                              expected)
+    else:
+        assert positions.shape == (3, 5, 1, 4, 4)
+        assert np.array_equal(positions[2, 1, 0, 3],
+                              expected)
+
+
+@pytest.mark.parametrize("order", ["F", "C"])
+def test_vectorised_set(order):
+    spec = "1,5,3/1,3,2/1,7,4"
+
+    def setter(pos):
+        return [pos[0] * pos[1], pos[2], 1.0]
+
+    def vectorised_setter(pos):
+        return np.array([pos[:, 0] * pos[:, 1], pos[:, 2],
+                         np.ones(len(pos))]).T
+
+    fl = FieldLattice(spec, order=order)
+    fl.set(setter)
+    fl_vectorised = FieldLattice(spec, order=order)
+    fl_vectorised.set(vectorised_setter, vectorised=True)
+    assert np.array_equal(fl.field_data, fl_vectorised.field_data)
+
+    fl_scalar = FieldLattice(spec, dim=1, order=order)
+    fl_scalar.set(lambda pos: pos[:, 1], vectorised=True)
+    positions = fl_scalar.lattice.get_positions()
+    if order == "F":
+        assert np.array_equal(fl_scalar.field_data[0], positions[1])
+    else:
+        assert np.array_equal(fl_scalar.field_data[..., 0], positions[..., 1])
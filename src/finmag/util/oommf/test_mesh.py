@@ -45,3 +45,18 @@ class TestIterCoords(unittest.TestCase):
         coords = [r for r in m.iter_coords()]
         expected = [[0.5, 0.5, 0.5], [1.5, 0.5, 0.5], [2.5, 0.5, 0.5]]
         assert np.array_equal(expected, coords)
+
+
+class TestGetCoords(unittest.TestCase):
+
+    def test_agrees_with_iteration(self):
+        for order in [mesh.Mesh.ZYX, mesh.Mesh.XYZ, mesh.Mesh.ZXY]:
+            m = mesh.Mesh((4, 3, 2), cellsize=(1, 2, 3), origin=(-1, 0, 5),
+                          array_order=order)
+            coords_int = m.get_coords_int()
+            assert coords_int.shape == (24, 3)
+            assert np.array_equal(coords_int, list(m.iter_coords_int()))
+            coords = m.get_coords()
+            assert np.array_equal(coords, list(m.iter_coords()))
+            assert np.array_equal(coords[0], [-0.5, 1, 6.5])
+            assert np.array_equal(coords[-1], [2.5, 5, 9.5])
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pytest
+from finmag.util.oommf.ovf import OVFFile, OVF10, OVF20, OVFReadError
+from finmag.util.oommf.lattice import FieldLattice
+
+
+def random_field_lattice():
+    fl = FieldLattice("1,5,3/1,3,2/1,7,4", order="F")
+    fl.field_data[...] = np.random.random_sample(fl.field_data.shape)
+    return fl
+
+
+@pytest.mark.parametrize("version", [OVF10, OVF20])
+@pytest.mark.parametrize("data_type", ["binary8", "binary4", "text"])
+def test_write_and_read(tmpdir, version, data_type):
+    filename = os.path.join(str(tmpdir), "field.ovf")
+    fl = random_field_lattice()
+    ovf = OVFFile()
+    ovf.new(fl, version=version, data_type=data_type)
+    ovf.write(filename)
+
+    rtol = 1e-6 if data_type == "binary4" else 0
+    for lazy in [False, True]:
+        field_data = OVFFile(filename, lazy=lazy).get_field().field_data
+        assert field_data.shape == (3, 3, 2, 4)
+        assert np.allclose(field_data, fl.field_data, rtol=rtol, atol=0)
+
+
+def test_binary_data_layout(tmpdir):
+    # OVF 1.0 stores big endian, OVF 2.0 little endian floats, preceded by
+    # a verification tag and with the x index varying fastest
+    fl = random_field_lattice()
+    expected = fl.field_data.ravel('F')
+    for version, dtype in [(OVF10, '>f8'), (OVF20, '<f8')]:
+        filename = os.path.join(str(tmpdir), "field.ovf")
+        ovf = OVFFile()
+        ovf.new(fl, version=version, data_type="binary8")
+        ovf.write(filename)
+        data = open(filename, 'rb').read()
+        start = data.index("# Begin: Data Binary 8\n") + 23
+        values = np.frombuffer(data[start:start + 8 * (1 + len(expected))],
+                               dtype=dtype)
+        assert values[0] == 123456789012345.0
+        assert np.array_equal(values[1:], expected)
+
+
+def test_lazy_reading_maps_binary_data(tmpdir):
+    filename = os.path.join(str(tmpdir), "field.ovf")
+    fl = random_field_lattice()
+    ovf = OVFFile()
+    ovf.new(fl, version=OVF20, data_type="binary8")
+    ovf.write(filename)
+    field_data = OVFFile(filename, lazy=True).get_field().field_data
+    assert isinstance(field_data.base, np.memmap)
+    assert np.array_equal(field_data, fl.field_data)
+
+
+def test_text_data_has_one_node_per_line(tmpdir):
+    filename = os.path.join(str(tmpdir), "field.ovf")
+    fl = random_field_lattice()
+    ovf = OVFFile()
+    ovf.new(fl, version=OVF20, data_type="text")
+    ovf.write(filename)
+    lines = open(filename).read().split("# Begin: Data Text\n")[1]
+    first_node = [float(v) for v in lines.split("\n")[1].split()]
+    # the second node is the next one along the x axis
+    assert first_node == list(fl.field_data[:, 1, 0, 0])
+
+
+def test_truncated_file(tmpdir):
+    filename = os.path.join(str(tmpdir), "field.ovf")
+    ovf = OVFFile()
+    ovf.new(random_field_lattice(), version=OVF20, data_type="text")
+    ovf.write(filename)
+    lines = open(filename).read().split("\n")
+    open(filename, "w").write("\n".join(lines[:-10]))
+    with pytest.raises(OVFReadError):
+        OVFFile(filename)
@@ -72,7 +72,7 @@ def quiver(f, mesh, filename=None, title="", **kwargs):
     if isinstance(mesh, dolfin_mesh):
         coords = mesh.coordinates()
     elif isinstance(mesh, oommf_mesh):
-        coords = np.array(list(mesh.iter_coords()))
+        coords = mesh.get_coords()
     elif isinstance(mesh, np.ndarray) or isinstance(mesh, list):
         # If you know what the data has to look like, why not
         # be able to pass it in directly.
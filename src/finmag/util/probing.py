@@ -0,0 +1,185 @@
+"""
+Evaluation of CG1 fields at arbitrary points via a precomputed
+interpolation matrix.
+
+Evaluating a dolfin Function at a point (`f(pt)`) searches for the cell
+containing the point every time. When the same points are probed many
+times (e.g. for every snapshot of a time series), it is much cheaper to
+locate the cells once and store the barycentric coordinates of the
+points as a sparse matrix which maps the values at the mesh vertices to
+the values at the points. This is what a `ProbePlan` does.
+
+Note that building a plan costs about as much as probing the points once
+in the usual way, since each point is still located with a separate query
+of the mesh's bounding box tree. The savings come from evaluating the
+plan many times (e.g. with `evaluate_many`).
+
+"""
+import numpy as np
+import dolfin as df
+from scipy.sparse import csr_matrix
+
+
+def is_cg1(function_space):
+    """
+    Return True if `function_space` is a scalar or vector function space
+    of continuous piecewise linear functions.
+    """
+    element = function_space.ufl_element()
+    return element.family() in ('Lagrange', 'CG') and element.degree() == 1
+
+
+class ProbePlan(object):
+
+    """
+    Interpolation of CG1 fields on `mesh` at a fixed set of points.
+
+    *Arguments*
+
+    mesh: dolfin.Mesh
+
+    points: numpy.array
+
+        An array of points of arbitrary shape, except that the last axis
+        must have dimension 3 (or the geometric dimension of the mesh).
+        For example, if points.shape == (10, 20, 5, 3) then the fields
+        are probed on a regular grid of size 10 x 20 x 5. Only the first
+        `d` coordinates are used for a mesh of geometric dimension `d`.
+
+    The cells containing the points are found once with the bounding box
+    tree of the mesh. The attribute `outside` is a boolean array of shape
+    points.shape[:-1] which is True for points outside the mesh; the
+    corresponding values are masked out in the results.
+
+    Example:
+
+        plan = ProbePlan(mesh, pts)
+        m_at_pts = plan(m)                # masked array, shape pts.shape
+        m_series = plan.evaluate_many(ms) # one matrix product for all
+
+    """
+
+    def __init__(self, mesh, points):
+        points = np.array(points, dtype=float)
+        d = mesh.geometry().dim()
+        if points.ndim == 0 or points.shape[-1] not in (3, d):
+            raise ValueError(
+                "Argument 'points' must be a numpy array of 3D points, "
+                "i.e. the last axis must have dimension 3. Shape of "
+                "'points' is: {}".format(points.shape))
+        self.mesh = mesh
+        self.points = points
+        self.points_shape = points.shape[:-1]
+        self.num_vertices = mesh.num_vertices()
+
+        pts = points.reshape(-1, points.shape[-1])[:, :d]
+        cells = self._locate(mesh, pts)
+        self.outside = (cells < 0).reshape(self.points_shape)
+
+        inside = np.nonzero(cells >= 0)[0]
+        vertices = mesh.cells()[cells[inside]]
+        weights = self._barycentric_coordinates(
+            mesh.coordinates()[vertices], pts[inside])
+        rows = np.repeat(inside, vertices.shape[1])
+        self.matrix = csr_matrix(
+            (weights.ravel(), (rows, vertices.ravel())),
+            shape=(len(pts), self.num_vertices))
+
+    @staticmethod
+    def _locate(mesh, pts):
+        """
+        Return the index of a cell containing each point, or -1.
+
+        This loops over the points in Python. A vectorised search of all
+        points would have to be done in numpy without the C++ bounding
+        box tree, and is not faster than one tree query per point.
+        """
+        tree = mesh.bounding_box_tree()
+        num_cells = mesh.num_cells()
+        cells = np.empty(len(pts), dtype=int)
+        for i, pt in enumerate(pts):
+            cells[i] = tree.compute_first_entity_collision(df.Point(*pt))
+        cells[cells >= num_cells] = -1
+        return cells
+
+    @staticmethod
+    def _barycentric_coordinates(vertex_coords, pts):
+        """
+        Return the barycentric coordinates of the points `pts` (shape (n,
+        d)) with respect to the simplices with vertices `vertex_coords`
+        (shape (n, d + 1, d)).
+        """
+        if len(pts) == 0:
+            return np.empty((0, vertex_coords.shape[1]))
+        x0 = vertex_coords[:, 0, :]
+        # The columns of T are the edges from the first vertex.
+        T = np.transpose(vertex_coords[:, 1:, :] - x0[:, np.newaxis, :],
+                         (0, 2, 1))
+        lambdas = np.linalg.solve(T, (pts - x0)[:, :, np.newaxis])[:, :, 0]
+        return np.hstack([1 - lambdas.sum(axis=1)[:, np.newaxis], lambdas])
+
+    def _check(self, f):
+        V = f.function_space()
+        if not is_cg1(V):
+            raise ValueError("ProbePlan can only evaluate CG1 functions, "
+                             "got: {}".format(V.ufl_element()))
+        if V.mesh().id() != self.mesh.id():
+            raise ValueError("The function is not defined on the mesh "
+                             "of the probe plan.")
+
+    def evaluate_vertex_values(self, values):
+        """
+        Return the values at the probing points of the fields given by
+        their `values` at the mesh vertices.
+
+        The last axis of `values` must run over the mesh vertices. The
+        result is a masked array of shape values.shape[:-1] +
+        points.shape[:-1]. For example, for values of shape (nt, 3,
+        num_vertices) and points of shape (N, 3) it has the shape (nt,
+        3, N).
+        """
+        values = np.asarray(values)
+        if values.shape[-1] != self.num_vertices:
+            raise ValueError(
+                "Expected values at the {} vertices of the mesh, got array "
+                "of shape {}.".format(self.num_vertices, values.shape))
+        leading = values.shape[:-1]
+        res = self.matrix.dot(values.reshape(-1, self.num_vertices).T).T
+        res = res.reshape(leading + self.points_shape)
+        mask = np.empty(res.shape, dtype=bool)
+        mask[...] = self.outside
+        return np.ma.masked_array(res, mask=mask)
+
+    def evaluate_many(self, functions):
+        """
+        Return the values of the CG1 `functions` (a list of
+        dolfin.Functions on the mesh of the plan, e.g. the snapshots of a
+        time series) at the probing points, computed with a single sparse
+        matrix product.
+
+        The result is a masked array of shape (len(functions),) +
+        points.shape[:-1] + value shape, where the value shape is (3,)
+        for vector fields and () for scalar fields.
+        """
+        if len(functions) == 0:
+            raise ValueError("Expected at least one function.")
+        for f in functions:
+            self._check(f)
+        value_shape = tuple(
+            functions[0].function_space().ufl_element().value_shape())
+        dim = int(np.prod(value_shape))
+        values = np.array([f.compute_vertex_values(self.mesh)
+                           for f in functions])
+        values = values.reshape(len(functions), dim, self.num_vertices)
+        res = self.evaluate_vertex_values(values)
+        # Move the component axis behind the point axes.
+        res = np.ma.masked_array(np.rollaxis(res.data, 1, res.ndim),
+                                 mask=np.rollaxis(res.mask, 1, res.ndim))
+        return res.reshape((len(functions),) + self.points_shape + value_shape)
+
+    def __call__(self, f):
+        """
+        Return the values of the CG1 function `f` at the probing points as
+        a masked array of shape points.shape[:-1] + value shape.
+        """
+        return self.evaluate_many([f])[0]
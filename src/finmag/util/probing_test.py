@@ -0,0 +1,75 @@
+import numpy as np
+import dolfin as df
+import pytest
+from finmag.util.probing import ProbePlan
+from finmag.util.helpers import probe
+
+mesh = df.BoxMesh(df.Point(0, 0, 0), df.Point(10, 5, 2), 10, 5, 2)
+S1 = df.FunctionSpace(mesh, 'Lagrange', 1)
+S3 = df.VectorFunctionSpace(mesh, 'Lagrange', 1, dim=3)
+
+
+def random_points(n, outside=0):
+    pts = np.random.random_sample((n, 3)) * [10, 5, 2]
+    pts[:outside] += [20, 0, 0]
+    return pts
+
+
+def test_probe_plan_agrees_with_pointwise_evaluation():
+    # a field which is not linear, so that the interpolation matters
+    f = df.interpolate(df.Expression(('x[0]*x[1]', 'x[2]*x[2]', 'x[0]'),
+                                     degree=2), S3)
+    pts = random_points(50, outside=5)
+    plan = ProbePlan(mesh, pts)
+    vals = plan(f)
+
+    assert vals.shape == (50, 3)
+    assert np.all(plan.outside == [True] * 5 + [False] * 45)
+    assert np.all(np.ma.getmask(vals)[:5])
+    assert not np.any(np.ma.getmask(vals)[5:])
+    for i in xrange(5, 50):
+        assert np.allclose(vals[i], f(pts[i]), rtol=1e-12, atol=1e-12)
+
+
+def test_probe_plan_for_grid_of_points_and_scalar_field():
+    f = df.interpolate(df.Expression('x[0] + 2*x[1] - x[2]', degree=1), S1)
+    X, Y, Z = np.mgrid[0.5:9.5:4j, 0.5:4.5:3j, 0.5:1.5:2j]
+    pts = np.concatenate([X[..., None], Y[..., None], Z[..., None]], axis=-1)
+    vals = ProbePlan(mesh, pts)(f)
+    assert vals.shape == (4, 3, 2)
+    assert np.allclose(vals, X + 2 * Y - Z)
+
+
+def test_evaluate_many():
+    fs = [df.interpolate(df.Expression(('a*x[0]', 'a', 'x[1]'), a=a, degree=1), S3)
+          for a in [1.0, 2.0, 3.0]]
+    pts = random_points(20, outside=2)
+    plan = ProbePlan(mesh, pts)
+    vals = plan.evaluate_many(fs)
+    assert vals.shape == (3, 20, 3)
+    for i, f in enumerate(fs):
+        assert np.ma.allclose(vals[i], plan(f))
+        assert np.all(np.ma.getmask(vals[i]) == np.ma.getmask(plan(f)))
+
+
+def test_probe_plan_on_2d_mesh():
+    mesh2d = df.RectangleMesh(df.Point(0, 0), df.Point(4, 3), 4, 3)
+    V = df.VectorFunctionSpace(mesh2d, 'Lagrange', 1, dim=3)
+    f = df.interpolate(df.Expression(('x[0]', 'x[1]', '1'), degree=1), V)
+    vals = ProbePlan(mesh2d, [[1.5, 2.5, 0], [5, 1, 0]])(f)
+    assert np.allclose(vals[0], [1.5, 2.5, 1])
+    assert np.ma.getmask(vals)[1].all()
+
+
+def test_probe_plan_rejects_other_function_spaces():
+    plan = ProbePlan(mesh, random_points(3))
+    f_dg = df.Function(df.FunctionSpace(mesh, 'DG', 0))
+    with pytest.raises(ValueError):
+        plan(f_dg)
+    other_mesh = df.UnitCubeMesh(2, 2, 2)
+    with pytest.raises(ValueError):
+        plan(df.Function(df.FunctionSpace(other_mesh, 'Lagrange', 1)))
+
+    # helpers.probe falls back to pointwise evaluation
+    f_dg.vector()[:] = 4.2
+    assert np.allclose(probe(f_dg, random_points(3)), 4.2)
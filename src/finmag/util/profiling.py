@@ -0,0 +1,102 @@
+"""
+Lightweight instrumentation of simulation runs.
+
+The module-level object `profiler` collects wall clock times of named
+sections of code and counters (e.g. Krylov iterations). It is disabled
+by default, in which case entering a section only costs a function call
+and an attribute lookup. Use `Simulation.enable_profiling` to switch it
+on and obtain a structured report for each call of `run_until` or
+`relax`.
+
+Instrumented code looks like this:
+
+    from finmag.util.profiling import profiler
+
+    with profiler("demag/first linear solve"):
+        iterations = solver.solve(x, b)
+    profiler.count("demag/first linear solve iterations", iterations)
+
+Names are hierarchical by convention, with '/' as the separator.
+
+"""
+import time
+
+
+class _NullSection(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null_section = _NullSection()
+
+
+class _Section(object):
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.time() - self.start)
+        return False
+
+
+class Profiler(object):
+
+    """
+    Accumulates the time spent in named sections of code and named
+    counters while it is enabled.
+
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all recorded times and counts.
+        """
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+
+    def __call__(self, name):
+        """
+        Return a context manager which adds the time spent in its body to
+        the section `name` (if the profiler is enabled).
+        """
+        if not self.enabled:
+            return _null_section
+        return _Section(self, name)
+
+    def add_time(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        """
+        Increase the counter `name` by `n` (if the profiler is enabled).
+        """
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def report(self):
+        """
+        Return the recorded data as a dictionary with the keys 'times'
+        (total seconds per section), 'calls' (number of times each
+        section was entered) and 'counts'.
+        """
+        return {'times': dict(self.times),
+                'calls': dict(self.calls),
+                'counts': dict(self.counts)}
+
+
+profiler = Profiler()
@@ -0,0 +1,29 @@
+import time
+from profiling import Profiler
+
+
+def test_profiler_records_nothing_when_disabled():
+    p = Profiler()
+    with p("section"):
+        pass
+    p.count("counter", 3)
+    assert p.report() == {'times': {}, 'calls': {}, 'counts': {}}
+
+
+def test_profiler_accumulates_times_and_counts():
+    p = Profiler()
+    p.enabled = True
+    for i in xrange(3):
+        with p("outer"):
+            with p("inner"):
+                time.sleep(0.01)
+        p.count("counter", 2)
+
+    report = p.report()
+    assert report['calls'] == {'outer': 3, 'inner': 3}
+    assert report['counts'] == {'counter': 6}
+    assert report['times']['inner'] >= 0.03
+    assert report['times']['outer'] >= report['times']['inner']
+
+    p.reset()
+    assert p.report()['times'] == {}